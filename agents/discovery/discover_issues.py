@@ -2,22 +2,40 @@
 """Issue Discovery Agent."""
 import sys
 import json
+import asyncio
 import argparse
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
 from infrastructure.git.github_client import GitHubClient
 from infrastructure.llm_pool.client import GeminiLLM
+from infrastructure.llm_pool.async_client import AsyncGeminiLLM
+from infrastructure.llm_pool.provider import get_provider
+from infrastructure.llm_pool.router import router_from_config
+from infrastructure.llm_pool.local_triage import local_triage_from_config, log_verdicts
 
 class IssueDiscoveryAgent:
-    def __init__(self, repo_url: str, output_dir: str = "artifacts"):
+    def __init__(self, repo_url: str, output_dir: str = "artifacts", concurrency: int = 1,
+                 config: Optional[Dict[str, Any]] = None, batch_size: Optional[int] = None):
         self.repo_url = repo_url
         self.output_dir = Path(output_dir)
+        self.concurrency = concurrency
+        self.batch_size = batch_size or (config or {}).get('triage_batch_size', 1)
         self.gh_client = GitHubClient()
-        self.llm_client = GeminiLLM()
+        config = config or {}
+        structured = config.get('structured_output', True)
+        self.llm_client = GeminiLLM(provider=get_provider("gemini-3-pro-preview", config=config),
+                                    structured_output=structured)
+        self.router = router_from_config(
+            config, self.llm_client,
+            lambda name: GeminiLLM(provider=get_provider(name, config=config), structured_output=structured),
+            local_triage=local_triage_from_config(config)
+        )
+        # Remote verdicts are kept as training data for the local classifier
+        self.verdict_log = config.get('local_triage_log', 'data/triage/verdicts.jsonl')
         
     def discover(self, limit: int = 10) -> List[Dict[str, Any]]:
         """
@@ -39,24 +57,23 @@ class IssueDiscoveryAgent:
         print(f"Found {len(issues)} open issues. Analyzing top {limit}...")
         
         candidates = []
+        to_triage = []
         
         # Analyze top N issues
         for i, issue in enumerate(issues[:limit]):
-            print(f"Analyzing #{issue.number}: {issue.title}...")
-            
             labels = [l.name for l in issue.labels]
             
             # Skip if explicitly labeled as 'wontfix', 'question', 'invalid'
             skip_labels = {'wontfix', 'question', 'invalid', 'documentation'}
             if any(l in skip_labels for l in labels):
-                print(f"  Skipping due to labels: {labels}")
+                print(f"Skipping #{issue.number} due to labels: {labels}")
                 continue
-                
-            triage_result = self.llm_client.triage_issue(
-                issue.title,
-                issue.body or "",
-                labels
-            )
+            to_triage.append((issue, labels))
+        
+        triage_results = self._triage(to_triage)
+        
+        for (issue, labels), triage_result in zip(to_triage, triage_results):
+            print(f"#{issue.number}: {issue.title}")
             
             if triage_result.get('is_suitable'):
                 print(f"  ✓ Suitable (Score: {triage_result.get('priority_score')})")
@@ -91,13 +108,56 @@ class IssueDiscoveryAgent:
             json.dump(top_candidates, f, indent=2)
             
         print(f"\nSaved {len(top_candidates)} candidates to {output_path}")
+        if self.llm_client.rate_limiter.wait_count:
+            print(f"Waited {self.llm_client.rate_limiter.wait_seconds_total:.1f}s for LLM quota")
+        for tier, stats in self.router.stats()['tiers'].items():
+            print(f"LLM {tier} tier ({stats['model']}): {stats['llm_calls']} calls, "
+                  f"{stats['escalations']} escalated, ${stats['cost_usd']:.4f}")
+        llm_metrics = self.llm_client.provider.metrics()
+        print(f"LLM calls: {llm_metrics['llm_calls']} ({llm_metrics['llm_retries']} retries, "
+              f"p95 {llm_metrics['llm_latency_ms_p95']:.0f}ms)")
         return top_candidates
+    
+    def _triage(self, to_triage) -> List[Dict[str, Any]]:
+        """Triage (issue, labels) pairs, batched and concurrently if configured."""
+        issues = [
+            {"title": issue.title, "body": issue.body or "", "labels": labels}
+            for issue, labels in to_triage
+        ]
+        if self.batch_size > 1:
+            print(f"Triaging {len(issues)} issues in batches of {self.batch_size}...")
+        
+        triage = None
+        if self.concurrency > 1 and len(to_triage) > 1:
+            print(f"Triaging {len(to_triage)} issues with concurrency {self.concurrency}...")
+            
+            def triage(llm, batch):
+                async_client = AsyncGeminiLLM(llm, max_concurrency=self.concurrency)
+                return asyncio.run(async_client.triage_many(batch, batch_size=self.batch_size))
+        
+        # Cheapest tier first (the local classifier when trained); borderline or
+        # unparsed verdicts are re-triaged by the stronger models
+        results = self.router.triage_issues(issues, batch_size=self.batch_size, triage=triage)
+        if self.verdict_log:
+            log_verdicts(self.verdict_log, issues, results)
+        return results
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("repo_url", help="GitHub repository URL")
     parser.add_argument("--limit", type=int, default=10, help="Max issues to analyze")
+    parser.add_argument("--concurrency", type=int, default=4, help="Max concurrent triage calls")
+    parser.add_argument("--batch-size", type=int, default=None,
+                        help="Issues per triage prompt (default: triage_batch_size from config)")
+    parser.add_argument("--config", default="config/config.yml", help="Config file path")
     args = parser.parse_args()
     
-    agent = IssueDiscoveryAgent(args.repo_url)
+    config = {}
+    if Path(args.config).exists():
+        import yaml
+        with open(args.config, "r") as f:
+            config = yaml.safe_load(f) or {}
+    
+    agent = IssueDiscoveryAgent(args.repo_url, concurrency=args.concurrency, config=config,
+                                batch_size=args.batch_size)
     agent.discover(args.limit)
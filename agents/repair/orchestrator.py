@@ -5,35 +5,42 @@ import argparse
 import logging
 from pathlib import Path
 import subprocess
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 
 from infrastructure.retrieval.chunk_selector import ChunkSelector
+from infrastructure.retrieval import retrieval_cache
+from infrastructure.retrieval.retrieval_cache import RetrievalCache
+from infrastructure.retrieval.reranker import CrossEncoderReranker
 from infrastructure.llm.llm_client import LLMClient
+from infrastructure.llm_pool.context_cache import ContextCache, split_template
 from infrastructure.metrics.metrics import Metrics
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class Orchestrator:
-    def __init__(self, repo_dir: str, run_id: str):
+    def __init__(self, repo_dir: str, run_id: str, rerank: bool = False, rerank_candidates: int = 50,
+                 config: Optional[Dict[str, Any]] = None):
         self.repo_dir = repo_dir
+        self.config = config or {}
         self.run_id = run_id
+        self.rerank_candidates = rerank_candidates
         self.artifacts_dir = Path(f"data/runs/{run_id}")
         self.artifacts_dir.mkdir(parents=True, exist_ok=True)
         
         self.chunk_selector = ChunkSelector(repo_dir)
-        self.llm_client = LLMClient()
+        self.retrieval_cache = RetrievalCache()
+        self.reranker = CrossEncoderReranker() if rerank else None
+        self.llm_client = LLMClient(self.config)
+        self.context_cache = ContextCache()
         self.metrics = Metrics()
 
-    def run(self, issue_title: str, issue_body: str, max_retries: int = 3):
+    def run(self, issue_title: str, issue_body: str, max_retries: int = 3, labels: Optional[List[str]] = None):
         logger.info(f"Starting repair for run {self.run_id}")
         
-        # 1. Ingest & Retrieve
-        logger.info("Ingesting codebase...")
-        self.chunk_selector.ingest()
-        
+        # 1. Ingest & Retrieve (skipped entirely on a retrieval cache hit)
         query = f"{issue_title}\n{issue_body}"
-        chunks = self.chunk_selector.query(query, top_k=5)
+        chunks = self._retrieve(query, top_k=5, labels=labels)
         
         context_str = "\n".join([
             f"File: {c.file_path}\nLines: {c.start_line}-{c.end_line}\n{c.content}\n"
@@ -43,29 +50,30 @@ class Orchestrator:
         # 2. Initial Patch
         logger.info("Generating initial patch...")
         with open("infrastructure/prompts/patchbuilder_json_prompt.txt", "r") as f:
-            prompt_tmpl = f.read()
+            prefix_tmpl, suffix_tmpl = split_template(f.read())
             
-        prompt = prompt_tmpl.format(
+        prefix = prefix_tmpl.format(
             REPO_URL=self.repo_dir, # Using repo_dir as URL proxy for now
             ISSUE_NUMBER=self.run_id, # Using run_id as issue number proxy
+            ISSUE_DESCRIPTION=query,
             CONTEXT_CHUNKS=context_str,
             METRICS="N/A"
         )
+        prompt = prefix + suffix_tmpl.format(EXISTING_PATCH="None", VALIDATION_RESULTS="None")
         
-        response = self.llm_client.call_llm(prompt)
+        response = self._call(prefix, prompt, schema="patch_response")
         
-        try:
-            # Clean JSON block
-            text = response["text"].replace("```json", "").replace("```", "").strip()
-            patch_data = json.loads(text)
-            patch_content = patch_data.get("patch_text", "")
-            explanation = patch_data.get("explanation", "")
-            logger.info(f"Patch generated. Explanation: {explanation}")
-        except json.JSONDecodeError:
-            logger.error("Failed to parse LLM JSON response. Fallback to raw text.")
+        patch_data = response.get("data")
+        if patch_data is not None:
+            patch_content = patch_data["patch_text"]
+            logger.info(f"Patch generated. Explanation: {patch_data.get('explanation', '')}")
+        else:
+            logger.error(f"Invalid patch response ({response.get('parse_error')}). Fallback to raw text.")
             patch_content = response["text"]
             
         self.metrics.record_attempt(False, response["usage"]["total_tokens"])
+        self.metrics.record_token_estimate(response["usage"].get("estimated_prompt_tokens", 0),
+                                           response["usage"]["prompt_tokens"])
         
         if "CANNOT_FIX_SAFELY" in patch_content:
             logger.warning("LLM declined to fix.")
@@ -94,28 +102,84 @@ class Orchestrator:
             # Prepare repair
             logger.info("Patch failed. Attempting repair...")
             with open("infrastructure/prompts/repair_loop_prompt.txt", "r") as f:
-                repair_tmpl = f.read()
+                repair_prefix_tmpl, repair_suffix_tmpl = split_template(f.read())
             
             logs = ""
             if os.path.exists(val_res["stderr_log_path"]):
                 with open(val_res["stderr_log_path"], "r") as f:
                     logs += f.read()
             
-            repair_prompt = repair_tmpl.format(
+            # Context first so iterations 2..N share a cacheable prefix
+            repair_prefix = repair_prefix_tmpl.format(CONTEXT_CHUNKS=context_str)
+            repair_prompt = repair_prefix + repair_suffix_tmpl.format(
                 PREVIOUS_PATCH=patch_content,
-                FAILURE_LOGS=logs[-2000:], # Truncate logs
-                CONTEXT_CHUNKS=context_str
+                FAILURE_LOGS=logs[-2000:] # Truncate logs
             )
             
-            response = self.llm_client.call_llm(repair_prompt)
+            response = self._call(repair_prefix, repair_prompt)
             patch_content = response["text"]
             self.metrics.record_attempt(False, response["usage"]["total_tokens"])
+            self.metrics.record_token_estimate(response["usage"].get("estimated_prompt_tokens", 0),
+                                               response["usage"]["prompt_tokens"])
             
             with open(patch_path, "w") as f:
                 f.write(patch_content)
 
         return self._finish("failed", "Max retries exceeded")
 
+    def _call(self, prefix: str, prompt: str, schema: str = None):
+        """Call the LLM and account the reuse of the prompt's stable prefix."""
+        response = self.llm_client.call_llm(prompt, schema=schema)
+        usage = response["usage"]
+        if usage.get("prompt_tokens"):
+            cached = self.context_cache.record(prefix, usage["prompt_tokens"], usage.get("cached_tokens", 0))
+            self.metrics.record_context_cache(self.context_cache.stats())
+            logger.info(f"Prompt prefix: {cached} of {usage['prompt_tokens']} prompt tokens cached")
+        return response
+
+    def _retrieve(self, query: str, top_k: int, labels: Optional[List[str]] = None):
+        version = retrieval_cache.index_version(self.repo_dir)
+        selector = self.chunk_selector
+        config_key = retrieval_cache.config_hash({
+            "selector": "retrieval",
+            "chunk_size": selector.chunk_size,
+            "overlap": selector.overlap,
+            "shard_min_chunks": selector.shard_min_chunks,
+            "shards_to_search": selector.shards_to_search,
+            "embed_model": selector.embed_adapter.model,
+            "top_k": top_k,
+            "labels": sorted(labels or []),  # Labels steer shard routing
+            "rerank": self.reranker.model_name if self.reranker and self.reranker.available else None,
+        })
+        query_key = retrieval_cache.query_hash(query)
+        repo_key = os.path.abspath(self.repo_dir)
+        
+        if version:
+            cached = self.retrieval_cache.get(repo_key, version, config_key, query_key)
+            if cached is not None:
+                logger.info(f"Retrieval cache hit ({len(cached)} chunks), skipping ingestion")
+                self.metrics.record_retrieval_cache(True)
+                return selector.load_chunks(cached)
+        
+        logger.info("Ingesting codebase...")
+        selector.ingest()
+        if self.reranker and self.reranker.available:
+            candidates = selector.query(query, top_k=self.rerank_candidates, labels=labels)
+            chunks = self.reranker.rerank(query, candidates, top_n=top_k)
+            logger.info(f"Reranked {len(candidates)} candidates: {self.reranker.last_stats}")
+        else:
+            chunks = selector.query(query, top_k=top_k, labels=labels)
+        self.metrics.record_retrieval_cache(False)
+        
+        if version:
+            self.retrieval_cache.put(repo_key, version, config_key, query_key, [{
+                "file_path": c.file_path,
+                "start_line": c.start_line,
+                "end_line": c.end_line,
+                "score": c.metadata.get("score"),
+            } for c in chunks])
+        return chunks
+
     def _validate(self, patch_path: Path) -> Dict[str, Any]:
         cmd = [
             "infrastructure/validation/validate_patch.sh",
@@ -144,6 +208,7 @@ class Orchestrator:
         return {"verdict": "fail", "stderr_log_path": "/dev/null"}
 
     def _finish(self, status: str, reason: str):
+        self.metrics.record_llm(self.llm_client.metrics())
         self.metrics.save(self.artifacts_dir / "metrics.json")
         result = {
             "status": status,
@@ -160,9 +225,18 @@ if __name__ == "__main__":
     parser.add_argument("--repo-dir", required=True)
     parser.add_argument("--issue-title", default="Issue")
     parser.add_argument("--issue-body", default="")
+    parser.add_argument("--labels", nargs="*", default=[], help="Issue labels, used to route retrieval shards")
     parser.add_argument("--run-id", default="test_run")
+    parser.add_argument("--rerank", action="store_true", help="Rerank retrieval candidates with a local cross-encoder")
+    parser.add_argument("--config", default="config/config.yml", help="Config file path")
     args = parser.parse_args()
     
-    orch = Orchestrator(args.repo_dir, args.run_id)
-    res = orch.run(args.issue_title, args.issue_body)
+    config = {}
+    if Path(args.config).exists():
+        import yaml
+        with open(args.config, "r") as f:
+            config = yaml.safe_load(f) or {}
+    
+    orch = Orchestrator(args.repo_dir, args.run_id, rerank=args.rerank, config=config)
+    res = orch.run(args.issue_title, args.issue_body, labels=args.labels)
     print(json.dumps(res, indent=2))
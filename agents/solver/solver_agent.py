@@ -1,102 +1,349 @@
 """Solver agent orchestrates the patch generation pipeline."""
-from typing import Dict, Any, Optional
+from itertools import takewhile
+from typing import Dict, Any, List, Optional, Tuple
 from pathlib import Path
 import json
+import subprocess
 import sys
+import time
+import uuid
+
+from git import Repo
 
 # Add parent to path
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
 from agents.base_agent import BaseAgent
+from agents.solver.speculative import SpeculativeSolver, speculative_result
 from infrastructure.code_graph.ingestion import Ingestor
 from infrastructure.git.github_client import GitHubClient
 from infrastructure.code_graph.chunk_selector import ChunkSelector
+from infrastructure.retrieval import retrieval_cache
+from infrastructure.retrieval.retrieval_cache import RetrievalCache
 from infrastructure.llm_pool.client import GeminiLLM
+from infrastructure.llm_pool.provider import get_provider
+from infrastructure.llm_pool.context_cache import ContextCache
+from infrastructure.llm_pool.deadline import deadline_scope
+from infrastructure.llm_pool.router import estimate_complexity, router_from_config
+from data.artifact_store import artifact_store_from_config
 from data.database import Database
 
+# Pipeline stages in order; each records its output in the run_stages table
+STAGES = ("fetch", "clone", "index", "retrieve", "generate", "validate", "repair", "persist")
+
 
 class SolverAgent(BaseAgent):
     """Agent that solves GitHub issues by generating patches."""
     
-    def __init__(self, config: Dict[str, Any], db: Database):
-        """Initialize solver agent."""
-        super().__init__(config)
+    def __init__(self, config: Dict[str, Any], db: Database, run_id: Optional[str] = None):
+        """Initialize solver agent (``run_id`` of an earlier run to resume it)."""
+        super().__init__(config, run_id)
         self.db = db
+        self.stage_seconds: Dict[str, float] = {}
         self.ingestor = Ingestor()
         self.github_client = GitHubClient()
         self.chunk_selector = ChunkSelector(
             chunk_size=config.get('chunk_size', 500),
             overlap=config.get('overlap', 50)
         )
-        self.llm = GeminiLLM(
-            model_name=config.get('llm_model', 'gemini-3-pro-preview'),
-            logger=self.logger
+        self.retrieval_cache = (
+            RetrievalCache(config.get('db_path', 'data/db/openfix.db'))
+            if config.get('retrieval_cache', True) else None
         )
+        self.artifact_store = artifact_store_from_config(config)
+        self.llm = self._make_llm(config.get('llm_model', 'gemini-3-pro-preview'))
+        self.router = router_from_config(config, self.llm, self._make_llm, logger=self.logger)
     
-    def execute(self, repo_url: str) -> Dict[str, Any]:
+    def _make_llm(self, model_name: str, generation_config: Optional[Dict[str, Any]] = None) -> GeminiLLM:
+        """GeminiLLM on the pooled provider for a model, with its own prefix accounting."""
+        return GeminiLLM(
+            model_name=model_name,
+            logger=self.logger,
+            provider=get_provider(model_name, generation_config, config=self.config, logger=self.logger),
+            structured_output=self.config.get('structured_output', True),
+            patch_format=self.config.get('patch_format', 'diff'),
+            artifact_store=self.artifact_store,
+            context_cache=ContextCache(
+                ttl_seconds=self.config.get('context_cache_ttl_seconds', 300),
+                min_tokens=self.config.get('context_cache_min_tokens', 1024)
+            )
+        )
+    
+    def execute(self, repo_url: str, resume: bool = False, issue_number: Optional[int] = None) -> Dict[str, Any]:
         """
         Execute the solver pipeline.
         
+        The pipeline runs as named stages (``STAGES``) whose outputs are
+        recorded in the ``run_stages`` table. With ``resume`` the completed
+        stages of ``self.run_id`` are restored instead of run again, so a
+        crashed run restarts after its last completed stage.
+        
+        LLM calls and validation runs share the ``run_deadline_seconds`` budget
+        (unbounded when unset).
+        
         Args:
             repo_url: GitHub repository URL
+            resume: Continue the run recorded under ``self.run_id`` (if any)
+            issue_number: Issue to solve (default: ``issue_number`` from config, else the first open issue)
             
         Returns:
             Dict with results including patch_path, validation results, etc.
         """
-        try:
-            self.logger.info(f"Starting solve pipeline for {repo_url}")
-            
-            # 1. Insert repository
-            repo_name = repo_url.split('/')[-1]
-            repo_id = self.db.insert_repository(repo_url, repo_name)
+        with deadline_scope(self.config.get('run_deadline_seconds')) as deadline:
+            return self._execute(repo_url, deadline, resume, issue_number=issue_number)
+    
+    def execute_batch(self, repo_url: str, issue_numbers: List[int]) -> List[Dict[str, Any]]:
+        """
+        Solve several issues of one repository against a single clone and index.
+        
+        The repository is cloned, ingested and chunked once; between issues
+        the checkout is reset to the cloned commit, so patches applied by
+        validation do not leak into the next issue. Each issue is its own run
+        (run ID, stages, deadline and metrics); router and provider stats
+        accumulate over the batch.
+        
+        Args:
+            repo_url: GitHub repository URL
+            issue_numbers: Issues to solve, in order
             
-            # 2. Fetch issues
+        Returns:
+            One result per issue, as from ``execute``; an issue whose run
+            raised gets 'patch_generated': False and its 'error'
+        """
+        shared: Dict[str, Any] = {}
+        results = []
+        start = time.perf_counter()
+        try:
+            for number in issue_numbers:
+                self.run_id = str(uuid.uuid4())
+                self.metrics = {}
+                self.stage_seconds = {}
+                try:
+                    with deadline_scope(self.config.get('run_deadline_seconds')) as deadline:
+                        result = self._execute(repo_url, deadline, False, shared, number)
+                    results.append(dict(result, issue_number=number))
+                except Exception as e:
+                    results.append({'run_id': self.run_id, 'issue_number': number,
+                                    'patch_generated': False, 'error': str(e)})
+        finally:
+            self.ingestor.cleanup()
+        
+        elapsed = time.perf_counter() - start
+        self.logger.info(
+            f"Batch of {len(issue_numbers)} issues: {sum(1 for r in results if r.get('patch_generated'))} "
+            f"patches in {elapsed:.1f}s ({elapsed / max(1, len(issue_numbers)):.1f}s per issue, "
+            f"clone and index {shared.get('setup_seconds', 0.0):.1f}s once)"
+        )
+        return results
+    
+    def _execute(self, repo_url: str, deadline, resume: bool, shared: Optional[Dict[str, Any]] = None,
+                 issue_number: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Run the pipeline stages under ``deadline``.
+        
+        ``shared`` carries the fetched issues, clone and index between the runs
+        of a batch; without it the checkout is removed when the run ends.
+        """
+        recorded = self.db.get_completed_stages(self.run_id) if resume else {}
+        completed = {name: recorded[name] for name in takewhile(lambda name: name in recorded, STAGES)}
+        if 'persist' in completed:
+            self.logger.info(f"Run {self.run_id} already completed")
+            return completed['persist']
+        if completed:
+            self.logger.info(f"Resuming run {self.run_id} after the {list(completed)[-1]} stage")
+            self.db.update_run(self.run_id, status='RUNNING', error_message=None)
+        
+        self.logger.info(f"Starting solve pipeline for {repo_url}")
+        for llm in self.router.llms.values():
+            llm.context_cache.reset_stats()
+        
+        state = {
+            'repo_url': repo_url,
+            'deadline': deadline,
+            'artifacts_dir': Path(self.config['runs_dir']) / self.run_id,
+            'shared': {} if shared is None else shared,
+            'issue_number': issue_number or self.config.get('issue_number'),
+        }
+        stage = None
+        try:
+            for stage in STAGES:
+                state[stage] = self._run_stage(stage, state, completed)
+                if stage == 'fetch' and state['fetch']['issue'] is None:
+                    return {"error": "No issues found", "patch_generated": False}
+            return state['persist']
+        except Exception as e:
+            self.logger.error(f"Error in solve pipeline ({stage} stage): {e}", exc_info=True)
+            self.db.fail_stage(self.run_id, stage, str(e))
+            self.db.update_run(self.run_id, status='FAILED', error_message=str(e))
+            raise
+        finally:
+            if shared is None:
+                self.ingestor.cleanup()
+    
+    def _run_stage(self, name: str, state: Dict[str, Any], completed: Dict[str, Any]) -> Any:
+        """Run a stage and record its output, or restore the output recorded by an earlier attempt."""
+        if name in completed:
+            restore = getattr(self, f"_restore_{name}", None)
+            if restore:
+                restore(state, completed[name])
+            self.logger.info(f"Stage {name}: restored")
+            return completed[name]
+        
+        self.db.start_stage(self.run_id, name)
+        start = time.perf_counter()
+        output = getattr(self, f"_{name}")(state)
+        self.db.complete_stage(self.run_id, name, output)
+        self.stage_seconds[name] = round(time.perf_counter() - start, 2)
+        return output
+    
+    @staticmethod
+    def _issue_text(state: Dict[str, Any]) -> str:
+        issue = state['fetch']['issue']
+        return f"{issue['title']}\n\n{issue['body']}"
+    
+    def _fetch(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Record the repository, select the issue and create the run."""
+        repo_url = state['repo_url']
+        repo_id = self.db.insert_repository(repo_url, repo_url.split('/')[-1])
+        
+        shared = state['shared']
+        if 'issues' not in shared:
             self.logger.info("Fetching issues from GitHub...")
-            issues = self.github_client.get_repo_issues(repo_url)
-            
-            if not issues:
-                return {"error": "No issues found", "patch_generated": False}
-            
-            self.logger.info(f"Found {len(issues)} issues")
-            
-            # 3. Select issue to solve
-            issue = self._select_issue(issues)
-            issue_id = self.db.insert_issue(
-                repo_id,
-                issue.number,
-                issue.title,
-                issue.body or "",
-                [label.name for label in issue.labels]
-            )
-            
-            # 4. Create run
-            run_db_id = self.db.insert_run(self.run_id, repo_id, issue_id)
-            
-            # 5. Ingest codebase
+            shared['issues'] = self.github_client.get_repo_issues(repo_url)
+        issues = shared['issues']
+        if not issues:
+            return {'repo_id': repo_id, 'issue_id': None, 'issue': None}
+        self.logger.info(f"Found {len(issues)} issues")
+        
+        issue = self._select_issue(issues, state['issue_number'])
+        labels = [label.name for label in issue.labels]
+        issue_id = self.db.insert_issue(repo_id, issue.number, issue.title, issue.body or "", labels)
+        if self.db.get_run(self.run_id) is None:  # A retried fetch may have created it already
+            self.db.insert_run(self.run_id, repo_id, issue_id)
+        return {
+            'repo_id': repo_id,
+            'issue_id': issue_id,
+            'issue': {'number': issue.number, 'title': issue.title, 'body': issue.body or "", 'labels': labels},
+        }
+    
+    def _clone(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Clone the repository, recording the commit later stages ran against."""
+        shared = state['shared']
+        if 'commit' in shared:
+            # Later issue of a batch: undo patches applied while validating earlier ones
+            repo = Repo(self.ingestor.temp_dir)
+            repo.git.reset('--hard', shared['commit'])
+            repo.git.clean('-fd')
+            return {'commit': shared['commit']}
+        
+        start = time.perf_counter()
+        if not self.ingestor.clone_repo(state['repo_url']):
+            raise RuntimeError(f"Could not clone {state['repo_url']}")
+        shared['commit'] = Repo(self.ingestor.temp_dir).head.commit.hexsha
+        shared['setup_seconds'] = shared.get('setup_seconds', 0.0) + time.perf_counter() - start
+        return {'commit': shared['commit']}
+    
+    def _restore_clone(self, state: Dict[str, Any], output: Dict[str, Any]):
+        """Clone again at the recorded commit; the checkout does not outlive its process."""
+        self._clone(state)
+        Repo(self.ingestor.temp_dir).git.checkout(output['commit'])
+    
+    def _retrieval_key(self, state: Dict[str, Any]) -> tuple:
+        """(index version, config hash, query hash) for the retrieval cache."""
+        version = retrieval_cache.index_version(self.ingestor.temp_dir) if self.retrieval_cache else None
+        config_key = retrieval_cache.config_hash({
+            'selector': 'code_graph',
+            'chunk_size': self.chunk_selector.chunk_size,
+            'overlap': self.chunk_selector.overlap,
+            'top_k': self.config.get('top_k_chunks', 10),
+            'token_budget': self.config.get('context_token_budget'),
+        })
+        return version, config_key, retrieval_cache.query_hash(self._issue_text(state))
+    
+    def _index(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Ingest and chunk the codebase, unless retrieval for this commit and issue is cached."""
+        version, config_key, query_key = self._retrieval_key(state)
+        if version:
+            cached = self.retrieval_cache.get(state['repo_url'], version, config_key, query_key)
+            if cached is not None:
+                self.logger.info(f"Retrieval cache hit for {version[:12]}, skipping indexing")
+                state['cached_refs'] = cached
+                return {'retrieval_cache_hit': True}
+        
+        shared = state['shared']
+        reused = 'chunks' in shared
+        if not reused:
+            start = time.perf_counter()
             self.logger.info("Ingesting codebase...")
-            self.ingestor.clone_repo(repo_url)
             codebase_text = self.ingestor.get_codebase_context()
-            
-            # 6. Create chunks
-            chunks = self._create_chunks(codebase_text)
-            self.logger.info(f"Created {len(chunks)} code chunks")
-            
-            # 7. Select relevant chunks
-            issue_text = f"{issue.title}\n\n{issue.body or ''}"
+            shared['chunks'] = self._create_chunks(codebase_text)
+            shared['trigram_index'] = self.chunk_selector.build_index(shared['chunks'])
+            shared['setup_seconds'] = shared.get('setup_seconds', 0.0) + time.perf_counter() - start
+            self.logger.info(f"Created {len(shared['chunks'])} code chunks")
+        files_excluded = self.ingestor.exclusion_report.summary()['files_excluded']
+        self.log_metric('files_excluded', files_excluded)
+        
+        state['chunks'] = shared['chunks']
+        state['trigram_index'] = shared['trigram_index']
+        return {'retrieval_cache_hit': False, 'chunks': len(state['chunks']), 'files_excluded': files_excluded,
+                'shared_index': reused}
+    
+    def _retrieve(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Select relevant chunks and save them with the issue to the run artifacts."""
+        if 'cached_refs' not in state and 'chunks' not in state:
+            # Resumed after the index stage: the in-memory index did not survive
+            self._index(state)
+        
+        issue_text = self._issue_text(state)
+        if 'cached_refs' in state:
+            self.log_metric('retrieval_cache_hit', True)
+            selected_chunks = self._load_cached_chunks(state['cached_refs'])
+        else:
             selected_chunks = self.chunk_selector.select_chunks(
-                chunks,
+                state['chunks'],
                 issue_text,
-                top_k=self.config.get('top_k_chunks', 10)
+                top_k=self.config.get('top_k_chunks', 10),
+                trigram_index=state['trigram_index'],
+                token_budget=self.config.get('context_token_budget'),
+                token_counter=self.llm.token_counter
             )
-            
-            self.log_metric('chunks_selected', len(selected_chunks))
-            self.logger.info(f"Selected {len(selected_chunks)} relevant chunks")
-            
-            # 8. Create artifacts directory
-            artifacts_dir = Path(self.config['runs_dir']) / self.run_id
-            artifacts_dir.mkdir(parents=True, exist_ok=True)
-            
-            # 9. Save selected chunks
+            self.log_metric('exact_match_chunks', sum(1 for c in selected_chunks if c.exact_matches))
+            self.log_metric('retrieval_cache_hit', False)
+        
+        refs = [{
+            'file_path': c.file_path,
+            'start_line': c.start_line,
+            'end_line': c.end_line,
+            'score': c.relevance_score,
+            'exact_matches': c.exact_matches
+        } for c in selected_chunks]
+        version, config_key, query_key = self._retrieval_key(state)
+        if version and 'cached_refs' not in state:
+            self.retrieval_cache.put(state['repo_url'], version, config_key, query_key, refs)
+        
+        state['selected_chunks'] = selected_chunks
+        self.log_metric('chunks_selected', len(selected_chunks))
+        self.logger.info(f"Selected {len(selected_chunks)} relevant chunks")
+        self._save_context(state, selected_chunks)
+        return {'chunks': refs}
+    
+    def _restore_retrieve(self, state: Dict[str, Any], output: Dict[str, Any]):
+        state['selected_chunks'] = self._load_cached_chunks(output['chunks'])
+    
+    def _save_context(self, state: Dict[str, Any], selected_chunks: list):
+        """Write chunks.json, excluded_files.json and issue.md to the run artifacts."""
+        artifacts_dir = state['artifacts_dir']
+        artifacts_dir.mkdir(parents=True, exist_ok=True)
+        
+        # Chunk contents are stored once across runs by the artifact store
+        if self.artifact_store:
+            self.artifact_store.save_json(artifacts_dir, 'chunks.json', [{
+                'file': c.file_path,
+                'lines': f"{c.start_line}-{c.end_line}",
+                'score': c.relevance_score,
+                'content_sha256': self.artifact_store.put(c.content)
+            } for c in selected_chunks])
+        else:
             with open(artifacts_dir / 'chunks.json', 'w') as f:
                 json.dump([{
                     'file': c.file_path,
@@ -104,175 +351,287 @@ class SolverAgent(BaseAgent):
                     'score': c.relevance_score,
                     'content': c.content
                 } for c in selected_chunks], f, indent=2)
+        self.ingestor.exclusion_report.save(artifacts_dir / 'excluded_files.json')
+        
+        issue = state['fetch']['issue']
+        with open(artifacts_dir / 'issue.md', 'w') as f:
+            f.write(f"# Issue #{issue['number']}: {issue['title']}\n\n{issue['body']}")
+    
+    def _generate_patch(self, state: Dict[str, Any], tier: str, validation_results: str = "None") -> Dict[str, Any]:
+        """Generate a patch on a tier; the result carries its 'tier'."""
+        state['artifacts_dir'].mkdir(parents=True, exist_ok=True)
+        return self.router.generate_patch(
+            tier,
+            self._issue_text(state),
+            state['selected_chunks'],
+            state['repo_url'].split('/')[-1],
+            state['fetch']['issue']['number'],
+            state['artifacts_dir'],
+            validation_results=validation_results,
+            stream=self.config.get('stream_patches', True),
+            repo_root=self.ingestor.temp_dir
+        )
+    
+    def _generate(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Generate the first patch (cheap tier first for low-complexity issues)."""
+        issue = state['fetch']['issue']
+        complexity = estimate_complexity(self._issue_text(state), issue['labels'])
+        tier = self.router.patch_tier(complexity)
+        self.log_metric('issue_complexity', complexity)
+        self.log_metric('patch_format', self.llm.patch_format)
+        self.logger.info(f"Generating patch with LLM ({tier} tier, {complexity} complexity)...")
+        if self.config.get('speculative_candidates', 0) > 1:
+            llm_result = self._speculate(tier, self._issue_text(state), state['selected_chunks'],
+                                         state['repo_url'].split('/')[-1], issue['number'],
+                                         state['artifacts_dir'])
+            if llm_result['success'] and not llm_result.get('validated'):
+                # No candidate passed: repair the first generated one straight away
+                self.router.record_outcome(tier, False)
+                tier = self.router.escalate(tier, "no speculative candidate passed validation")
+                llm_result = self._generate_patch(state, tier, llm_result['validation_output'])
+        else:
+            llm_result = self._generate_patch(state, tier)
+        
+        if not llm_result['success'] and self.router.next_tier(tier):
+            self.router.record_outcome(tier, False)
+            tier = self.router.escalate(tier, llm_result['reason'])
+            llm_result = self._generate_patch(state, tier)
+        
+        self.log_metric('prompt_tokens', llm_result['prompt_tokens'])
+        self.log_metric('stream_aborted', llm_result.get('aborted', False))
+        self.log_metric('response_tokens', llm_result['response_tokens'])
+        return dict(llm_result, tier=tier)
+    
+    def _save_patch(self, state: Dict[str, Any], diff: str) -> Path:
+        patch_dir = Path(self.config['patch_dir']) / f"issue-{state['fetch']['issue']['number']}"
+        patch_dir.mkdir(parents=True, exist_ok=True)
+        patch_path = patch_dir / "fix.patch"
+        with open(patch_path, 'w') as f:
+            f.write(diff)
+        self.logger.info(f"Patch saved to {patch_path}")
+        return patch_path
+    
+    def _run_validation(self, state: Dict[str, Any], patch_path: Path, attempt: int) -> Tuple[bool, str]:
+        """
+        Run ``validate_patch.sh`` on the checkout.
+        
+        Returns:
+            (passed, validation output for a repair prompt)
+        """
+        validate_cmd = [
+            "infrastructure/validation/validate_patch.sh",
+            "--run-id", self.run_id,
+            "--task-id", f"attempt-{attempt}",
+            "--repo-dir", str(Path(self.ingestor.temp_dir)),  # Use ingested path
+            "--patch", str(patch_path)
+        ]
+        
+        try:
+            self.logger.info(f"Validating patch (Attempt {attempt+1})...")
+            # Ensure script is executable
+            subprocess.run(["chmod", "+x", "infrastructure/validation/validate_patch.sh"], check=True)
             
-            # 10. Save issue
-            with open(artifacts_dir / 'issue.md', 'w') as f:
-                f.write(f"# Issue #{issue.number}: {issue.title}\n\n{issue.body or ''}")
-            
-            # 11. Generate patch using LLM
-            self.logger.info("Generating patch with LLM...")
-            llm_result = self.llm.generate_patch(
-                issue_text,
-                selected_chunks,
-                repo_name,
-                issue.number,
-                artifacts_dir
-            )
-            
-            self.log_metric('prompt_tokens', llm_result['prompt_tokens'])
-            self.log_metric('response_tokens', llm_result['response_tokens'])
-            
-            # 12. Handle result and Repair Loop
-            max_retries = 1
-            current_result = llm_result
-            
-            for attempt in range(max_retries + 1):
-                if not current_result['success']:
-                    self.logger.warning(f"Patch generation failed: {current_result['reason']}")
-                    break # Cannot repair if generation failed completely
-                
-                # Save patch file
-                patch_dir = Path(self.config['patch_dir']) / f"issue-{issue.number}"
-                patch_dir.mkdir(parents=True, exist_ok=True)
-                patch_path = patch_dir / "fix.patch"
-                
-                with open(patch_path, 'w') as f:
-                    f.write(current_result['diff'])
-                
-                self.logger.info(f"Patch saved to {patch_path}")
-                
-                # Validate Patch
-                validation_output = "No validation run."
-                validation_passed = False
-                
-                # Run validation script
-                import subprocess
-                validate_cmd = [
-                    "infrastructure/validation/validate_patch.sh",
-                    "--run-id", self.run_id,
-                    "--task-id", f"attempt-{attempt}",
-                    "--repo-dir", str(Path(self.ingestor.temp_dir)), # Use ingested path
-                    "--patch", str(patch_path)
-                ]
-                
-                try:
-                    self.logger.info(f"Validating patch (Attempt {attempt+1})...")
-                    # Ensure script is executable
-                    subprocess.run(["chmod", "+x", "infrastructure/validation/validate_patch.sh"], check=True)
-                    
-                    # Run validation
-                    proc = subprocess.run(validate_cmd, capture_output=True, text=True)
-                    validation_output = proc.stdout + "\n" + proc.stderr
-                    
-                    # Check validation.json
-                    val_json_path = artifacts_dir / "validation.json"
-                    if val_json_path.exists():
-                        with open(val_json_path, 'r') as f:
-                            val_data = json.load(f)
-                            if val_data.get("verdict") == "pass":
-                                validation_passed = True
-                                self.logger.info("✓ Validation PASSED!")
-                                break # Success!
-                            else:
-                                self.logger.warning(f"✗ Validation FAILED: {val_data.get('failure_reason')}")
-                                validation_output = json.dumps(val_data, indent=2)
-                    else:
-                         self.logger.warning("Validation JSON not found.")
-
-                except Exception as e:
-                    self.logger.error(f"Validation execution failed: {e}")
-                    validation_output = f"Validation execution error: {str(e)}"
-
-                # If we are here, validation failed (or didn't run).
-                # If we have retries left, try to repair.
-                if attempt < max_retries:
-                    self.logger.info("Attempting to repair patch with validation feedback...")
-                    current_result = self.llm.generate_patch(
-                        issue_text,
-                        selected_chunks,
-                        repo_name,
-                        issue.number,
-                        artifacts_dir,
-                        validation_results=validation_output
-                    )
-                    
-                    self.log_metric(f'repair_prompt_tokens_{attempt}', current_result['prompt_tokens'])
-                    self.log_metric(f'repair_response_tokens_{attempt}', current_result['response_tokens'])
-                else:
-                    self.logger.warning("Max retries reached. Stopping.")
-
-            # Final Result Handling
-            if current_result['success']:
-                 # Update database with final status
-                status = 'SUCCESS' if validation_passed else 'GENERATED_BUT_FAILED_VALIDATION'
-                
-                self.db.insert_patch(
-                    issue_id,
-                    self.run_id,
-                    current_result['diff'],
-                    status=status
-                )
-                
-                self.db.update_run(
-                    self.run_id,
-                    chunks_selected=len(selected_chunks),
-                    prompt_tokens=current_result['prompt_tokens'], # Last run tokens
-                    response_tokens=current_result['response_tokens'],
-                    artifacts_path=str(artifacts_dir),
-                    status=status
-                )
-                
-                self.ingestor.cleanup()
-                
-                return {
-                    'run_id': self.run_id,
-                    'issue_number': issue.number,
-                    'patch_generated': True,
-                    'patch_path': str(patch_path),
-                    'validation_passed': validation_passed,
-                    'chunks_selected': len(selected_chunks),
-                    'artifacts_dir': str(artifacts_dir),
-                    'metrics': self.get_metrics()
-                }
-            else:
-                # Failed
-                self.logger.warning(f"Patch generation failed: {current_result['reason']}")
-                
-                self.db.update_run(
-                    self.run_id,
-                    chunks_selected=len(selected_chunks),
-                    prompt_tokens=current_result['prompt_tokens'],
-                    response_tokens=current_result['response_tokens'],
-                    artifacts_path=str(artifacts_dir),
-                    status='FAILED',
-                    error_message=current_result['reason']
-                )
-                
-                self.ingestor.cleanup()
-                
-                return {
-                    'run_id': self.run_id,
-                    'issue_number': issue.number,
-                    'patch_generated': False,
-                    'reason': current_result['reason'],
-                    'artifacts_dir': str(artifacts_dir),
-                    'metrics': self.get_metrics()
-                }
+            proc = subprocess.run(validate_cmd, capture_output=True, text=True,
+                                  timeout=state['deadline'].call_timeout())
+            validation_output = proc.stdout + "\n" + proc.stderr
             
+            # Check validation.json
+            val_json_path = state['artifacts_dir'] / "validation.json"
+            if not val_json_path.exists():
+                self.logger.warning("Validation JSON not found.")
+                return False, validation_output
+            with open(val_json_path, 'r') as f:
+                val_data = json.load(f)
+            if val_data.get("verdict") == "pass":
+                self.logger.info("✓ Validation PASSED!")
+                return True, validation_output
+            self.logger.warning(f"✗ Validation FAILED: {val_data.get('failure_reason')}")
+            return False, json.dumps(val_data, indent=2)
         except Exception as e:
-            self.logger.error(f"Error in solve pipeline: {e}", exc_info=True)
-            self.db.update_run(self.run_id, status='FAILED', error_message=str(e))
-            self.ingestor.cleanup()
-            raise
+            self.logger.error(f"Validation execution failed: {e}")
+            return False, f"Validation execution error: {str(e)}"
+    
+    def _validate(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Save and validate the generated patch."""
+        result = state['generate']
+        tier = result['tier']
+        if not result['success']:
+            self.logger.warning(f"Patch generation failed: {result['reason']}")
+            self.router.record_outcome(tier, False)
+            return {'passed': False, 'output': None, 'patch_path': None}
+        
+        patch_path = self._save_patch(state, result['diff'])
+        if result.get('validated'):
+            self.router.record_outcome(tier, True)
+            self.logger.info("✓ Speculative candidate already passed validation")
+            return {'passed': True, 'output': None, 'patch_path': str(patch_path)}
+        
+        passed, output = self._run_validation(state, patch_path, attempt=0)
+        self.router.record_outcome(tier, passed)
+        return {'passed': passed, 'output': output, 'patch_path': str(patch_path)}
+    
+    def _repair(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Repair a patch that failed validation once, on the strong tier, with the validation feedback."""
+        result = state['generate']
+        validation = state['validate']
+        final = {'attempted': False, 'result': result, 'passed': validation['passed'],
+                 'patch_path': validation['patch_path']}
+        if validation['passed'] or not result['success']:
+            return final
+        if state['deadline'].expired:
+            self.logger.warning("Run deadline exceeded; skipping repair.")
+            return final
+        
+        tier = self.router.escalate(result['tier'], "validation failed")
+        self.logger.info(f"Attempting to repair patch with validation feedback ({tier} tier)...")
+        result = dict(self._generate_patch(state, tier, validation['output']), tier=tier)
+        self.log_metric('repair_prompt_tokens_0', result['prompt_tokens'])
+        self.log_metric('repair_response_tokens_0', result['response_tokens'])
+        final.update(attempted=True, result=result, passed=False)
+        if not result['success']:
+            self.logger.warning(f"Patch generation failed: {result['reason']}")
+            self.router.record_outcome(tier, False)
+            return final
+        
+        patch_path = self._save_patch(state, result['diff'])
+        passed, _ = self._run_validation(state, patch_path, attempt=1)
+        self.router.record_outcome(tier, passed)
+        if not passed:
+            self.logger.warning("Max retries reached. Stopping.")
+        final.update(passed=passed, patch_path=str(patch_path))
+        return final
+    
+    def _persist(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Log metrics, store the patch and final run status, and build the result."""
+        artifacts_dir = state['artifacts_dir']
+        artifacts_dir.mkdir(parents=True, exist_ok=True)
+        self.log_metric('rate_limit_wait_seconds', round(self.llm.rate_limiter.wait_seconds_total, 1))
+        self.log_metric('token_estimate_ratio', round(self.llm.token_counter.ratio, 3))
+        self.log_metric('context_cache', self.llm.context_cache.stats())
+        self.log_metric('llm', self.llm.provider.metrics())
+        self.log_metric('deadline', state['deadline'].to_dict())
+        if self.artifact_store:
+            self.log_metric('artifact_store', self.artifact_store.stats())
+        self.log_metric('routing', self.router.stats())
+        self.log_metric('structured_output', {
+            tier: llm.patch_output.stats() for tier, llm in self.router.llms.items()
+        })
+        self.log_metric('stage_seconds', self.stage_seconds)
+        self.router.save(artifacts_dir / 'routing.json')
+        
+        repair = state['repair']
+        current_result = repair['result']
+        chunks_selected = len(state['retrieve']['chunks'])
+        issue_number = state['fetch']['issue']['number']
+        if current_result['success']:
+            status = 'SUCCESS' if repair['passed'] else 'GENERATED_BUT_FAILED_VALIDATION'
+            self.db.insert_patch(
+                state['fetch']['issue_id'],
+                self.run_id,
+                current_result['diff'],
+                status=status
+            )
+            self.db.update_run(
+                self.run_id,
+                chunks_selected=chunks_selected,
+                prompt_tokens=current_result['prompt_tokens'],  # Last run tokens
+                response_tokens=current_result['response_tokens'],
+                artifacts_path=str(artifacts_dir),
+                status=status
+            )
+            return {
+                'run_id': self.run_id,
+                'issue_number': issue_number,
+                'patch_generated': True,
+                'patch_path': repair['patch_path'],
+                'validation_passed': repair['passed'],
+                'chunks_selected': chunks_selected,
+                'artifacts_dir': str(artifacts_dir),
+                'metrics': self.get_metrics()
+            }
+        
+        self.logger.warning(f"Patch generation failed: {current_result['reason']}")
+        self.db.update_run(
+            self.run_id,
+            chunks_selected=chunks_selected,
+            prompt_tokens=current_result['prompt_tokens'],
+            response_tokens=current_result['response_tokens'],
+            artifacts_path=str(artifacts_dir),
+            status='FAILED',
+            error_message=current_result['reason']
+        )
+        return {
+            'run_id': self.run_id,
+            'issue_number': issue_number,
+            'patch_generated': False,
+            'reason': current_result['reason'],
+            'artifacts_dir': str(artifacts_dir),
+            'metrics': self.get_metrics()
+        }
+    
+    def _speculate(self, tier: str, issue_text: str, chunks: list, repo_name: str, issue_number: int,
+                   artifacts_dir: Path) -> Dict[str, Any]:
+        """
+        Generate speculative candidates on a tier and validate them in parallel.
+        
+        Returns:
+            Patch result chosen by ``speculative_result``
+        """
+        model_name = self.router.llm(tier).model_name
+        solver = SpeculativeSolver(
+            lambda temperature: self._make_llm(model_name, {"temperature": temperature}),
+            k=self.config['speculative_candidates'],
+            temperatures=self.config.get('speculative_temperatures', (0.2, 0.6, 1.0)),
+            logger=self.logger
+        )
+        self.logger.info(f"Generating {solver.k} speculative candidates ({tier} tier)...")
+        outcome = solver.run(issue_text, chunks, repo_name, issue_number, artifacts_dir,
+                             self.ingestor.temp_dir, self.run_id)
+        
+        for candidate in outcome['candidates']:
+            self.router.record_usage(tier, candidate['prompt_tokens'], candidate['response_tokens'],
+                                     candidate['generation_seconds'] * 1000)
+        self.log_metric('speculative', {
+            'candidates': len(outcome['candidates']),
+            'cancelled': outcome['cancelled'],
+            'winner': outcome['winner']['index'] if outcome['winner'] else None,
+            'elapsed_seconds': outcome['elapsed_seconds'],
+        })
+        
+        return speculative_result(outcome)
+    
+    def _load_cached_chunks(self, refs):
+        """Rebuild selected chunks from cached references."""
+        from infrastructure.code_graph.chunk_selector import CodeChunk
+        
+        chunks = []
+        for ref in refs:
+            file_path = Path(self.ingestor.temp_dir) / ref['file_path']
+            try:
+                lines = file_path.read_text(encoding='utf-8', errors='ignore').split('\n')
+            except OSError as e:
+                self.logger.warning(f"Cached chunk {ref['file_path']} unreadable: {e}")
+                continue
+            chunk = CodeChunk(
+                ref['file_path'],
+                ref['start_line'],
+                ref['end_line'],
+                '\n'.join(lines[ref['start_line'] - 1:ref['end_line']])
+            )
+            chunk.relevance_score = ref['score']
+            chunk.exact_matches = ref.get('exact_matches', 0)
+            self.chunk_selector.truncate_chunk(chunk)
+            chunks.append(chunk)
+        return chunks
     
-    def _select_issue(self, issues):
+    def _select_issue(self, issues, issue_number: Optional[int] = None):
         """Select which issue to solve."""
         # If specific issue number provided, use that
-        if self.config.get('issue_number'):
+        if issue_number:
             for issue in issues:
-                if issue.number == self.config['issue_number']:
+                if issue.number == issue_number:
                     return issue
-            raise ValueError(f"Issue #{self.config['issue_number']} not found")
+            raise ValueError(f"Issue #{issue_number} not found")
         
         # Otherwise, pick first issue
         return issues[0]
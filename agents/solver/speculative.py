@@ -0,0 +1,263 @@
+"""Speculative patch candidates with first-pass-wins validation.
+
+Instead of one patch followed by serial repair rounds, ``SpeculativeSolver``
+generates K candidates concurrently, each with its own temperature and
+context packing, and validates every candidate as soon as it arrives in its
+own ``git worktree`` of the checked-out repository. The first candidate that
+passes validation wins; the remaining generation requests and validation
+subprocesses are cancelled and their worktrees removed. The same happens to
+all candidates still running when the run deadline passes.
+
+Candidate artifacts (prompt, response, patch, validation.json) are written
+to ``candidates/c<i>/`` in the run directory and a summary to
+``speculative.json``.
+"""
+import asyncio
+import json
+import os
+import shutil
+import signal
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from infrastructure.llm_pool.async_client import AsyncGeminiLLM
+from infrastructure.llm_pool.deadline import current_deadline
+
+PACKINGS = ("ranked", "by_file", "focused")
+VALIDATE_SCRIPT = "infrastructure/validation/validate_patch.sh"
+
+
+def pack_candidate_chunks(chunks: list, packing: str) -> list:
+    """
+    Order or trim selected chunks for one candidate.
+
+    Args:
+        chunks: Selected CodeChunk objects, best first
+        packing: "ranked" (as selected), "by_file" (grouped by file in line
+            order) or "focused" (the better-scoring half)
+
+    Returns:
+        Chunks for the candidate's prompt
+    """
+    if packing == "by_file":
+        return sorted(chunks, key=lambda c: (c.file_path, c.start_line))
+    if packing == "focused":
+        return chunks[:max(1, (len(chunks) + 1) // 2)]
+    return list(chunks)
+
+
+def candidate_specs(k: int, temperatures: Sequence[float] = (0.2, 0.6, 1.0)) -> List[Dict[str, Any]]:
+    """Vary temperature and packing across K candidates (distinct pairs for up to 9)."""
+    return [
+        {
+            "index": i,
+            "temperature": temperatures[i % len(temperatures)],
+            "packing": PACKINGS[(i // len(temperatures) + i) % len(PACKINGS)],
+        }
+        for i in range(k)
+    ]
+
+
+async def run_command(*cmd: str, cwd: Optional[str] = None) -> tuple:
+    """
+    Run a subprocess, killing its process group if the calling task is cancelled.
+
+    Returns:
+        Tuple of (return code, combined stdout and stderr)
+    """
+    # Own session, so test runners and linters started by the script die with it
+    proc = await asyncio.create_subprocess_exec(
+        *cmd, cwd=cwd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT,
+        start_new_session=True
+    )
+    try:
+        output, _ = await proc.communicate()
+    except asyncio.CancelledError:
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        await proc.wait()
+        raise
+    return proc.returncode, output.decode(errors="replace")
+
+
+def speculative_result(outcome: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Patch result to continue with after a speculative round.
+
+    Args:
+        outcome: Summary returned by ``SpeculativeSolver.run``
+
+    Returns:
+        Result of the winning candidate (marked 'validated'), else of the first
+        generated candidate with its 'validation_output', else of the first
+        candidate; a failed result when the run deadline passed before any
+        candidate finished
+    """
+    if outcome['winner']:
+        return dict(outcome['winner']['result'], validated=True)
+    generated = [c for c in outcome['candidates'] if c['success']]
+    if generated:
+        return dict(generated[0]['result'], validation_output=generated[0]['validation_output'])
+    if outcome['candidates']:
+        return outcome['candidates'][0]['result']
+    return {'success': False, 'diff': None, 'reason': 'Run deadline exceeded before any candidate finished',
+            'prompt_tokens': 0, 'response_tokens': 0}
+
+
+class SpeculativeSolver:
+    """Generates K patch candidates concurrently and keeps the first to pass validation."""
+
+    def __init__(self, make_llm: Callable[[float], Any], k: int = 3,
+                 temperatures: Sequence[float] = (0.2, 0.6, 1.0),
+                 validate_script: str = VALIDATE_SCRIPT, logger=None):
+        """
+        Initialize speculative solver.
+
+        Args:
+            make_llm: Returns a GeminiLLM for a sampling temperature
+            k: Number of candidates
+            temperatures: Temperatures cycled across candidates
+            validate_script: Validation script run in each candidate's worktree
+            logger: Optional logger
+        """
+        self.make_llm = make_llm
+        self.k = k
+        self.temperatures = tuple(temperatures)
+        self.validate_script = str(Path(validate_script).resolve())
+        self.logger = logger
+
+    def run(self, issue_text: str, chunks: list, repo_name: str, issue_number: int,
+            artifacts_dir: Path, repo_dir: str, run_id: str) -> Dict[str, Any]:
+        """
+        Generate and validate candidates until one passes.
+
+        Args:
+            issue_text: Combined issue title and body
+            chunks: Selected CodeChunk objects
+            repo_name: Repository name
+            issue_number: Issue number
+            artifacts_dir: Run artifacts directory
+            repo_dir: Checked-out repository (a git work tree)
+            run_id: Run ID, suffixed per candidate for validation
+
+        Returns:
+            Dict with 'winner' (candidate outcome or None), 'candidates'
+            (finished outcomes in completion order), 'cancelled' and
+            'elapsed_seconds'; outcomes carry the patch 'result'
+        """
+        return asyncio.run(self._run(issue_text, chunks, repo_name, issue_number,
+                                     Path(artifacts_dir).resolve(), repo_dir, run_id))
+
+    async def _run(self, issue_text, chunks, repo_name, issue_number, artifacts_dir, repo_dir, run_id):
+        start = time.perf_counter()
+        tasks = [
+            asyncio.create_task(self._candidate(spec, issue_text, chunks, repo_name, issue_number,
+                                                artifacts_dir, repo_dir, run_id))
+            for spec in candidate_specs(self.k, self.temperatures)
+        ]
+        pending = set(tasks)
+        outcomes = []
+        winner = None
+        deadline = current_deadline()
+        try:
+            while pending and winner is None:
+                remaining = deadline.remaining()
+                timeout = max(0.0, remaining) if remaining is not None else None
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    if self.logger:
+                        self.logger.warning("Run deadline exceeded; cancelling remaining candidates")
+                    break
+                for task in done:
+                    outcome = task.result()
+                    outcomes.append(outcome)
+                    if outcome["validation_passed"] and winner is None:
+                        winner = outcome
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        if self.logger:
+            if winner:
+                self.logger.info(f"✓ Candidate {winner['index']} passed validation; "
+                                 f"cancelled {len(pending)} candidate(s)")
+            else:
+                self.logger.warning(f"No speculative candidate passed validation ({len(outcomes)} tried)")
+
+        summary = {
+            "winner": winner,
+            "candidates": outcomes,
+            "cancelled": len(pending),
+            "elapsed_seconds": round(time.perf_counter() - start, 1),
+        }
+        with open(artifacts_dir / "speculative.json", "w") as f:
+            json.dump({
+                **summary,
+                "winner": winner["index"] if winner else None,
+                "candidates": [{k: v for k, v in o.items() if k != "result"} for o in outcomes],
+            }, f, indent=2)
+        return summary
+
+    async def _candidate(self, spec, issue_text, chunks, repo_name, issue_number,
+                         artifacts_dir, repo_dir, run_id) -> Dict[str, Any]:
+        """Generate one candidate and validate it in its own worktree."""
+        start = time.perf_counter()
+        candidate_dir = artifacts_dir / "candidates" / f"c{spec['index']}"
+        candidate_dir.mkdir(parents=True, exist_ok=True)
+
+        llm = AsyncGeminiLLM(self.make_llm(spec["temperature"]), max_concurrency=1, logger=self.logger)
+        result = await llm.generate_patch(issue_text, pack_candidate_chunks(chunks, spec["packing"]),
+                                          repo_name, issue_number, candidate_dir, repo_root=repo_dir)
+        outcome = {
+            **spec,
+            "success": result["success"],
+            "reason": result["reason"],
+            "prompt_tokens": result["prompt_tokens"],
+            "response_tokens": result["response_tokens"],
+            "generation_seconds": round(time.perf_counter() - start, 1),
+            "verdict": None,
+            "validation_passed": False,
+            "validation_output": result["reason"] or "",
+            "result": result,
+        }
+        if not result["success"]:
+            return outcome
+
+        patch_path = candidate_dir / "fix.patch"
+        patch_path.write_text(result["diff"])
+        # Removing the directory and pruning also cleans up a checkout cancelled half-way
+        worktree = Path(tempfile.mkdtemp(prefix="openfix-candidate-")) / "repo"
+        try:
+            code, output = await run_command("git", "worktree", "add", "--detach", str(worktree), "HEAD",
+                                             cwd=repo_dir)
+            if code != 0:
+                outcome["validation_output"] = f"Validation execution error: git worktree add failed: {output.strip()}"
+                return outcome
+            await run_command(
+                self.validate_script,
+                "--run-id", f"{run_id}-c{spec['index']}",
+                "--task-id", f"candidate-{spec['index']}",
+                "--repo-dir", str(worktree),
+                "--patch", str(patch_path),
+                "--output-dir", str(candidate_dir)
+            )
+        finally:
+            shutil.rmtree(worktree.parent, ignore_errors=True)
+            await run_command("git", "worktree", "prune", cwd=repo_dir)
+
+        validation_path = candidate_dir / "validation.json"
+        if validation_path.exists():
+            with open(validation_path) as f:
+                validation = json.load(f)
+            outcome["verdict"] = validation.get("verdict")
+            outcome["validation_passed"] = validation.get("verdict") == "pass"
+            outcome["validation_output"] = json.dumps(validation, indent=2)
+        else:
+            outcome["validation_output"] = "Validation JSON not found."
+        outcome["elapsed_seconds"] = round(time.perf_counter() - start, 1)
+        return outcome
@@ -0,0 +1,269 @@
+"""Content-addressed, compressed store for run artifacts.
+
+Prompts, responses and chunk contents repeat heavily across repair
+iterations, speculative candidates and runs on the same repository. Instead
+of a pretty-printed file per artifact, ``ArtifactStore`` keeps each distinct
+content once as a compressed blob named by its SHA-256::
+
+    data/artifacts/blobs/3f/3fa4...e1.zst   (.gz when zstandard is not installed)
+
+and appends one line per saved artifact to ``manifest.jsonl`` in the run
+directory (name, version, digest, size, time). Saving the same name again
+adds a new version instead of overwriting, so every repair iteration is
+kept. Hashing happens on the caller's thread; compression and file writes
+run on a background writer thread, off the LLM hot path. ``flush`` waits for
+pending writes and is called at interpreter exit.
+"""
+import atexit
+import gzip
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.jsonl"
+CODECS = ("zst", "gz")
+
+
+def _compress(data: bytes, codec: str) -> bytes:
+    if codec == "zst":
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return gzip.compress(data, compresslevel=6, mtime=0)
+
+
+def _decompress(data: bytes, codec: str) -> bytes:
+    if codec == "zst":
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read .zst artifact blobs")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+class ArtifactStore:
+    """Deduplicating blob store with per-run manifests and background writes."""
+
+    def __init__(self, root: str = "data/artifacts", compression: str = "auto", async_writes: bool = True):
+        """
+        Initialize artifact store.
+
+        Args:
+            root: Directory holding ``blobs/``
+            compression: "zstd", "gzip" or "auto" (zstd when installed)
+            async_writes: Compress and write on a background thread
+        """
+        if compression not in ("auto", "zstd", "gzip"):
+            raise ValueError(f"Unknown artifact compression {compression!r}")
+        if compression == "zstd" and zstandard is None:
+            raise ValueError("artifact_compression: zstd needs the zstandard package")
+        self.root = Path(root)
+        self.codec = "zst" if compression == "zstd" or (compression == "auto" and zstandard) else "gz"
+        self.async_writes = async_writes
+        self.blobs_written = 0
+        self.dedup_hits = 0
+        self.bytes_in = 0
+        self.bytes_stored = 0
+        self._known = set()
+        self._versions: Dict[str, Dict[str, int]] = {}  # run dir -> name -> next version
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue" = queue.Queue()
+        self._writer = None
+        if async_writes:
+            self._writer = threading.Thread(target=self._drain, name="artifact-writer", daemon=True)
+            self._writer.start()
+            atexit.register(self.flush)
+
+    def _blob_path(self, digest: str, codec: Optional[str] = None) -> Path:
+        return self.root / "blobs" / digest[:2] / f"{digest}.{codec or self.codec}"
+
+    def _exists(self, digest: str) -> bool:
+        return any(self._blob_path(digest, codec).exists() for codec in CODECS)
+
+    def _submit(self, task: tuple):
+        if self.async_writes:
+            self._queue.put(task)
+        else:
+            self._run(task)
+
+    def _drain(self):
+        while True:
+            task = self._queue.get()
+            try:
+                self._run(task)
+            except Exception as e:  # A failed write must not stop later ones
+                logger.warning(f"Artifact store write failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _run(self, task: tuple):
+        kind, target, payload = task
+        if kind == "blob":
+            path = self._blob_path(target)
+            if path.exists():
+                return
+            compressed = _compress(payload, self.codec)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+            tmp.write_bytes(compressed)
+            os.replace(tmp, path)
+            with self._lock:
+                self.blobs_written += 1
+                self.bytes_stored += len(compressed)
+        else:
+            run_dir = Path(target)
+            run_dir.mkdir(parents=True, exist_ok=True)
+            with open(run_dir / MANIFEST, "a") as f:
+                f.write(json.dumps(payload) + "\n")
+
+    def put(self, content: Union[str, bytes]) -> str:
+        """
+        Store content once, returning its SHA-256 digest.
+
+        Args:
+            content: Text (stored as UTF-8) or bytes
+
+        Returns:
+            Hex digest; the blob may still be queued for writing
+        """
+        data = content.encode("utf-8") if isinstance(content, str) else content
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            self.bytes_in += len(data)
+            if digest in self._known:
+                self.dedup_hits += 1
+                return digest
+            self._known.add(digest)
+        if self._exists(digest):
+            with self._lock:
+                self.dedup_hits += 1
+            return digest
+        self._submit(("blob", digest, data))
+        return digest
+
+    def save(self, run_dir: Union[str, Path], name: str, content: Union[str, bytes]) -> str:
+        """
+        Store an artifact and record it as the next version of ``name`` in the run's manifest.
+
+        Args:
+            run_dir: Run (or candidate) artifacts directory
+            name: Artifact name, e.g. "prompt.txt"
+            content: Artifact content
+
+        Returns:
+            Hex digest of the content
+        """
+        data = content.encode("utf-8") if isinstance(content, str) else content
+        digest = self.put(data)
+        run_key = str(Path(run_dir).resolve())
+        with self._lock:
+            if run_key not in self._versions:
+                # Continue numbering from an earlier process (e.g. a resumed run)
+                counts: Dict[str, int] = {}
+                for entry in self._read_manifest(run_key):
+                    counts[entry["name"]] = counts.get(entry["name"], 0) + 1
+                self._versions[run_key] = counts
+            version = self._versions[run_key].get(name, 0)
+            self._versions[run_key][name] = version + 1
+        self._submit(("manifest", run_key, {
+            "name": name,
+            "version": version,
+            "sha256": digest,
+            "size": len(data),
+            "time": datetime.utcnow().isoformat(),
+        }))
+        return digest
+
+    def save_json(self, run_dir: Union[str, Path], name: str, data: Any) -> str:
+        """``save`` for a JSON-serializable value (compact encoding)."""
+        return self.save(run_dir, name, json.dumps(data, separators=(",", ":"), default=str))
+
+    def flush(self):
+        """Block until every queued write has finished."""
+        if self.async_writes:
+            self._queue.join()
+
+    def get(self, digest: str) -> bytes:
+        """
+        Read a blob by digest.
+
+        Raises:
+            KeyError: If no blob with this digest exists
+        """
+        self.flush()
+        for codec in CODECS:
+            path = self._blob_path(digest, codec)
+            if path.exists():
+                return _decompress(path.read_bytes(), codec)
+        raise KeyError(digest)
+
+    def manifest(self, run_dir: Union[str, Path]) -> List[Dict[str, Any]]:
+        """Manifest entries of a run, oldest first."""
+        self.flush()
+        return self._read_manifest(run_dir)
+
+    @staticmethod
+    def _read_manifest(run_dir: Union[str, Path]) -> List[Dict[str, Any]]:
+        path = Path(run_dir) / MANIFEST
+        if not path.exists():
+            return []
+        with open(path) as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def read(self, run_dir: Union[str, Path], name: str, version: int = -1) -> str:
+        """
+        Read a version of an artifact as text.
+
+        Args:
+            run_dir: Run artifacts directory
+            name: Artifact name
+            version: Version index (negative counts from the latest)
+
+        Raises:
+            KeyError: If the run has no such artifact version
+        """
+        entries = [e for e in self.manifest(run_dir) if e["name"] == name]
+        try:
+            entry = entries[version]
+        except IndexError:
+            raise KeyError(f"{name} version {version} not in {run_dir}") from None
+        return self.get(entry["sha256"]).decode("utf-8")
+
+    def stats(self) -> Dict[str, Any]:
+        """Blob writes, dedup hits and compression since the store was opened."""
+        self.flush()
+        return {
+            "blobs_written": self.blobs_written,
+            "dedup_hits": self.dedup_hits,
+            "bytes_in": self.bytes_in,
+            "bytes_stored": self.bytes_stored,
+            "codec": self.codec,
+        }
+
+
+_stores: Dict[tuple, ArtifactStore] = {}
+
+
+def artifact_store_from_config(config: Dict[str, Any]) -> Optional[ArtifactStore]:
+    """
+    Return the process-wide store for ``config.yml`` settings.
+
+    Returns:
+        ArtifactStore, or None when ``artifact_store`` is disabled (plain files)
+    """
+    if not config.get('artifact_store', True):
+        return None
+    key = (config.get('artifact_store_dir', 'data/artifacts'), config.get('artifact_compression', 'auto'))
+    if key not in _stores:
+        _stores[key] = ArtifactStore(root=key[0], compression=key[1])
+    return _stores[key]
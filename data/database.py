@@ -90,6 +90,21 @@ class Database:
             )
         """)
         
+        # Run stages table - completed stage outputs, for resuming a crashed run
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS run_stages (
+                run_id TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                status TEXT DEFAULT 'RUNNING',  -- RUNNING, COMPLETED, FAILED
+                output TEXT,  -- JSON
+                error_message TEXT,
+                started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                completed_at TIMESTAMP,
+                PRIMARY KEY (run_id, stage),
+                FOREIGN KEY (run_id) REFERENCES runs(run_id)
+            )
+        """)
+        
         self.conn.commit()
     
     def insert_repository(self, github_url: str, name: str, language: Optional[str] = None) -> int:
@@ -150,6 +165,60 @@ class Database:
         cursor.execute(f"UPDATE runs SET {set_clause} WHERE run_id = ?", values)
         self.conn.commit()
     
+    def get_run(self, run_id: str) -> Optional[Dict]:
+        """Get run by run ID, with its repository URL and issue number."""
+        cursor = self.conn.cursor()
+        cursor.execute(
+            """SELECT runs.*, repositories.github_url, issues.github_issue_number
+               FROM runs
+               JOIN repositories ON repositories.id = runs.repository_id
+               LEFT JOIN issues ON issues.id = runs.issue_id
+               WHERE runs.run_id = ?""",
+            (run_id,)
+        )
+        row = cursor.fetchone()
+        return dict(row) if row else None
+    
+    def start_stage(self, run_id: str, stage: str):
+        """Mark a run stage as running (again, when a resumed run retries it)."""
+        cursor = self.conn.cursor()
+        cursor.execute(
+            """INSERT OR REPLACE INTO run_stages (run_id, stage, status, started_at)
+               VALUES (?, ?, 'RUNNING', ?)""",
+            (run_id, stage, datetime.utcnow().isoformat())
+        )
+        self.conn.commit()
+    
+    def complete_stage(self, run_id: str, stage: str, output: Any):
+        """Record a stage's JSON-serializable output."""
+        cursor = self.conn.cursor()
+        cursor.execute(
+            """UPDATE run_stages SET status = 'COMPLETED', output = ?, error_message = NULL,
+               completed_at = ? WHERE run_id = ? AND stage = ?""",
+            (json.dumps(output, default=str), datetime.utcnow().isoformat(), run_id, stage)
+        )
+        self.conn.commit()
+    
+    def fail_stage(self, run_id: str, stage: str, error_message: str):
+        """Record the error that stopped a stage."""
+        cursor = self.conn.cursor()
+        cursor.execute(
+            """UPDATE run_stages SET status = 'FAILED', error_message = ?, completed_at = ?
+               WHERE run_id = ? AND stage = ?""",
+            (error_message, datetime.utcnow().isoformat(), run_id, stage)
+        )
+        self.conn.commit()
+    
+    def get_completed_stages(self, run_id: str) -> Dict[str, Any]:
+        """Outputs of a run's completed stages, by stage name."""
+        cursor = self.conn.cursor()
+        cursor.execute(
+            """SELECT stage, output FROM run_stages
+               WHERE run_id = ? AND status = 'COMPLETED' ORDER BY started_at""",
+            (run_id,)
+        )
+        return {row['stage']: json.loads(row['output']) for row in cursor.fetchall()}
+    
     def insert_patch(self, issue_id: int, run_id: str, diff_content: str, **kwargs) -> int:
         """Insert a generated patch."""
         cursor = self.conn.cursor()
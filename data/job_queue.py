@@ -0,0 +1,260 @@
+"""Durable (repo, issue) work queue in the OpenFix database.
+
+``scripts/worker.py`` runs a fleet of solver processes that pull jobs from
+this queue, so a host can work through hundreds of issues unattended:
+
+- ``enqueue`` adds a job unless the same issue is already queued or running
+- ``claim`` hands the next job to a worker under a lease
+  (``job_lease_seconds``) and never runs more than ``per_repo_limit`` jobs
+  of one repository at once
+- ``heartbeat`` extends the lease while the solver is working
+- a job whose lease expires (its worker crashed or hung) is queued again on
+  the next claim and keeps its ``run_id``, so the retry resumes the run
+  after its last completed stage
+- ``fail`` requeues with a growing backoff until ``job_max_attempts`` is
+  reached, then marks the job FAILED
+
+Claims and state changes run in ``BEGIN IMMEDIATE`` transactions, so any
+number of processes can share the queue.
+"""
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+QUEUED = "QUEUED"
+RUNNING = "RUNNING"
+SUCCEEDED = "SUCCEEDED"
+FAILED = "FAILED"
+
+
+@dataclass
+class Job:
+    """A claimed job."""
+    id: int
+    repo_url: str
+    issue_number: int
+    run_id: str
+    attempts: int
+
+
+class JobQueue:
+    """SQLite-backed job queue with leases, heartbeats and retry counts."""
+
+    def __init__(self, db_path: str = "data/db/openfix.db", lease_seconds: float = 300.0,
+                 max_attempts: int = 3, retry_backoff_seconds: float = 60.0,
+                 clock: Callable[[], float] = time.time):
+        """
+        Initialize job queue.
+
+        Args:
+            db_path: OpenFix database shared by all workers
+            lease_seconds: How long a claim lasts without a heartbeat
+            max_attempts: Attempts before a job is marked FAILED
+            retry_backoff_seconds: Delay before a failed job is retried (doubles per attempt)
+            clock: Wall clock (replaceable in tests); leases must compare across processes
+        """
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.clock = clock
+
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        # Autocommit mode; transactions are opened explicitly below
+        self.conn = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self._lock = threading.RLock()
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                repo_url TEXT NOT NULL,
+                issue_number INTEGER NOT NULL,
+                status TEXT DEFAULT 'QUEUED',  -- QUEUED, RUNNING, SUCCEEDED, FAILED
+                priority INTEGER DEFAULT 0,
+                attempts INTEGER DEFAULT 0,
+                run_id TEXT,
+                worker_id TEXT,
+                lease_expires_at REAL,
+                heartbeat_at REAL,
+                available_at REAL DEFAULT 0,
+                error_message TEXT,
+                result TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, priority, id)")
+
+    @contextmanager
+    def _transaction(self):
+        """``BEGIN IMMEDIATE`` ... ``COMMIT`` (``ROLLBACK`` on error) under the thread lock."""
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    def enqueue(self, repo_url: str, issue_number: int, priority: int = 0) -> Optional[int]:
+        """
+        Queue a job.
+
+        Args:
+            repo_url: GitHub repository URL
+            issue_number: Issue to solve
+            priority: Higher runs first
+
+        Returns:
+            Job id, or None if this issue is already queued or running
+        """
+        with self._transaction():
+            active = self.conn.execute(
+                "SELECT id FROM jobs WHERE repo_url = ? AND issue_number = ? AND status IN (?, ?)",
+                (repo_url, issue_number, QUEUED, RUNNING)
+            ).fetchone()
+            if active:
+                return None
+            cursor = self.conn.execute(
+                "INSERT INTO jobs (repo_url, issue_number, priority) VALUES (?, ?, ?)",
+                (repo_url, issue_number, priority)
+            )
+            return cursor.lastrowid
+
+    def _expire_leases(self, now: float) -> int:
+        """Requeue (or fail, when out of attempts) running jobs whose lease ran out."""
+        expired = self.conn.execute(
+            "SELECT id, attempts FROM jobs WHERE status = ? AND lease_expires_at < ?", (RUNNING, now)
+        ).fetchall()
+        for job in expired:
+            out_of_attempts = job["attempts"] >= self.max_attempts
+            self.conn.execute(
+                """UPDATE jobs SET status = ?, worker_id = NULL, lease_expires_at = NULL,
+                   error_message = 'Lease expired (worker crashed or stalled)', updated_at = CURRENT_TIMESTAMP
+                   WHERE id = ?""",
+                (FAILED if out_of_attempts else QUEUED, job["id"])
+            )
+        return len(expired)
+
+    def claim(self, worker_id: str, per_repo_limit: Optional[int] = None) -> Optional[Job]:
+        """
+        Lease the next runnable job to a worker.
+
+        Args:
+            worker_id: Identifier of the claiming worker
+            per_repo_limit: Max running jobs per repository (None = unlimited)
+
+        Returns:
+            The claimed job, or None when nothing is runnable now
+        """
+        with self._transaction():
+            now = self.clock()
+            self._expire_leases(now)
+            running = {
+                row["repo_url"]: row["n"] for row in self.conn.execute(
+                    "SELECT repo_url, COUNT(*) AS n FROM jobs WHERE status = ? GROUP BY repo_url", (RUNNING,)
+                )
+            }
+            candidates = self.conn.execute(
+                """SELECT * FROM jobs WHERE status = ? AND available_at <= ?
+                   ORDER BY priority DESC, id""",
+                (QUEUED, now)
+            ).fetchall()
+            for row in candidates:
+                if per_repo_limit is not None and running.get(row["repo_url"], 0) >= per_repo_limit:
+                    continue
+                # Retries keep the run id so the solver resumes after the last completed stage
+                run_id = row["run_id"] or str(uuid.uuid4())
+                self.conn.execute(
+                    """UPDATE jobs SET status = ?, worker_id = ?, run_id = ?, attempts = attempts + 1,
+                       lease_expires_at = ?, heartbeat_at = ?, updated_at = CURRENT_TIMESTAMP
+                       WHERE id = ?""",
+                    (RUNNING, worker_id, run_id, now + self.lease_seconds, now, row["id"])
+                )
+                return Job(row["id"], row["repo_url"], row["issue_number"], run_id, row["attempts"] + 1)
+            return None
+
+    def heartbeat(self, job_id: int, worker_id: str) -> bool:
+        """
+        Extend a job's lease.
+
+        Returns:
+            False if the worker no longer holds the job (its lease expired and it was requeued)
+        """
+        with self._transaction():
+            now = self.clock()
+            cursor = self.conn.execute(
+                """UPDATE jobs SET lease_expires_at = ?, heartbeat_at = ?
+                   WHERE id = ? AND worker_id = ? AND status = ?""",
+                (now + self.lease_seconds, now, job_id, worker_id, RUNNING)
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, job_id: int, worker_id: str, result: Optional[str] = None) -> bool:
+        """Mark a job SUCCEEDED; returns False if the worker no longer holds it."""
+        with self._transaction():
+            cursor = self.conn.execute(
+                """UPDATE jobs SET status = ?, result = ?, error_message = NULL, worker_id = NULL,
+                   lease_expires_at = NULL, updated_at = CURRENT_TIMESTAMP
+                   WHERE id = ? AND worker_id = ? AND status = ?""",
+                (SUCCEEDED, result, job_id, worker_id, RUNNING)
+            )
+            return cursor.rowcount == 1
+
+    def fail(self, job_id: int, worker_id: str, error_message: str) -> Optional[str]:
+        """
+        Record a failed attempt: requeue with backoff, or mark FAILED after the last attempt.
+
+        Returns:
+            The job's new status, or None if the worker no longer holds it
+        """
+        with self._transaction():
+            row = self.conn.execute(
+                "SELECT attempts FROM jobs WHERE id = ? AND worker_id = ? AND status = ?",
+                (job_id, worker_id, RUNNING)
+            ).fetchone()
+            if row is None:
+                return None
+            status = FAILED if row["attempts"] >= self.max_attempts else QUEUED
+            backoff = self.retry_backoff_seconds * 2 ** (row["attempts"] - 1)
+            self.conn.execute(
+                """UPDATE jobs SET status = ?, error_message = ?, worker_id = NULL, lease_expires_at = NULL,
+                   available_at = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?""",
+                (status, error_message, self.clock() + backoff, job_id)
+            )
+            return status
+
+    def pending(self) -> int:
+        """Jobs queued or running."""
+        with self._lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)
+            ).fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        """Job counts by status."""
+        with self._lock:
+            counts = {row["status"]: row["n"] for row in self.conn.execute(
+                "SELECT status, COUNT(*) AS n FROM jobs GROUP BY status"
+            )}
+        return {status: counts.get(status, 0) for status in (QUEUED, RUNNING, SUCCEEDED, FAILED)}
+
+    def close(self):
+        self.conn.close()
+
+
+def job_queue_from_config(config: Dict[str, Any]) -> JobQueue:
+    """Build the job queue for ``config.yml`` settings."""
+    return JobQueue(
+        db_path=config.get('db_path', 'data/db/openfix.db'),
+        lease_seconds=config.get('job_lease_seconds', 300),
+        max_attempts=config.get('job_max_attempts', 3),
+        retry_backoff_seconds=config.get('job_retry_backoff_seconds', 60)
+    )
@@ -1,8 +1,12 @@
 """Chunk selection for code relevance scoring."""
-from typing import List, Dict, Tuple
+import copy
+from typing import List, Dict, Tuple, Optional
 import re
 from pathlib import Path
 
+from infrastructure.retrieval.trigram_index import TrigramIndex, extract_exact_terms
+from infrastructure.llm_pool.token_counter import TokenCounter, get_token_counter
+
 
 class CodeChunk:
     """Represents a chunk of code with metadata."""
@@ -13,6 +17,7 @@ class CodeChunk:
         self.end_line = end_line
         self.content = content
         self.relevance_score = 0.0
+        self.exact_matches = 0
     
     def __repr__(self):
         return f"CodeChunk({self.file_path}:{self.start_line}-{self.end_line}, score={self.relevance_score:.2f})"
@@ -129,37 +134,109 @@ class ChunkSelector:
         
         return min(score, 1.0)
     
+    def truncate_chunk(self, chunk: CodeChunk, max_chars_per_chunk: int = 5000):
+        """
+        Truncate a chunk's content in place if it is too long.
+        
+        Args:
+            chunk: CodeChunk to truncate
+            max_chars_per_chunk: Max characters per chunk (for token limits)
+        """
+        if len(chunk.content) > max_chars_per_chunk:
+            lines = chunk.content.split('\n')
+            truncated_lines = lines[:max_chars_per_chunk // 50]  # Rough estimate: 50 chars/line
+            chunk.content = '\n'.join(truncated_lines) + f'\n... (truncated from {len(lines)} lines)'
+    
+    def build_index(self, chunks: List[CodeChunk]) -> TrigramIndex:
+        """
+        Build a trigram index over chunk contents.
+        
+        Document ids in the returned index are positions in ``chunks``.
+        
+        Args:
+            chunks: List of all code chunks
+            
+        Returns:
+            TrigramIndex for exact identifier lookup
+        """
+        return TrigramIndex.from_texts(c.content for c in chunks)
+    
     def select_chunks(self, chunks: List[CodeChunk], issue_text: str, top_k: int = 10, 
-                     max_chars_per_chunk: int = 5000) -> List[CodeChunk]:
+                     max_chars_per_chunk: int = 5000,
+                     trigram_index: Optional[TrigramIndex] = None,
+                     token_budget: Optional[int] = None,
+                     token_counter: Optional[TokenCounter] = None) -> List[CodeChunk]:
         """
         Select top K most relevant chunks for an issue.
         
+        Chunks containing exact identifiers, config keys or error strings
+        named in the issue are ranked ahead of keyword-scored chunks.
+        
         Args:
             chunks: List of all code chunks
             issue_text: Combined issue title and body
             top_k: Number of chunks to return
             max_chars_per_chunk: Max characters per chunk (for token limits)
+            trigram_index: Optional index built with ``build_index(chunks)``
+            token_budget: Optional cap on total tokens of the selected chunks
+            token_counter: Counter used for the budget (default: process-wide counter)
             
         Returns:
             List of top K most relevant chunks, sorted by score
         """
         keywords = self.extract_keywords(issue_text)
         
+        # Exact term hits (high precision signal)
+        exact_hits = {}
+        if trigram_index is not None and len(trigram_index) == len(chunks):
+            exact_hits = trigram_index.match_terms(extract_exact_terms(issue_text))
+        
         # Extract file mentions from issue (e.g., "in src/foo.py")
         file_pattern = r'[\w/]+\.\w+'
         mentioned_files = re.findall(file_pattern, issue_text)
         file_keywords = {f: 1.0 for f in mentioned_files}
         
         # Score all chunks
-        for chunk in chunks:
+        for i, chunk in enumerate(chunks):
             chunk.relevance_score = self.score_chunk(chunk, keywords, file_keywords)
+            chunk.exact_matches = exact_hits.get(i, 0)
+        
+        # Sort by exact hits first, then by score, and return top K
+        sorted_chunks = sorted(chunks, key=lambda c: (c.exact_matches, c.relevance_score), reverse=True)
+        
+        # Truncate copies: ``chunks`` (and its trigram index) may be shared by several issues
+        selected = []
+        for chunk in sorted_chunks[:top_k]:
+            chunk = copy.copy(chunk)
+            self.truncate_chunk(chunk, max_chars_per_chunk)
+            selected.append(chunk)
+        if token_budget is None:
+            return selected
+        return self.pack_chunks(selected, token_budget, token_counter)
+    
+    def pack_chunks(self, chunks: List[CodeChunk], token_budget: int,
+                    token_counter: Optional[TokenCounter] = None) -> List[CodeChunk]:
+        """
+        Keep chunks in order while they fit in a token budget.
+        
+        Chunks that do not fit are skipped so smaller lower-ranked chunks can
+        still use the remaining budget. The best chunk is always kept.
+        
+        Args:
+            chunks: Chunks, best first
+            token_budget: Maximum total tokens
+            token_counter: Counter to use (default: process-wide counter)
             
-            # Truncate if too long
-            if len(chunk.content) > max_chars_per_chunk:
-                lines = chunk.content.split('\n')
-                truncated_lines = lines[:max_chars_per_chunk // 50]  # Rough estimate: 50 chars/line
-                chunk.content = '\n'.join(truncated_lines) + f'\n... (truncated from {len(lines)} lines)'
-        
-        # Sort by score and return top K
-        sorted_chunks = sorted(chunks, key=lambda c: c.relevance_score, reverse=True)
-        return sorted_chunks[:top_k]
+        Returns:
+            Chunks that fit, in their original order
+        """
+        counter = token_counter or get_token_counter()
+        packed = []
+        used = 0
+        for chunk in chunks:
+            tokens = counter.count(chunk.content)
+            if packed and used + tokens > token_budget:
+                continue
+            packed.append(chunk)
+            used += tokens
+        return packed
@@ -0,0 +1,143 @@
+"""Detection of generated, minified and vendored files.
+
+Bundled JS, protobuf stubs, snapshots and data fixtures add nothing useful to
+retrieval but cost chunking and embedding time. The classifier looks at cheap
+signals only: path, "generated by" headers, file size, line-length distribution
+and character entropy.
+"""
+import json
+import math
+from collections import Counter
+from pathlib import Path, PurePosixPath
+from typing import Dict, List, Optional
+
+VENDORED_DIRS = {
+    'vendor', 'vendors', 'third_party', 'third-party', 'thirdparty',
+    'node_modules', 'bower_components', '__snapshots__',
+}
+
+GENERATED_NAMES = {
+    'package-lock.json', 'npm-shrinkwrap.json', 'pnpm-lock.yaml', 'go.sum',
+    'poetry.lock', 'pipfile.lock', 'composer.lock', 'gemfile.lock',
+}
+
+GENERATED_SUFFIXES = (
+    '_pb2.py', '_pb2.pyi', '_pb2_grpc.py', '.pb.go', '.pb.cc', '.pb.h', '_pb.js', '_pb.d.ts',
+    '.snap', '.bundle.js', '.chunk.js', '.min.mjs', '.g.dart', '.freezed.dart',
+    '.designer.cs', '.generated.ts', '.generated.js',
+)
+
+GENERATED_MARKERS = (
+    'generated by', 'do not edit', '@generated', 'autogenerated', 'auto-generated',
+    'code generated', 'this file was generated', 'automatically generated',
+)
+
+DATA_SUFFIXES = ('.json', '.csv', '.tsv', '.xml', '.yaml', '.yml', '.sql', '.txt', '.ndjson')
+
+
+def shannon_entropy(text: str) -> float:
+    """Return the Shannon entropy of a string in bits per character."""
+    if not text:
+        return 0.0
+    total = len(text)
+    return -sum((n / total) * math.log2(n / total) for n in Counter(text).values())
+
+
+def byte_size(content: str) -> int:
+    """Return the UTF-8 encoded size of ``content`` in bytes."""
+    return len(content.encode('utf-8', errors='ignore'))
+
+
+class FileClassifier:
+    """Flags generated, minified, vendored and oversized files."""
+
+    def __init__(self, max_file_bytes: int = 512_000, max_data_file_bytes: int = 100_000,
+                 max_avg_line_length: int = 200, max_line_length: int = 1000,
+                 max_entropy: float = 5.75, header_lines: int = 10):
+        """
+        Initialize classifier.
+
+        Args:
+            max_file_bytes: Size ceiling for any file
+            max_data_file_bytes: Size ceiling for data files (JSON, CSV, ...)
+            max_avg_line_length: Average line length above which a file counts as minified
+            max_line_length: Single line length above which a file counts as minified
+            max_entropy: Character entropy (bits/char) above which a file counts as a blob
+            header_lines: Number of leading lines searched for "generated by" markers
+        """
+        self.max_file_bytes = max_file_bytes
+        self.max_data_file_bytes = max_data_file_bytes
+        self.max_avg_line_length = max_avg_line_length
+        self.max_line_length = max_line_length
+        self.max_entropy = max_entropy
+        self.header_lines = header_lines
+
+    def classify(self, rel_path: str, content: str) -> Optional[str]:
+        """
+        Classify a file.
+
+        Args:
+            rel_path: Repository-relative file path
+            content: File content
+
+        Returns:
+            Exclusion reason ("vendored", "generated", "too_large", "data_fixture",
+            "minified", "high_entropy") or None if the file should be indexed
+        """
+        path = PurePosixPath(rel_path.replace('\\', '/'))
+        name = path.name.lower()
+
+        if any(part.lower() in VENDORED_DIRS for part in path.parts[:-1]):
+            return 'vendored'
+        if name in GENERATED_NAMES or name.endswith(GENERATED_SUFFIXES):
+            return 'generated'
+
+        size = byte_size(content)
+        if size > self.max_file_bytes:
+            return 'too_large'
+        if name.endswith(DATA_SUFFIXES) and size > self.max_data_file_bytes:
+            return 'data_fixture'
+
+        lines = content.split('\n')
+        header = '\n'.join(lines[:self.header_lines]).lower()
+        if any(marker in header for marker in GENERATED_MARKERS):
+            return 'generated'
+
+        non_empty = [len(line) for line in lines if line.strip()]
+        if non_empty:
+            if sum(non_empty) / len(non_empty) > self.max_avg_line_length:
+                return 'minified'
+            if max(non_empty) > self.max_line_length and len(non_empty) < 50:
+                return 'minified'
+
+        # Entropy is only meaningful on non-trivial content; sample the head
+        if size >= 4096 and shannon_entropy(content[:65536]) > self.max_entropy:
+            return 'high_entropy'
+
+        return None
+
+
+class ExclusionReport:
+    """Records which files were excluded from indexing and why."""
+
+    def __init__(self):
+        self.excluded: List[Dict[str, object]] = []
+
+    def add(self, rel_path: str, reason: str, size: int):
+        self.excluded.append({'file': rel_path, 'reason': reason, 'bytes': size})
+
+    def summary(self) -> Dict[str, object]:
+        """Return counts and bytes saved per reason."""
+        by_reason: Dict[str, int] = {}
+        for entry in self.excluded:
+            by_reason[entry['reason']] = by_reason.get(entry['reason'], 0) + 1
+        return {
+            'files_excluded': len(self.excluded),
+            'bytes_excluded': sum(entry['bytes'] for entry in self.excluded),
+            'by_reason': by_reason,
+        }
+
+    def save(self, path: Path):
+        """Write the report as JSON."""
+        with open(path, 'w') as f:
+            json.dump({**self.summary(), 'files': self.excluded}, f, indent=2)
@@ -4,9 +4,13 @@ import tempfile
 from git import Repo
 from pathlib import Path
 
+from infrastructure.code_graph.file_classifier import FileClassifier, ExclusionReport, byte_size
+
 class Ingestor:
     def __init__(self):
         self.temp_dir = tempfile.mkdtemp()
+        self.classifier = FileClassifier()
+        self.exclusion_report = ExclusionReport()
 
     def clone_repo(self, repo_url):
         try:
@@ -19,6 +23,7 @@ class Ingestor:
 
     def get_codebase_context(self, max_chars=100000):
         context = ""
+        self.exclusion_report = ExclusionReport()
         # Walk through the directory
         for root, dirs, files in os.walk(self.temp_dir):
             # Skip unwanted directories
@@ -35,6 +40,11 @@ class Ingestor:
                         with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
                             content = f.read()
                             rel_path = os.path.relpath(file_path, self.temp_dir)
+                            # Skip generated, minified and vendored content
+                            reason = self.classifier.classify(rel_path, content)
+                            if reason:
+                                self.exclusion_report.add(rel_path, reason, byte_size(content))
+                                continue
                             context += f"\n--- FILE: {rel_path} ---\n"
                             context += content
                             if len(context) > max_chars:
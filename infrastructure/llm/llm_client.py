@@ -1,51 +1,67 @@
 """LLM client wrapper for Phase 1."""
-import os
 import logging
-import google.generativeai as genai
 from typing import Optional, Dict, Any
 
+from infrastructure.llm_pool.provider import get_provider
+from infrastructure.llm_pool.response_cache import CacheMissError
+from infrastructure.llm_pool.structured import StructuredOutput, StructuredOutputError
+
 logger = logging.getLogger(__name__)
 
 class LLMClient:
-    def __init__(self, api_key: Optional[str] = None):
-        self.api_key = api_key or os.getenv("GEMINI_API_KEY")
-        if not self.api_key:
-            logger.warning("GEMINI_API_KEY not set")
-        else:
-            genai.configure(api_key=self.api_key)
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        self.config = config or {}
+        self.provider = None
+        self.outputs: Dict[str, StructuredOutput] = {}
 
-    def call_llm(self, prompt: str, model: str = "gemini-2.5-pro", 
-                 max_tokens: int = 8192, temperature: float = 0.0) -> Dict[str, Any]:
-        """Call LLM and return response with token usage."""
-        if not self.api_key:
-            return {"text": "API_KEY_MISSING", "usage": {"prompt_tokens": 0, "completion_tokens": 0}}
+    def call_llm(self, prompt: str, model: str = "gemini-2.5-pro",
+                 max_tokens: int = 8192, temperature: float = 0.0,
+                 schema: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Call LLM and return response with token usage.
 
+        With ``schema`` (a name under ``infrastructure/prompts/schemas``) the
+        response is requested as JSON in that schema and returned parsed as
+        ``data`` (None, with ``parse_error``, if it does not match).
+        """
+        generation_config = {"temperature": temperature, "max_output_tokens": max_tokens}
+        output = None
+        if schema:
+            output = self.outputs.setdefault(schema, StructuredOutput(schema))
         try:
-            generative_model = genai.GenerativeModel(model)
-            response = generative_model.generate_content(
-                prompt,
-                generation_config=genai.GenerationConfig(
-                    temperature=temperature,
-                    max_output_tokens=max_tokens
-                )
-            )
-            
-            # Estimate tokens if metadata missing (rough fallback)
-            prompt_tokens = len(prompt) // 4
-            completion_tokens = len(response.text) // 4
-            
-            if hasattr(response, 'usage_metadata'):
-                prompt_tokens = response.usage_metadata.prompt_token_count
-                completion_tokens = response.usage_metadata.candidates_token_count
+            provider = self.provider = get_provider(model, generation_config, self.config, logger)
+        except ValueError as e:
+            logger.warning(str(e))
+            return {"text": "API_KEY_MISSING", "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}}
 
-            return {
+        estimated_tokens = provider.token_counter.count(prompt)
+        try:
+            structured = output is not None and self.config.get('structured_output', True)
+            call_config = output.generation_config if structured else None
+            response = provider.generate(prompt, estimated_tokens, call_config)
+            result = {
                 "text": response.text,
                 "usage": {
-                    "prompt_tokens": prompt_tokens,
-                    "completion_tokens": completion_tokens,
-                    "total_tokens": prompt_tokens + completion_tokens
+                    "prompt_tokens": response.prompt_tokens,
+                    "completion_tokens": response.response_tokens,
+                    "total_tokens": response.prompt_tokens + response.response_tokens,
+                    "estimated_prompt_tokens": estimated_tokens,
+                    "cached_tokens": response.context_cached_tokens
                 }
             }
+            if output:
+                try:
+                    result["data"] = output.parse(response.text)
+                except StructuredOutputError as e:
+                    result["data"] = None
+                    result["parse_error"] = str(e)
+            return result
+        except CacheMissError:
+            raise
         except Exception as e:
             logger.error(f"LLM call failed: {e}")
-            return {"text": f"ERROR: {str(e)}", "usage": {"prompt_tokens": 0, "completion_tokens": 0}}
+            return {"text": f"ERROR: {str(e)}", "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}}
+
+    def metrics(self) -> Dict[str, Any]:
+        """Latency and retry metrics of the provider used by the last ``call_llm``."""
+        return self.provider.metrics() if self.provider else {}
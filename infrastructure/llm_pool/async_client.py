@@ -0,0 +1,150 @@
+"""Asyncio variant of the Gemini client with bounded concurrency.
+
+``GeminiLLM`` calls block one at a time. ``AsyncGeminiLLM`` reuses its prompt
+building and response parsing but issues requests with
+``generate_content_async`` so independent calls (triaging many issues, patch
+candidates, repair attempts) overlap their network latency. A semaphore caps
+in-flight requests and a cooperative gate reserves tokens with the rate
+limiter before each request, sleeping with ``asyncio.sleep`` rather than
+blocking the event loop.
+"""
+import asyncio
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from infrastructure.llm_pool.client import GeminiLLM
+from infrastructure.llm_pool.response_cache import CacheMissError
+
+
+class AsyncGeminiLLM:
+    """Async Gemini client sharing prompts, parsing and rate limits with GeminiLLM."""
+
+    def __init__(self, llm: Optional[GeminiLLM] = None, max_concurrency: int = 4,
+                 model_name: str = "gemini-3-pro-preview", logger=None):
+        """
+        Initialize async client.
+
+        Args:
+            llm: Existing GeminiLLM to wrap (created from model_name if omitted)
+            max_concurrency: Maximum number of requests in flight at once
+            model_name: Model used when creating a new GeminiLLM
+            logger: Optional logger
+        """
+        self.llm = llm or GeminiLLM(model_name=model_name, logger=logger)
+        self.logger = logger or self.llm.logger
+        self.max_concurrency = max_concurrency
+        self._semaphore = None
+        self._gate = None
+
+    def _primitives(self):
+        # Created lazily so they bind to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._gate = asyncio.Lock()
+        return self._semaphore, self._gate
+
+    async def _acquire_tokens(self, estimated_tokens: int):
+        """Wait until the rate limiter reserves tokens for one attempt of a request."""
+        _, gate = self._primitives()
+        limiter = self.llm.rate_limiter
+        async with gate:
+            while True:
+                wait = limiter.acquire(estimated_tokens)
+                if wait <= 0:
+                    return
+                if self.logger:
+                    self.logger.info(f"⏱️  Rate limit approaching, waiting {wait:.1f}s")
+                limiter.record_wait(wait)
+                await asyncio.sleep(wait)
+
+    async def _generate(self, prompt: str, estimated_tokens: int, generation_config: Optional[dict] = None):
+        """Async counterpart of ``LLMProvider.generate``; cache hits skip the semaphore."""
+        provider = self.llm.provider
+        key, cached = provider.lookup(prompt, generation_config)
+        if cached:
+            return cached
+        semaphore, _ = self._primitives()
+        async with semaphore:
+            return await provider.generate_async(prompt, estimated_tokens, key, generation_config,
+                                                 reserve=self._acquire_tokens)
+
+    async def generate_patch(self, issue_text: str, chunks: list, repo_name: str,
+                             issue_number: int, artifacts_dir: Path,
+                             validation_results: str = "None", repo_root: str = None) -> dict:
+        """Async version of ``GeminiLLM.generate_patch`` (non-streaming); same result."""
+        llm = self.llm
+        prefix, suffix = llm._build_patch_prompt_parts(issue_text, chunks, repo_name, issue_number,
+                                                       validation_results)
+        prompt = prefix + suffix
+        estimated_tokens = llm._start_patch_call(prompt, artifacts_dir)
+        try:
+            response = await self._generate(prompt, estimated_tokens, llm._patch_output_config())
+            cached_tokens = llm._record_context_reuse(prefix, response)
+            result = llm._finish_patch_call(response, artifacts_dir, repo_root=repo_root)
+            result['cached_prompt_tokens'] = cached_tokens
+            return result
+        except CacheMissError:
+            raise
+        except Exception as e:
+            return llm._patch_call_failed(e, artifacts_dir)
+
+    async def triage_issue(self, issue_title: str, issue_body: str, labels: list) -> dict:
+        """Async version of ``GeminiLLM.triage_issue``; same arguments and result."""
+        llm = self.llm
+        try:
+            prompt = llm._build_triage_prompt(issue_title, issue_body, labels)
+            estimated_tokens = llm.token_counter.count(prompt)
+            response = await self._generate(prompt, estimated_tokens, llm._output_config(llm.triage_output))
+            return llm._parse_triage_response(response.text)
+        except CacheMissError:
+            raise
+        except Exception as e:
+            return llm._triage_failed(e)
+
+    async def triage_batch(self, issues: List[Dict[str, Any]]) -> List[Optional[dict]]:
+        """Async version of ``GeminiLLM.triage_batch``; same arguments and result."""
+        llm = self.llm
+        try:
+            prompt = llm._build_triage_batch_prompt(issues)
+            response = await self._generate(prompt, llm.token_counter.count(prompt),
+                                            llm._output_config(llm.triage_batch_output))
+            return llm._parse_triage_batch_response(response.text, len(issues))
+        except CacheMissError:
+            raise
+        except Exception as e:
+            if self.logger:
+                self.logger.warning(f"Batched triage failed, falling back to single calls: {e}")
+            return [None] * len(issues)
+
+    async def triage_many(self, issues: List[Dict[str, Any]], batch_size: int = 1) -> List[dict]:
+        """
+        Triage several issues concurrently.
+
+        Args:
+            issues: Dicts with 'title', 'body' and 'labels'
+            batch_size: Issues per prompt; unparsed issues are retried individually
+
+        Returns:
+            Triage results in the same order as ``issues``
+        """
+        start = time.perf_counter()
+        results: List[Optional[dict]] = [None] * len(issues)
+        if batch_size > 1:
+            starts = [s for s in range(0, len(issues), batch_size) if len(issues[s:s + batch_size]) > 1]
+            batches = await asyncio.gather(*(self.triage_batch(issues[s:s + batch_size]) for s in starts))
+            for s, verdicts in zip(starts, batches):
+                results[s:s + len(verdicts)] = verdicts
+
+        missing = [i for i, result in enumerate(results) if result is None]
+        singles = await asyncio.gather(*(
+            self.triage_issue(issues[i]['title'], issues[i]['body'], issues[i]['labels'])
+            for i in missing
+        ))
+        for i, result in zip(missing, singles):
+            results[i] = result
+        if self.logger:
+            self.logger.info(f"Triaged {len(issues)} issues in {time.perf_counter() - start:.1f}s "
+                             f"(concurrency {self.max_concurrency}, batch size {batch_size}, "
+                             f"{len(missing)} single calls)")
+        return results
@@ -0,0 +1,315 @@
+"""Pluggable model backends for GeminiLLM.
+
+A backend exposes the two ``GenerativeModel`` methods the clients use,
+``generate_content`` and ``generate_content_async``, returning objects with
+``text`` and ``usage_metadata``, plus ``stream_content``, a generator of
+partial responses that cancels the request when closed. All three take an
+optional per-call ``generation_config`` (e.g. a response schema) that is
+merged over the model's; backends with ``supports_timeout`` also take a
+per-call ``timeout`` in seconds. ``GeminiBackend`` talks to the API;
+``ReplayBackend`` serves recorded responses offline with configurable
+latency, token counts and error rate, so ``SolverAgent.execute`` and
+``IssueDiscoveryAgent.discover`` can be benchmarked without a key.
+``RecordingBackend`` wraps any backend and appends every exchange to a JSONL
+file that ``ReplayBackend`` can read back.
+
+Selection (``config.yml`` keys, environment variables take precedence):
+    llm_backend / OPENFIX_LLM_BACKEND              gemini | replay
+    replay_path / OPENFIX_REPLAY_PATH              recordings JSONL
+    replay_latency_ms / OPENFIX_REPLAY_LATENCY_MS  fixed latency per call
+    replay_error_rate / OPENFIX_REPLAY_ERROR_RATE  fraction of calls that fail
+    record_llm_path / OPENFIX_LLM_RECORD           record exchanges to JSONL
+
+With several keys in ``GEMINI_API_KEYS`` the Gemini backend is a ``KeyPool``
+of one ``GeminiBackend`` per key (see ``key_pool.py``).
+"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, Optional
+
+import google.generativeai as genai
+from google.ai import generativelanguage as glm
+
+from infrastructure.llm_pool.key_pool import api_keys_from_env, key_pool_from_config
+from infrastructure.llm_pool.token_counter import count_tokens
+
+DEFAULT_KEY = "*"
+# Private GenerativeModel attributes a pooled key replaces with its own clients;
+# they exist in the google-generativeai version pinned in requirements.txt
+_MODEL_CLIENT_ATTRS = ("_client", "_async_client")
+
+
+class BackendError(RuntimeError):
+    """Simulated provider failure raised by ReplayBackend."""
+
+
+class ReplayMissError(KeyError):
+    """Raised when a prompt has no recording and no default entry exists."""
+
+
+def prompt_hash(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+def make_response(text: str, prompt_tokens: int, response_tokens: int):
+    """Build a response object shaped like a Gemini ``GenerateContentResponse``."""
+    usage = SimpleNamespace(prompt_token_count=prompt_tokens, candidates_token_count=response_tokens)
+    return SimpleNamespace(text=text, usage_metadata=usage)
+
+
+class GeminiBackend:
+    """Live Gemini API backend."""
+
+    supports_timeout = True
+
+    def __init__(self, model_name: str, generation_config: Optional[Dict[str, Any]] = None,
+                 api_key: Optional[str] = None):
+        """
+        Initialize backend.
+
+        Args:
+            model_name: Gemini model name
+            generation_config: Optional Gemini generation config
+            api_key: Key for this backend's own clients (default: the global
+                ``GEMINI_API_KEY`` configuration)
+        """
+        self.api_key = api_key
+        if api_key is None:
+            api_key = os.getenv("GEMINI_API_KEY")
+            if not api_key:
+                raise ValueError("GEMINI_API_KEY not found in environment variables.")
+            genai.configure(api_key=api_key)
+            self.model = genai.GenerativeModel(model_name, generation_config=generation_config)
+            return
+        self.model = genai.GenerativeModel(model_name, generation_config=generation_config)
+        # genai.configure is process-global; pooled keys need clients of their own
+        missing = [attr for attr in _MODEL_CLIENT_ATTRS if not hasattr(self.model, attr)]
+        if missing:
+            raise RuntimeError(f"google-generativeai {genai.__version__} has no GenerativeModel "
+                               f"{', '.join(missing)}; per-key clients need the version pinned in requirements.txt")
+        self.model._client = glm.GenerativeServiceClient(client_options={"api_key": api_key})
+
+    @staticmethod
+    def _request_options(timeout: Optional[float]):
+        return {"timeout": timeout} if timeout else None
+
+    def generate_content(self, prompt: str, generation_config: Optional[Dict[str, Any]] = None,
+                         timeout: Optional[float] = None):
+        return self.model.generate_content(prompt, generation_config=generation_config,
+                                           request_options=self._request_options(timeout))
+
+    def count_tokens(self, prompt: str) -> int:
+        return self.model.count_tokens(prompt).total_tokens
+
+    def stream_content(self, prompt: str, generation_config: Optional[Dict[str, Any]] = None,
+                       timeout: Optional[float] = None):
+        response = self.model.generate_content(prompt, generation_config=generation_config, stream=True,
+                                               request_options=self._request_options(timeout))
+        try:
+            for chunk in response:
+                yield chunk
+        finally:
+            # Closing early cancels the underlying server stream
+            cancel = getattr(getattr(response, "_iterator", None), "cancel", None)
+            if cancel:
+                cancel()
+
+    async def generate_content_async(self, prompt: str, generation_config: Optional[Dict[str, Any]] = None,
+                                     timeout: Optional[float] = None):
+        if self.api_key and self.model._async_client is None:
+            # Created on first use, inside the running event loop
+            self.model._async_client = glm.GenerativeServiceAsyncClient(client_options={"api_key": self.api_key})
+        return await self.model.generate_content_async(prompt, generation_config=generation_config,
+                                                       request_options=self._request_options(timeout))
+
+
+class ReplayBackend:
+    """Offline backend serving recorded responses with injected latency and errors."""
+
+    def __init__(self, recordings_path: Optional[str] = None, latency_ms: Optional[float] = None,
+                 latency_jitter_ms: float = 0.0, error_rate: float = 0.0,
+                 prompt_tokens: Optional[int] = None, response_tokens: Optional[int] = None,
+                 seed: Optional[int] = None, stream_chunk_chars: int = 200):
+        """
+        Initialize replay backend.
+
+        Args:
+            recordings_path: JSONL of recorded exchanges (``prompt_sha256`` "*" is the default entry)
+            latency_ms: Latency per call (None = recorded latency, or 0)
+            latency_jitter_ms: Uniform +/- jitter added to the latency
+            error_rate: Fraction of calls that raise BackendError
+            prompt_tokens: Override reported prompt tokens (None = recorded or local count)
+            response_tokens: Override reported response tokens (None = recorded or local count)
+            seed: Seed for jitter and error injection, for repeatable runs
+            stream_chunk_chars: Characters per chunk from ``stream_content``
+        """
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.error_rate = error_rate
+        self.prompt_tokens = prompt_tokens
+        self.response_tokens = response_tokens
+        self.rng = random.Random(seed)
+        self.stream_chunk_chars = stream_chunk_chars
+        self.chunks_streamed = 0
+        self.recordings: Dict[str, Dict[str, Any]] = {}
+        self.calls = 0
+        if recordings_path and Path(recordings_path).exists():
+            with open(recordings_path, "r") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.recordings[entry["prompt_sha256"]] = entry
+
+    def add(self, prompt: Optional[str], response_text: str, **fields):
+        """Register a response for a prompt (None registers the default entry)."""
+        key = DEFAULT_KEY if prompt is None else prompt_hash(prompt)
+        self.recordings[key] = {"prompt_sha256": key, "response_text": response_text, **fields}
+
+    def _lookup(self, prompt: str) -> Dict[str, Any]:
+        entry = self.recordings.get(prompt_hash(prompt)) or self.recordings.get(DEFAULT_KEY)
+        if entry is None:
+            raise ReplayMissError(f"No recorded response for prompt {prompt_hash(prompt)[:12]}")
+        return entry
+
+    def _delay(self, entry: Dict[str, Any]) -> float:
+        latency = self.latency_ms if self.latency_ms is not None else entry.get("latency_ms", 0)
+        if self.latency_jitter_ms:
+            latency += self.rng.uniform(-self.latency_jitter_ms, self.latency_jitter_ms)
+        return max(0.0, latency) / 1000
+
+    def _respond(self, prompt: str, entry: Dict[str, Any]):
+        self.calls += 1
+        if self.error_rate and self.rng.random() < self.error_rate:
+            raise BackendError("429 Resource exhausted (simulated)")
+        text = entry["response_text"]
+        prompt_tokens = self.prompt_tokens or entry.get("prompt_tokens") or count_tokens(prompt)
+        response_tokens = self.response_tokens or entry.get("response_tokens") or count_tokens(text)
+        return make_response(text, prompt_tokens, response_tokens)
+
+    def generate_content(self, prompt: str, generation_config: Optional[Dict[str, Any]] = None):
+        entry = self._lookup(prompt)
+        time.sleep(self._delay(entry))
+        return self._respond(prompt, entry)
+
+    async def generate_content_async(self, prompt: str, generation_config: Optional[Dict[str, Any]] = None):
+        entry = self._lookup(prompt)
+        await asyncio.sleep(self._delay(entry))
+        return self._respond(prompt, entry)
+
+    def stream_content(self, prompt: str, generation_config: Optional[Dict[str, Any]] = None):
+        """Yield the recorded response in chunks, spreading the latency across them."""
+        entry = self._lookup(prompt)
+        full = self._respond(prompt, entry)
+        text = full.text
+        pieces = [text[i:i + self.stream_chunk_chars] for i in range(0, len(text), self.stream_chunk_chars)] or [""]
+        delay = self._delay(entry) / len(pieces)
+        prompt_tokens = full.usage_metadata.prompt_token_count
+        streamed = ""
+        for piece in pieces:
+            time.sleep(delay)
+            streamed += piece
+            self.chunks_streamed += 1
+            yield make_response(piece, prompt_tokens, count_tokens(streamed))
+
+
+class RecordingBackend:
+    """Wraps a backend and appends every exchange to a JSONL recordings file."""
+
+    def __init__(self, inner, path: str, model_name: str = ""):
+        self.inner = inner
+        self.path = Path(path)
+        self.model_name = model_name
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def __getattr__(self, name):
+        # Forward optional capabilities such as count_tokens
+        return getattr(self.inner, name)
+
+    def _record(self, prompt: str, response, latency_ms: float):
+        usage = getattr(response, "usage_metadata", None)
+        entry = {
+            "prompt_sha256": prompt_hash(prompt),
+            "model": self.model_name,
+            "response_text": response.text,
+            "prompt_tokens": getattr(usage, "prompt_token_count", None),
+            "response_tokens": getattr(usage, "candidates_token_count", None),
+            "latency_ms": round(latency_ms, 1),
+        }
+        with open(self.path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    def generate_content(self, prompt: str, **kwargs):
+        start = time.perf_counter()
+        response = self.inner.generate_content(prompt, **kwargs)
+        self._record(prompt, response, (time.perf_counter() - start) * 1000)
+        return response
+
+    async def generate_content_async(self, prompt: str, **kwargs):
+        start = time.perf_counter()
+        response = await self.inner.generate_content_async(prompt, **kwargs)
+        self._record(prompt, response, (time.perf_counter() - start) * 1000)
+        return response
+
+    def stream_content(self, prompt: str, **kwargs):
+        """Stream from the inner backend, recording only responses that finish."""
+        start = time.perf_counter()
+        text = ""
+        last = None
+        stream = self.inner.stream_content(prompt, **kwargs)
+        try:
+            for chunk in stream:
+                text += chunk.text
+                last = chunk
+                yield chunk
+        finally:
+            stream.close()
+        if last is not None:
+            usage = getattr(last, "usage_metadata", None)
+            self._record(prompt, SimpleNamespace(text=text, usage_metadata=usage),
+                         (time.perf_counter() - start) * 1000)
+
+
+def backend_from_config(config: Dict[str, Any], model_name: str,
+                        generation_config: Optional[Dict[str, Any]] = None):
+    """
+    Build the model backend from ``config.yml`` settings and environment overrides.
+
+    Args:
+        config: OpenFix config dict
+        model_name: Gemini model name
+        generation_config: Optional Gemini generation config
+
+    Returns:
+        GeminiBackend (a KeyPool of them for several API keys), ReplayBackend,
+        or either wrapped in a RecordingBackend
+    """
+    kind = os.getenv("OPENFIX_LLM_BACKEND", config.get("llm_backend", "gemini"))
+    if kind == "replay":
+        latency = os.getenv("OPENFIX_REPLAY_LATENCY_MS", config.get("replay_latency_ms"))
+        backend = ReplayBackend(
+            recordings_path=os.getenv("OPENFIX_REPLAY_PATH", config.get("replay_path", "data/replay/llm.jsonl")),
+            latency_ms=float(latency) if latency is not None else None,
+            error_rate=float(os.getenv("OPENFIX_REPLAY_ERROR_RATE", config.get("replay_error_rate", 0.0))),
+            seed=config.get("replay_seed")
+        )
+    elif kind == "gemini":
+        api_keys = api_keys_from_env()
+        if len(api_keys) > 1:
+            backend = key_pool_from_config(
+                config, api_keys, lambda api_key: GeminiBackend(model_name, generation_config, api_key)
+            )
+        else:
+            backend = GeminiBackend(model_name, generation_config)
+    else:
+        raise ValueError(f"Unknown LLM backend '{kind}', expected 'gemini' or 'replay'")
+
+    record_path = os.getenv("OPENFIX_LLM_RECORD", config.get("record_llm_path"))
+    if record_path:
+        backend = RecordingBackend(backend, record_path, model_name)
+    return backend
@@ -1,18 +1,37 @@
 """LLM client with strict diff generation, artifact logging, and rate limiting."""
-import os
 import json
 import time
 from pathlib import Path
 from datetime import datetime
 from collections import deque
-import google.generativeai as genai
+from types import SimpleNamespace
 from dotenv import load_dotenv
 
+from infrastructure.llm_pool.deadline import current_deadline
+from infrastructure.llm_pool.edit_blocks import EditBlockError, edits_to_diff, parse_edit_blocks, parse_summary
+from infrastructure.llm_pool.provider import LLMProvider
+from infrastructure.llm_pool.stream_guard import DIFF_HEADERS, StreamGuard
+from infrastructure.llm_pool.structured import StructuredOutput, StructuredOutputError
+from infrastructure.llm_pool.context_cache import ContextCache, split_template
+from infrastructure.llm_pool.response_cache import CacheMissError, LLMResponse
+
 load_dotenv()
 
+PATCH_PROMPTS = {
+    "diff": "infrastructure/prompts/patchbuilder_json_prompt.txt",
+    "edits": "infrastructure/prompts/patchbuilder_edits_prompt.txt",
+}
+PATCH_FORMATS = tuple(PATCH_PROMPTS)
+
 
 class RateLimiter:
-    """Simple token-based rate limiter for Gemini API."""
+    """Simple token-based rate limiter for Gemini API.
+    
+    Callers reserve their estimated tokens with ``acquire`` (or
+    ``wait_if_needed``) and settle the reservation with the real count via
+    ``record_usage``. Reserving up front keeps concurrent callers from all
+    passing the check before any of them has recorded usage.
+    """
     
     def __init__(self, tokens_per_minute=900000):  # 900k to leave safety margin
         """
@@ -22,67 +41,243 @@ class RateLimiter:
             tokens_per_minute: Maximum tokens allowed per minute (default 900k for safety)
         """
         self.tokens_per_minute = tokens_per_minute
-        self.token_history = deque()  # (timestamp, token_count) tuples
+        self.token_history = deque()  # [timestamp, token_count] entries
+        self.reservations = deque()  # history entries still holding an estimate
+        self.wait_seconds_total = 0.0
+        self.wait_count = 0
     
-    def wait_if_needed(self, estimated_tokens, logger=None):
+    def _prune(self, now):
+        """Remove entries older than 60 seconds."""
+        while self.token_history and (now - self.token_history[0][0]) > 60:
+            self.token_history.popleft()
+    
+    def tokens_in_window(self):
+        """Tokens used in the last 60 seconds."""
+        self._prune(time.time())
+        return sum(count for _, count in self.token_history)
+    
+    def compute_wait(self, estimated_tokens):
         """
-        Sleep if needed to respect rate limits.
+        Compute how long to wait before sending a request, without sleeping.
         
         Args:
             estimated_tokens: Estimated tokens for the upcoming request
-            logger: Optional logger for transparency
+            
+        Returns:
+            Seconds to wait (0 if the request fits in the current window)
         """
         now = time.time()
+        self._prune(now)
         
-        # Remove entries older than 60 seconds
-        while self.token_history and (now - self.token_history[0][0]) > 60:
-            self.token_history.popleft()
-        
-        # Calculate tokens used in last 60 seconds
+        # Check if adding this request would exceed quota
         tokens_in_window = sum(count for _, count in self.token_history)
+        if tokens_in_window + estimated_tokens <= self.tokens_per_minute or not self.token_history:
+            return 0
         
-        # Check if adding this request would exceed quota
-        projected_total = tokens_in_window + estimated_tokens
+        # Wait until oldest entry expires
+        oldest_timestamp = self.token_history[0][0]
+        return max(0, 60 - (now - oldest_timestamp)) + 1  # +1 for safety
+    
+    def acquire(self, estimated_tokens):
+        """
+        Reserve tokens for a request if they fit in the current window.
         
-        if projected_total > self.tokens_per_minute:
-            # Calculate sleep time - wait until oldest entry expires
-            if self.token_history:
-                oldest_timestamp = self.token_history[0][0]
-                sleep_time = max(0, 60 - (now - oldest_timestamp)) + 1  # +1 for safety
-                
-                if logger:
-                    logger.info(f"⏱️  Rate limit approaching: {tokens_in_window}/{self.tokens_per_minute} tokens used")
-                    logger.info(f"   Sleeping {sleep_time:.1f}s to respect quota...")
-                else:
-                    print(f"Rate limiting: sleeping {sleep_time:.1f}s...")
-                
-                time.sleep(sleep_time)
-                
-                # Clear old entries after sleeping
-                now = time.time()
-                while self.token_history and (now - self.token_history[0][0]) > 60:
-                    self.token_history.popleft()
+        Args:
+            estimated_tokens: Estimated tokens for the upcoming request
+            
+        Returns:
+            0 if the tokens were reserved, otherwise seconds to wait before retrying
+        """
+        wait = self.compute_wait(estimated_tokens)
+        if wait > 0:
+            return wait
+        entry = [time.time(), estimated_tokens]
+        self.token_history.append(entry)
+        self.reservations.append(entry)
+        return 0
+    
+    def record_wait(self, seconds):
+        """Account time spent waiting for quota."""
+        self.wait_seconds_total += seconds
+        self.wait_count += 1
+    
+    def wait_if_needed(self, estimated_tokens, logger=None):
+        """
+        Sleep if needed to respect rate limits, then reserve the tokens.
+        
+        Args:
+            estimated_tokens: Estimated tokens for the upcoming request
+            logger: Optional logger for transparency
+        """
+        while True:
+            sleep_time = self.acquire(estimated_tokens)
+            if sleep_time <= 0:
+                return
+            
+            if logger:
+                logger.info(f"⏱️  Rate limit approaching: {self.tokens_in_window()}/{self.tokens_per_minute} tokens used")
+                logger.info(f"   Sleeping {sleep_time:.1f}s to respect quota...")
+            else:
+                print(f"Rate limiting: sleeping {sleep_time:.1f}s...")
+            
+            self.record_wait(sleep_time)
+            time.sleep(sleep_time)
     
     def record_usage(self, token_count):
-        """Record actual token usage after a successful request."""
-        self.token_history.append((time.time(), token_count))
+        """Record actual token usage, settling the oldest outstanding reservation."""
+        if self.reservations:
+            self.reservations.popleft()[1] = token_count
+        else:
+            self.token_history.append([time.time(), token_count])
 
 
 class GeminiLLM:
-    """Gemini LLM client with artifact logging and rate limiting."""
-    
-    def __init__(self, model_name="gemini-3-pro-preview", logger=None):
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            raise ValueError("GEMINI_API_KEY not found in environment variables.")
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel(model_name)
-        self.model_name = model_name
-        self.rate_limiter = RateLimiter()
+    """Gemini patch and triage prompts on top of the shared LLMProvider."""
+    
+    def __init__(self, model_name="gemini-3-pro-preview", logger=None, rate_limiter=None,
+                 response_cache=None, generation_config=None, backend=None, token_counter=None,
+                 context_cache=None, provider=None, structured_output=False, patch_format="diff",
+                 artifact_store=None):
+        """
+        Initialize client.
+        
+        Args:
+            model_name: Gemini model name
+            logger: Optional logger
+            rate_limiter: RateLimiter or SharedRateLimiter (default: host-wide shared limiter)
+            response_cache: ResponseCache (default: read_write cache under data/cache)
+            generation_config: Optional Gemini generation config (part of the cache key)
+            backend: Model backend (default: chosen by OPENFIX_LLM_BACKEND, live Gemini
+                if unset; only the Gemini backend needs GEMINI_API_KEY)
+            token_counter: TokenCounter for prompt sizing (default: calibrated from responses,
+                exact counts via the backend's count_tokens when requested)
+            context_cache: ContextCache tracking reuse of stable prompt prefixes
+            provider: LLMProvider to call through (e.g. from ``get_provider``); when
+                given, the backend, limiter, cache and counter arguments are ignored
+            structured_output: Request JSON constrained to the response schemas in
+                ``infrastructure/prompts/schemas`` (responses are validated either way)
+            patch_format: "diff" (JSON with a unified diff) or "edits" (search/replace
+                edit blocks, rendered to a diff against ``repo_root``)
+            artifact_store: ArtifactStore for prompts and responses (every iteration is
+                kept); without one they are written as plain files, overwritten per call
+        """
+        if patch_format not in PATCH_FORMATS:
+            raise ValueError(f"Unknown patch_format {patch_format!r}; expected one of {PATCH_FORMATS}")
+        self.provider = provider or LLMProvider(
+            model_name=model_name,
+            generation_config=generation_config,
+            backend=backend,
+            rate_limiter=rate_limiter,
+            response_cache=response_cache,
+            token_counter=token_counter,
+            logger=logger
+        )
+        self.context_cache = context_cache or ContextCache(token_counter=self.token_counter)
         self.logger = logger
+        self.structured_output = structured_output
+        self.patch_format = patch_format
+        self.artifact_store = artifact_store
+        self.patch_output = StructuredOutput("patch_response")
+        self.triage_output = StructuredOutput("triage_response")
+        self.triage_batch_output = StructuredOutput("triage_batch_response")
+    
+    # Provider state, exposed for callers and tests that swap pieces
+    @property
+    def model(self):
+        return self.provider.model
+    
+    @model.setter
+    def model(self, backend):
+        self.provider.model = backend
+    
+    @property
+    def model_name(self):
+        return self.provider.model_name
+    
+    @property
+    def rate_limiter(self):
+        return self.provider.rate_limiter
+    
+    @property
+    def response_cache(self):
+        return self.provider.response_cache
+    
+    @response_cache.setter
+    def response_cache(self, cache):
+        self.provider.response_cache = cache
+    
+    @property
+    def token_counter(self):
+        return self.provider.token_counter
+    
+    def _record_context_reuse(self, prefix: str, response: LLMResponse) -> int:
+        """Account the stable prefix of a patch prompt; response-cache hits cost nothing."""
+        if response.cached:
+            return 0
+        return self.context_cache.record(prefix, response.prompt_tokens, response.context_cached_tokens)
+    
+    def _output_config(self, output: StructuredOutput):
+        """Per-call generation config requesting ``output``'s schema, if enabled."""
+        return output.generation_config if self.structured_output else None
+    
+    def _patch_output_config(self):
+        """Generation config for patch calls; edit blocks are plain text, not JSON."""
+        return None if self.patch_format == "edits" else self._output_config(self.patch_output)
+    
+    def structured_stats(self) -> dict:
+        """Parsed / fixed-up / failed response counts per schema."""
+        return {o.schema_name: o.stats() for o in (self.patch_output, self.triage_output, self.triage_batch_output)}
+    
+    def _call_model(self, prompt: str, estimated_tokens: int, generation_config: dict = None) -> LLMResponse:
+        """Send a prompt through the provider (response cache, rate limiter, retries)."""
+        return self.provider.generate(prompt, estimated_tokens, generation_config)
+    
+    def _stream_model(self, prompt: str, estimated_tokens: int, guard: StreamGuard,
+                      generation_config: dict = None) -> LLMResponse:
+        """
+        Stream a prompt, cancelling the request as soon as the guard reports a problem.
+        
+        Args:
+            prompt: Full prompt text
+            estimated_tokens: Estimated tokens, reserved with the rate limiter on a cache miss
+            guard: StreamGuard fed with the response as it arrives
+            generation_config: Optional per-call generation config
+            
+        Returns:
+            LLMResponse with the text received; check ``guard.abort_reason``
+        """
+        provider = self.provider
+        key, cached = provider.lookup(prompt, generation_config)
+        if cached:
+            guard.feed(cached.text)
+            return cached
+        
+        text = ""
+        usage = None
+        stream, chunk = provider.open_stream(prompt, estimated_tokens, generation_config)
+        deadline = current_deadline()
+        try:
+            while chunk is not None:
+                text += chunk.text
+                usage = getattr(chunk, 'usage_metadata', None) or usage
+                if guard.feed(chunk.text):
+                    break
+                if deadline.expired:
+                    guard.abort_reason = "Run deadline exceeded while streaming"
+                    break
+                chunk = next(stream, None)
+        finally:
+            stream.close()
+        
+        response = SimpleNamespace(text=text)
+        if usage is not None:
+            response.usage_metadata = usage
+        # Partial responses would parse differently on a later non-streaming hit
+        return provider.complete(key, prompt, response, estimated_tokens, store=guard.abort_reason is None)
     
     def generate_patch(self, issue_text: str, chunks: list, repo_name: str, 
-                      issue_number: int, artifacts_dir: Path, validation_results: str = "None") -> dict:
+                      issue_number: int, artifacts_dir: Path, validation_results: str = "None",
+                      stream: bool = False, repo_root: str = None) -> dict:
         """
         Generate a git patch for an issue.
         
@@ -93,144 +288,225 @@ class GeminiLLM:
             issue_number: Issue number
             artifacts_dir: Directory to save artifacts
             validation_results: Output from previous validation run (optional)
+            stream: Stream the response and abort early on a refusal, a bad diff
+                header or a path outside the repository
+            repo_root: Checked-out repository, for the streaming path checks (required
+                with ``patch_format: edits`` to render the edits as a diff)
             
         Returns:
             Dict with 'success', 'diff', 'reason', 'prompt_tokens', 'response_tokens'
+            (and 'aborted' when a streamed response was cut short)
         """
-        # Build prompt
-        prompt = self._build_patch_prompt(issue_text, chunks, repo_name, issue_number, validation_results)
+        # Build prompt: stable prefix (instructions, issue, chunks) + per-iteration suffix
+        prefix, suffix = self._build_patch_prompt_parts(issue_text, chunks, repo_name, issue_number,
+                                                        validation_results)
+        prompt = prefix + suffix
+        estimated_tokens = self._start_patch_call(prompt, artifacts_dir)
         
-        # Estimate tokens (rough: 4 chars = 1 token)
-        estimated_tokens = len(prompt) // 4
+        # Call Gemini (or the response cache)
+        try:
+            abort_reason = None
+            output_config = self._patch_output_config()
+            if stream:
+                guard = StreamGuard(repo_root, self.patch_format)
+                response = self._stream_model(prompt, estimated_tokens, guard, output_config)
+                abort_reason = guard.abort_reason
+            else:
+                response = self._call_model(prompt, estimated_tokens, output_config)
+            cached_tokens = self._record_context_reuse(prefix, response)
+            result = self._finish_patch_call(response, artifacts_dir, abort_reason, repo_root)
+            result['cached_prompt_tokens'] = cached_tokens
+            return result
+        except CacheMissError:
+            raise
+        except Exception as e:
+            return self._patch_call_failed(e, artifacts_dir)
+    
+    def _save_artifact(self, artifacts_dir: Path, name: str, content: str):
+        """Save an artifact to the store, or as a plain file in ``artifacts_dir``."""
+        if self.artifact_store:
+            self.artifact_store.save(artifacts_dir, name, content)
+        else:
+            with open(artifacts_dir / name, 'w') as f:
+                f.write(content)
+    
+    def _start_patch_call(self, prompt: str, artifacts_dir: Path) -> int:
+        """Estimate tokens and save the prompt before a patch call."""
+        estimated_tokens = self.token_counter.count(prompt)
         
         if self.logger:
             self.logger.info(f"Estimated tokens: ~{estimated_tokens:,}")
         
-        # Wait if needed to respect rate limits
-        self.rate_limiter.wait_if_needed(estimated_tokens, self.logger)
-        
         # Save prompt
         artifacts_dir.mkdir(parents=True, exist_ok=True)
-        with open(artifacts_dir / 'prompt.txt', 'w') as f:
-            f.write(prompt)
+        self._save_artifact(artifacts_dir, 'prompt.txt', prompt)
+        return estimated_tokens
+    
+    def _finish_patch_call(self, response: LLMResponse, artifacts_dir: Path, abort_reason: str = None,
+                           repo_root: str = None) -> dict:
+        """Save the response and parse it into a patch result."""
+        response_text = response.text
+        prompt_tokens, response_tokens = response.prompt_tokens, response.response_tokens
         
-        # Call Gemini
-        try:
-            response = self.model.generate_content(prompt)
-            response_text = response.text
-            
-            # Extract token counts
-            prompt_tokens = response.usage_metadata.prompt_token_count if hasattr(response, 'usage_metadata') else estimated_tokens
-            response_tokens = response.usage_metadata.candidates_token_count if hasattr(response, 'usage_metadata') else 0
-            
-            # Record actual usage
-            self.rate_limiter.record_usage(prompt_tokens + response_tokens)
-            
-            if self.logger:
-                self.logger.info(f"✓ LLM response received: {prompt_tokens:,} input + {response_tokens:,} output tokens")
-            
-            # Save response
-            response_data = {
-                'model': self.model_name,
-                'timestamp': datetime.utcnow().isoformat(),
+        if self.logger:
+            self.logger.info(f"✓ LLM response received: {prompt_tokens:,} input + {response_tokens:,} output tokens")
+            if abort_reason:
+                self.logger.warning(f"Stream aborted early: {abort_reason}")
+        
+        # Save response
+        response_data = {
+            'model': self.model_name,
+            'timestamp': datetime.utcnow().isoformat(),
+            'prompt_tokens': prompt_tokens,
+            'response_tokens': response_tokens,
+            'cached': response.cached,
+            'aborted_reason': abort_reason,
+            'response_text': response_text
+        }
+        
+        if self.artifact_store:
+            self.artifact_store.save_json(artifacts_dir, 'response.json', response_data)
+        else:
+            self._save_artifact(artifacts_dir, 'response.json', json.dumps(response_data, indent=2))
+        
+        if abort_reason:
+            return {
+                'success': False,
+                'diff': None,
+                'reason': abort_reason,
+                'aborted': True,
                 'prompt_tokens': prompt_tokens,
-                'response_tokens': response_tokens,
-                'response_text': response_text
+                'response_tokens': response_tokens
             }
+        if self.patch_format == "edits":
+            return self._parse_edit_response(response_text, repo_root, prompt_tokens, response_tokens)
+        return self._parse_patch_response(response_text, prompt_tokens, response_tokens)
+    
+    def _parse_edit_response(self, response_text: str, repo_root: str, prompt_tokens: int,
+                             response_tokens: int) -> dict:
+        """Apply an edit-block response to the checked-out files and render it as a diff."""
+        result = {
+            'success': False,
+            'diff': None,
+            'reason': None,
+            'prompt_tokens': prompt_tokens,
+            'response_tokens': response_tokens
+        }
+        if 'CANNOT_FIX_SAFELY' in response_text:
+            result['reason'] = response_text.split('CANNOT_FIX_SAFELY', 1)[1].lstrip(': ').strip() \
+                or 'CANNOT_FIX_SAFELY'
+            return result
+        if repo_root is None:
+            result['reason'] = 'Edit-block patches need the checked-out repository (repo_root)'
+            return result
+        
+        try:
+            blocks = parse_edit_blocks(response_text)
+            diff = edits_to_diff(repo_root, blocks)
+        except EditBlockError as e:
+            if self.logger:
+                self.logger.warning(f"Invalid edit blocks: {e}")
+            result['reason'] = f"Invalid edit blocks: {e}"
+            return result
+        
+        explanation, risk = parse_summary(response_text)
+        if self.logger:
+            self.logger.info(f"Patch generated from {len(blocks)} edit block(s). "
+                             f"Explanation: {explanation} (Risk: {risk})")
+        result.update(success=True, diff=diff, edits=len(blocks))
+        return result
+    
+    def _parse_patch_response(self, response_text: str, prompt_tokens: int, response_tokens: int) -> dict:
+        """Parse the JSON patch response into a result dict."""
+        patch_content = None
+        reason = None
+        
+        try:
+            patch_data = self.patch_output.parse(response_text)
+            patch_content = patch_data["patch_text"]
+            explanation = patch_data.get("explanation", "")
+            risk = patch_data.get("estimated_risk", "Unknown")
             
-            with open(artifacts_dir / 'response.json', 'w') as f:
-                json.dump(response_data, f, indent=2)
-            
-            # Parse response
-            patch_content = None
-            reason = None
-            
-            try:
-                # Extract JSON block
-                text = response_text
-                if "```json" in text:
-                    start = text.find("```json") + 7
-                    end = text.find("```", start)
-                    if end != -1:
-                        text = text[start:end]
-                elif "```" in text: # Maybe just ``` without json
-                    start = text.find("```") + 3
-                    end = text.find("```", start)
-                    if end != -1:
-                        text = text[start:end]
-                
-                # If still has preamble, try to find first { and last }
-                if not text.strip().startswith("{"):
-                    start = text.find("{")
-                    end = text.rfind("}")
-                    if start != -1 and end != -1:
-                        text = text[start:end+1]
-
-                patch_data = json.loads(text.strip())
-                patch_content = patch_data.get("patch_text", "")
-                explanation = patch_data.get("explanation", "")
-                risk = patch_data.get("estimated_risk", "Unknown")
-                
-                if self.logger:
-                    self.logger.info(f"Patch generated. Explanation: {explanation} (Risk: {risk})")
-            except (json.JSONDecodeError, AttributeError, ValueError):
+            if self.logger:
+                self.logger.info(f"Patch generated. Explanation: {explanation} (Risk: {risk})")
+        except StructuredOutputError as e:
+            if not response_text.lstrip().startswith(DIFF_HEADERS):
                 if self.logger:
-                    self.logger.warning("Failed to parse LLM JSON response. Fallback to raw text parsing.")
-                patch_content = response_text
-
-            if not patch_content:
-                 return {
-                    'success': False,
-                    'diff': None,
-                    'reason': "Empty patch content",
-                    'prompt_tokens': prompt_tokens,
-                    'response_tokens': response_tokens
-                }
-
-            if 'CANNOT_FIX_SAFELY' in patch_content:
-                reason = patch_content.split('CANNOT_FIX_SAFELY:', 1)[1].strip() if ':' in patch_content else patch_content
-                return {
-                    'success': False,
-                    'diff': None,
-                    'reason': reason,
-                    'prompt_tokens': prompt_tokens,
-                    'response_tokens': response_tokens
-                }
-            
-            # Extract diff (look for --- and +++ markers) if not already clean
-            if '---' in patch_content and '+++' in patch_content:
-                 return {
-                    'success': True,
-                    'diff': patch_content,
-                    'reason': None,
-                    'prompt_tokens': prompt_tokens,
-                    'response_tokens': response_tokens
-                }
-            else:
+                    self.logger.warning(f"Invalid patch response: {e}")
                 return {
                     'success': False,
                     'diff': None,
-                    'reason': 'LLM did not output valid diff format in JSON',
+                    'reason': f"Invalid patch response: {e}",
                     'prompt_tokens': prompt_tokens,
                     'response_tokens': response_tokens
                 }
-                
-        except Exception as e:
-            # Save error
-            with open(artifacts_dir / 'error.txt', 'w') as f:
-                f.write(f"Error: {str(e)}\n")
-            
+            if self.logger:
+                self.logger.warning("Patch response is a raw diff rather than JSON; using it as is.")
+            patch_content = response_text
+
+        if not patch_content:
+             return {
+                'success': False,
+                'diff': None,
+                'reason': "Empty patch content",
+                'prompt_tokens': prompt_tokens,
+                'response_tokens': response_tokens
+            }
+
+        if 'CANNOT_FIX_SAFELY' in patch_content:
+            reason = patch_content.split('CANNOT_FIX_SAFELY:', 1)[1].strip() if ':' in patch_content else patch_content
             return {
                 'success': False,
                 'diff': None,
-                'reason': f'LLM call failed: {str(e)}',
-                'prompt_tokens': 0,
-                'response_tokens': 0
+                'reason': reason,
+                'prompt_tokens': prompt_tokens,
+                'response_tokens': response_tokens
+            }
+        
+        # Extract diff (look for --- and +++ markers) if not already clean
+        if '---' in patch_content and '+++' in patch_content:
+             return {
+                'success': True,
+                'diff': patch_content,
+                'reason': None,
+                'prompt_tokens': prompt_tokens,
+                'response_tokens': response_tokens
+            }
+        else:
+            return {
+                'success': False,
+                'diff': None,
+                'reason': 'LLM did not output valid diff format in JSON',
+                'prompt_tokens': prompt_tokens,
+                'response_tokens': response_tokens
             }
     
+    def _patch_call_failed(self, error: Exception, artifacts_dir: Path) -> dict:
+        """Save the error and return a failed patch result."""
+        self._save_artifact(artifacts_dir, 'error.txt', f"Error: {str(error)}\n")
+        
+        return {
+            'success': False,
+            'diff': None,
+            'reason': f'LLM call failed: {str(error)}',
+            'prompt_tokens': 0,
+            'response_tokens': 0
+        }
+    
     def _build_patch_prompt(self, issue_text: str, chunks: list, repo_name: str, 
                            issue_number: int, validation_results: str = "None") -> str:
         """Build the patch generation prompt."""
+        return "".join(self._build_patch_prompt_parts(issue_text, chunks, repo_name, issue_number,
+                                                      validation_results))
+    
+    def _build_patch_prompt_parts(self, issue_text: str, chunks: list, repo_name: str,
+                                  issue_number: int, validation_results: str = "None"):
+        """
+        Build the patch prompt as (stable prefix, per-iteration suffix).
+        
+        The prefix is identical across repair iterations of one issue, so the
+        provider's context cache can serve it.
+        """
         
         # Format chunks
         chunks_text = ""
@@ -239,24 +515,28 @@ class GeminiLLM:
             chunks_text += f"```\n{chunk.content}\n```\n"
         
         try:
-            with open("infrastructure/prompts/patchbuilder_json_prompt.txt", "r") as f:
-                prompt_tmpl = f.read()
+            template = PATCH_PROMPTS[self.patch_format]
+            with open(template, "r") as f:
+                prefix_tmpl, suffix_tmpl = split_template(f.read())
                 
-            prompt = prompt_tmpl.format(
+            prefix = prefix_tmpl.format(
                 REPO_URL=repo_name,
                 ISSUE_NUMBER=issue_number,
                 ISSUE_DESCRIPTION=issue_text,
                 CONTEXT_CHUNKS=chunks_text,
-                METRICS="N/A",
+                METRICS="N/A"
+            )
+            suffix = suffix_tmpl.format(
                 EXISTING_PATCH="None",
                 VALIDATION_RESULTS=validation_results
             )
-            return prompt
+            return prefix, suffix
         except Exception as e:
             if self.logger:
                 self.logger.error(f"Failed to load prompt template: {e}")
             # Fallback to hardcoded if file missing
-            return f"Error loading prompt: {e}"
+            return f"Error loading prompt: {e}", ""
+
     def triage_issue(self, issue_title: str, issue_body: str, labels: list) -> dict:
         """
         Analyze an issue to determine suitability for automation.
@@ -270,67 +550,133 @@ class GeminiLLM:
             Dict with triage results (is_suitable, complexity, etc.)
         """
         try:
-            # Load prompt
-            with open("infrastructure/prompts/triage_prompt.txt", "r") as f:
-                prompt_tmpl = f.read()
-                
-            prompt = prompt_tmpl.format(
-                ISSUE_TITLE=issue_title,
-                ISSUE_BODY=issue_body[:2000], # Truncate body to avoid huge context
-                LABELS=", ".join(labels),
-                ISSUE_NUMBER="0" # Placeholder
-            )
+            prompt = self._build_triage_prompt(issue_title, issue_body, labels)
             
-            # Estimate tokens
-            estimated_tokens = len(prompt) // 4
-            self.rate_limiter.wait_if_needed(estimated_tokens, self.logger)
+            estimated_tokens = self.token_counter.count(prompt)
+            response = self._call_model(prompt, estimated_tokens, self._output_config(self.triage_output))
+            return self._parse_triage_response(response.text)
+        except CacheMissError:
+            raise
+        except Exception as e:
+            return self._triage_failed(e)
+    
+    def triage_batch(self, issues: list) -> list:
+        """
+        Triage several issues with a single prompt.
+        
+        Args:
+            issues: Dicts with 'title', 'body' and 'labels'
             
-            # Generate
-            response = self.model.generate_content(prompt)
-            response_text = response.text
+        Returns:
+            One triage dict per issue, or None where the response had no
+            usable verdict for it (callers fall back to ``triage_issue``)
+        """
+        try:
+            prompt = self._build_triage_batch_prompt(issues)
+            response = self._call_model(prompt, self.token_counter.count(prompt),
+                                        self._output_config(self.triage_batch_output))
+            return self._parse_triage_batch_response(response.text, len(issues))
+        except CacheMissError:
+            raise
+        except Exception as e:
+            if self.logger:
+                self.logger.warning(f"Batched triage failed, falling back to single calls: {e}")
+            return [None] * len(issues)
+    
+    def triage_issues(self, issues: list, batch_size: int = 8) -> list:
+        """
+        Triage issues in batches of ``batch_size``, retrying unparsed ones individually.
+        
+        Args:
+            issues: Dicts with 'title', 'body' and 'labels'
+            batch_size: Issues per prompt (1 = one call per issue)
             
-            # Record usage
-            prompt_tokens = response.usage_metadata.prompt_token_count if hasattr(response, 'usage_metadata') else estimated_tokens
-            response_tokens = response.usage_metadata.candidates_token_count if hasattr(response, 'usage_metadata') else 0
-            self.rate_limiter.record_usage(prompt_tokens + response_tokens)
+        Returns:
+            Triage results in the same order as ``issues``
+        """
+        results = [None] * len(issues)
+        if batch_size > 1:
+            for start in range(0, len(issues), batch_size):
+                batch = issues[start:start + batch_size]
+                if len(batch) > 1:
+                    results[start:start + len(batch)] = self.triage_batch(batch)
+        
+        for i, issue in enumerate(issues):
+            if results[i] is None:
+                results[i] = self.triage_issue(issue['title'], issue['body'], issue['labels'])
+        return results
+    
+    def _build_triage_batch_prompt(self, issues: list) -> str:
+        """Build one triage prompt covering several issues."""
+        with open("infrastructure/prompts/triage_batch_prompt.txt", "r") as f:
+            prompt_tmpl = f.read()
+        
+        blocks = []
+        for i, issue in enumerate(issues, 1):
+            blocks.append(
+                f"--- ISSUE {i} ---\n"
+                f"Title: {issue['title']}\n"
+                f"Labels: {', '.join(issue['labels'])}\n"
+                f"Body:\n{(issue['body'] or '')[:2000]}\n"
+            )
+        return prompt_tmpl.format(ISSUE_COUNT=len(issues), ISSUES="\n".join(blocks))
+    
+    def _parse_triage_batch_response(self, response_text: str, count: int) -> list:
+        """Map a JSON array of verdicts back to issue positions (None where missing)."""
+        results = [None] * count
+        output = self.triage_batch_output
+        try:
+            verdicts, fixed = output.load(response_text)
+        except StructuredOutputError as e:
+            if self.logger:
+                self.logger.warning(f"Failed to parse batched triage JSON: {e}")
+            return results
+        if not isinstance(verdicts, list):
+            return results
+        
+        # Verdicts are checked one by one so a bad entry only costs its own single call
+        for verdict in verdicts:
+            verdict, errors = output.check(verdict, output.schema['items'], fixed=fixed)
+            if errors:
+                continue
+            index = verdict['issue_id'] - 1
+            if 0 <= index < count and results[index] is None:
+                results[index] = verdict
+        return results
+    
+    def _build_triage_prompt(self, issue_title: str, issue_body: str, labels: list) -> str:
+        """Build the triage prompt."""
+        with open("infrastructure/prompts/triage_prompt.txt", "r") as f:
+            prompt_tmpl = f.read()
             
-            # Parse JSON
-            try:
-                text = response_text
-                if "```json" in text:
-                    start = text.find("```json") + 7
-                    end = text.find("```", start)
-                    if end != -1:
-                        text = text[start:end]
-                elif "```" in text:
-                    start = text.find("```") + 3
-                    end = text.find("```", start)
-                    if end != -1:
-                        text = text[start:end]
-                
-                if not text.strip().startswith("{"):
-                    start = text.find("{")
-                    end = text.rfind("}")
-                    if start != -1 and end != -1:
-                        text = text[start:end+1]
-                        
-                return json.loads(text.strip())
-            except Exception as e:
-                if self.logger:
-                    self.logger.warning(f"Failed to parse triage JSON: {e}")
-                return {
-                    "is_suitable": False,
-                    "reason": f"Failed to parse LLM response: {e}",
-                    "estimated_complexity_score": "unknown",
-                    "priority_score": 0
-                }
-                
-        except Exception as e:
+        return prompt_tmpl.format(
+            ISSUE_TITLE=issue_title,
+            ISSUE_BODY=issue_body[:2000], # Truncate body to avoid huge context
+            LABELS=", ".join(labels),
+            ISSUE_NUMBER="0" # Placeholder
+        )
+    
+    def _parse_triage_response(self, response_text: str) -> dict:
+        """Parse the JSON triage response."""
+        try:
+            return self.triage_output.parse(response_text)
+        except StructuredOutputError as e:
             if self.logger:
-                self.logger.error(f"Triage failed: {e}")
+                self.logger.warning(f"Failed to parse triage JSON: {e}")
             return {
                 "is_suitable": False,
-                "reason": f"LLM call failed: {e}",
+                "reason": f"Failed to parse LLM response: {e}",
                 "estimated_complexity_score": "unknown",
                 "priority_score": 0
             }
+    
+    def _triage_failed(self, error: Exception) -> dict:
+        """Return a not-suitable triage result for a failed call."""
+        if self.logger:
+            self.logger.error(f"Triage failed: {error}")
+        return {
+            "is_suitable": False,
+            "reason": f"LLM call failed: {error}",
+            "estimated_complexity_score": "unknown",
+            "priority_score": 0
+        }
@@ -0,0 +1,111 @@
+"""Stable-prefix prompt layout and cached-context accounting.
+
+Patch and repair prompts are laid out as a large prefix that does not change
+between repair iterations (instructions, issue, code chunks) followed by an
+``ITERATION INPUT:`` section holding the previous patch and validation output.
+Gemini's implicit context caching bills a repeated prefix at a discount and
+reports it as ``usage_metadata.cached_content_token_count``.
+
+``ContextCache`` accounts for that reuse per run. When the provider reports
+cached tokens they are used as-is; otherwise it models the provider cache
+locally: a prefix resent within ``ttl_seconds`` and at least ``min_tokens``
+long counts as cached. This keeps the savings measurable with the replay
+backend and with models that do not report caching.
+"""
+import hashlib
+import time
+from typing import Dict, Optional, Tuple
+
+from infrastructure.llm_pool.token_counter import TokenCounter, get_token_counter
+
+ITERATION_MARKER = "ITERATION INPUT:"
+
+
+def split_template(template: str) -> Tuple[str, str]:
+    """
+    Split a prompt template into its stable prefix and per-iteration suffix.
+
+    Args:
+        template: Prompt template containing an ``ITERATION INPUT:`` line
+
+    Returns:
+        Tuple of (prefix template, suffix template); the suffix is empty when
+        the template has no iteration section
+    """
+    pos = template.find(ITERATION_MARKER)
+    if pos == -1:
+        return template, ""
+    return template[:pos], template[pos:]
+
+
+class ContextCache:
+    """Per-run accounting of prompt prefixes served from the provider cache."""
+
+    def __init__(self, ttl_seconds: float = 300, min_tokens: int = 1024,
+                 cached_token_discount: float = 0.75, token_counter: Optional[TokenCounter] = None):
+        """
+        Initialize context cache model.
+
+        Args:
+            ttl_seconds: How long a sent prefix stays cached
+            min_tokens: Prefixes shorter than this are never cached
+            cached_token_discount: Fraction of the input price saved on cached tokens
+            token_counter: Counter for prefix sizes (default: process-wide counter)
+        """
+        self.ttl_seconds = ttl_seconds
+        self.min_tokens = min_tokens
+        self.cached_token_discount = cached_token_discount
+        self.token_counter = token_counter or get_token_counter()
+        self._last_sent: Dict[str, float] = {}
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.provider_reported = False
+
+    def record(self, prefix: str, prompt_tokens: int, provider_cached_tokens: int = 0) -> int:
+        """
+        Account one model call whose prompt starts with ``prefix``.
+
+        Args:
+            prefix: Stable prompt prefix
+            prompt_tokens: Prompt tokens billed for the call
+            provider_cached_tokens: ``cached_content_token_count`` reported by the provider
+
+        Returns:
+            Prompt tokens served from the cache
+        """
+        now = time.time()
+        key = hashlib.sha1(prefix.encode("utf-8")).hexdigest()
+        last = self._last_sent.get(key)
+        self._last_sent[key] = now
+
+        if provider_cached_tokens:
+            self.provider_reported = True
+            cached = provider_cached_tokens
+        else:
+            prefix_tokens = self.token_counter.count(prefix)
+            fresh = last is None or now - last > self.ttl_seconds
+            cached = 0 if fresh or prefix_tokens < self.min_tokens else min(prefix_tokens, prompt_tokens)
+
+        self.calls += 1
+        self.prompt_tokens += prompt_tokens
+        self.cached_tokens += cached
+        return cached
+
+    def reset_stats(self):
+        """Start a new run's accounting; prefixes already sent stay cached."""
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.provider_reported = False
+
+    def stats(self) -> Dict[str, float]:
+        """Cached-token savings for the run so far."""
+        return {
+            "calls": self.calls,
+            "prompt_tokens": self.prompt_tokens,
+            "cached_prompt_tokens": self.cached_tokens,
+            "cached_ratio": round(self.cached_tokens / self.prompt_tokens, 3) if self.prompt_tokens else 0.0,
+            "saved_prompt_tokens": int(self.cached_tokens * self.cached_token_discount),
+            "provider_reported": self.provider_reported,
+        }
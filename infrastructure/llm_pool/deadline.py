@@ -0,0 +1,150 @@
+"""Run deadlines, per-call timeouts and hedged requests.
+
+A ``Deadline`` is opened once per run with ``deadline_scope``
+(``run_deadline_seconds`` in config.yml, ``run_e2e.py --deadline``) and read
+by every LLM call made inside it through ``current_deadline``, including
+calls on asyncio tasks, which copy the context. The budget therefore does
+not have to be passed through every prompt builder. Each call gets
+``min(llm_call_timeout_seconds, time left)``:
+
+- a call that runs past its timeout raises ``CallTimeout``, which is retried
+  while the run still has time
+- a call started after the deadline raises ``DeadlineExceeded``, which is not
+
+``HedgePolicy`` tracks recent call latencies. Once a call has been running
+longer than their p95, the provider sends a duplicate request and takes
+whichever answer arrives first, so one slow request does not set the run's
+tail latency.
+"""
+import math
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterator, Optional, Sequence
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a call is started after the run deadline has passed."""
+
+
+class CallTimeout(TimeoutError):
+    """Raised when a single LLM call runs past its timeout."""
+
+
+def quantile(values: Sequence[float], q: float) -> float:
+    """Nearest-rank quantile of ``values`` (0.0 when empty)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+
+class Deadline:
+    """Absolute point in time by which a run must finish."""
+
+    def __init__(self, seconds: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize deadline.
+
+        Args:
+            seconds: Time allowed from now (None = unbounded)
+            clock: Monotonic clock (replaceable in tests)
+        """
+        self.clock = clock
+        self.seconds = seconds
+        self.expires_at = clock() + seconds if seconds is not None else None
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left (negative once passed), or None when unbounded."""
+        return None if self.expires_at is None else self.expires_at - self.clock()
+
+    @property
+    def expired(self) -> bool:
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+    def call_timeout(self, max_timeout: Optional[float] = None) -> Optional[float]:
+        """
+        Timeout for the next call.
+
+        Args:
+            max_timeout: Per-call cap (None = no cap)
+
+        Returns:
+            ``min(max_timeout, remaining)``, or None if both are unbounded
+
+        Raises:
+            DeadlineExceeded: If the deadline has already passed
+        """
+        remaining = self.remaining()
+        if remaining is not None and remaining <= 0:
+            raise DeadlineExceeded(f"Run deadline of {self.seconds:.0f}s exceeded")
+        bounds = [t for t in (remaining, max_timeout) if t is not None]
+        return min(bounds) if bounds else None
+
+    def to_dict(self) -> dict:
+        remaining = self.remaining()
+        return {
+            "seconds": self.seconds,
+            "remaining_seconds": round(remaining, 1) if remaining is not None else None,
+            "expired": self.expired,
+        }
+
+
+_current: ContextVar[Optional[Deadline]] = ContextVar("openfix_deadline", default=None)
+
+
+def current_deadline() -> Deadline:
+    """The deadline of the enclosing ``deadline_scope`` (unbounded outside one)."""
+    return _current.get() or Deadline()
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]) -> Iterator[Deadline]:
+    """
+    Run the enclosed calls under a deadline ``seconds`` from now.
+
+    A nested scope never extends an enclosing one: the earlier of the two
+    expiry times applies.
+    """
+    deadline = Deadline(seconds)
+    outer = _current.get()
+    if outer is not None and outer.expires_at is not None and (
+            deadline.expires_at is None or outer.expires_at < deadline.expires_at):
+        deadline = outer
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+
+class HedgePolicy:
+    """Decides when to send a duplicate request, from recent call latencies."""
+
+    def __init__(self, quantile: float = 0.95, min_samples: int = 20, window: int = 200,
+                 min_delay: float = 1.0):
+        """
+        Initialize hedge policy.
+
+        Args:
+            quantile: Latency quantile after which a call is hedged
+            min_samples: Latencies needed before hedging starts
+            window: Recent latencies kept
+            min_delay: Never hedge earlier than this many seconds
+        """
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.latencies = deque(maxlen=window)
+
+    def observe(self, seconds: float):
+        """Record the latency of a successful call."""
+        self.latencies.append(seconds)
+
+    def delay(self) -> Optional[float]:
+        """Seconds to wait before hedging, or None while there are too few samples."""
+        if len(self.latencies) < self.min_samples:
+            return None
+        return max(self.min_delay, quantile(self.latencies, self.quantile))
@@ -0,0 +1,197 @@
+"""Search/replace edit blocks as a compact patch format.
+
+With ``patch_format: edits`` the model answers with blocks such as::
+
+    FILE: src/app.py
+    <<<<<<< SEARCH
+    return a - b
+    =======
+    return a + b
+    >>>>>>> REPLACE
+
+instead of a unified diff, so it spends no output tokens on context lines
+and hunk headers and cannot get line numbers wrong. OpenFix applies the
+blocks to the checked-out files and renders a canonical unified diff with
+``difflib`` for ``validate_patch.sh``.
+
+A SEARCH text must match exactly one place in the file. If it matches
+nowhere, lines are compared again ignoring trailing whitespace and then
+ignoring indentation (the replacement is re-indented by the same offset).
+An empty SEARCH creates a new file.
+"""
+import difflib
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+_BLOCK = re.compile(
+    r"^FILE:[ \t]*(?P<path>[^\n]+?)[ \t]*\n"
+    r"(?:```[^\n]*\n)?"
+    r"<{5,9} SEARCH[ \t]*\n(?P<search>.*?)"
+    r"^={5,9}[ \t]*\n(?P<replace>.*?)"
+    r"^>{5,9} REPLACE[ \t]*$",
+    re.MULTILINE | re.DOTALL,
+)
+_EXPLANATION = re.compile(r"^EXPLANATION:[ \t]*(.+)$", re.MULTILINE)
+_RISK = re.compile(r"^RISK:[ \t]*(\w+)", re.MULTILINE)
+
+
+class EditBlockError(ValueError):
+    """Raised when edit blocks cannot be parsed or applied."""
+
+
+@dataclass
+class EditBlock:
+    """One search/replace edit to a file."""
+    file_path: str
+    search: str
+    replace: str
+
+
+def parse_edit_blocks(text: str) -> List[EditBlock]:
+    """
+    Extract edit blocks from a model response.
+
+    Args:
+        text: Response text
+
+    Returns:
+        Edit blocks in response order
+
+    Raises:
+        EditBlockError: If the response contains no complete block
+    """
+    blocks = [
+        EditBlock(m.group("path").strip().strip("`"), m.group("search"), m.group("replace"))
+        for m in _BLOCK.finditer(text)
+    ]
+    if not blocks:
+        raise EditBlockError("No complete FILE / SEARCH / REPLACE edit blocks in response")
+    return blocks
+
+
+def parse_summary(text: str) -> Tuple[str, str]:
+    """Return the (explanation, risk) lines of an edit-block response."""
+    explanation = _EXPLANATION.search(text)
+    risk = _RISK.search(text)
+    return (explanation.group(1).strip() if explanation else "",
+            risk.group(1).capitalize() if risk else "Unknown")
+
+
+def _indent(line: str) -> str:
+    return line[:len(line) - len(line.lstrip())]
+
+
+def _find_lines(lines: List[str], search: List[str], key) -> List[int]:
+    """Start indexes where ``search`` matches ``lines`` under a comparison key."""
+    wanted = [key(s) for s in search]
+    return [
+        i for i in range(len(lines) - len(search) + 1)
+        if all(key(lines[i + j]) == wanted[j] for j in range(len(search)))
+    ]
+
+
+def apply_edit(content: str, block: EditBlock) -> str:
+    """
+    Apply one edit block to file content.
+
+    Args:
+        content: Current file content
+        block: Edit to apply
+
+    Returns:
+        New file content
+
+    Raises:
+        EditBlockError: If SEARCH matches nowhere or in more than one place
+    """
+    if not block.search.strip():
+        raise EditBlockError(f"{block.file_path}: empty SEARCH only allowed for new files")
+
+    count = content.count(block.search)
+    if count == 1:
+        return content.replace(block.search, block.replace, 1)
+    if count > 1:
+        raise EditBlockError(f"{block.file_path}: SEARCH text matches {count} places; add surrounding lines")
+
+    # Whitespace-tolerant fallbacks, line by line
+    lines = content.splitlines(keepends=True)
+    search = block.search.splitlines(keepends=True)
+    replace = block.replace.splitlines(keepends=True)
+    for key in (str.rstrip, str.strip):
+        matches = _find_lines(lines, search, key)
+        if len(matches) > 1:
+            raise EditBlockError(f"{block.file_path}: SEARCH text matches {len(matches)} places; "
+                                 "add surrounding lines")
+        if matches:
+            start = matches[0]
+            if key is str.strip:
+                # Shift the replacement by the indentation difference of the first line
+                old, new = _indent(search[0]), _indent(lines[start])
+                replace = [new + line[len(old):] if line.startswith(old) and line.strip() else line
+                           for line in replace]
+            if replace and not replace[-1].endswith("\n") and start + len(search) < len(lines):
+                replace[-1] += "\n"
+            return "".join(lines[:start] + replace + lines[start + len(search):])
+    raise EditBlockError(f"{block.file_path}: SEARCH text not found:\n{block.search[:300]}")
+
+
+def _repo_path(root: Path, raw: str) -> str:
+    """Path relative to the repository, tolerating diff-style ``a/`` and ``b/`` prefixes."""
+    if raw.startswith(("a/", "b/")) and not (root / raw).exists() and (root / raw[2:]).exists():
+        return raw[2:]
+    return raw
+
+
+def edits_to_diff(repo_root: str, blocks: List[EditBlock]) -> str:
+    """
+    Apply edit blocks to a checked-out repository in memory and render a unified diff.
+
+    Args:
+        repo_root: Repository root
+        blocks: Edit blocks (blocks for one file are applied in order)
+
+    Returns:
+        Unified diff with ``a/`` and ``b/`` prefixes, applicable with ``git apply``
+
+    Raises:
+        EditBlockError: On paths outside the repository or edits that do not apply
+    """
+    root = Path(repo_root).resolve()
+    originals: Dict[str, Optional[str]] = {}
+    updated: Dict[str, Optional[str]] = {}
+
+    for block in blocks:
+        path = _repo_path(root, block.file_path)
+        target = (root / path).resolve()
+        if Path(path).is_absolute() or not target.is_relative_to(root):
+            raise EditBlockError(f"Edit touches path outside the repository: {block.file_path}")
+        if path not in updated:
+            originals[path] = target.read_text(encoding="utf-8") if target.is_file() else None
+            updated[path] = originals[path]
+        if updated[path] is None:
+            if block.search.strip():
+                raise EditBlockError(f"{path}: file does not exist")
+            updated[path] = block.replace  # New file
+        else:
+            updated[path] = apply_edit(updated[path], block)
+
+    diff = []
+    for path, new in updated.items():
+        old = originals[path]
+        if old == new:
+            continue
+        diff.append(f"diff --git a/{path} b/{path}\n")
+        if old is None:
+            diff.append("new file mode 100644\n")
+        for line in difflib.unified_diff(
+            (old or "").splitlines(keepends=True), new.splitlines(keepends=True),
+            fromfile=f"a/{path}" if old is not None else "/dev/null",
+            tofile=f"b/{path}"
+        ):
+            # Mark a missing final newline the way diff does
+            diff.append(line if line.endswith("\n") else line + "\n\\ No newline at end of file\n")
+    if not diff:
+        raise EditBlockError("Edit blocks do not change any file")
+    return "".join(diff)
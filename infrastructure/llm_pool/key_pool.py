@@ -0,0 +1,272 @@
+"""Pool of Gemini API keys with per-key rate limits and quarantine.
+
+One key's quota caps throughput no matter how many workers run. With
+several keys (``GEMINI_API_KEYS=key1,key2,...``, typically from different
+projects) ``KeyPool`` acts as a single backend that spreads calls across
+them:
+
+- every key has its own host-wide ``SharedRateLimiter`` bucket
+  (``gemini:<key id>``), and the provider's aggregate limit is scaled by the
+  number of keys
+- each call goes to the least-loaded healthy key: one whose bucket has room
+  for the request, then the fewest calls in flight, then the fewest tokens
+  used in the last minute
+- a 429 / quota error quarantines the key (``key_quarantine_seconds``,
+  doubling on repeated errors up to ``key_quarantine_max_seconds``) and the
+  call fails over to another healthy key
+
+Keys are identified in logs and metrics by a short hash, never by value.
+"""
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from infrastructure.llm_pool.shared_limiter import SharedRateLimiter
+from infrastructure.llm_pool.token_counter import count_tokens
+
+QUOTA_MARKERS = ("429", "RESOURCE_EXHAUSTED", "quota")
+
+
+def api_keys_from_env() -> List[str]:
+    """Keys from ``GEMINI_API_KEYS`` (comma-separated), else ``GEMINI_API_KEY``."""
+    keys = [k.strip() for k in os.getenv("GEMINI_API_KEYS", "").split(",") if k.strip()]
+    if not keys and os.getenv("GEMINI_API_KEY"):
+        keys = [os.getenv("GEMINI_API_KEY")]
+    return list(dict.fromkeys(keys))
+
+
+def key_id(api_key: str) -> str:
+    """Short, stable identifier for a key that is safe to log."""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:8]
+
+
+def is_quota_error(error: Exception) -> bool:
+    """True for 429 / resource-exhausted errors (google.api_core code or message)."""
+    if getattr(error, "code", None) == 429:
+        return True
+    message = str(error)
+    return any(marker in message for marker in QUOTA_MARKERS)
+
+
+@dataclass(eq=False)
+class PooledKey:
+    """One API key with its backend, rate limiter and health."""
+    name: str
+    backend: Any
+    rate_limiter: Any
+    in_flight: int = 0
+    calls: int = 0
+    failures: int = 0
+    quota_errors: int = 0
+    strikes: int = 0  # Consecutive quota errors, for the quarantine backoff
+    quarantined_until: float = 0.0
+
+
+class KeyPool:
+    """Backend that schedules calls across several API keys."""
+
+    def __init__(self, keys: List[PooledKey], quarantine_seconds: float = 60.0,
+                 max_quarantine_seconds: float = 900.0, clock: Callable[[], float] = time.monotonic,
+                 logger=None):
+        """
+        Initialize key pool.
+
+        Args:
+            keys: Pooled keys, each with its own backend and rate limiter
+            quarantine_seconds: Quarantine after a first quota error
+            max_quarantine_seconds: Cap on the doubling quarantine
+            clock: Monotonic clock (replaceable in tests)
+            logger: Optional logger
+        """
+        if not keys:
+            raise ValueError("KeyPool needs at least one key")
+        self.keys = keys
+        self.quarantine_seconds = quarantine_seconds
+        self.max_quarantine_seconds = max_quarantine_seconds
+        self.clock = clock
+        self.logger = logger
+        self.failovers = 0
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        # Forward optional capabilities such as count_tokens to the first key
+        keys = self.__dict__.get("keys")
+        if not keys:
+            raise AttributeError(name)
+        return getattr(keys[0].backend, name)
+
+    @property
+    def supports_timeout(self) -> bool:
+        return all(getattr(k.backend, "supports_timeout", False) for k in self.keys)
+
+    def healthy(self) -> List[PooledKey]:
+        """Keys not in quarantine."""
+        now = self.clock()
+        return [k for k in self.keys if k.quarantined_until <= now]
+
+    def select(self, estimated_tokens: int, exclude: tuple = ()) -> PooledKey:
+        """
+        Pick the least-loaded healthy key and count the call as in flight.
+
+        Args:
+            estimated_tokens: Tokens the request is expected to use
+            exclude: Keys already tried for this request
+
+        Returns:
+            The chosen key (the one leaving quarantine soonest if all are quarantined)
+        """
+        with self._lock:
+            candidates = [k for k in self.healthy() if k not in exclude]
+            if not candidates:
+                others = [k for k in self.keys if k not in exclude] or self.keys
+                candidates = [min(others, key=lambda k: k.quarantined_until)]
+            key = min(candidates, key=lambda k: (
+                k.rate_limiter.compute_wait(estimated_tokens) > 0,
+                k.in_flight,
+                k.rate_limiter.tokens_in_window(),
+                k.calls,
+            ))
+            key.in_flight += 1
+            key.calls += 1
+            return key
+
+    def release(self, key: PooledKey, estimated_tokens: int, error: Optional[Exception] = None, response=None):
+        """Finish a call on a key: settle its reservation and quarantine it after a quota error."""
+        with self._lock:
+            key.in_flight -= 1
+            if error is None:
+                key.strikes = 0
+                usage = getattr(response, "usage_metadata", None)
+                if usage is not None:
+                    estimated_tokens = (usage.prompt_token_count or 0) + (usage.candidates_token_count or 0)
+                key.rate_limiter.record_usage(estimated_tokens)
+                return
+            key.rate_limiter.record_usage(0)  # Rejected requests use no tokens
+            key.failures += 1
+            if not is_quota_error(error):
+                return
+            key.quota_errors += 1
+            key.strikes += 1
+            seconds = min(self.max_quarantine_seconds, self.quarantine_seconds * 2 ** (key.strikes - 1))
+            key.quarantined_until = self.clock() + seconds
+        if self.logger:
+            self.logger.warning(f"API key {key.name} hit its quota; quarantined for {seconds:.0f}s")
+
+    def _should_fail_over(self, error: Exception, tried: List[PooledKey]) -> bool:
+        if not is_quota_error(error) or not [k for k in self.healthy() if k not in tried]:
+            return False
+        self.failovers += 1
+        return True
+
+    def generate_content(self, prompt: str, **kwargs):
+        tokens = count_tokens(prompt)
+        tried = []
+        while True:
+            key = self.select(tokens, tuple(tried))
+            tried.append(key)
+            key.rate_limiter.wait_if_needed(tokens, self.logger)
+            try:
+                response = key.backend.generate_content(prompt, **kwargs)
+            except Exception as e:
+                self.release(key, tokens, e)
+                if self._should_fail_over(e, tried):
+                    continue
+                raise
+            self.release(key, tokens, response=response)
+            return response
+
+    async def generate_content_async(self, prompt: str, **kwargs):
+        tokens = count_tokens(prompt)
+        tried = []
+        while True:
+            key = self.select(tokens, tuple(tried))
+            tried.append(key)
+            while True:
+                wait = key.rate_limiter.acquire(tokens)
+                if wait <= 0:
+                    break
+                key.rate_limiter.record_wait(wait)
+                await asyncio.sleep(wait)
+            try:
+                response = await key.backend.generate_content_async(prompt, **kwargs)
+            except Exception as e:
+                self.release(key, tokens, e)
+                if self._should_fail_over(e, tried):
+                    continue
+                raise
+            self.release(key, tokens, response=response)
+            return response
+
+    def stream_content(self, prompt: str, **kwargs):
+        """Stream from one key; a quota error quarantines it and the provider's retry picks another."""
+        tokens = count_tokens(prompt)
+        key = self.select(tokens)
+        key.rate_limiter.wait_if_needed(tokens, self.logger)
+        last = None
+        try:
+            for chunk in key.backend.stream_content(prompt, **kwargs):
+                last = chunk
+                yield chunk
+        except Exception as e:
+            self.release(key, tokens, e)
+            raise
+        except GeneratorExit:
+            self.release(key, tokens, response=last)
+            raise
+        self.release(key, tokens, response=last)
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-key calls, failures, quota errors and quarantine state."""
+        now = self.clock()
+        return {
+            "keys": {
+                k.name: {
+                    "calls": k.calls,
+                    "failures": k.failures,
+                    "quota_errors": k.quota_errors,
+                    "quarantined_seconds_left": round(max(0.0, k.quarantined_until - now), 1),
+                }
+                for k in self.keys
+            },
+            "healthy_keys": len(self.healthy()),
+            "failovers": self.failovers,
+        }
+
+
+def key_pool_from_config(config: Dict[str, Any], api_keys: List[str],
+                         make_backend: Callable[[str], Any], logger=None) -> KeyPool:
+    """
+    Build a pool over ``api_keys`` from ``config.yml`` settings.
+
+    Args:
+        config: Configuration settings
+        api_keys: API keys to pool
+        make_backend: Builds the backend for one key
+        logger: Optional logger
+
+    Returns:
+        KeyPool whose keys each draw from their own shared limiter bucket
+    """
+    keys = [
+        PooledKey(
+            name=key_id(api_key),
+            backend=make_backend(api_key),
+            rate_limiter=SharedRateLimiter(
+                db_path=config.get('rate_limit_db', 'data/db/ratelimit.db'),
+                tokens_per_minute=config.get('max_tokens_per_minute', 900000),
+                requests_per_minute=config.get('max_llm_calls_per_minute'),
+                bucket=f"gemini:{key_id(api_key)}"
+            )
+        )
+        for api_key in api_keys
+    ]
+    return KeyPool(
+        keys,
+        quarantine_seconds=config.get('key_quarantine_seconds', 60.0),
+        max_quarantine_seconds=config.get('key_quarantine_max_seconds', 900.0),
+        logger=logger
+    )
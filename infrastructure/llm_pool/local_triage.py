@@ -0,0 +1,289 @@
+"""Local CPU triage classifier placed in front of the remote triage tiers.
+
+Triage is a short classification task, so most verdicts do not need a
+remote model. ``LocalTriage`` is a naive Bayes classifier over words of the
+issue title and body plus its label names. It is trained on earlier remote
+verdicts, which discovery appends to ``local_triage_log``::
+
+    python scripts/cli.py train-triage
+
+It returns the same fields as ``GeminiLLM.triage_issue`` plus a
+``confidence``. The priority score is learned from the remote models'
+scores (the expected score under a classifier over 1-10), so locally kept
+verdicts rank on the same scale as remote ones. ``CascadeRouter`` keeps a
+local verdict only when that confidence reaches
+``local_triage_min_confidence`` and its priority score is outside the
+borderline band. Every other issue goes to the remote tiers as before.
+
+The router only calls ``triage_issues(issues)`` and reads ``model_name``,
+so any other CPU backend with that interface can be used instead, for
+example a small quantized model.
+"""
+import json
+import math
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+COMPLEXITIES = ("low", "medium", "high")
+PRIORITY_SCORES = tuple(str(score) for score in range(1, 11))
+
+_WORDS = re.compile(r"[a-z][a-z0-9_]{1,29}")
+
+
+def issue_features(title: str, body: str, labels: Sequence[str] = ()) -> List[str]:
+    """
+    Distinct feature tokens of an issue.
+
+    Args:
+        title: Issue title
+        body: Issue body (only the first 2000 characters are used, as in the triage prompt)
+        labels: Issue label names
+
+    Returns:
+        Title words (prefixed "t:"), body words and "label:<name>" tokens
+    """
+    features = {f"t:{w}" for w in _WORDS.findall((title or "").lower())}
+    features.update(_WORDS.findall((body or "")[:2000].lower()))
+    features.update(f"label:{label.lower()}" for label in labels)
+    return sorted(features)
+
+
+class NaiveBayes:
+    """Multinomial naive Bayes over binary token features with Laplace smoothing."""
+
+    def __init__(self, classes: Sequence[str], alpha: float = 1.0):
+        self.classes = list(classes)
+        self.alpha = alpha
+        self.docs = {c: 0 for c in self.classes}
+        self.token_totals = {c: 0 for c in self.classes}
+        self.counts: Dict[str, Dict[str, int]] = {c: {} for c in self.classes}
+        self.vocabulary = set()
+
+    def add(self, features: Iterable[str], label: str):
+        """Count one training example."""
+        counts = self.counts[label]
+        self.docs[label] += 1
+        for token in features:
+            counts[token] = counts.get(token, 0) + 1
+            self.token_totals[label] += 1
+            self.vocabulary.add(token)
+
+    @property
+    def examples(self) -> int:
+        return sum(self.docs.values())
+
+    def predict_proba(self, features: Iterable[str]) -> Dict[str, float]:
+        """Posterior probability of every class (uniform before any training)."""
+        if not self.examples:
+            return {c: 1.0 / len(self.classes) for c in self.classes}
+        features = [t for t in features if t in self.vocabulary]
+        vocab = len(self.vocabulary)
+        scores = {}
+        for c in self.classes:
+            denominator = math.log(self.token_totals[c] + self.alpha * vocab)
+            score = math.log((self.docs[c] + self.alpha) / (self.examples + self.alpha * len(self.classes)))
+            for token in features:
+                score += math.log(self.counts[c].get(token, 0) + self.alpha) - denominator
+            scores[c] = score
+        top = max(scores.values())
+        weights = {c: math.exp(s - top) for c, s in scores.items()}
+        total = sum(weights.values())
+        return {c: w / total for c, w in weights.items()}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"classes": self.classes, "alpha": self.alpha, "docs": self.docs, "counts": self.counts}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "NaiveBayes":
+        model = cls(data["classes"], alpha=data.get("alpha", 1.0))
+        for c in model.classes:
+            model.docs[c] = data["docs"].get(c, 0)
+            model.counts[c] = dict(data["counts"].get(c, {}))
+            model.token_totals[c] = sum(model.counts[c].values())
+            model.vocabulary.update(model.counts[c])
+        return model
+
+
+def _verdict(example: Dict[str, Any]) -> Dict[str, Any]:
+    # Log entries nest the verdict; hand-labelled examples may be flat
+    return example.get("verdict") or example
+
+
+class LocalTriage:
+    """Naive Bayes triage returning ``triage_issue`` fields plus a confidence."""
+
+    model_name = "local-naive-bayes"
+
+    def __init__(self, suitability: Optional[NaiveBayes] = None, complexity: Optional[NaiveBayes] = None,
+                 priority: Optional[NaiveBayes] = None, min_confidence: float = 0.9, min_examples: int = 50):
+        """
+        Initialize local triage.
+
+        Args:
+            suitability: Classifier over "suitable" / "unsuitable"
+            complexity: Classifier over "low" / "medium" / "high"
+            priority: Classifier over remote priority scores "1" to "10"
+            min_confidence: Suitability probability a verdict needs to be kept locally
+            min_examples: Training examples needed before any verdict is trusted
+        """
+        self.suitability = suitability or NaiveBayes(("suitable", "unsuitable"))
+        self.complexity = complexity or NaiveBayes(COMPLEXITIES)
+        self.priority = priority or NaiveBayes(PRIORITY_SCORES)
+        self.min_confidence = min_confidence
+        self.min_examples = min_examples
+
+    @property
+    def examples(self) -> int:
+        return self.suitability.examples
+
+    def fit(self, examples: Iterable[Dict[str, Any]]) -> "LocalTriage":
+        """
+        Train on labelled issues.
+
+        Args:
+            examples: Dicts with 'title', 'body', 'labels' and the verdict fields
+                ('is_suitable', 'estimated_complexity_score', 'priority_score'), flat or
+                under 'verdict'
+
+        Returns:
+            self
+        """
+        for example in examples:
+            verdict = _verdict(example)
+            if not isinstance(verdict.get("is_suitable"), bool):
+                continue
+            features = issue_features(example.get("title", ""), example.get("body", ""),
+                                      example.get("labels", []))
+            self.suitability.add(features, "suitable" if verdict["is_suitable"] else "unsuitable")
+            complexity = str(verdict.get("estimated_complexity_score", "")).lower()
+            if complexity in COMPLEXITIES:
+                self.complexity.add(features, complexity)
+            try:
+                priority = str(round(float(verdict.get("priority_score"))))
+            except (TypeError, ValueError):
+                continue
+            if priority in PRIORITY_SCORES:
+                self.priority.add(features, priority)
+        return self
+
+    def trusted(self, verdict: Dict[str, Any]) -> bool:
+        """True when a local verdict may stand without a remote call."""
+        return (self.examples >= self.min_examples and verdict.get("priority_score") is not None
+                and verdict.get("confidence", 0.0) >= self.min_confidence)
+
+    def triage_issue(self, issue_title: str, issue_body: str, labels: list) -> dict:
+        """
+        Classify an issue on the CPU.
+
+        Args:
+            issue_title: Issue title
+            issue_body: Issue body
+            labels: List of label names
+
+        Returns:
+            Dict with is_suitable, priority_score, estimated_complexity_score,
+            reason, suggested_labels and confidence (0.5-1.0); priority_score is
+            None when no remote scores have been learned
+        """
+        features = issue_features(issue_title, issue_body, labels)
+        p_suitable = self.suitability.predict_proba(features)["suitable"]
+        complexity = self.complexity.predict_proba(features)
+        is_suitable = p_suitable >= 0.5
+        priority = None
+        if self.priority.examples:
+            scores = self.priority.predict_proba(features)
+            priority = round(sum(int(score) * p for score, p in scores.items()))
+        return {
+            "is_suitable": is_suitable,
+            "reason": f"Local classifier: {max(p_suitable, 1 - p_suitable):.0%} "
+                      f"{'suitable' if is_suitable else 'unsuitable'} ({self.examples} training issues)",
+            "estimated_complexity_score": max(COMPLEXITIES, key=lambda c: complexity[c]),
+            "priority_score": priority,
+            "suggested_labels": [],
+            "confidence": round(max(p_suitable, 1 - p_suitable), 4),
+        }
+
+    def triage_issues(self, issues: list) -> list:
+        """``triage_issue`` for dicts with 'title', 'body' and 'labels', in order."""
+        return [self.triage_issue(i["title"], i["body"] or "", i["labels"]) for i in issues]
+
+    def save(self, path: str):
+        """Write the model as JSON."""
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({
+                "suitability": self.suitability.to_dict(),
+                "complexity": self.complexity.to_dict(),
+                "priority": self.priority.to_dict(),
+                "trained_at": datetime.utcnow().isoformat(),
+            }, f)
+
+    @classmethod
+    def load(cls, path: str, **kwargs) -> "LocalTriage":
+        """Read a model written by ``save``; ``kwargs`` go to ``__init__``."""
+        with open(path) as f:
+            data = json.load(f)
+        # Models saved before priority was learned have none; their verdicts all go remote
+        priority = NaiveBayes.from_dict(data["priority"]) if "priority" in data else None
+        return cls(NaiveBayes.from_dict(data["suitability"]), NaiveBayes.from_dict(data["complexity"]),
+                   priority, **kwargs)
+
+
+def log_verdicts(path: str, issues: list, results: list):
+    """
+    Append remote triage verdicts to the training log (JSONL).
+
+    Local verdicts and failed or unparsed ones are skipped, so the
+    classifier only learns from the remote models.
+    """
+    entries = [
+        {"title": issue["title"], "body": (issue["body"] or "")[:2000], "labels": issue["labels"],
+         "verdict": {k: v for k, v in result.items() if k != "routed_tier"}}
+        for issue, result in zip(issues, results)
+        if result and result.get("routed_tier") != "local" and isinstance(result.get("is_suitable"), bool)
+        and result.get("estimated_complexity_score") != "unknown"
+    ]
+    if not entries:
+        return
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a") as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + "\n")
+
+
+def train_from_log(log_path: str, model_path: str) -> LocalTriage:
+    """
+    Train a model on a verdict log and save it.
+
+    Args:
+        log_path: JSONL written by ``log_verdicts``
+        model_path: Where to write the model
+
+    Returns:
+        The trained model
+    """
+    with open(log_path) as f:
+        model = LocalTriage().fit(json.loads(line) for line in f if line.strip())
+    model.save(model_path)
+    return model
+
+
+def local_triage_from_config(config: Dict[str, Any]) -> Optional[LocalTriage]:
+    """
+    Load the local triage model for ``config.yml`` settings.
+
+    Returns:
+        LocalTriage, or None when ``local_triage`` is disabled or no model has been trained yet
+    """
+    if not config.get('local_triage', True):
+        return None
+    path = config.get('local_triage_model', 'data/models/triage_nb.json')
+    if not Path(path).exists():
+        return None
+    return LocalTriage.load(
+        path,
+        min_confidence=config.get('local_triage_min_confidence', 0.9),
+        min_examples=config.get('local_triage_min_examples', 50)
+    )
@@ -0,0 +1,559 @@
+"""Unified LLM provider shared by every agent.
+
+``LLMProvider`` owns everything between a finished prompt and a parsed
+response: the pooled model handle (backend), the response cache, the rate
+limiter, token counting, and retries with jittered exponential backoff on
+429/5xx. ``GeminiLLM`` (solver, discovery) and ``LLMClient`` (repair
+orchestrator) only build prompts and parse responses, and delegate calls to
+a provider. ``get_provider`` pools providers per model and generation config
+so handles are created once per process.
+
+Retries use "full jitter" (a uniform delay up to the exponential cap) and a
+retry budget shared by all calls on the provider, so a provider outage fails
+fast instead of multiplying traffic. The budget is a token bucket refilled by
+a fraction of every call, so long-lived workers keep retrying transient errors
+while retries stay a bounded share of traffic. Every attempt, retries
+included, reserves its tokens with the rate limiter.
+
+Every attempt is bounded by the run deadline (see ``deadline.py``) and
+``llm_call_timeout_seconds``, and with ``llm_hedge`` (off by default) a
+duplicate request is sent once an attempt outlives the recent p95 latency.
+The duplicate takes its own rate limiter reservation and is skipped when the
+limiter has no room; the losing request's tokens are recorded too.
+"""
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from infrastructure.llm_pool.backends import backend_from_config
+from infrastructure.llm_pool.deadline import CallTimeout, HedgePolicy, current_deadline, quantile
+from infrastructure.llm_pool.response_cache import LLMResponse, cache_key, response_cache_from_config
+from infrastructure.llm_pool.shared_limiter import rate_limiter_from_config
+from infrastructure.llm_pool.token_counter import TokenCounter
+
+RETRYABLE_CODES = {429, 500, 502, 503, 504}
+_STATUS_IN_MESSAGE = re.compile(r"\b(429|500|502|503|504)\b")
+
+
+def is_retryable(error: Exception) -> bool:
+    """True for timeouts, rate-limit and server errors (google.api_core codes or status in the message)."""
+    if isinstance(error, CallTimeout):
+        return True
+    code = getattr(error, "code", None)
+    if isinstance(code, int):
+        return code in RETRYABLE_CODES
+    return bool(_STATUS_IN_MESSAGE.search(str(error)))
+
+
+class RetryPolicy:
+    """Jittered exponential backoff with a per-call limit and a shared, refilling retry budget."""
+
+    def __init__(self, max_retries: int = 4, base_delay: float = 1.0, max_delay: float = 30.0,
+                 retry_budget: int = 20, retry_ratio: float = 0.1, seed: Optional[int] = None,
+                 sleep: Callable[[float], None] = time.sleep):
+        """
+        Initialize retry policy.
+
+        Args:
+            max_retries: Retries allowed for a single call
+            base_delay: Backoff cap for the first retry, in seconds
+            max_delay: Upper bound on any backoff
+            retry_budget: Retries the shared budget holds at most (bucket capacity)
+            retry_ratio: Retries earned back per call, i.e. the long-run share of
+                calls that may be retried
+            seed: Seed for the jitter
+            sleep: Sleep function (replaceable in tests)
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_budget = retry_budget
+        self.retry_ratio = retry_ratio
+        self.budget = float(retry_budget)
+        self.rng = random.Random(seed)
+        self.sleep = sleep
+        self.retries = 0
+
+    def backoff(self, attempt: int) -> float:
+        return self.rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def should_retry(self, error: Exception, attempt: int, delay: float = 0.0) -> bool:
+        remaining = current_deadline().remaining()
+        if remaining is not None and delay >= remaining:
+            return False  # The retry could not start before the run deadline
+        return attempt < self.max_retries and self.budget >= 1 and is_retryable(error)
+
+    def _start_call(self):
+        self.budget = min(self.retry_budget, self.budget + self.retry_ratio)
+
+    def _spend(self):
+        self.budget -= 1
+        self.retries += 1
+
+    def call(self, fn: Callable[[], Any], logger=None):
+        """Run ``fn`` and retry retryable failures."""
+        self._start_call()
+        attempt = 0
+        while True:
+            try:
+                return fn()
+            except Exception as e:
+                delay = self.backoff(attempt)
+                if not self.should_retry(e, attempt, delay):
+                    raise
+                self._spend()
+                attempt += 1
+                if logger:
+                    logger.warning(f"LLM call failed ({e}); retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                self.sleep(delay)
+
+    async def call_async(self, fn: Callable[[], Any], logger=None):
+        """Async version of ``call``; ``fn`` returns an awaitable."""
+        self._start_call()
+        attempt = 0
+        while True:
+            try:
+                return await fn()
+            except Exception as e:
+                delay = self.backoff(attempt)
+                if not self.should_retry(e, attempt, delay):
+                    raise
+                self._spend()
+                attempt += 1
+                if logger:
+                    logger.warning(f"LLM call failed ({e}); retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+
+class LLMProvider:
+    """Pooled model handle with response cache, rate limiting, retries and call metrics."""
+
+    def __init__(self, model_name: str = "gemini-3-pro-preview", generation_config: Optional[Dict[str, Any]] = None,
+                 backend=None, rate_limiter=None, response_cache=None, token_counter=None,
+                 retry_policy: Optional[RetryPolicy] = None, call_timeout: Optional[float] = None,
+                 hedge: Optional[HedgePolicy] = None, logger=None):
+        """
+        Initialize provider.
+
+        Args:
+            model_name: Model name
+            generation_config: Optional generation config (part of the cache key)
+            backend: Model backend (default: chosen by OPENFIX_LLM_BACKEND)
+            rate_limiter: RateLimiter or SharedRateLimiter (default: host-wide shared limiter)
+            response_cache: ResponseCache (default: read_write cache under data/cache)
+            token_counter: TokenCounter (default: calibrated from responses)
+            retry_policy: RetryPolicy (default: 4 retries per call, budget of 20 refilled
+                at 0.1 per call)
+            call_timeout: Seconds allowed per attempt, further capped by the run deadline
+                (None = only the deadline)
+            hedge: HedgePolicy for duplicate requests on slow calls (None = no hedging)
+            logger: Optional logger
+        """
+        self.model_name = model_name
+        self.generation_config = generation_config
+        self.model = backend or backend_from_config({}, model_name, generation_config)
+        self.rate_limiter = rate_limiter or rate_limiter_from_config({})
+        self.response_cache = response_cache or response_cache_from_config({})
+        self.token_counter = token_counter or TokenCounter(count_fn=getattr(self.model, 'count_tokens', None))
+        self.retry = retry_policy or RetryPolicy()
+        self.call_timeout = call_timeout
+        self.hedge = hedge
+        self.logger = logger
+        self.calls = 0
+        self.cache_hits = 0
+        self.failures = 0
+        self.prompt_tokens = 0
+        self.response_tokens = 0
+        self.latencies_ms = []
+        self.timeouts = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.hedges_skipped = 0
+
+    def _call_kwargs(self, generation_config: Optional[Dict[str, Any]],
+                     timeout: Optional[float] = None) -> Dict[str, Any]:
+        # Backends without per-call config (test doubles) are called with the prompt only
+        kwargs = {"generation_config": generation_config} if generation_config else {}
+        if timeout is not None and getattr(self.model, "supports_timeout", False):
+            kwargs["timeout"] = timeout
+        return kwargs
+
+    def _timeout_error(self, timeout: float) -> CallTimeout:
+        self.timeouts += 1
+        return CallTimeout(f"LLM call to {self.model_name} exceeded its {timeout:.1f}s timeout")
+
+    @staticmethod
+    def _submit(call: Callable[[Optional[float]], Any], timeout: Optional[float]) -> Future:
+        """Run ``call(timeout)`` on a daemon thread, so an abandoned call cannot block exit."""
+        future = Future()
+
+        def run():
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(call(timeout))
+                except BaseException as e:
+                    future.set_exception(e)
+        threading.Thread(target=run, name="llm-call", daemon=True).start()
+        return future
+
+    def _reserve(self, estimated_tokens: int):
+        """Reserve tokens (and a request slot) for one attempt."""
+        self.rate_limiter.wait_if_needed(estimated_tokens, self.logger)
+
+    async def _reserve_async(self, estimated_tokens: int):
+        """Async version of ``_reserve`` that sleeps without blocking the event loop."""
+        while True:
+            wait = self.rate_limiter.acquire(estimated_tokens)
+            if wait <= 0:
+                return
+            if self.logger:
+                self.logger.info(f"⏱️  Rate limit approaching, waiting {wait:.1f}s")
+            self.rate_limiter.record_wait(wait)
+            await asyncio.sleep(wait)
+
+    def _discard(self, request, estimated_tokens: int):
+        """Settle the reservation of a request whose response is not used (failed, or lost a hedge)."""
+        if request.cancelled():
+            tokens = estimated_tokens  # The prompt was sent; what it produced is unknown
+            self.prompt_tokens += tokens
+        elif request.exception() is not None:
+            tokens = 0
+        else:
+            prompt_tokens, response_tokens = self.usage(request.result(), estimated_tokens)
+            self.prompt_tokens += prompt_tokens
+            self.response_tokens += response_tokens
+            tokens = prompt_tokens + response_tokens
+        self.rate_limiter.record_usage(tokens)
+
+    def _reserve_hedge(self, estimated_tokens: int, hedge_after: float) -> bool:
+        """Reserve a hedged request with the rate limiter; no hedge is sent without room."""
+        if self.rate_limiter.acquire(estimated_tokens) > 0:
+            self.hedges_skipped += 1
+            if self.logger:
+                self.logger.info(f"LLM call slower than p95 ({hedge_after:.1f}s); no rate limit room to hedge")
+            return False
+        self.hedged += 1
+        if self.logger:
+            self.logger.info(f"LLM call slower than p95 ({hedge_after:.1f}s); sending a hedged request")
+        return True
+
+    def _attempt(self, call: Callable[[Optional[float]], Any], estimated_tokens: int = 0):
+        """
+        Run one attempt of ``call(timeout)`` within its timeout, hedging slow calls.
+
+        The wait is enforced here so any backend is bounded; backends that
+        accept a ``timeout`` also get it so the abandoned request ends too.
+        The caller reserves ``estimated_tokens`` for the first request and a
+        hedge reserves its own. Every reservation except the returned
+        response's (settled by ``complete``) is settled here; requests left
+        running are settled when they finish.
+        """
+        timeout = current_deadline().call_timeout(self.call_timeout)
+        hedge_after = self.hedge.delay() if self.hedge else None
+        start = time.perf_counter()
+        if timeout is None and hedge_after is None:
+            try:
+                response = call(None)
+            except Exception:
+                self.rate_limiter.record_usage(0)
+                raise
+            if self.hedge:
+                self.hedge.observe(time.perf_counter() - start)
+            return response
+
+        primary = self._submit(call, timeout)
+        pending = {primary}
+        hedged = False
+        error = None
+        try:
+            while pending:
+                elapsed = time.perf_counter() - start
+                left = None if timeout is None else timeout - elapsed
+                wait_for = left
+                if not hedged and hedge_after is not None and (left is None or hedge_after - elapsed < left):
+                    wait_for = max(0.0, hedge_after - elapsed)
+                done, pending = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+                winner = next((f for f in done if f.exception() is None), None)
+                for future in done:
+                    if future is not winner:
+                        error = error or future.exception()
+                        self._discard(future, estimated_tokens)
+                if winner is not None:
+                    if winner is not primary:
+                        self.hedge_wins += 1
+                    if self.hedge:
+                        self.hedge.observe(time.perf_counter() - start)
+                    return winner.result()
+                if not done and not hedged and hedge_after is not None and (
+                        left is None or time.perf_counter() - start < timeout):
+                    hedged = True
+                    if self._reserve_hedge(estimated_tokens, hedge_after):
+                        pending.add(self._submit(call, left))
+                elif not done:
+                    raise self._timeout_error(timeout)
+            raise error
+        finally:
+            # A thread cannot be cancelled; its request is settled when it ends
+            for future in pending:
+                future.add_done_callback(lambda f: self._discard(f, estimated_tokens))
+
+    async def _attempt_async(self, call: Callable[[Optional[float]], Any], estimated_tokens: int = 0):
+        """Async version of ``_attempt``; ``call(timeout)`` returns an awaitable and losers are cancelled."""
+        timeout = current_deadline().call_timeout(self.call_timeout)
+        hedge_after = self.hedge.delay() if self.hedge else None
+        start = time.perf_counter()
+        primary = asyncio.ensure_future(call(timeout))
+        pending = {primary}
+        hedged = False
+        error = None
+        try:
+            while pending:
+                elapsed = time.perf_counter() - start
+                left = None if timeout is None else timeout - elapsed
+                wait_for = left
+                if not hedged and hedge_after is not None and (left is None or hedge_after - elapsed < left):
+                    wait_for = max(0.0, hedge_after - elapsed)
+                done, pending = await asyncio.wait(pending, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((t for t in done if t.exception() is None), None)
+                for task in done:
+                    if task is not winner:
+                        error = error or task.exception()
+                        self._discard(task, estimated_tokens)
+                if winner is not None:
+                    if winner is not primary:
+                        self.hedge_wins += 1
+                    if self.hedge:
+                        self.hedge.observe(time.perf_counter() - start)
+                    return winner.result()
+                if not done and not hedged and hedge_after is not None and (
+                        left is None or time.perf_counter() - start < timeout):
+                    hedged = True
+                    if self._reserve_hedge(estimated_tokens, hedge_after):
+                        pending.add(asyncio.ensure_future(call(left)))
+                elif not done:
+                    raise self._timeout_error(timeout)
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+                # Settled at the estimate: the prompt was sent, the output is unknown
+                self.prompt_tokens += estimated_tokens
+                self.rate_limiter.record_usage(estimated_tokens)
+
+    def lookup(self, prompt: str,
+               generation_config: Optional[Dict[str, Any]] = None) -> Tuple[str, Optional[LLMResponse]]:
+        """
+        Consult the response cache before calling the model.
+
+        Args:
+            prompt: Full prompt text
+            generation_config: Per-call config merged over the provider's (part of the key)
+
+        Returns:
+            Tuple of (cache key, cached LLMResponse or None)
+
+        Raises:
+            CacheMissError: On a miss in replay mode
+        """
+        if generation_config:
+            generation_config = {**(self.generation_config or {}), **generation_config}
+        key = cache_key(self.model_name, generation_config or self.generation_config, prompt)
+        cached = self.response_cache.get(key)
+        if cached:
+            self.cache_hits += 1
+            if self.logger:
+                self.logger.info(f"✓ LLM response served from cache ({key[:12]})")
+        return key, cached
+
+    def usage(self, response, estimated_tokens: int) -> Tuple[int, int]:
+        """Extract (prompt_tokens, response_tokens) from a response."""
+        usage = getattr(response, 'usage_metadata', None)
+        if usage is None:
+            return estimated_tokens, self.token_counter.count(response.text)
+        return usage.prompt_token_count, usage.candidates_token_count or self.token_counter.count(response.text)
+
+    def complete(self, key: str, prompt: str, response, estimated_tokens: int,
+                 store: bool = True) -> LLMResponse:
+        """Record usage for a fresh model response and store it in the cache."""
+        prompt_tokens, response_tokens = self.usage(response, estimated_tokens)
+        self.rate_limiter.record_usage(prompt_tokens + response_tokens)
+        self.prompt_tokens += prompt_tokens
+        self.response_tokens += response_tokens
+        usage = getattr(response, 'usage_metadata', None)
+        if usage is not None:
+            self.token_counter.observe(prompt, prompt_tokens)
+        result = LLMResponse(text=response.text, prompt_tokens=prompt_tokens, response_tokens=response_tokens,
+                             context_cached_tokens=getattr(usage, 'cached_content_token_count', 0) or 0)
+        if store:
+            self.response_cache.put(key, self.model_name, result)
+        return result
+
+    def _timed(self, fn: Callable[[], Any]):
+        start = time.perf_counter()
+        self.calls += 1
+        try:
+            return self.retry.call(fn, self.logger)
+        except Exception:
+            self.failures += 1
+            raise
+        finally:
+            self.latencies_ms.append((time.perf_counter() - start) * 1000)
+
+    async def _timed_async(self, fn: Callable[[], Any]):
+        start = time.perf_counter()
+        self.calls += 1
+        try:
+            return await self.retry.call_async(fn, self.logger)
+        except Exception:
+            self.failures += 1
+            raise
+        finally:
+            self.latencies_ms.append((time.perf_counter() - start) * 1000)
+
+    def generate(self, prompt: str, estimated_tokens: Optional[int] = None,
+                 generation_config: Optional[Dict[str, Any]] = None) -> LLMResponse:
+        """
+        Send a prompt through the response cache, rate limiter and retry policy.
+
+        Args:
+            prompt: Full prompt text
+            estimated_tokens: Tokens reserved with the rate limiter (default: counted)
+            generation_config: Per-call config merged over the provider's, e.g. a
+                structured-output response schema
+
+        Returns:
+            LLMResponse (``cached`` is True when no API call was made)
+        """
+        key, cached = self.lookup(prompt, generation_config)
+        if cached:
+            return cached
+        if estimated_tokens is None:
+            estimated_tokens = self.token_counter.count(prompt)
+
+        def attempt():
+            # Every attempt waits for its own reservation, so retries after a 429 respect the limit
+            self._reserve(estimated_tokens)
+            return self._attempt(
+                lambda timeout: self.model.generate_content(prompt, **self._call_kwargs(generation_config, timeout)),
+                estimated_tokens
+            )
+        response = self._timed(attempt)
+        return self.complete(key, prompt, response, estimated_tokens)
+
+    async def generate_async(self, prompt: str, estimated_tokens: int, key: str,
+                             generation_config: Optional[Dict[str, Any]] = None,
+                             reserve: Optional[Callable[[int], Awaitable[None]]] = None):
+        """
+        Send an uncached prompt asynchronously.
+
+        Args:
+            prompt: Full prompt text
+            estimated_tokens: Tokens reserved with the rate limiter before each attempt
+            key: Response cache key from ``lookup``
+            generation_config: Per-call config merged over the provider's
+            reserve: Coroutine function reserving tokens for an attempt (default: ``_reserve_async``)
+        """
+        reserve = reserve or self._reserve_async
+
+        async def attempt():
+            await reserve(estimated_tokens)
+            return await self._attempt_async(
+                lambda timeout: self.model.generate_content_async(prompt, **self._call_kwargs(generation_config, timeout)),
+                estimated_tokens
+            )
+        response = await self._timed_async(attempt)
+        return self.complete(key, prompt, response, estimated_tokens)
+
+    def open_stream(self, prompt: str, estimated_tokens: int, generation_config: Optional[Dict[str, Any]] = None):
+        """
+        Start a streaming request, retrying failures before the first chunk arrives.
+
+        Each attempt reserves ``estimated_tokens`` with the rate limiter. The
+        backend gets the attempt's timeout when it accepts one; the caller
+        checks the run deadline between chunks.
+
+        Returns:
+            Tuple of (stream generator, first chunk or None)
+        """
+        def start():
+            self._reserve(estimated_tokens)
+            timeout = current_deadline().call_timeout(self.call_timeout)
+            try:
+                stream = self.model.stream_content(prompt, **self._call_kwargs(generation_config, timeout))
+                try:
+                    return stream, next(stream)
+                except StopIteration:
+                    return stream, None
+            except Exception:
+                self.rate_limiter.record_usage(0)
+                raise
+        return self._timed(start)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Per-provider call, tail latency, timeout, hedging and retry metrics."""
+        latencies = self.latencies_ms
+        metrics = {
+            "llm_calls": self.calls,
+            "llm_cache_hits": self.cache_hits,
+            "llm_retries": self.retry.retries,
+            "llm_failures": self.failures,
+            "llm_prompt_tokens": self.prompt_tokens,
+            "llm_response_tokens": self.response_tokens,
+            "llm_retry_budget_left": int(self.retry.budget),
+            "llm_latency_ms_avg": round(sum(latencies) / len(latencies), 1) if latencies else 0.0,
+            "llm_latency_ms_p50": round(quantile(latencies, 0.50), 1),
+            "llm_latency_ms_p95": round(quantile(latencies, 0.95), 1),
+            "llm_latency_ms_p99": round(quantile(latencies, 0.99), 1),
+            "llm_latency_ms_max": round(max(latencies), 1) if latencies else 0.0,
+            "llm_timeouts": self.timeouts,
+            "llm_hedged": self.hedged,
+            "llm_hedge_wins": self.hedge_wins,
+            "llm_hedges_skipped": self.hedges_skipped,
+        }
+        if getattr(self.model, "keys", None):
+            metrics["llm_key_pool"] = self.model.stats()
+        return metrics
+
+
+_providers: Dict[Tuple[str, str], LLMProvider] = {}
+
+
+def get_provider(model_name: str, generation_config: Optional[Dict[str, Any]] = None,
+                 config: Optional[Dict[str, Any]] = None, logger=None) -> LLMProvider:
+    """
+    Return the process-wide provider for a model and generation config.
+
+    ``config`` (``config.yml`` settings) is only used when the provider is
+    first created.
+    """
+    pool_key = (model_name, json.dumps(generation_config or {}, sort_keys=True, default=str))
+    provider = _providers.get(pool_key)
+    if provider is None:
+        config = config or {}
+        backend = backend_from_config(config, model_name, generation_config)
+        provider = LLMProvider(
+            model_name=model_name,
+            generation_config=generation_config,
+            backend=backend,
+            rate_limiter=rate_limiter_from_config(config, keys=len(getattr(backend, 'keys', ())) or 1),
+            response_cache=response_cache_from_config(config),
+            retry_policy=RetryPolicy(
+                max_retries=config.get('llm_max_retries', 4),
+                base_delay=config.get('llm_retry_base_delay', 1.0),
+                retry_budget=config.get('llm_retry_budget', 20),
+                retry_ratio=config.get('llm_retry_ratio', 0.1)
+            ),
+            call_timeout=config.get('llm_call_timeout_seconds'),
+            hedge=HedgePolicy(
+                quantile=config.get('llm_hedge_quantile', 0.95),
+                min_samples=config.get('llm_hedge_min_samples', 20)
+            ) if config.get('llm_hedge', False) else None,
+            logger=logger
+        )
+        _providers[pool_key] = provider
+    return provider
@@ -0,0 +1,167 @@
+"""Persistent prompt -> response cache for LLM calls.
+
+Responses are content-addressed by the hash of (model, generation config,
+prompt) and kept in SQLite with a TTL and an LRU size limit. Re-running the
+same issue or the same nightly triage prompt is then free.
+
+Modes:
+    off         - never read or write
+    read_write  - serve hits, store misses (default)
+    replay      - serve hits only; a miss raises ``CacheMissError`` so
+                  benchmark runs are fully deterministic
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+MODES = ("off", "read_write", "replay")
+
+
+class CacheMissError(RuntimeError):
+    """Raised in replay mode when a prompt has no cached response."""
+
+
+@dataclass
+class LLMResponse:
+    text: str
+    prompt_tokens: int
+    response_tokens: int
+    cached: bool = False
+    context_cached_tokens: int = 0  # Prompt tokens the provider served from its context cache
+
+
+def cache_key(model: str, generation_config: Optional[Dict[str, Any]], prompt: str) -> str:
+    """Return the content address of a request."""
+    payload = json.dumps(
+        {"model": model, "config": generation_config or {}, "prompt": prompt},
+        sort_keys=True, default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """SQLite response cache with TTL and LRU eviction."""
+
+    def __init__(self, db_path: str = "data/cache/llm_responses.db", ttl_seconds: float = 7 * 86400,
+                 max_entries: int = 5000, mode: str = "read_write"):
+        """
+        Initialize cache.
+
+        Args:
+            db_path: SQLite file holding cached responses
+            ttl_seconds: Entries older than this are ignored (except in replay mode)
+            max_entries: Least recently used entries beyond this are evicted
+            mode: "off", "read_write" or "replay"
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown cache mode '{mode}', expected one of {MODES}")
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(db_path, timeout=30)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response_text TEXT NOT NULL,
+                prompt_tokens INTEGER,
+                response_tokens INTEGER,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                hit_count INTEGER DEFAULT 0
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_responses_access ON llm_responses (last_access)")
+        self.conn.commit()
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    def get(self, key: str) -> Optional[LLMResponse]:
+        """
+        Look up a cached response.
+
+        Args:
+            key: Key from ``cache_key``
+
+        Returns:
+            Cached LLMResponse, or None on a miss (read_write mode)
+
+        Raises:
+            CacheMissError: On a miss in replay mode
+        """
+        if not self.enabled:
+            return None
+
+        row = self.conn.execute(
+            "SELECT response_text, prompt_tokens, response_tokens, created_at FROM llm_responses WHERE key = ?",
+            (key,)
+        ).fetchone()
+
+        now = time.time()
+        expired = row is not None and self.mode != "replay" and now - row[3] > self.ttl_seconds
+        if row is None or expired:
+            self.misses += 1
+            if self.mode == "replay":
+                raise CacheMissError(f"No cached response for request {key[:12]} (replay mode)")
+            return None
+
+        self.hits += 1
+        self.conn.execute(
+            "UPDATE llm_responses SET last_access = ?, hit_count = hit_count + 1 WHERE key = ?",
+            (now, key)
+        )
+        self.conn.commit()
+        return LLMResponse(text=row[0], prompt_tokens=row[1], response_tokens=row[2], cached=True)
+
+    def put(self, key: str, model: str, response: LLMResponse):
+        """Store a response and evict least recently used entries over the size limit."""
+        if self.mode != "read_write":
+            return
+        now = time.time()
+        self.conn.execute(
+            """INSERT OR REPLACE INTO llm_responses
+               (key, model, response_text, prompt_tokens, response_tokens, created_at, last_access)
+               VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            (key, model, response.text, response.prompt_tokens, response.response_tokens, now, now)
+        )
+        self.conn.execute(
+            """DELETE FROM llm_responses WHERE key IN (
+                   SELECT key FROM llm_responses ORDER BY last_access DESC LIMIT -1 OFFSET ?
+               )""",
+            (self.max_entries,)
+        )
+        self.conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        """Close the database connection."""
+        self.conn.close()
+
+
+def response_cache_from_config(config: Dict[str, Any]) -> ResponseCache:
+    """
+    Build the response cache from ``config.yml`` settings.
+
+    ``OPENFIX_LLM_CACHE`` (off / read_write / replay) overrides the configured
+    mode, so subprocesses of a benchmark run can be switched to replay.
+    """
+    return ResponseCache(
+        db_path=config.get('llm_cache_path', 'data/cache/llm_responses.db'),
+        ttl_seconds=config.get('llm_cache_ttl_hours', 168) * 3600,
+        max_entries=config.get('llm_cache_max_entries', 5000),
+        mode=os.getenv('OPENFIX_LLM_CACHE', config.get('llm_cache_mode', 'read_write'))
+    )
@@ -0,0 +1,341 @@
+"""Cascade routing between a fast, cheap model and a strong model.
+
+With ``routing_policy: cascade`` triage and first patch attempts on
+low-complexity issues go to ``fast_llm_model``. Work is escalated to
+``llm_model`` when the fast tier's output is unusable or low-confidence:
+
+- triage: the verdict failed to parse, or its priority score falls in the
+  borderline band ``triage_escalate_scores``
+- patches: generation failed (refusal, aborted stream, unparsable response)
+  or the patch failed validation; every later repair iteration stays on the
+  strong tier
+
+``CascadeRouter`` records calls, latency, tokens, cost and success per tier
+(``stats``, saved as ``routing.json`` in the run artifacts) so the policy and
+thresholds can be tuned. ``routing_policy: single`` sends everything to
+``llm_model`` through the same accounting.
+
+With a trained local triage model (``local_triage.py``) a "local" tier runs
+before both: its verdicts are kept when confident and not borderline, and
+only the rest reach the remote tiers.
+"""
+import json
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from infrastructure.llm_pool.token_counter import count_tokens
+
+LOCAL = "local"
+FAST = "fast"
+STRONG = "strong"
+
+# USD per million (input, output) tokens; override with ``model_prices`` in config.yml
+DEFAULT_PRICES = {
+    "gemini-2.5-flash-lite": (0.10, 0.40),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-pro": (1.25, 10.00),
+    "gemini-3-pro-preview": (2.00, 12.00),
+}
+
+LOW_COMPLEXITY_LABELS = {"good first issue", "typo", "easy", "trivial", "beginner"}
+HIGH_COMPLEXITY_LABELS = {"refactor", "performance", "security", "breaking change", "architecture"}
+
+
+def estimate_complexity(issue_text: str, labels: Sequence[str] = (), low_max_tokens: int = 300,
+                        high_min_tokens: int = 1500) -> str:
+    """
+    Estimate issue complexity from its labels and length, without an LLM call.
+
+    Args:
+        issue_text: Combined issue title and body
+        labels: Issue label names
+        low_max_tokens: Issues up to this many tokens count as low complexity
+        high_min_tokens: Issues from this many tokens count as high complexity
+
+    Returns:
+        "low", "medium" or "high"
+    """
+    names = {label.lower() for label in labels}
+    if names & HIGH_COMPLEXITY_LABELS:
+        return "high"
+    if names & LOW_COMPLEXITY_LABELS:
+        return "low"
+    tokens = count_tokens(issue_text)
+    if tokens <= low_max_tokens:
+        return "low"
+    return "high" if tokens >= high_min_tokens else "medium"
+
+
+class TierStats:
+    """Calls, latency, tokens, cost and outcomes for one routing tier."""
+
+    def __init__(self, model_name: str, prices: Tuple[float, float]):
+        self.model_name = model_name
+        self.prices = prices
+        self.requests = 0
+        self.llm_calls = 0
+        self.successes = 0
+        self.failures = 0
+        self.escalations = 0
+        self.latency_ms = 0.0
+        self.prompt_tokens = 0
+        self.response_tokens = 0
+
+    @property
+    def cost_usd(self) -> float:
+        input_price, output_price = self.prices
+        return (self.prompt_tokens * input_price + self.response_tokens * output_price) / 1_000_000
+
+    def to_dict(self) -> Dict[str, Any]:
+        outcomes = self.successes + self.failures
+        return {
+            "model": self.model_name,
+            "requests": self.requests,
+            "llm_calls": self.llm_calls,
+            "successes": self.successes,
+            "failures": self.failures,
+            "escalations": self.escalations,
+            "success_rate": round(self.successes / outcomes, 3) if outcomes else None,
+            "latency_ms_avg": round(self.latency_ms / self.requests, 1) if self.requests else 0.0,
+            "prompt_tokens": self.prompt_tokens,
+            "response_tokens": self.response_tokens,
+            "cost_usd": round(self.cost_usd, 6),
+        }
+
+
+class CascadeRouter:
+    """Routes triage and patch calls across GeminiLLM tiers, cheapest first."""
+
+    def __init__(self, tiers: List[Tuple[str, Any]], prices: Optional[Dict[str, Tuple[float, float]]] = None,
+                 triage_escalate_scores: Tuple[int, int] = (4, 6), local_triage=None, logger=None):
+        """
+        Initialize router.
+
+        Args:
+            tiers: (tier name, GeminiLLM) pairs ordered from cheapest to strongest
+            prices: USD per million (input, output) tokens by model name
+            triage_escalate_scores: Inclusive priority-score band treated as borderline
+            local_triage: Optional CPU classifier tried before the remote tiers for triage
+            logger: Optional logger
+        """
+        if not tiers:
+            raise ValueError("CascadeRouter needs at least one tier")
+        prices = {**DEFAULT_PRICES, **(prices or {})}
+        self.tier_names = [name for name, _ in tiers]
+        self.llms = dict(tiers)
+        self.tier_stats = {
+            name: TierStats(llm.model_name, tuple(prices.get(llm.model_name, (0.0, 0.0))))
+            for name, llm in tiers
+        }
+        self.triage_escalate_scores = tuple(triage_escalate_scores)
+        self.local_triage = local_triage
+        if local_triage is not None:
+            self.tier_stats[LOCAL] = TierStats(local_triage.model_name, (0.0, 0.0))
+        self.logger = logger
+
+    @property
+    def strongest(self) -> str:
+        return self.tier_names[-1]
+
+    def llm(self, tier: str):
+        return self.llms[tier]
+
+    def next_tier(self, tier: str) -> Optional[str]:
+        """The tier above ``tier``, or None if it is already the strongest."""
+        index = self.tier_names.index(tier)
+        return self.tier_names[index + 1] if index + 1 < len(self.tier_names) else None
+
+    def escalate(self, tier: str, reason: str) -> str:
+        """
+        Move work from ``tier`` to the next tier up, counting the escalation.
+
+        Returns:
+            The tier to use next (``tier`` itself when already the strongest)
+        """
+        target = self.next_tier(tier)
+        if target is None:
+            return tier
+        self.tier_stats[tier].escalations += 1
+        if self.logger:
+            self.logger.info(f"Escalating {tier} -> {target}: {reason}")
+        return target
+
+    def patch_tier(self, complexity: str) -> str:
+        """Tier for the first patch attempt on an issue of the given complexity."""
+        return self.tier_names[0] if complexity == "low" else self.strongest
+
+    def record_outcome(self, tier: str, success: bool):
+        """Record whether work done on ``tier`` was accepted."""
+        if success:
+            self.tier_stats[tier].successes += 1
+        else:
+            self.tier_stats[tier].failures += 1
+
+    def record_usage(self, tier: str, prompt_tokens: int, response_tokens: int, latency_ms: float,
+                     llm_calls: int = 1):
+        """Account a request made outside ``call`` (e.g. with a different generation config)."""
+        stats = self.tier_stats[tier]
+        stats.requests += 1
+        stats.llm_calls += llm_calls
+        stats.latency_ms += latency_ms
+        stats.prompt_tokens += prompt_tokens
+        stats.response_tokens += response_tokens
+
+    def call(self, tier: str, fn: Callable[[Any], Any]):
+        """
+        Run ``fn(llm)`` on a tier and account its latency, calls and tokens.
+
+        Token and call counts are read from the tier's provider, so cache hits
+        cost nothing and retries are included.
+        """
+        llm = self.llms[tier]
+        provider = llm.provider
+        stats = self.tier_stats[tier]
+        calls, prompt_tokens, response_tokens = provider.calls, provider.prompt_tokens, provider.response_tokens
+        start = time.perf_counter()
+        try:
+            return fn(llm)
+        finally:
+            stats.requests += 1
+            stats.latency_ms += (time.perf_counter() - start) * 1000
+            stats.llm_calls += provider.calls - calls
+            stats.prompt_tokens += provider.prompt_tokens - prompt_tokens
+            stats.response_tokens += provider.response_tokens - response_tokens
+
+    def generate_patch(self, tier: str, *args, **kwargs) -> dict:
+        """``GeminiLLM.generate_patch`` on a tier; the result carries its 'tier' and 'model'."""
+        result = self.call(tier, lambda llm: llm.generate_patch(*args, **kwargs))
+        result['tier'] = tier
+        result['model'] = self.llms[tier].model_name
+        return result
+
+    @staticmethod
+    def _parsed(verdict: Optional[dict]) -> bool:
+        return bool(verdict) and 'is_suitable' in verdict and verdict.get('estimated_complexity_score') != 'unknown'
+
+    def triage_confident(self, verdict: Optional[dict]) -> bool:
+        """False for unparsed or failed verdicts and borderline priority scores."""
+        if not self._parsed(verdict):
+            return False
+        try:
+            score = float(verdict.get('priority_score', 0))
+        except (TypeError, ValueError):
+            return False
+        low, high = self.triage_escalate_scores
+        return not low <= score <= high
+
+    def triage_issues(self, issues: list, batch_size: int = 8,
+                      triage: Optional[Callable[[Any, list], list]] = None) -> list:
+        """
+        Triage issues on the cheapest tier, re-triaging low-confidence verdicts one tier up.
+
+        With a local classifier, its confident verdicts are kept and only the
+        remaining issues are sent to the remote tiers.
+
+        Args:
+            issues: Dicts with 'title', 'body' and 'labels'
+            batch_size: Issues per triage prompt
+            triage: ``triage(llm, issues) -> results`` for the first pass
+                (default: ``llm.triage_issues``), e.g. to run it concurrently
+
+        Returns:
+            Triage results in the same order as ``issues``; each carries 'routed_tier'
+        """
+        if self.local_triage is not None and issues:
+            return self._triage_local_first(issues, batch_size, triage)
+        return self._triage_remote(issues, batch_size, triage)
+
+    def _triage_remote(self, issues: list, batch_size: int, triage) -> list:
+        triage = triage or (lambda llm, batch: llm.triage_issues(batch, batch_size=batch_size))
+        tier = self.tier_names[0]
+        results = self.call(tier, lambda llm: triage(llm, issues))
+        pending = list(range(len(issues)))
+
+        while pending:
+            for i in pending:
+                results[i] = dict(results[i] or {}, routed_tier=tier)
+            unsure = [i for i in pending if not self.triage_confident(results[i])]
+            target = self.next_tier(tier)
+            for i in pending:
+                # A borderline verdict on the strongest tier is final, not a failure
+                accepted = i not in unsure or (target is None and self._parsed(results[i]))
+                self.record_outcome(tier, accepted)
+            if not unsure or target is None:
+                break
+            for _ in unsure:
+                self.escalate(tier, "low-confidence triage verdict")
+            retried = self.call(target, lambda llm: llm.triage_issues([issues[i] for i in unsure],
+                                                                       batch_size=batch_size))
+            for i, verdict in zip(unsure, retried):
+                results[i] = verdict
+            tier, pending = target, unsure
+        return results
+
+    def _triage_local_first(self, issues: list, batch_size: int, triage) -> list:
+        stats = self.tier_stats[LOCAL]
+        start = time.perf_counter()
+        results = self.local_triage.triage_issues(issues)
+        stats.requests += 1
+        stats.latency_ms += (time.perf_counter() - start) * 1000
+
+        remote = []
+        for i, verdict in enumerate(results):
+            if self.local_triage.trusted(verdict) and self.triage_confident(verdict):
+                results[i] = dict(verdict, routed_tier=LOCAL)
+                self.record_outcome(LOCAL, True)
+            else:
+                remote.append(i)
+                self.record_outcome(LOCAL, False)
+                stats.escalations += 1
+        if remote:
+            verdicts = self._triage_remote([issues[i] for i in remote], batch_size, triage)
+            for i, verdict in zip(remote, verdicts):
+                results[i] = verdict
+        if self.logger:
+            self.logger.info(f"Local triage kept {len(issues) - len(remote)}/{len(issues)} verdicts")
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-tier stats plus totals."""
+        names = ([LOCAL] if self.local_triage is not None else []) + self.tier_names
+        tiers = {name: self.tier_stats[name].to_dict() for name in names}
+        return {
+            "tiers": tiers,
+            "escalations": sum(t["escalations"] for t in tiers.values()),
+            "cost_usd": round(sum(t["cost_usd"] for t in tiers.values()), 6),
+        }
+
+    def save(self, path: Path):
+        """Write ``stats`` as JSON (``routing.json`` in the run artifacts)."""
+        with open(path, "w") as f:
+            json.dump(self.stats(), f, indent=2)
+
+
+def router_from_config(config: Dict[str, Any], strong_llm, make_llm: Callable[[str], Any],
+                       logger=None, local_triage=None) -> CascadeRouter:
+    """
+    Build the router for ``routing_policy`` in ``config.yml``.
+
+    Args:
+        config: Configuration settings
+        strong_llm: GeminiLLM for ``llm_model``
+        make_llm: Builds a GeminiLLM for a model name (the fast tier)
+        logger: Optional logger
+        local_triage: Optional local classifier (see ``local_triage_from_config``)
+
+    Returns:
+        CascadeRouter with a fast and a strong tier, or only the strong tier
+        for the "single" policy (or when both tiers would use the same model)
+    """
+    tiers = [(STRONG, strong_llm)]
+    fast_model = config.get('fast_llm_model', 'gemini-2.5-flash')
+    if config.get('routing_policy', 'cascade') == 'cascade' and fast_model != strong_llm.model_name:
+        tiers.insert(0, (FAST, make_llm(fast_model)))
+    return CascadeRouter(
+        tiers,
+        prices={k: tuple(v) for k, v in (config.get('model_prices') or {}).items()},
+        triage_escalate_scores=tuple(config.get('triage_escalate_scores', (4, 6))),
+        local_triage=local_triage,
+        logger=logger
+    )
@@ -0,0 +1,189 @@
+"""Cross-process token bucket shared by every OpenFix process on a host.
+
+``scripts/cli.py`` and ``automate_full_pipeline.py`` run discovery and solving
+as separate subprocesses. An in-memory ``RateLimiter`` lets each of them
+believe it owns the whole quota, so together they trip 429s. This limiter
+keeps the sliding one-minute window in SQLite: reservations are made inside
+``BEGIN IMMEDIATE`` transactions, so every process on the host draws from the
+same tokens-per-minute and requests-per-minute budget.
+
+It implements the same interface as ``RateLimiter`` (``acquire``,
+``wait_if_needed``, ``record_usage``, ``compute_wait``) and can be passed
+anywhere one is expected. One instance may be used from several threads
+(calls bounded by a timeout run on worker threads).
+"""
+import sqlite3
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+WINDOW_SECONDS = 60
+
+
+class SharedRateLimiter:
+    """SQLite-backed sliding-window limiter for tokens and requests per minute."""
+
+    def __init__(self, db_path: str = "data/db/ratelimit.db", tokens_per_minute: int = 900000,
+                 requests_per_minute: Optional[int] = None, bucket: str = "gemini"):
+        """
+        Initialize shared limiter.
+
+        Args:
+            db_path: SQLite file shared by all processes on the host
+            tokens_per_minute: Maximum tokens per minute across all processes
+            requests_per_minute: Maximum requests per minute (None = unlimited)
+            bucket: Bucket name, so different quotas can share one file
+        """
+        self.db_path = db_path
+        self.tokens_per_minute = tokens_per_minute
+        self.requests_per_minute = requests_per_minute
+        self.bucket = bucket
+        self.reservations = deque()  # Row ids still holding an estimate
+        self.wait_seconds_total = 0.0
+        self.wait_count = 0
+
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        # Autocommit mode; transactions are opened explicitly below
+        self.conn = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._lock = threading.RLock()
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_usage (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                bucket TEXT NOT NULL,
+                ts REAL NOT NULL,
+                tokens INTEGER NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_usage_bucket_ts ON llm_usage (bucket, ts)")
+
+    def _window(self, now: float):
+        """Prune expired rows and return (tokens, requests, oldest_ts) in the window."""
+        self.conn.execute(
+            "DELETE FROM llm_usage WHERE bucket = ? AND ts < ?",
+            (self.bucket, now - WINDOW_SECONDS)
+        )
+        tokens, requests, oldest = self.conn.execute(
+            "SELECT COALESCE(SUM(tokens), 0), COUNT(*), MIN(ts) FROM llm_usage WHERE bucket = ?",
+            (self.bucket,)
+        ).fetchone()
+        return tokens, requests, oldest
+
+    def _wait_for(self, now: float, estimated_tokens: int) -> float:
+        tokens, requests, oldest = self._window(now)
+        if not requests:
+            return 0
+        over_tokens = tokens + estimated_tokens > self.tokens_per_minute
+        over_requests = self.requests_per_minute is not None and requests >= self.requests_per_minute
+        if not (over_tokens or over_requests):
+            return 0
+        # Wait until oldest entry expires
+        return max(0, WINDOW_SECONDS - (now - oldest)) + 1  # +1 for safety
+
+    def compute_wait(self, estimated_tokens: int) -> float:
+        """Seconds to wait before a request of this size fits (no reservation)."""
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                return self._wait_for(time.time(), estimated_tokens)
+            finally:
+                self.conn.execute("COMMIT")
+
+    def acquire(self, estimated_tokens: int) -> float:
+        """
+        Atomically check the shared window and reserve tokens for one request.
+
+        Args:
+            estimated_tokens: Estimated tokens for the upcoming request
+
+        Returns:
+            0 if the request was reserved, otherwise seconds to wait before retrying
+        """
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                wait = self._wait_for(now, estimated_tokens)
+                if wait <= 0:
+                    cursor = self.conn.execute(
+                        "INSERT INTO llm_usage (bucket, ts, tokens) VALUES (?, ?, ?)",
+                        (self.bucket, now, estimated_tokens)
+                    )
+                    self.reservations.append(cursor.lastrowid)
+                self.conn.execute("COMMIT")
+                return wait
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def record_wait(self, seconds: float):
+        """Account time spent waiting for quota."""
+        self.wait_seconds_total += seconds
+        self.wait_count += 1
+
+    def wait_if_needed(self, estimated_tokens: int, logger=None):
+        """
+        Sleep until the shared window has room, then reserve the tokens.
+
+        Args:
+            estimated_tokens: Estimated tokens for the upcoming request
+            logger: Optional logger for transparency
+        """
+        while True:
+            sleep_time = self.acquire(estimated_tokens)
+            if sleep_time <= 0:
+                return
+
+            if logger:
+                logger.info(f"⏱️  Shared rate limit reached: {self.tokens_in_window()}/{self.tokens_per_minute} tokens "
+                            f"in window across processes")
+                logger.info(f"   Sleeping {sleep_time:.1f}s to respect quota...")
+            else:
+                print(f"Rate limiting: sleeping {sleep_time:.1f}s...")
+
+            self.record_wait(sleep_time)
+            time.sleep(sleep_time)
+
+    def record_usage(self, token_count: int):
+        """Record actual token usage, settling the oldest outstanding reservation."""
+        with self._lock:
+            if self.reservations:
+                self.conn.execute(
+                    "UPDATE llm_usage SET tokens = ? WHERE id = ?",
+                    (token_count, self.reservations.popleft())
+                )
+            else:
+                self.conn.execute(
+                    "INSERT INTO llm_usage (bucket, ts, tokens) VALUES (?, ?, ?)",
+                    (self.bucket, time.time(), token_count)
+                )
+
+    def tokens_in_window(self) -> int:
+        """Tokens used in the last 60 seconds by all processes."""
+        with self._lock:
+            return self.conn.execute(
+                "SELECT COALESCE(SUM(tokens), 0) FROM llm_usage WHERE bucket = ? AND ts >= ?",
+                (self.bucket, time.time() - WINDOW_SECONDS)
+            ).fetchone()[0]
+
+    def close(self):
+        """Close the database connection."""
+        self.conn.close()
+
+
+def rate_limiter_from_config(config: Dict[str, Any], keys: int = 1) -> SharedRateLimiter:
+    """
+    Build the host-wide limiter from ``config.yml`` settings.
+
+    Args:
+        config: Configuration settings
+        keys: API keys behind the limiter; the per-key quotas add up
+    """
+    rpm = config.get('max_llm_calls_per_minute')
+    return SharedRateLimiter(
+        db_path=config.get('rate_limit_db', 'data/db/ratelimit.db'),
+        tokens_per_minute=config.get('max_tokens_per_minute', 900000) * keys,
+        requests_per_minute=rpm * keys if rpm is not None else None
+    )
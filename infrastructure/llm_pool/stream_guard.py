@@ -0,0 +1,175 @@
+"""Incremental checks on a streamed patch response.
+
+``StreamGuard`` is fed response text as it streams in and reports the first
+reason to give up on it, so the request can be cancelled before the model
+spends its full output budget:
+
+- a ``CANNOT_FIX_SAFELY`` refusal (reported once its reason line is complete)
+- a patch whose first line is not a diff header
+- a diff that touches a path outside the repository, or modifies a file that
+  does not exist in it
+
+The response is normally the JSON object from ``patchbuilder_json_prompt.txt``
+with the diff escaped inside ``patch_text``; a raw diff is checked directly.
+Edit-block responses (``patch_format: edits``) have no diff header; only the
+refusal and their ``FILE:`` paths are checked.
+"""
+import json
+import re
+from pathlib import Path
+from typing import Optional
+
+REFUSAL_MARKER = "CANNOT_FIX_SAFELY"
+DIFF_HEADERS = ("diff --git", "--- ", "Index: ", "From ")
+_PATCH_TEXT_START = re.compile(r'"patch_text"\s*:\s*"')
+_REFUSAL_END = re.compile(r'(?<!\\)"|\\n|\n')
+_HUNK_HEADER = re.compile(r"^@@ -\d+(?:,(\d+))? \+\d+(?:,(\d+))? @@")
+
+
+def decode_partial_json_string(raw: str):
+    """
+    Decode the body of a JSON string that may still be streaming.
+
+    Args:
+        raw: Text following the opening quote
+
+    Returns:
+        Tuple of (decoded text so far, whether the closing quote was seen)
+    """
+    out = []
+    i = 0
+    while i < len(raw):
+        ch = raw[i]
+        if ch == '"':
+            return "".join(out), True
+        if ch != "\\":
+            out.append(ch)
+            i += 1
+            continue
+        if i + 1 >= len(raw):
+            break  # Escape split across chunks
+        if raw[i + 1] == "u":
+            if i + 6 > len(raw):
+                break
+            escape = raw[i:i + 6]
+            i += 6
+        else:
+            escape = raw[i:i + 2]
+            i += 2
+        try:
+            out.append(json.loads(f'"{escape}"'))
+        except json.JSONDecodeError:
+            out.append(escape)
+    return "".join(out), False
+
+
+class StreamGuard:
+    """Detects unusable patch responses from a streaming prefix."""
+
+    def __init__(self, repo_root: Optional[str] = None, patch_format: str = "diff"):
+        """
+        Initialize guard.
+
+        Args:
+            repo_root: Checked-out repository; enables the path checks
+            patch_format: "diff" or "edits" (search/replace edit blocks)
+        """
+        self.repo_root = Path(repo_root).resolve() if repo_root else None
+        self.patch_format = patch_format
+        self.text = ""
+        self.abort_reason: Optional[str] = None
+
+    def feed(self, chunk: str) -> Optional[str]:
+        """
+        Add streamed text and check the response so far.
+
+        Args:
+            chunk: Newly received text
+
+        Returns:
+            Reason to abort, or None to keep streaming
+        """
+        if self.abort_reason is None:
+            self.text += chunk
+            check = self._check_edits if self.patch_format == "edits" else self._check_patch
+            self.abort_reason = self._check_refusal() or check()
+        return self.abort_reason
+
+    def _check_refusal(self) -> Optional[str]:
+        pos = self.text.find(REFUSAL_MARKER)
+        if pos == -1:
+            return None
+        rest = self.text[pos + len(REFUSAL_MARKER):]
+        end = _REFUSAL_END.search(rest)
+        if end is None and len(rest) < 500:
+            return None  # Wait for the reason to finish
+        reason = rest[:end.start() if end else 500].lstrip(": ").strip()
+        return reason or REFUSAL_MARKER
+
+    def _patch_lines(self):
+        """Complete lines of the diff received so far."""
+        match = _PATCH_TEXT_START.search(self.text)
+        if match:
+            patch, complete = decode_partial_json_string(self.text[match.end():])
+        elif self.text.lstrip().startswith(("{", "```")):
+            return []  # JSON not reached patch_text yet
+        else:
+            patch, complete = self.text, False
+        lines = patch.split("\n")
+        return lines if complete else lines[:-1]
+
+    def _check_patch(self) -> Optional[str]:
+        lines = self._patch_lines()
+        first = next((line for line in lines if line.strip()), None)
+        if first is None:
+            return None
+        if not first.startswith(DIFF_HEADERS):
+            return f"Invalid diff header: {first[:80]!r}"
+        if self.repo_root is None:
+            return None
+        # Hunk bodies can contain "--- "/"+++ " lines (a removed "-- comment"),
+        # so file headers are only checked between hunks
+        old_left = new_left = 0
+        for line in lines:
+            if old_left > 0 or new_left > 0:
+                if line.startswith("-"):
+                    old_left -= 1
+                elif line.startswith("+"):
+                    new_left -= 1
+                elif not line.startswith("\\"):
+                    old_left -= 1
+                    new_left -= 1
+                continue
+            hunk = _HUNK_HEADER.match(line)
+            if hunk:
+                old_left = int(hunk.group(1) or 1)
+                new_left = int(hunk.group(2) or 1)
+            elif line.startswith(("--- ", "+++ ")):
+                reason = self._check_path(line)
+                if reason:
+                    return reason
+        return None
+
+    def _check_edits(self) -> Optional[str]:
+        if self.repo_root is None:
+            return None
+        for line in self.text.split("\n")[:-1]:
+            if line.startswith("FILE:"):
+                path = line[5:].strip().strip("`")
+                target = (self.repo_root / path).resolve()
+                if Path(path).is_absolute() or not target.is_relative_to(self.repo_root):
+                    return f"Patch touches path outside the repository: {path}"
+        return None
+
+    def _check_path(self, header: str) -> Optional[str]:
+        path = header[4:].split("\t")[0].strip()
+        if path == "/dev/null":
+            return None
+        if path.startswith(("a/", "b/")):
+            path = path[2:]
+        target = (self.repo_root / path).resolve()
+        if Path(path).is_absolute() or not target.is_relative_to(self.repo_root):
+            return f"Patch touches path outside the repository: {path}"
+        if header.startswith("--- ") and not target.exists():
+            return f"Patch modifies a file that does not exist: {path}"
+        return None
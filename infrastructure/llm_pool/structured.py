@@ -0,0 +1,289 @@
+"""Schema-constrained JSON output.
+
+Response schemas live in ``infrastructure/prompts/schemas/*.json`` and use
+the same JSON Schema subset as ``validation_schema.json``: ``type``,
+``required``, ``properties``, ``items``, ``enum``, ``minimum`` and
+``maximum``. ``StructuredOutput`` turns a schema into a Gemini generation
+config (``response_mime_type: application/json`` plus ``response_schema``) so
+the model is constrained to valid JSON, and parses responses against it.
+
+Parsing makes one cheap local fix-up pass before giving up: strip markdown
+fences and preamble, escape raw newlines inside strings, drop trailing commas,
+close a truncated string and unbalanced brackets, and coerce scalar values
+to the declared types (``"7"`` for an integer, ``"low"`` for ``"Low"``). A
+response that still does not match raises ``StructuredOutputError`` instead
+of being passed on as raw text.
+"""
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+SCHEMA_DIR = Path("infrastructure/prompts/schemas")
+
+# Schema keywords Gemini accepts in ``response_schema``
+_GEMINI_SCHEMA_KEYS = {"type", "format", "description", "nullable", "enum", "properties", "required", "items"}
+_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "integer": int,
+    "number": (int, float),
+    "boolean": bool,
+    "null": type(None),
+}
+
+
+class StructuredOutputError(ValueError):
+    """Raised when a response cannot be parsed into its declared schema."""
+
+
+_schemas: Dict[str, Dict[str, Any]] = {}
+
+
+def load_schema(name: str) -> Dict[str, Any]:
+    """Load ``infrastructure/prompts/schemas/<name>.json`` (cached)."""
+    if name not in _schemas:
+        with open(SCHEMA_DIR / f"{name}.json", "r") as f:
+            _schemas[name] = json.load(f)
+    return _schemas[name]
+
+
+def to_response_schema(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a JSON Schema to the subset Gemini accepts as ``response_schema``."""
+    out = {}
+    for key, value in schema.items():
+        if key not in _GEMINI_SCHEMA_KEYS:
+            continue
+        if key == "type":
+            value = value.upper()
+        elif key == "properties":
+            value = {name: to_response_schema(prop) for name, prop in value.items()}
+        elif key == "items":
+            value = to_response_schema(value)
+        out[key] = value
+    return out
+
+
+def _is_type(value: Any, expected: str) -> bool:
+    if expected in ("integer", "number") and isinstance(value, bool):
+        return False
+    return isinstance(value, _TYPES[expected])
+
+
+def validate(instance: Any, schema: Dict[str, Any], path: str = "$") -> List[str]:
+    """
+    Check an instance against a schema.
+
+    Args:
+        instance: Parsed JSON value
+        schema: Schema (or sub-schema)
+        path: Location of ``instance``, for error messages
+
+    Returns:
+        List of error messages (empty when valid)
+    """
+    expected = schema.get("type")
+    if expected and not _is_type(instance, expected):
+        return [f"{path}: expected {expected}, got {type(instance).__name__}"]
+
+    errors = []
+    if "enum" in schema and instance not in schema["enum"]:
+        errors.append(f"{path}: {instance!r} not one of {schema['enum']}")
+    if "minimum" in schema and isinstance(instance, (int, float)) and instance < schema["minimum"]:
+        errors.append(f"{path}: {instance} is below minimum {schema['minimum']}")
+    if "maximum" in schema and isinstance(instance, (int, float)) and instance > schema["maximum"]:
+        errors.append(f"{path}: {instance} is above maximum {schema['maximum']}")
+    if isinstance(instance, dict):
+        for key in schema.get("required", []):
+            if key not in instance:
+                errors.append(f"{path}: missing required key '{key}'")
+        for key, prop in schema.get("properties", {}).items():
+            if key in instance:
+                errors.extend(validate(instance[key], prop, f"{path}.{key}"))
+    if isinstance(instance, list) and "items" in schema:
+        for i, item in enumerate(instance):
+            errors.extend(validate(item, schema["items"], f"{path}[{i}]"))
+    return errors
+
+
+def coerce(instance: Any, schema: Dict[str, Any]) -> Any:
+    """Convert scalar values to their declared types where unambiguous."""
+    expected = schema.get("type")
+    if isinstance(instance, dict):
+        props = schema.get("properties", {})
+        return {k: coerce(v, props[k]) if k in props else v for k, v in instance.items()}
+    if isinstance(instance, list):
+        return [coerce(item, schema["items"]) for item in instance] if "items" in schema else instance
+    if expected == "array" and instance is not None:
+        return [coerce(instance, schema.get("items", {}))]
+
+    if expected in ("integer", "number") and isinstance(instance, str):
+        try:
+            number = float(instance.strip())
+            instance = int(number) if expected == "integer" and number.is_integer() else number
+        except ValueError:
+            pass
+    elif expected == "integer" and isinstance(instance, float) and instance.is_integer():
+        instance = int(instance)
+    elif expected == "boolean" and isinstance(instance, str) and instance.strip().lower() in ("true", "false"):
+        instance = instance.strip().lower() == "true"
+    if "enum" in schema and isinstance(instance, str) and instance not in schema["enum"]:
+        matches = [e for e in schema["enum"] if isinstance(e, str) and e.lower() == instance.strip().lower()]
+        if matches:
+            instance = matches[0]
+    return instance
+
+
+def _json_region(text: str) -> str:
+    """Text from the first ``{`` or ``[`` on, without markdown fences."""
+    if "```" in text:
+        start = text.find("```")
+        start = text.find("\n", start) + 1 if text.find("\n", start) != -1 else start + 3
+        end = text.find("```", start)
+        text = text[start:end] if end != -1 else text[start:]
+    starts = [pos for pos in (text.find("{"), text.find("[")) if pos != -1]
+    return text[min(starts):] if starts else text
+
+
+def repair_json(text: str) -> str:
+    """
+    Apply the local fix-up pass to almost-JSON model output.
+
+    Escapes control characters inside strings, drops trailing commas, stops
+    after the first complete value and closes a truncated string and any
+    unbalanced brackets.
+    """
+    text = _json_region(text)
+    out = []
+    stack = []
+    in_string = False
+    escaped = False
+    for ch in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            elif ch == "\n":
+                ch = "\\n"
+            elif ch == "\t":
+                ch = "\\t"
+            elif ch == "\r":
+                ch = "\\r"
+            out.append(ch)
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]":
+            while out and out[-1] in " \n\r\t,":
+                out.pop()
+            if stack:
+                stack.pop()
+            out.append(ch)
+            if not stack:
+                break  # Ignore anything after the first complete value
+            continue
+        out.append(ch)
+
+    if in_string:
+        if escaped:
+            out.pop()
+        out.append('"')
+    while stack:
+        while out and out[-1] in " \n\r\t,:":
+            out.pop()
+        out.append(stack.pop())
+    return "".join(out)
+
+
+class StructuredOutput:
+    """Generation config and parser for one response schema, with parse counters."""
+
+    def __init__(self, schema_name: str):
+        """
+        Initialize structured output.
+
+        Args:
+            schema_name: File name (without .json) under ``infrastructure/prompts/schemas``
+        """
+        self.schema_name = schema_name
+        self.schema = load_schema(schema_name)
+        self.generation_config = {
+            "response_mime_type": "application/json",
+            "response_schema": to_response_schema(self.schema),
+        }
+        self.parsed = 0
+        self.fixed = 0
+        self.failed = 0
+
+    def load(self, text: str) -> Tuple[Any, bool]:
+        """
+        Decode JSON, applying the fix-up pass if plain decoding fails.
+
+        Returns:
+            Tuple of (decoded value, whether the fix-up pass was needed)
+
+        Raises:
+            StructuredOutputError: If the text is not JSON even after fix-up
+        """
+        try:
+            return json.loads(text), False
+        except json.JSONDecodeError:
+            pass
+        try:
+            return json.loads(repair_json(text)), True
+        except json.JSONDecodeError as e:
+            self.failed += 1
+            raise StructuredOutputError(f"{self.schema_name}: invalid JSON after fix-up: {e}") from e
+
+    def parse(self, text: str) -> Any:
+        """
+        Parse a response and validate it against the schema.
+
+        Args:
+            text: Model response text
+
+        Returns:
+            The validated value
+
+        Raises:
+            StructuredOutputError: If the response does not match the schema
+        """
+        data, fixed = self.load(text)
+        data, errors = self.check(data, fixed=fixed)
+        if errors:
+            raise StructuredOutputError(f"{self.schema_name}: {'; '.join(errors[:5])}")
+        return data
+
+    def check(self, data: Any, schema: Dict[str, Any] = None, fixed: bool = False) -> Tuple[Any, List[str]]:
+        """
+        Coerce and validate decoded data (or one item, against its sub-schema).
+
+        Args:
+            data: Decoded JSON value
+            schema: Sub-schema to check against (default: the whole schema)
+            fixed: Whether decoding already needed the fix-up pass
+
+        Returns:
+            Tuple of (coerced data, validation errors); the outcome is counted
+        """
+        schema = schema or self.schema
+        errors = validate(data, schema)
+        if errors:
+            coerced = coerce(data, schema)
+            if validate(coerced, schema):
+                self.failed += 1
+                return data, errors
+            data, fixed = coerced, True
+        if fixed:
+            self.fixed += 1
+        else:
+            self.parsed += 1
+        return data, []
+
+    def stats(self) -> Dict[str, int]:
+        return {"parsed": self.parsed, "fixed": self.fixed, "failed": self.failed}
@@ -0,0 +1,131 @@
+"""Token counting for prompt sizing, rate limiting and metrics.
+
+``len(text) // 4`` undercounts code badly: punctuation, short identifiers,
+digits and indentation all cost tokens of their own. ``TokenCounter`` splits
+text into word, digit, punctuation and whitespace pieces for a local
+estimate, then scales it by a ratio calibrated against real counts, either
+the ``usage_metadata`` of completed calls (free) or the provider's
+``count_tokens`` API when an exact count is requested. Counts are cached by
+content hash, so repeated prompts and chunks are counted once.
+"""
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+_PIECES = re.compile(r"[A-Za-z]+|\d|\n|[ \t]+|[^\sA-Za-z\d]")
+
+# Keep calibration from drifting on a single odd sample
+MIN_RATIO = 0.5
+MAX_RATIO = 2.0
+
+
+def approximate_tokens(text: str) -> int:
+    """Uncalibrated local token estimate for ``text``."""
+    count = 0
+    for match in _PIECES.finditer(text):
+        piece = match.group()
+        first = piece[0]
+        if first.isalpha():
+            # Common words are one token, long identifiers split every ~6 chars
+            count += 1 + (len(piece) - 1) // 6
+        elif first in " \t":
+            # A single space merges into the next word; indentation runs cost one
+            count += 1 if len(piece) > 1 else 0
+        else:
+            count += 1
+    return count
+
+
+class TokenCounter:
+    """Cached, calibrated token counter."""
+
+    def __init__(self, count_fn: Optional[Callable[[str], int]] = None, cache_size: int = 4096,
+                 smoothing: float = 0.2):
+        """
+        Initialize counter.
+
+        Args:
+            count_fn: Optional exact counter (e.g. the provider's count_tokens API)
+            cache_size: Number of texts whose counts are kept
+            smoothing: Weight of each new sample in the calibration ratio
+        """
+        self.count_fn = count_fn
+        self.cache_size = cache_size
+        self.smoothing = smoothing
+        self.ratio = 1.0
+        self.samples = 0
+        self._estimates: OrderedDict = OrderedDict()
+        self._exact = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(text: str) -> str:
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def _raw(self, key: str, text: str) -> int:
+        with self._lock:
+            if key in self._estimates:
+                self._estimates.move_to_end(key)
+                return self._estimates[key]
+        raw = approximate_tokens(text)
+        with self._lock:
+            self._estimates[key] = raw
+            if len(self._estimates) > self.cache_size:
+                self._estimates.popitem(last=False)
+        return raw
+
+    def count(self, text: str, exact: bool = False) -> int:
+        """
+        Count tokens in ``text``.
+
+        Args:
+            text: Text to count
+            exact: Ask ``count_fn`` for an exact count (cached, and used to calibrate)
+
+        Returns:
+            Exact count if known, otherwise the calibrated local estimate
+        """
+        if not text:
+            return 0
+        key = self._key(text)
+        if key in self._exact:
+            return self._exact[key]
+        if exact and self.count_fn is not None:
+            try:
+                actual = int(self.count_fn(text))
+            except Exception:
+                actual = None
+            if actual is not None:
+                self._exact[key] = actual
+                self._calibrate(self._raw(key, text), actual)
+                return actual
+        return max(1, round(self._raw(key, text) * self.ratio))
+
+    def observe(self, text: str, actual_tokens: int):
+        """Calibrate against the real token count of a completed call."""
+        if text and actual_tokens:
+            self._calibrate(self._raw(self._key(text), text), actual_tokens)
+
+    def _calibrate(self, raw: int, actual: int):
+        if raw <= 0:
+            return
+        sample = min(MAX_RATIO, max(MIN_RATIO, actual / raw))
+        with self._lock:
+            weight = 1.0 if self.samples == 0 else self.smoothing
+            self.ratio += weight * (sample - self.ratio)
+            self.samples += 1
+
+
+_default_counter = TokenCounter()
+
+
+def get_token_counter() -> TokenCounter:
+    """Process-wide counter for callers without an LLM client at hand."""
+    return _default_counter
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens with the process-wide counter."""
+    return _default_counter.count(text)
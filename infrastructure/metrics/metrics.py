@@ -8,9 +8,11 @@ class Metrics:
     def __init__(self):
         self.metrics: Dict[str, Any] = {
             "retrieval_precision": 0.0,
+            "retrieval_cache_hit": False,
             "patch_attempts": 0,
             "patch_successes": 0,
             "token_usage": 0,
+            "token_estimate_error": 0.0,
             "total_time": 0.0,
             "start_time": time.time()
         }
@@ -18,12 +20,30 @@ class Metrics:
     def record_retrieval(self, precision: float):
         self.metrics["retrieval_precision"] = precision
 
+    def record_retrieval_cache(self, hit: bool):
+        self.metrics["retrieval_cache_hit"] = hit
+
     def record_attempt(self, success: bool, tokens: int):
         self.metrics["patch_attempts"] += 1
         if success:
             self.metrics["patch_successes"] += 1
         self.metrics["token_usage"] += tokens
 
+    def record_token_estimate(self, estimated: int, actual: int):
+        """Track mean relative error of local prompt token estimates."""
+        if not actual:
+            return
+        n = self.metrics.setdefault("token_estimate_samples", 0)
+        error = abs(estimated - actual) / actual
+        self.metrics["token_estimate_error"] = (self.metrics["token_estimate_error"] * n + error) / (n + 1)
+        self.metrics["token_estimate_samples"] = n + 1
+
+    def record_llm(self, stats: Dict[str, Any]):
+        self.metrics["llm"] = stats
+
+    def record_context_cache(self, stats: Dict[str, Any]):
+        self.metrics["context_cache"] = stats
+
     def save(self, path: str):
         self.metrics["total_time"] = time.time() - self.metrics["start_time"]
         with open(path, 'w') as f:
@@ -1,7 +1,7 @@
 """Chunk selector using FAISS and embeddings."""
 import os
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 import numpy as np
 from dataclasses import dataclass
 
@@ -10,7 +10,10 @@ try:
 except ImportError:
     faiss = None
 
+from infrastructure.code_graph.file_classifier import FileClassifier, ExclusionReport, byte_size
 from infrastructure.retrieval.embed_adapter import EmbedAdapter
+from infrastructure.retrieval.trigram_index import TrigramIndex, extract_exact_terms
+from infrastructure.retrieval.shard_router import IndexShard, ShardRouter, find_package_roots, group_by_shard
 
 logger = logging.getLogger(__name__)
 
@@ -23,22 +26,34 @@ class Chunk:
     metadata: Dict[str, Any]
 
 class ChunkSelector:
-    def __init__(self, repo_path: str, chunk_size: int = 100, overlap: int = 10):
+    def __init__(self, repo_path: str, chunk_size: int = 100, overlap: int = 10,
+                 shard_min_chunks: int = 2000, shards_to_search: int = 3):
         self.repo_path = repo_path
         self.chunk_size = chunk_size
         self.overlap = overlap
+        # Repos with at least shard_min_chunks chunks are sharded by package root
+        self.shard_min_chunks = shard_min_chunks
+        self.shards_to_search = shards_to_search
         self.chunks: List[Chunk] = []
+        self.package_roots: List[str] = []
         self.index = None
+        self.router = None
+        self.trigram_index = None
         self.embed_adapter = EmbedAdapter()
+        self.classifier = FileClassifier()
+        self.exclusion_report = ExclusionReport()
 
     def ingest(self):
         """Scan repo and chunk files."""
         self.chunks = []
+        self.exclusion_report = ExclusionReport()
+        file_paths = []
         exclude_dirs = {'.git', '.yarn', 'node_modules', 'dist', 'build', '.venv', '__pycache__', 'vendor'}
         
         for root, dirs, files in os.walk(self.repo_path):
             dirs[:] = [d for d in dirs if d not in exclude_dirs]
             
+            file_paths.extend(os.path.relpath(os.path.join(root, f), self.repo_path) for f in files)
             for file in files:
                 if file.endswith(('.lock', '.png', '.jpg', '.pyc', '.min.js')):
                     continue
@@ -47,12 +62,22 @@ class ChunkSelector:
                 try:
                     with open(file_path, 'r', encoding='utf-8') as f:
                         content = f.read()
+                        rel_path = os.path.relpath(file_path, self.repo_path)
+                        reason = self.classifier.classify(rel_path, content)
+                        if reason:
+                            self.exclusion_report.add(rel_path, reason, byte_size(content))
+                            continue
                         self._chunk_file(file_path, content)
                 except UnicodeDecodeError:
                     continue # Skip binary
                 except Exception as e:
                     logger.warning(f"Failed to process {file_path}: {e}")
 
+        excluded = self.exclusion_report.summary()
+        if excluded['files_excluded']:
+            logger.info(f"Excluded {excluded['files_excluded']} generated/vendored files: {excluded['by_reason']}")
+
+        self.package_roots = find_package_roots(file_paths)
         self._build_index()
 
     def _chunk_file(self, file_path: str, content: str):
@@ -77,35 +102,113 @@ class ChunkSelector:
         if not self.chunks:
             return
 
+        self.trigram_index = TrigramIndex.from_texts(c.content for c in self.chunks)
+
         texts = [c.content for c in self.chunks]
-        embeddings = self.embed_adapter.embed_texts(texts)
-        
-        dim = embeddings.shape[1]
-        
-        if faiss:
-            self.index = faiss.IndexFlatL2(dim)
-            self.index.add(embeddings)
+        embeddings = np.asarray(self.embed_adapter.embed_texts(texts), dtype=np.float32)
+
+        groups = group_by_shard([c.file_path for c in self.chunks], self.package_roots)
+        if len(self.chunks) >= self.shard_min_chunks and len(groups) > self.shards_to_search:
+            shards = []
+            for name, chunk_ids in groups.items():
+                vectors = embeddings[chunk_ids]
+                shards.append(IndexShard(
+                    name=name,
+                    chunk_ids=chunk_ids,
+                    index=self._make_index(vectors),
+                    centroid=vectors.mean(axis=0)
+                ))
+            self.router = ShardRouter(shards)
+            self.index = None
+            logger.info(f"Built {len(shards)} index shards over {len(self.chunks)} chunks")
         else:
-            # Simple fallback if FAISS missing
-            self.index = embeddings # Store raw vectors
+            self.router = None
+            self.index = self._make_index(embeddings)
+
+    def _make_index(self, embeddings: np.ndarray):
+        if faiss:
+            index = faiss.IndexFlatL2(embeddings.shape[1])
+            index.add(embeddings)
+            return index
+        # Simple fallback if FAISS missing
+        return embeddings # Store raw vectors
+
+    def _search(self, index, query_vec: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        """Return (position, score) pairs from one index, higher score is better."""
+        if faiss and isinstance(index, faiss.IndexFlatL2):
+            D, I = index.search(np.array([query_vec]), k)
+            return [(int(i), -float(d)) for i, d in zip(I[0], D[0]) if i >= 0]
+        # Numpy cosine similarity fallback
+        scores = np.dot(index, query_vec)
+        return [(int(i), float(scores[i])) for i in np.argsort(scores)[::-1][:k]]
 
-    def query(self, query_text: str, top_k: int = 5) -> List[Chunk]:
+    def exact_matches(self, query_text: str) -> List[Tuple[int, int]]:
+        """Return (chunk index, matched term count) for exact query terms, best first."""
+        if self.trigram_index is None:
+            return []
+        counts = self.trigram_index.match_terms(extract_exact_terms(query_text))
+        return sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+
+    def query(self, query_text: str, top_k: int = 5, labels: Optional[List[str]] = None) -> List[Chunk]:
         if not self.chunks:
             return []
 
+        # Exact identifier hits go first, dense results fill the remainder
+        results = []
+        for idx, count in self.exact_matches(query_text)[:top_k]:
+            self.chunks[idx].metadata.update({"exact_matches": count, "score": float(count)})
+            results.append(self.chunks[idx])
+        if len(results) >= top_k:
+            return results
+        seen = {id(c) for c in results}
+
         query_vec = self.embed_adapter.embed_texts([query_text])[0]
+        k = top_k + len(results)  # Leave room for duplicates of exact hits
         
-        if faiss and isinstance(self.index, faiss.IndexFlatL2):
-            D, I = self.index.search(np.array([query_vec]), top_k)
-            indices = I[0]
+        if self.router is not None:
+            # Search only the shards the router picks, then merge by score
+            hits = []
+            for shard in self.router.route(query_text, query_vec, labels, top_n=self.shards_to_search):
+                for pos, score in self._search(shard.index, query_vec, k):
+                    hits.append((shard.chunk_ids[pos], score))
+            hits.sort(key=lambda hit: hit[1], reverse=True)
         else:
-            # Numpy cosine similarity fallback
-            scores = np.dot(self.index, query_vec)
-            indices = np.argsort(scores)[::-1][:top_k]
+            hits = self._search(self.index, query_vec, k)
 
-        results = []
-        for idx in indices:
-            if idx < len(self.chunks) and idx >= 0:
+        for idx, score in hits:
+            if len(results) >= top_k:
+                break
+            if idx < len(self.chunks) and idx >= 0 and id(self.chunks[idx]) not in seen:
+                self.chunks[idx].metadata["score"] = score
                 results.append(self.chunks[idx])
         
         return results
+
+    def load_chunks(self, refs: List[Dict[str, Any]]) -> List[Chunk]:
+        """
+        Rebuild chunks from cached references without ingesting the repo.
+        
+        Args:
+            refs: Dicts with file_path, start_line, end_line and score
+            
+        Returns:
+            List of chunks read from disk, in the given order
+        """
+        chunks = []
+        for ref in refs:
+            file_path = os.path.join(self.repo_path, ref["file_path"])
+            try:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    lines = f.read().splitlines()
+            except (OSError, UnicodeDecodeError) as e:
+                logger.warning(f"Cached chunk {ref['file_path']} unreadable: {e}")
+                continue
+            content = '\n'.join(lines[ref["start_line"] - 1:ref["end_line"]])
+            chunks.append(Chunk(
+                file_path=ref["file_path"],
+                start_line=ref["start_line"],
+                end_line=ref["end_line"],
+                content=content,
+                metadata={"len": len(content), "score": ref.get("score")}
+            ))
+        return chunks
@@ -0,0 +1,95 @@
+"""Cross-encoder rerank stage for retrieved chunks.
+
+Dense top-k is noisy, so callers ask for a wide candidate set (~50) and let a
+small local cross-encoder score (issue, chunk) pairs on CPU, keeping only the
+best few. Scoring runs in batches and stops when the latency budget is spent;
+candidates that were not scored keep their dense order after the scored ones.
+"""
+import time
+import logging
+from typing import Any, Dict, List, Optional
+
+from infrastructure.retrieval.chunk_selector import Chunk
+
+logger = logging.getLogger(__name__)
+
+
+class CrossEncoderReranker:
+    """Batched CPU cross-encoder reranker with a latency budget."""
+
+    def __init__(self, model: str = "cross-encoder/ms-marco-MiniLM-L-6-v2", batch_size: int = 16,
+                 latency_budget_ms: float = 1500.0, max_chars: int = 2000):
+        """
+        Initialize reranker.
+
+        Args:
+            model: sentence-transformers cross-encoder model name
+            batch_size: Number of (query, chunk) pairs scored per forward pass
+            latency_budget_ms: Stop scoring new batches once this much time is spent
+            max_chars: Chunk characters passed to the model (it truncates anyway)
+        """
+        self.model_name = model
+        self.batch_size = batch_size
+        self.latency_budget_ms = latency_budget_ms
+        self.max_chars = max_chars
+        self.last_stats: Dict[str, Any] = {}
+        self.model = None
+        try:
+            from sentence_transformers import CrossEncoder
+            self.model = CrossEncoder(model, device="cpu")
+        except ImportError:
+            logger.info("sentence-transformers not installed, rerank stage disabled")
+        except Exception as e:
+            logger.warning(f"Failed to load cross-encoder {model}: {e}")
+
+    @property
+    def available(self) -> bool:
+        return self.model is not None
+
+    def rerank(self, query_text: str, chunks: List[Chunk], top_n: int = 5,
+               latency_budget_ms: Optional[float] = None) -> List[Chunk]:
+        """
+        Rerank candidate chunks and keep the best ``top_n``.
+
+        Args:
+            query_text: Issue text
+            chunks: Candidates from ``ChunkSelector.query``, best first
+            top_n: Number of chunks to keep
+            latency_budget_ms: Override the default latency budget
+
+        Returns:
+            Up to ``top_n`` chunks, highest cross-encoder score first
+        """
+        budget = self.latency_budget_ms if latency_budget_ms is None else latency_budget_ms
+        if not self.available or not chunks:
+            self.last_stats = {"candidates": len(chunks), "scored": 0, "elapsed_ms": 0.0,
+                               "budget_exhausted": False}
+            return chunks[:top_n]
+
+        start = time.perf_counter()
+        scored = []
+        budget_exhausted = False
+        for i in range(0, len(chunks), self.batch_size):
+            if (time.perf_counter() - start) * 1000 > budget:
+                budget_exhausted = True
+                break
+            batch = chunks[i:i + self.batch_size]
+            pairs = [(query_text, f"{c.file_path}\n{c.content[:self.max_chars]}") for c in batch]
+            scores = self.model.predict(pairs, batch_size=len(pairs), show_progress_bar=False)
+            for chunk, score in zip(batch, scores):
+                chunk.metadata["rerank_score"] = float(score)
+                scored.append(chunk)
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.last_stats = {
+            "candidates": len(chunks),
+            "scored": len(scored),
+            "elapsed_ms": round(elapsed_ms, 1),
+            "budget_exhausted": budget_exhausted,
+        }
+        if budget_exhausted:
+            logger.warning(f"Rerank budget of {budget:.0f}ms spent after {len(scored)}/{len(chunks)} candidates")
+
+        scored.sort(key=lambda c: c.metadata["rerank_score"], reverse=True)
+        unscored = chunks[len(scored):]
+        return (scored + unscored)[:top_n]
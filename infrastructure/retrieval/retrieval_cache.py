@@ -0,0 +1,127 @@
+"""Retrieval result cache keyed by index version and query.
+
+Retried issues (another ``cli.py solve``, an ``Orchestrator`` rerun) ask the
+same question of the same code. The cache stores the selected chunk ids and
+scores under (repo, indexed commit, retriever config, normalized query hash),
+so reruns skip ingestion, indexing and scoring entirely. Entries for older
+index versions of a repo are dropped whenever a new version is written.
+"""
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(query_text: str) -> str:
+    """Lowercase and collapse whitespace so trivially different queries share a key."""
+    return re.sub(r'\s+', ' ', query_text).strip().lower()
+
+
+def query_hash(query_text: str) -> str:
+    """Return the hash of a normalized query."""
+    return hashlib.sha256(normalize_query(query_text).encode('utf-8')).hexdigest()
+
+
+def config_hash(config: Dict[str, Any]) -> str:
+    """Return a stable hash of retriever settings."""
+    return hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def index_version(repo_path: str) -> Optional[str]:
+    """
+    Return the version of the code being indexed.
+
+    This is the HEAD commit, plus a hash of uncommitted changes if the working
+    tree is dirty (e.g. a patch applied by a previous validation run). Untracked
+    files that are not ignored count as changes, by path and content.
+
+    Args:
+        repo_path: Path to a git checkout
+
+    Returns:
+        Version string, or None if the path is not a git repository
+    """
+    try:
+        from git import Repo
+        repo = Repo(repo_path)
+        version = repo.head.commit.hexsha
+        untracked = sorted(repo.untracked_files)
+        if untracked or repo.is_dirty(untracked_files=False):
+            digest = hashlib.sha256(repo.git.diff('HEAD').encode('utf-8'))
+            for rel_path in untracked:
+                digest.update(b'\0' + rel_path.encode('utf-8') + b'\0')
+                try:
+                    digest.update(hashlib.sha256((Path(repo_path) / rel_path).read_bytes()).digest())
+                except OSError:
+                    continue
+            version += ':' + digest.hexdigest()[:12]
+        return version
+    except Exception as e:
+        logger.debug(f"Cannot determine index version for {repo_path}: {e}")
+        return None
+
+
+class RetrievalCache:
+    """SQLite cache of retrieval results."""
+
+    def __init__(self, db_path: str = "data/db/openfix.db"):
+        """Initialize cache connection."""
+        self.db_path = db_path
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS retrieval_cache (
+                repo TEXT NOT NULL,
+                index_version TEXT NOT NULL,
+                config_hash TEXT NOT NULL,
+                query_hash TEXT NOT NULL,
+                results TEXT NOT NULL,  -- JSON array of {file_path, start_line, end_line, score}
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (repo, index_version, config_hash, query_hash)
+            )
+        """)
+        self.conn.commit()
+
+    def get(self, repo: str, version: str, config_key: str, query_key: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Look up cached retrieval results.
+
+        Args:
+            repo: Repository URL or path
+            version: Index version (see ``index_version``)
+            config_key: Retriever config hash
+            query_key: Normalized query hash
+
+        Returns:
+            List of chunk references with scores, or None on a miss
+        """
+        row = self.conn.execute(
+            """SELECT results FROM retrieval_cache
+               WHERE repo = ? AND index_version = ? AND config_hash = ? AND query_hash = ?""",
+            (repo, version, config_key, query_key)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, repo: str, version: str, config_key: str, query_key: str,
+            results: List[Dict[str, Any]]):
+        """Store retrieval results and drop entries for older index versions."""
+        self.conn.execute(
+            "DELETE FROM retrieval_cache WHERE repo = ? AND index_version != ?",
+            (repo, version)
+        )
+        self.conn.execute(
+            """INSERT OR REPLACE INTO retrieval_cache
+               (repo, index_version, config_hash, query_hash, results)
+               VALUES (?, ?, ?, ?, ?)""",
+            (repo, version, config_key, query_key, json.dumps(results))
+        )
+        self.conn.commit()
+
+    def close(self):
+        """Close cache connection."""
+        self.conn.close()
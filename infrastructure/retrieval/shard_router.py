@@ -0,0 +1,150 @@
+"""Shard routing for retrieval over large monorepos.
+
+Chunks are grouped into shards by package root: the outermost directory
+holding a package manifest, else the second-level directory under a common
+container directory (``packages/api``, ``apps/web``, ``services/auth``), else
+the top-level directory. A router scores each shard from path mentions, issue
+labels and the shard's embedding centroid so that a query only searches the
+few shards it is likely to concern.
+"""
+import re
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ROOT_SHARD = "."
+CONTAINER_DIRS = {"apps", "components", "crates", "libs", "modules", "packages", "plugins", "projects", "services"}
+PACKAGE_MANIFESTS = {"package.json", "pyproject.toml", "setup.py", "Cargo.toml", "go.mod", "pom.xml",
+                     "build.gradle", "build.gradle.kts"}
+
+_PATH_PATTERN = re.compile(r'[\w.\-]+(?:/[\w.\-]+)+')
+_WORD_PATTERN = re.compile(r'[a-z0-9]+')
+
+
+def shard_name(file_path: str, package_roots: Iterable[str] = ()) -> str:
+    """
+    Return the shard a repo-relative file path belongs to.
+
+    Args:
+        file_path: Repo-relative file path
+        package_roots: Directories holding a package manifest (see ``find_package_roots``)
+    """
+    path = file_path.replace('\\', '/')
+    for root in package_roots:
+        if path.startswith(root + '/'):
+            return root
+    parts = path.split('/')
+    if len(parts) > 2 and parts[0] in CONTAINER_DIRS:
+        return '/'.join(parts[:2])
+    return parts[0] if len(parts) > 1 else ROOT_SHARD
+
+
+def find_package_roots(file_paths: Iterable[str]) -> List[str]:
+    """
+    Return the outermost non-root directories holding a package manifest.
+
+    Manifests nested inside another package (fixtures, examples) do not split it.
+    """
+    manifest_dirs = set()
+    for path in file_paths:
+        directory, _, name = path.replace('\\', '/').rpartition('/')
+        if directory and name in PACKAGE_MANIFESTS:
+            manifest_dirs.add(directory)
+    outermost: List[str] = []
+    for root in sorted(manifest_dirs, key=lambda d: (d.count('/'), d)):
+        if not any(root.startswith(parent + '/') for parent in outermost):
+            outermost.append(root)
+    return outermost
+
+
+@dataclass
+class IndexShard:
+    name: str
+    chunk_ids: List[int]
+    index: Any
+    centroid: np.ndarray
+    tokens: set = field(default_factory=set)
+
+
+class ShardRouter:
+    """Scores shards for a query and picks the ones worth searching."""
+
+    def __init__(self, shards: List[IndexShard], path_weight: float = 1.0,
+                 label_weight: float = 0.5, centroid_weight: float = 1.0):
+        """
+        Initialize router.
+
+        Args:
+            shards: Shards built over the repository
+            path_weight: Bonus when the query mentions a path inside the shard
+            label_weight: Bonus when an issue label matches the shard name
+            centroid_weight: Weight of cosine similarity to the shard centroid
+        """
+        self.shards = shards
+        self.path_weight = path_weight
+        self.label_weight = label_weight
+        self.centroid_weight = centroid_weight
+        for shard in shards:
+            shard.tokens = set(_WORD_PATTERN.findall(shard.name.lower())) - CONTAINER_DIRS
+
+    def score_shards(self, query_text: str, query_vec: np.ndarray,
+                     labels: Optional[List[str]] = None) -> List[Tuple[IndexShard, float]]:
+        """
+        Score every shard for a query.
+
+        Args:
+            query_text: Issue text
+            query_vec: Query embedding
+            labels: Optional issue labels
+
+        Returns:
+            List of (shard, score) tuples sorted by score, best first
+        """
+        paths = _PATH_PATTERN.findall(query_text)
+        words = set(_WORD_PATTERN.findall(query_text.lower()))
+        label_tokens = set()
+        for label in labels or []:
+            label_tokens |= set(_WORD_PATTERN.findall(label.lower()))
+
+        query_norm = np.linalg.norm(query_vec) or 1.0
+        scored = []
+        for shard in self.shards:
+            score = 0.0
+
+            # Path mentions ("packages/api/src/x.ts") or the bare package directory name
+            if any(p.startswith(shard.name + '/') for p in paths):
+                score += self.path_weight
+            elif shard.name != ROOT_SHARD and shard.name.rsplit('/', 1)[-1].lower() in words:
+                score += self.path_weight * 0.5
+
+            if shard.tokens & label_tokens:
+                score += self.label_weight
+
+            centroid_norm = np.linalg.norm(shard.centroid) or 1.0
+            score += self.centroid_weight * float(
+                np.dot(shard.centroid, query_vec) / (centroid_norm * query_norm)
+            )
+            scored.append((shard, score))
+
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored
+
+    def route(self, query_text: str, query_vec: np.ndarray,
+              labels: Optional[List[str]] = None, top_n: int = 3) -> List[IndexShard]:
+        """Return the ``top_n`` shards to search for a query."""
+        scored = self.score_shards(query_text, query_vec, labels)
+        logger.debug("Shard scores: %s", [(s.name, round(v, 3)) for s, v in scored[:top_n]])
+        return [shard for shard, _ in scored[:top_n]]
+
+
+def group_by_shard(file_paths: List[str], package_roots: Iterable[str] = ()) -> Dict[str, List[int]]:
+    """Group chunk positions by shard name."""
+    package_roots = list(package_roots)
+    groups: Dict[str, List[int]] = {}
+    for i, path in enumerate(file_paths):
+        groups.setdefault(shard_name(path, package_roots), []).append(i)
+    return groups
@@ -0,0 +1,191 @@
+"""Trigram index for exact identifier and regex lookup over code chunks.
+
+Works like a tiny zoekt: every document is broken into lowercase trigrams,
+queries are narrowed to candidate documents by intersecting posting lists and
+the candidates are then verified against the real text.
+"""
+import re
+from typing import Dict, Iterable, List, Optional, Set
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+# Exact terms worth looking up: `backticked`, "quoted", snake_case, dotted.names,
+# CamelCase and SCREAMING_CASE identifiers.
+_BACKTICK_PATTERN = re.compile(r'`([^`\n]{3,120})`')
+_QUOTED_PATTERN = re.compile(r'"([^"\n]{3,120})"|\'([^\'\n]{3,120})\'')
+_IDENTIFIER_PATTERN = re.compile(
+    r'\b(?:[A-Za-z_]\w*_\w+'                # snake_case / SCREAMING_CASE
+    r'|[A-Za-z_]\w*(?:\.[A-Za-z_]\w*)+'    # dotted.names
+    r'|[a-z]+[A-Z]\w*'                     # camelCase
+    r'|[A-Z][a-z0-9]+[A-Z]\w*)\b'          # CamelCase
+)
+
+
+def trigrams(text: str) -> Set[str]:
+    """Return the set of lowercase trigrams in a string."""
+    lowered = text.lower()
+    return {lowered[i:i + 3] for i in range(len(lowered) - 2)}
+
+
+def extract_exact_terms(issue_text: str, max_terms: int = 20) -> List[str]:
+    """
+    Extract identifiers, config keys and error strings from issue text.
+
+    Args:
+        issue_text: Issue title and body combined
+        max_terms: Maximum number of terms to return
+
+    Returns:
+        De-duplicated list of terms, in order of appearance
+    """
+    terms = []
+    terms.extend(_BACKTICK_PATTERN.findall(issue_text))
+    terms.extend(a or b for a, b in _QUOTED_PATTERN.findall(issue_text))
+    terms.extend(_IDENTIFIER_PATTERN.findall(issue_text))
+
+    seen = set()
+    unique = []
+    for term in terms:
+        term = term.strip()
+        if len(term) < 3 or term in seen:
+            continue
+        seen.add(term)
+        unique.append(term)
+    return unique[:max_terms]
+
+
+class TrigramIndex:
+    """Inverted trigram index answering substring and regex queries."""
+
+    def __init__(self):
+        self.postings: Dict[str, Set[int]] = {}
+        self.documents: List[str] = []
+
+    @classmethod
+    def from_texts(cls, texts: Iterable[str]) -> "TrigramIndex":
+        """Build an index where document ids are positions in ``texts``."""
+        index = cls()
+        for text in texts:
+            index.add(text)
+        return index
+
+    def add(self, text: str) -> int:
+        """
+        Add a document to the index.
+
+        Args:
+            text: Document content
+
+        Returns:
+            Document id
+        """
+        doc_id = len(self.documents)
+        self.documents.append(text)
+        for gram in trigrams(text):
+            self.postings.setdefault(gram, set()).add(doc_id)
+        return doc_id
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def _candidates(self, literals: Iterable[str]) -> Optional[Set[int]]:
+        """Intersect posting lists for the given literals (None = all docs)."""
+        grams = set()
+        for literal in literals:
+            grams |= trigrams(literal)
+        if not grams:
+            return None
+
+        # Intersect smallest posting lists first
+        lists = sorted((self.postings.get(g, set()) for g in grams), key=len)
+        result = set(lists[0])
+        for posting in lists[1:]:
+            if not result:
+                break
+            result &= posting
+        return result
+
+    def search(self, needle: str, case_sensitive: bool = True) -> List[int]:
+        """
+        Find documents containing an exact substring.
+
+        Args:
+            needle: Substring to look for
+            case_sensitive: Whether the verification step respects case
+
+        Returns:
+            Sorted list of matching document ids
+        """
+        if not needle:
+            return []
+        candidates = self._candidates([needle])
+        if candidates is None:
+            candidates = range(len(self.documents))
+
+        if case_sensitive:
+            return sorted(d for d in candidates if needle in self.documents[d])
+        lowered = needle.lower()
+        return sorted(d for d in candidates if lowered in self.documents[d].lower())
+
+    def search_regex(self, pattern: str, flags: int = 0) -> List[int]:
+        """
+        Find documents matching a regular expression.
+
+        Literal runs that every match must contain are used to narrow the
+        candidate set; patterns without such runs fall back to a full scan.
+
+        Args:
+            pattern: Regular expression
+            flags: ``re`` flags
+
+        Returns:
+            Sorted list of matching document ids
+        """
+        compiled = re.compile(pattern, flags)
+        candidates = self._candidates(_required_literals(pattern, flags))
+        if candidates is None:
+            candidates = range(len(self.documents))
+        return sorted(d for d in candidates if compiled.search(self.documents[d]))
+
+    def match_terms(self, terms: Iterable[str]) -> Dict[int, int]:
+        """
+        Count how many distinct terms each document contains.
+
+        Args:
+            terms: Exact terms (see ``extract_exact_terms``)
+
+        Returns:
+            Dict mapping document id to number of matched terms
+        """
+        counts: Dict[int, int] = {}
+        for term in terms:
+            for doc_id in self.search(term):
+                counts[doc_id] = counts.get(doc_id, 0) + 1
+        return counts
+
+
+def _required_literals(pattern: str, flags: int = 0) -> List[str]:
+    """Return literal runs at the top level of a regex that every match contains."""
+    try:
+        parsed = sre_parse.parse(pattern, flags)
+    except Exception:
+        return []
+
+    literals = []
+    current = []
+    for op, arg in parsed:
+        if op is sre_parse.LITERAL:
+            current.append(chr(arg))
+            continue
+        if len(current) >= 3:
+            literals.append(''.join(current))
+        current = []
+        if op is sre_parse.BRANCH:
+            # Alternation at the top level: nothing is guaranteed
+            return []
+    if len(current) >= 3:
+        literals.append(''.join(current))
+    return literals
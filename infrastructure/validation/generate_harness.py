@@ -1,30 +1,25 @@
 #!/usr/bin/env python3
 """Generate validation harness using Gemini 2.5 Pro."""
-import os
 import sys
-import google.generativeai as genai
+from pathlib import Path
 
-# Get API key from environment
-api_key = os.getenv("GEMINI_API_KEY")
-if not api_key:
-    print("Error: GEMINI_API_KEY not set")
-    sys.exit(1)
+# Add repo root to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from infrastructure.llm_pool.provider import get_provider
 
-genai.configure(api_key=api_key)
+try:
+    provider = get_provider("gemini-2.5-pro", {"temperature": 0.0, "max_output_tokens": 8000})
+except ValueError as e:
+    print(f"Error: {e}")
+    sys.exit(1)
 
 # Read prompt
 with open("infrastructure/validation/harness_prompt.txt", "r") as f:
     prompt = f.read()
 
 # Call Gemini 2.5 Pro
-model = genai.GenerativeModel("gemini-2.5-pro")
-response = model.generate_content(
-    prompt,
-    generation_config=genai.GenerationConfig(
-        temperature=0.0,
-        max_output_tokens=8000
-    )
-)
+response = provider.generate(prompt)
 
 # Output response
 print(response.text)
@@ -1,5 +1,5 @@
 #!/bin/bash
-# Usage: ./validate_patch.sh --run-id <id> --task-id <id> --repo-dir <path> --patch <path> [--allow-network]
+# Usage: ./validate_patch.sh --run-id <id> --task-id <id> --repo-dir <path> --patch <path> [--output-dir <path>] [--allow-network]
 #
 # Validates an AI-generated patch by applying it, running tests and linters.
 # Produces validation.json with verdict: pass/fail/inconclusive
@@ -11,6 +11,7 @@ RUN_ID=""
 TASK_ID=""
 REPO_DIR=""
 PATCH_FILE=""
+OUTPUT_DIR=""
 ALLOW_NETWORK=0
 
 while [[ $# -gt 0 ]]; do
@@ -19,6 +20,7 @@ while [[ $# -gt 0 ]]; do
         --task-id) TASK_ID="$2"; shift 2 ;;
         --repo-dir) REPO_DIR="$2"; shift 2 ;;
         --patch) PATCH_FILE="$2"; shift 2 ;;
+        --output-dir) OUTPUT_DIR="$2"; shift 2 ;;
         --allow-network) ALLOW_NETWORK=1; shift ;;
         *) echo "Unknown option: $1"; exit 1 ;;
     esac
@@ -32,7 +34,8 @@ if [[ -z "$RUN_ID" ]] || [[ -z "$TASK_ID" ]] || [[ -z "$REPO_DIR" ]] || [[ -z "$
 fi
 
 # Setup paths
-VALIDATION_DIR="/workspace/data/runs/$RUN_ID"
+# --output-dir keeps concurrent validations of one run apart
+VALIDATION_DIR="${OUTPUT_DIR:-/workspace/data/runs/$RUN_ID}"
 mkdir -p "$VALIDATION_DIR"
 STDOUT_LOG="$VALIDATION_DIR/validation_stdout.log"
 STDERR_LOG="$VALIDATION_DIR/validation_stderr.log"
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""Benchmark the cross-encoder rerank stage against plain dense top-k.
+
+Each case in the JSONL file names the files a correct answer must touch:
+
+    {"query": "Dealer hits on soft 17", "files": ["src/dealer.py"]}
+
+For every case the baseline sends the dense top ``--baseline-k`` chunks, the
+rerank variant sends the best ``--top-k`` of ``--candidates`` dense results.
+A case is a hit when any selected chunk belongs to one of the expected files.
+Without sentence-transformers (or the model weights) only the baseline is run.
+
+``scripts/rerank_cases.jsonl`` holds cases for this repository:
+
+    python scripts/benchmark_rerank.py --repo-dir . --cases scripts/rerank_cases.jsonl
+"""
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from infrastructure.retrieval.chunk_selector import ChunkSelector
+from infrastructure.retrieval.reranker import CrossEncoderReranker
+from infrastructure.llm_pool.token_counter import count_tokens
+
+
+def prompt_tokens(chunks) -> int:
+    """Count the prompt tokens spent on context chunks."""
+    return sum(count_tokens(c.content) for c in chunks)
+
+
+def evaluate(chunks, expected_files) -> bool:
+    return any(c.file_path in expected_files for c in chunks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark retrieval reranking")
+    parser.add_argument("--repo-dir", required=True, help="Repository to index")
+    parser.add_argument("--cases", required=True, help="JSONL file of {query, files} cases")
+    parser.add_argument("--baseline-k", type=int, default=10, help="Chunks sent without rerank")
+    parser.add_argument("--top-k", type=int, default=5, help="Chunks kept after rerank")
+    parser.add_argument("--candidates", type=int, default=50, help="Dense candidates fed to the reranker")
+    parser.add_argument("--budget-ms", type=float, default=1500.0, help="Rerank latency budget")
+    parser.add_argument("--output", default="artifacts/rerank_benchmark.json", help="Results path")
+    args = parser.parse_args()
+
+    with open(args.cases, "r") as f:
+        cases = [json.loads(line) for line in f if line.strip()]
+
+    reranker = CrossEncoderReranker(latency_budget_ms=args.budget_ms)
+    if not reranker.available:
+        print("Cross-encoder unavailable, reporting the baseline only", file=sys.stderr)
+
+    selector = ChunkSelector(args.repo_dir)
+    start = time.perf_counter()
+    selector.ingest()
+    print(f"Indexed {len(selector.chunks)} chunks in {time.perf_counter() - start:.1f}s")
+
+    variants = ("baseline", "rerank") if reranker.available else ("baseline",)
+    totals = {name: {"hits": 0, "tokens": 0, "latency_ms": 0.0} for name in variants}
+    budget_exhausted = 0
+    for case in cases:
+        expected = set(case["files"])
+
+        start = time.perf_counter()
+        baseline = selector.query(case["query"], top_k=args.baseline_k)
+        totals["baseline"]["latency_ms"] += (time.perf_counter() - start) * 1000
+        totals["baseline"]["hits"] += evaluate(baseline, expected)
+        totals["baseline"]["tokens"] += prompt_tokens(baseline)
+        if not reranker.available:
+            continue
+
+        start = time.perf_counter()
+        candidates = selector.query(case["query"], top_k=args.candidates)
+        reranked = reranker.rerank(case["query"], candidates, top_n=args.top_k)
+        totals["rerank"]["latency_ms"] += (time.perf_counter() - start) * 1000
+        totals["rerank"]["hits"] += evaluate(reranked, expected)
+        totals["rerank"]["tokens"] += prompt_tokens(reranked)
+        budget_exhausted += reranker.last_stats["budget_exhausted"]
+
+    n = max(len(cases), 1)
+    summary = {
+        name: {
+            "hit_rate": round(t["hits"] / n, 3),
+            "avg_prompt_tokens": t["tokens"] // n,
+            "avg_latency_ms": round(t["latency_ms"] / n, 1),
+        }
+        for name, t in totals.items()
+    }
+    if reranker.available:
+        summary["rerank"]["budget_exhausted"] = budget_exhausted
+    summary["cases"] = len(cases)
+    summary["config"] = vars(args)
+
+    print(f"\n{'Variant':<10} {'Hit rate':>9} {'Tokens':>8} {'Latency':>10}")
+    for name in variants:
+        row = summary[name]
+        print(f"{name:<10} {row['hit_rate']:>9.3f} {row['avg_prompt_tokens']:>8} {row['avg_latency_ms']:>8.1f}ms")
+
+    Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(summary, f, indent=2)
+    print(f"\nSaved results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
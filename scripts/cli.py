@@ -145,7 +145,7 @@ def approve_patch_interactive(report_path: str, patch_path: str, repo_url: str)
         return False
 
 
-def cmd_discover(repo_url: str, limit: int = 10):
+def cmd_discover(repo_url: str, limit: int = 10, concurrency: int = 4, batch_size: int = None):
     """Discover and triage issues."""
     console.print(f"\n[cyan]Discovering issues in {repo_url}...[/cyan]\n")
 
@@ -155,7 +155,11 @@ def cmd_discover(repo_url: str, limit: int = 10):
         repo_url,
         "--limit",
         str(limit),
+        "--concurrency",
+        str(concurrency),
     ]
+    if batch_size:
+        cmd += ["--batch-size", str(batch_size)]
 
     result = subprocess.run(cmd)
 
@@ -199,6 +203,60 @@ def cmd_solve(repo_url: str, issue_number: int, no_confirm: bool = False):
         approve_patch_interactive(report_path, patch_path, repo_url)
 
 
+def cmd_enqueue(repo_url: str, issues: list, issues_from: str = None, priority: int = 0):
+    """Queue (repo, issue) jobs for the worker fleet."""
+    import yaml
+    from data.job_queue import job_queue_from_config
+
+    issues = list(issues or [])
+    if issues_from:
+        with open(issues_from, "r") as f:
+            issues += [c["issue_number"] for c in json.load(f)]
+    if not issues:
+        console.print("[red]No issues given (use --issues or --issues-from)[/red]")
+        return
+
+    with open("config/config.yml", "r") as f:
+        config = yaml.safe_load(f) or {}
+    queue = job_queue_from_config(config)
+    queued = [n for n in issues if queue.enqueue(repo_url, n, priority) is not None]
+    skipped = len(issues) - len(queued)
+    console.print(f"[green]✓ Queued {len(queued)} issues[/green]"
+                  + (f" [yellow]({skipped} already queued or running)[/yellow]" if skipped else ""))
+    console.print(f"Queue: {queue.stats()}")
+    queue.close()
+
+
+def cmd_worker(workers: int = None, per_repo: int = None, drain: bool = False):
+    """Run the solver worker fleet."""
+    cmd = [sys.executable, "scripts/worker.py"]
+    if workers:
+        cmd += ["--workers", str(workers)]
+    if per_repo:
+        cmd += ["--per-repo", str(per_repo)]
+    if drain:
+        cmd.append("--drain")
+
+    try:
+        subprocess.run(cmd)
+    except KeyboardInterrupt:
+        console.print("\n[yellow]Workers stopped[/yellow]")
+
+
+def cmd_train_triage(log_path: str, model_path: str):
+    """Train the local triage classifier on logged remote verdicts."""
+    from infrastructure.llm_pool.local_triage import train_from_log
+
+    if not Path(log_path).exists():
+        console.print(f"[red]No triage verdicts at {log_path}; run discover first[/red]")
+        return
+
+    model = train_from_log(log_path, model_path)
+    console.print(
+        f"[green]✓ Trained local triage on {model.examples} issues, saved to {model_path}[/green]"
+    )
+
+
 def cmd_status():
     """Show pending patches and approvals."""
     console.print("\n[cyan]OpenFix Status[/cyan]\n")
@@ -237,6 +295,13 @@ Examples:
   # Auto-approve (skip confirmation)
   openfix solve https://github.com/owner/repo --issue 123 --no-confirm
 
+  # Queue issues and work through them with 4 solver processes
+  openfix enqueue https://github.com/owner/repo --issues-from artifacts/issues.json
+  openfix worker --workers 4 --drain
+
+  # Train the local triage classifier on earlier verdicts
+  openfix train-triage
+
   # Check status
   openfix status
         """,
@@ -252,6 +317,12 @@ Examples:
     discover_parser.add_argument(
         "--limit", type=int, default=10, help="Max issues to analyze"
     )
+    discover_parser.add_argument(
+        "--concurrency", type=int, default=4, help="Max concurrent triage calls"
+    )
+    discover_parser.add_argument(
+        "--batch-size", type=int, default=None, help="Issues per triage prompt"
+    )
 
     # solve command
     solve_parser = subparsers.add_parser("solve", help="Generate patch for issue")
@@ -267,6 +338,38 @@ Examples:
         "--approve-pr", action="store_true", help="Auto-approve PR creation"
     )
 
+    # enqueue command
+    enqueue_parser = subparsers.add_parser("enqueue", help="Queue issues for the worker fleet")
+    enqueue_parser.add_argument("repo_url", help="GitHub repository URL")
+    enqueue_parser.add_argument("--issues", type=int, nargs="+", help="Issue numbers")
+    enqueue_parser.add_argument(
+        "--issues-from", help="Discovery output file (e.g. artifacts/issues.json)"
+    )
+    enqueue_parser.add_argument(
+        "--priority", type=int, default=0, help="Higher priority jobs run first"
+    )
+
+    # worker command
+    worker_parser = subparsers.add_parser("worker", help="Run solver workers on queued jobs")
+    worker_parser.add_argument("--workers", type=int, default=None, help="Solver processes")
+    worker_parser.add_argument(
+        "--per-repo", type=int, default=None, help="Max concurrent jobs per repository"
+    )
+    worker_parser.add_argument(
+        "--drain", action="store_true", help="Exit once the queue is empty"
+    )
+
+    # train-triage command
+    train_parser = subparsers.add_parser(
+        "train-triage", help="Train the local triage classifier"
+    )
+    train_parser.add_argument(
+        "--log", default="data/triage/verdicts.jsonl", help="Logged remote triage verdicts"
+    )
+    train_parser.add_argument(
+        "--model", default="data/models/triage_nb.json", help="Where to save the model"
+    )
+
     # status command
     status_parser = subparsers.add_parser("status", help="Show pending patches")
 
@@ -277,10 +380,16 @@ Examples:
         return
 
     if args.command == "discover":
-        cmd_discover(args.repo_url, args.limit)
+        cmd_discover(args.repo_url, args.limit, args.concurrency, args.batch_size)
     elif args.command == "solve":
         no_confirm = args.no_confirm or (args.approve_patch and args.approve_pr)
         cmd_solve(args.repo_url, args.issue, no_confirm)
+    elif args.command == "enqueue":
+        cmd_enqueue(args.repo_url, args.issues, args.issues_from, args.priority)
+    elif args.command == "worker":
+        cmd_worker(args.workers, args.per_repo, args.drain)
+    elif args.command == "train-triage":
+        cmd_train_triage(args.log, args.model)
     elif args.command == "status":
         cmd_status()
 
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 """E2E test runner for OpenFix."""
 import sys
+import json
 import argparse
 import logging
 from pathlib import Path
@@ -16,32 +17,80 @@ import yaml
 logger = setup_logger(__name__)
 
 
+def run_batch(solver: SolverAgent, repo_url: str, issue_numbers: list) -> int:
+    """Solve several issues with one clone and index; returns the exit code."""
+    logger.info(f"Starting batch run for {repo_url}: {len(issue_numbers)} issues")
+    results = solver.execute_batch(repo_url, issue_numbers)
+
+    logger.info("=" * 60)
+    logger.info("OpenFix Batch Run Complete")
+    logger.info("=" * 60)
+    for result in results:
+        if result.get("patch_generated"):
+            status = "PASSED" if result.get("validation_passed") else "FAILED validation"
+            logger.info(f"#{result['issue_number']}: ✓ {result['patch_path']} ({status})")
+        else:
+            reason = result.get("reason") or result.get("error")
+            logger.warning(f"#{result['issue_number']}: ✗ No patch generated ({reason})")
+    return 0 if any(r.get("patch_generated") for r in results) else 1
+
+
 def main():
     parser = argparse.ArgumentParser(description="OpenFix E2E Test Runner")
-    parser.add_argument("--repo", required=True, help="Repository URL")
-    parser.add_argument("--issue", type=int, required=True, help="Issue number")
+    parser.add_argument("--repo", help="Repository URL")
+    parser.add_argument("--issue", type=int, help="Issue number")
+    parser.add_argument(
+        "--issues", type=int, nargs="+", metavar="N",
+        help="Solve several issues against one shared clone and index"
+    )
+    parser.add_argument(
+        "--issues-from", metavar="FILE",
+        help="Solve the issues listed in a discovery output file (e.g. artifacts/issues.json)"
+    )
+    parser.add_argument(
+        "--resume", metavar="RUN_ID", help="Resume a crashed run after its last completed stage"
+    )
     parser.add_argument(
         "--config", default="config/config.yml", help="Config file path"
     )
+    parser.add_argument(
+        "--deadline", type=float, help="Seconds allowed for the run (overrides run_deadline_seconds)"
+    )
     parser.add_argument("--verbose", "-v", action="store_true", help="Verbose output")
 
     args = parser.parse_args()
+    if args.issues_from:
+        with open(args.issues_from, "r") as f:
+            args.issues = (args.issues or []) + [c["issue_number"] for c in json.load(f)]
+    if not args.resume and (not args.repo or (args.issue is None and not args.issues)):
+        parser.error("--repo and --issue (or --issues) are required unless --resume is given")
 
     # Setup logging with verbose mode
     if args.verbose:
         logger.setLevel(logging.DEBUG)
 
-    logger.info(f"Starting E2E Run for {args.repo} issue #{args.issue}")
-
     db = None  # Initialize db to None
     try:
         # Load config
         with open(args.config, "r") as f:
             config = yaml.safe_load(f)
+        if args.deadline is not None:
+            config["run_deadline_seconds"] = args.deadline
 
         # Initialize database and agent
         db = Database("data/db/openfix.db")
-        solver = SolverAgent(config, db)
+        if args.resume:
+            run = db.get_run(args.resume)
+            if run is None:
+                logger.error(f"Run {args.resume} not found")
+                sys.exit(1)
+            args.repo, args.issue = run["github_url"], run["github_issue_number"]
+            logger.info(f"Resuming run {args.resume} for {args.repo} issue #{args.issue}")
+        else:
+            logger.info(f"Starting E2E Run for {args.repo} issue #{args.issue}")
+        solver = SolverAgent(config, db, run_id=args.resume)
+        if args.issues and not args.resume:
+            sys.exit(run_batch(solver, args.repo, args.issues))
         
         # Override issue number in config if needed (though execute takes it from repo/issue)
         # Actually solver.execute takes repo_url. But how does it know which issue?
@@ -49,7 +98,7 @@ def main():
         solver.config['issue_number'] = args.issue
 
         # Execute pipeline
-        result = solver.execute(repo_url=args.repo)
+        result = solver.execute(repo_url=args.repo, resume=bool(args.resume))
 
         # Report results
         logger.info("=" * 60)
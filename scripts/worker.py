@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""Solver worker fleet for the OpenFix job queue.
+
+Runs N solver processes that pull (repo, issue) jobs queued with
+``openfix enqueue`` (see ``data/job_queue.py``):
+
+    python scripts/worker.py --workers 4 --per-repo 1
+    python scripts/worker.py --drain          # exit once the queue is empty
+
+Each worker solves every job in a fresh child process and renews the job's
+lease while the child runs; a worker that loses the lease stops the child.
+The supervisor restarts workers that die. A job whose worker crashed is
+retried once its lease expires, and resumes its run after the last completed
+stage.
+"""
+import sys
+import json
+import time
+import signal
+import socket
+import logging
+import argparse
+import multiprocessing
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from data.job_queue import Job, JobQueue, job_queue_from_config
+from infrastructure.utils.logging import setup_logger
+import yaml
+
+logger = setup_logger(__name__)
+
+
+def solve_job(job: Job, config: dict, results):
+    """Run the solver for one job (in its own process) and send a summary back on ``results``."""
+    from agents.solver.solver_agent import SolverAgent
+    from data.database import Database
+
+    db = Database(config.get('db_path', 'data/db/openfix.db'))
+    try:
+        solver = SolverAgent(config, db, run_id=job.run_id)
+        # A retried job continues its run after the last completed stage
+        result = solver.execute(job.repo_url, resume=True, issue_number=job.issue_number)
+        results.send(("done", {
+            'run_id': result.get('run_id'),
+            'patch_generated': result.get('patch_generated', False),
+            'validation_passed': result.get('validation_passed', False),
+            'reason': result.get('reason') or result.get('error'),
+        }))
+    except Exception as e:
+        results.send(("error", str(e)))
+    finally:
+        db.close()
+        results.close()
+
+
+def run_job(queue: JobQueue, job: Job, config: dict, worker_id: str):
+    """
+    Solve one claimed job in a fresh process, renewing its lease while it runs.
+
+    A fresh process per job means no pooled LLM provider state (retry budget,
+    latency history, key quarantine) carries over between jobs. If the lease
+    is lost, the job has been requeued under the same run, so the solve is
+    stopped before it can write that run's stages alongside the next worker.
+    """
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=solve_job, args=(job, config, sender), name=f"openfix-job-{job.id}")
+    process.start()
+    sender.close()
+
+    outcome = None
+    while outcome is None:
+        if receiver.poll(queue.lease_seconds / 3):
+            outcome = receiver.recv()
+        elif not process.is_alive():
+            break
+        elif not queue.heartbeat(job.id, worker_id):
+            logger.warning(f"[{worker_id}] Lost the lease on job {job.id}; stopping its solver")
+            process.terminate()
+            process.join()
+            return
+    process.join()
+    receiver.close()
+
+    if outcome is None:
+        outcome = ("error", f"Solver process exited with code {process.exitcode}")
+    kind, payload = outcome
+    if kind == "error":
+        logger.error(f"[{worker_id}] Job {job.id} ({job.repo_url}#{job.issue_number}) failed: {payload}")
+        status = queue.fail(job.id, worker_id, payload)
+        if status is None:
+            logger.warning(f"[{worker_id}] Lost the lease on job {job.id} before recording its failure")
+        else:
+            logger.info(f"[{worker_id}] Job {job.id} is now {status} (attempt {job.attempts})")
+        return
+
+    # A finished pipeline is a finished job, patch or not; retrying would replay the same run
+    if not queue.complete(job.id, worker_id, json.dumps(payload)):
+        logger.warning(f"[{worker_id}] Lost the lease on job {job.id} before completing it; result discarded")
+        return
+    logger.info(f"[{worker_id}] Job {job.id} done: patch_generated={payload['patch_generated']}")
+
+
+def worker_loop(worker_id: str, config: dict, per_repo: int, drain: bool, poll_seconds: float):
+    """Claim and solve jobs until stopped (or, with ``drain``, until the queue is empty)."""
+    queue = job_queue_from_config(config)
+    logger.info(f"[{worker_id}] Started")
+    try:
+        while True:
+            job = queue.claim(worker_id, per_repo_limit=per_repo)
+            if job is None:
+                if drain and queue.pending() == 0:
+                    logger.info(f"[{worker_id}] Queue empty, exiting")
+                    return
+                time.sleep(poll_seconds)
+                continue
+            logger.info(f"[{worker_id}] Job {job.id}: {job.repo_url}#{job.issue_number} "
+                        f"(attempt {job.attempts}, run {job.run_id})")
+            run_job(queue, job, config, worker_id)
+    finally:
+        queue.close()
+
+
+def supervise(config: dict, workers: int, per_repo: int, drain: bool, poll_seconds: float):
+    """Run ``workers`` processes, restarting any that die until all have finished cleanly."""
+    host = socket.gethostname()
+
+    def start(index: int) -> multiprocessing.Process:
+        worker_id = f"{host}-{index}-{int(time.time())}"
+        process = multiprocessing.Process(
+            target=worker_loop, args=(worker_id, config, per_repo, drain, poll_seconds),
+            name=f"openfix-worker-{index}"
+        )
+        process.start()
+        return process
+
+    processes = {i: start(i) for i in range(workers)}
+    try:
+        while processes:
+            for index, process in list(processes.items()):
+                process.join(timeout=poll_seconds / max(1, len(processes)))
+                if process.is_alive():
+                    continue
+                if process.exitcode == 0:
+                    del processes[index]
+                else:
+                    logger.warning(f"Worker {index} died (exit code {process.exitcode}); restarting")
+                    processes[index] = start(index)
+    except KeyboardInterrupt:
+        logger.info("Stopping workers; their jobs are retried once the leases expire")
+        for process in processes.values():
+            process.terminate()
+        for process in processes.values():
+            process.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenFix solver worker fleet")
+    parser.add_argument(
+        "--config", default="config/config.yml", help="Config file path"
+    )
+    parser.add_argument(
+        "--workers", type=int, help="Solver processes (default: worker_count from config)"
+    )
+    parser.add_argument(
+        "--per-repo", type=int,
+        help="Max concurrent jobs per repository (default: worker_per_repo_concurrency from config)"
+    )
+    parser.add_argument("--drain", action="store_true", help="Exit once the queue is empty")
+    parser.add_argument("--verbose", "-v", action="store_true", help="Verbose output")
+    args = parser.parse_args()
+
+    if args.verbose:
+        logger.setLevel(logging.DEBUG)
+
+    with open(args.config, "r") as f:
+        config = yaml.safe_load(f)
+    workers = args.workers or config.get('worker_count', 2)
+    per_repo = args.per_repo or config.get('worker_per_repo_concurrency', 1)
+
+    queue = job_queue_from_config(config)
+    logger.info(f"Starting {workers} workers ({per_repo} per repo); queue: {queue.stats()}")
+    queue.close()
+
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    supervise(config, workers, per_repo, args.drain, config.get('worker_poll_seconds', 5))
+
+
+if __name__ == "__main__":
+    main()
@@ -27,3 +27,71 @@ def test_chunk_selector_ingest(tmp_path):
     results = selector.query("foo", top_k=1)
     assert len(results) == 1
     assert "test.py" in results[0].file_path
+
+def test_chunk_selector_shard_routing(tmp_path):
+    repo = tmp_path / "repo"
+    for package in ("billing", "auth", "search", "web"):
+        (repo / package).mkdir(parents=True)
+        (repo / package / "module.py").write_text(f"# {package}\n" + "x = 1\n" * 30)
+    
+    selector = ChunkSelector(str(repo), chunk_size=10, overlap=0,
+                             shard_min_chunks=1, shards_to_search=1)
+    selector.ingest()
+    
+    assert selector.router is not None
+    assert len(selector.router.shards) == 4
+    
+    results = selector.query("Rounding error in billing/module.py totals", top_k=3)
+    assert len(results) == 3
+    assert all(r.file_path.startswith("billing") for r in results)
+
+def test_shard_names_follow_package_roots():
+    from infrastructure.retrieval.shard_router import find_package_roots, group_by_shard, shard_name
+    
+    assert shard_name("packages/api/src/x.ts") == "packages/api"
+    assert shard_name("apps/web/index.ts") == "apps/web"
+    assert shard_name("billing/module.py") == "billing"
+    assert shard_name("setup.py") == "."
+    
+    paths = ["tools/lint/pyproject.toml", "tools/lint/check.py", "tools/lint/tests/fixture/setup.py",
+             "tools/fmt/fmt.py", "services/auth/main.go"]
+    roots = find_package_roots(paths)
+    assert roots == ["tools/lint"]
+    assert set(group_by_shard(paths, roots)) == {"tools/lint", "tools", "services/auth"}
+
+def test_monorepo_shard_routing_by_label(tmp_path):
+    repo = tmp_path / "repo"
+    for package in ("api", "web", "billing", "search"):
+        (repo / "packages" / package / "src").mkdir(parents=True)
+        (repo / "packages" / package / "src" / "index.ts").write_text("x = 1\n" * 30)
+    
+    selector = ChunkSelector(str(repo), chunk_size=10, overlap=0,
+                             shard_min_chunks=1, shards_to_search=1)
+    selector.ingest()
+    
+    assert sorted(s.name for s in selector.router.shards) == [
+        "packages/api", "packages/billing", "packages/search", "packages/web"]
+    
+    results = selector.query("Totals are wrong", top_k=2, labels=["pkg: billing"])
+    assert all(r.file_path.startswith("packages/billing/") for r in results)
+
+def test_reranker_orders_by_score_within_budget():
+    from infrastructure.retrieval.chunk_selector import Chunk
+    from infrastructure.retrieval.reranker import CrossEncoderReranker
+    
+    class KeywordModel:
+        def predict(self, pairs, batch_size=None, show_progress_bar=False):
+            return [pair[1].count("dealer") for pair in pairs]
+    
+    reranker = CrossEncoderReranker(batch_size=2)
+    reranker.model = KeywordModel()
+    chunks = [Chunk(f"f{i}.py", 1, 1, "dealer " * i, {}) for i in range(5)]
+    
+    top = reranker.rerank("dealer bug", chunks, top_n=2)
+    assert [c.file_path for c in top] == ["f4.py", "f3.py"]
+    assert reranker.last_stats["scored"] == 5
+    
+    # A spent budget leaves unscored candidates in dense order
+    top = reranker.rerank("dealer bug", chunks, top_n=3, latency_budget_ms=-1)
+    assert [c.file_path for c in top] == ["f0.py", "f1.py", "f2.py"]
+    assert reranker.last_stats["budget_exhausted"]
@@ -0,0 +1,55 @@
+"""Shared fixtures for the unit tests."""
+import itertools
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from infrastructure.llm_pool.backends import ReplayBackend
+from infrastructure.llm_pool.client import GeminiLLM, RateLimiter
+from infrastructure.llm_pool.response_cache import ResponseCache
+
+
+class TextModel:
+    """Returns ``text`` and records the generation config of each call."""
+
+    def __init__(self, text):
+        self.text = text
+        self.configs = []
+
+    def generate_content(self, prompt, generation_config=None):
+        self.configs.append(generation_config)
+        usage = SimpleNamespace(prompt_token_count=100, candidates_token_count=10)
+        return SimpleNamespace(text=self.text, usage_metadata=usage)
+
+
+@pytest.fixture
+def make_llm(tmp_path):
+    """
+    Factory for a GeminiLLM that never touches the network.
+
+    ``make_llm(response)`` answers every prompt with ``response`` (dicts are
+    JSON-encoded) from a ReplayBackend; pass ``backend=`` to use another fake.
+    Each client gets its own response cache file, off unless ``cache_mode`` is set.
+    """
+    counter = itertools.count()
+
+    def make(response=None, backend=None, model_name="test-model", cache_mode="off",
+             prompt_tokens=100, response_tokens=10, **kwargs):
+        if backend is None:
+            backend = ReplayBackend(prompt_tokens=prompt_tokens, response_tokens=response_tokens)
+            if response is not None:
+                backend.add(None, response if isinstance(response, str) else json.dumps(response))
+        cache = ResponseCache(str(tmp_path / f"cache-{next(counter)}.db"), mode=cache_mode)
+        return GeminiLLM(model_name=model_name, rate_limiter=RateLimiter(), backend=backend,
+                         response_cache=cache, **kwargs)
+
+    return make
+
+
+@pytest.fixture
+def text_llm(make_llm):
+    """Factory for a GeminiLLM whose model is a TextModel returning ``text``."""
+    def make(text, **kwargs):
+        return make_llm(backend=TextModel(text), **kwargs)
+    return make
@@ -0,0 +1,76 @@
+"""Unit tests for the content-addressed artifact store."""
+import json
+
+import pytest
+
+from data.artifact_store import ArtifactStore
+
+PATCH = json.dumps({"patch_text": "--- a/x.py\n+++ b/x.py\n@@ -1 +1 @@\n-a\n+b\n", "explanation": "fix"})
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ArtifactStore(root=str(tmp_path / "artifacts"), compression="gzip")
+
+
+class TestArtifactStore:
+    """Test dedup, versions and compression."""
+
+    def test_dedup_across_runs(self, store, tmp_path):
+        """Test identical content is stored once however often it is saved."""
+        content = "def handler():\n    return 42\n" * 50
+        digest = store.save(tmp_path / "run1", "chunk.txt", content)
+        assert store.save(tmp_path / "run2", "chunk.txt", content) == digest
+        assert store.put(content) == digest
+
+        stats = store.stats()
+        assert stats["blobs_written"] == 1
+        assert stats["dedup_hits"] == 2
+        assert stats["bytes_stored"] < len(content) / 10
+        assert len(list((tmp_path / "artifacts" / "blobs").rglob("*.gz"))) == 1
+
+    def test_every_version_kept(self, store, tmp_path):
+        """Test saving a name again adds a version instead of overwriting."""
+        run = tmp_path / "run"
+        store.save(run, "prompt.txt", "first")
+        store.save(run, "prompt.txt", "second")
+        store.save_json(run, "response.json", {"ok": True})
+
+        assert [(e["name"], e["version"]) for e in store.manifest(run)] == [
+            ("prompt.txt", 0), ("prompt.txt", 1), ("response.json", 0)
+        ]
+        assert store.read(run, "prompt.txt", 0) == "first"
+        assert store.read(run, "prompt.txt") == "second"
+        assert json.loads(store.read(run, "response.json")) == {"ok": True}
+        with pytest.raises(KeyError):
+            store.read(run, "prompt.txt", 2)
+
+    def test_versions_continue_in_new_process(self, tmp_path):
+        """Test a second store instance continues a run's numbering."""
+        run = tmp_path / "run"
+        ArtifactStore(root=str(tmp_path / "a"), async_writes=False).save(run, "prompt.txt", "first")
+        store = ArtifactStore(root=str(tmp_path / "a"), async_writes=False)
+        store.save(run, "prompt.txt", "second")
+        assert [e["version"] for e in store.manifest(run)] == [0, 1]
+
+    def test_unknown_compression(self, tmp_path):
+        """Test an unknown codec is rejected."""
+        with pytest.raises(ValueError):
+            ArtifactStore(root=str(tmp_path), compression="lzma")
+
+
+class TestGeminiArtifacts:
+    """Test patch calls saving through the store."""
+
+    def test_repair_iterations_kept(self, store, text_llm, tmp_path):
+        """Test prompts and responses of every call are kept without plain files."""
+        llm = text_llm(PATCH, artifact_store=store)
+        run = tmp_path / "run"
+        assert llm.generate_patch("Issue", [], "org/repo", 1, run)["success"]
+        assert llm.generate_patch("Issue", [], "org/repo", 1, run, validation_results="FAILED")["success"]
+
+        names = [(e["name"], e["version"]) for e in store.manifest(run)]
+        assert names == [("prompt.txt", 0), ("response.json", 0), ("prompt.txt", 1), ("response.json", 1)]
+        assert "FAILED" in store.read(run, "prompt.txt", 1)
+        assert json.loads(store.read(run, "response.json"))["response_text"] == PATCH
+        assert not (run / "prompt.txt").exists()
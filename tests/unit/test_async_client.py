@@ -0,0 +1,61 @@
+"""Unit tests for the async Gemini client."""
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from infrastructure.llm_pool.async_client import AsyncGeminiLLM
+
+
+class FakeAsyncModel:
+    """Stands in for GenerativeModel and records peak concurrency."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.peak = 0
+
+    async def generate_content_async(self, prompt):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        text = json.dumps({"is_suitable": True, "priority_score": 7, "reason": "ok"})
+        usage = SimpleNamespace(prompt_token_count=100, candidates_token_count=20)
+        return SimpleNamespace(text=text, usage_metadata=usage)
+
+
+@pytest.fixture
+def llm(make_llm):
+    return make_llm(backend=FakeAsyncModel(), cache_mode="read_write")
+
+
+def test_triage_many_bounded_concurrency(llm):
+    """Test requests overlap but never exceed the semaphore."""
+    client = AsyncGeminiLLM(llm, max_concurrency=3)
+    issues = [{"title": f"Bug {i}", "body": "", "labels": ["bug"]} for i in range(8)]
+
+    results = asyncio.run(client.triage_many(issues))
+
+    assert len(results) == 8
+    assert all(r["is_suitable"] for r in results)
+    assert llm.model.peak == 3
+    assert llm.rate_limiter.tokens_in_window() == 8 * 120
+
+
+def test_generate_patch_async(llm, tmp_path):
+    """Test async patch generation saves artifacts and parses the diff."""
+    diff = "--- a/x.py\n+++ b/x.py\n@@ -1 +1 @@\n-a\n+b\n"
+
+    async def generate(prompt):
+        usage = SimpleNamespace(prompt_token_count=10, candidates_token_count=5)
+        return SimpleNamespace(text=json.dumps({"patch_text": diff}), usage_metadata=usage)
+
+    llm.model.generate_content_async = generate
+    client = AsyncGeminiLLM(llm)
+    result = asyncio.run(client.generate_patch("Bug", [], "repo", 1, tmp_path))
+
+    assert result["success"]
+    assert result["diff"] == diff
+    assert (tmp_path / "prompt.txt").exists()
+    assert (tmp_path / "response.json").exists()
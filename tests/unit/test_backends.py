@@ -0,0 +1,94 @@
+"""Unit tests for the pluggable LLM backends."""
+import asyncio
+import json
+
+import pytest
+
+from infrastructure.llm_pool.backends import (
+    BackendError, RecordingBackend, ReplayBackend, ReplayMissError, backend_from_config
+)
+
+
+class TestReplayBackend:
+    """Test offline replay, injection and recording."""
+
+    def test_replays_recorded_response(self):
+        """Test a recorded prompt returns its response and token counts."""
+        backend = ReplayBackend()
+        backend.add("prompt", "answer", prompt_tokens=100, response_tokens=7)
+
+        response = backend.generate_content("prompt")
+        assert response.text == "answer"
+        assert response.usage_metadata.prompt_token_count == 100
+        assert response.usage_metadata.candidates_token_count == 7
+
+    def test_default_entry_and_miss(self):
+        """Test unknown prompts use the default entry, or raise without one."""
+        backend = ReplayBackend()
+        with pytest.raises(ReplayMissError):
+            backend.generate_content("unknown")
+
+        backend.add(None, "fallback")
+        assert backend.generate_content("unknown").text == "fallback"
+
+    def test_error_rate_is_seeded(self):
+        """Test injected errors are repeatable for a given seed."""
+        def failures(seed):
+            backend = ReplayBackend(error_rate=0.5, seed=seed)
+            backend.add(None, "ok")
+            outcome = []
+            for _ in range(20):
+                try:
+                    backend.generate_content("p")
+                    outcome.append(False)
+                except BackendError:
+                    outcome.append(True)
+            return outcome
+
+        assert failures(1) == failures(1)
+        assert 0 < sum(failures(1)) < 20
+
+    def test_async_latency(self):
+        """Test async calls honour injected latency without blocking each other."""
+        backend = ReplayBackend(latency_ms=50)
+        backend.add(None, "ok")
+
+        async def run():
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            await asyncio.gather(*(backend.generate_content_async(str(i)) for i in range(5)))
+            return loop.time() - start
+
+        assert 0.05 <= asyncio.run(run()) < 0.2
+
+    def test_record_then_replay(self, tmp_path):
+        """Test RecordingBackend output can be loaded by ReplayBackend."""
+        path = tmp_path / "llm.jsonl"
+        live = ReplayBackend()
+        live.add("prompt", "answer", prompt_tokens=12, response_tokens=3)
+        RecordingBackend(live, str(path), "test-model").generate_content("prompt")
+
+        replay = ReplayBackend(str(path))
+        assert replay.generate_content("prompt").text == "answer"
+        assert json.loads(path.read_text())["model"] == "test-model"
+
+
+class TestBackendSelection:
+    """Test GeminiLLM runs without an API key on the replay backend."""
+
+    def test_replay_backend_needs_no_key(self, monkeypatch, make_llm):
+        """Test OPENFIX_LLM_BACKEND=replay drives triage offline."""
+        monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+        monkeypatch.setenv("OPENFIX_LLM_BACKEND", "replay")
+        backend = backend_from_config({}, "test-model")
+        backend.add(None, json.dumps({"is_suitable": True, "priority_score": 3}))
+
+        llm = make_llm(backend=backend)
+        assert llm.triage_issue("Bug", "body", [])["is_suitable"] is True
+
+    def test_gemini_backend_requires_key(self, monkeypatch):
+        """Test the live backend still fails fast without a key."""
+        monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+        monkeypatch.delenv("OPENFIX_LLM_BACKEND", raising=False)
+        with pytest.raises(ValueError):
+            backend_from_config({}, "test-model")
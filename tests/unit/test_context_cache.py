@@ -0,0 +1,59 @@
+"""Unit tests for stable-prefix prompts and cached-context accounting."""
+from infrastructure.code_graph.chunk_selector import CodeChunk
+from infrastructure.llm_pool.context_cache import ContextCache, split_template
+
+
+class TestContextCache:
+    """Test prefix splitting and reuse accounting."""
+
+    def test_split_template(self):
+        """Test the iteration section is split off the stable prefix."""
+        prefix, suffix = split_template("Context {A}\nITERATION INPUT:\n{B}\n")
+        assert prefix == "Context {A}\n"
+        assert suffix == "ITERATION INPUT:\n{B}\n"
+        assert split_template("no marker") == ("no marker", "")
+
+    def test_repeated_prefix_counts_as_cached(self):
+        """Test the local model caches a prefix resent within the TTL."""
+        cache = ContextCache(min_tokens=1)
+        prefix = "shared context " * 50
+
+        assert cache.record(prefix, 500) == 0
+        cached = cache.record(prefix, 520)
+        assert 0 < cached <= 520
+        assert cache.stats()["cached_prompt_tokens"] == cached
+
+    def test_short_or_expired_prefix_not_cached(self):
+        """Test prefixes below the minimum or past the TTL are billed in full."""
+        cache = ContextCache(min_tokens=10_000)
+        cache.record("short", 10)
+        assert cache.record("short", 10) == 0
+
+        cache = ContextCache(ttl_seconds=-1, min_tokens=1)
+        cache.record("prefix " * 100, 200)
+        assert cache.record("prefix " * 100, 200) == 0
+
+    def test_provider_count_wins(self):
+        """Test provider-reported cached tokens are used as-is."""
+        cache = ContextCache()
+        assert cache.record("anything", 1000, provider_cached_tokens=800) == 800
+        assert cache.stats()["provider_reported"] is True
+
+
+class TestRepairIterations:
+    """Test repair iterations share the patch prompt prefix."""
+
+    def test_only_validation_output_changes(self, make_llm, tmp_path):
+        """Test iteration 2 reuses the prefix and only pays for the delta."""
+        llm = make_llm({"patch_text": "--- a/x.py\n+++ b/x.py\n"}, context_cache=ContextCache(min_tokens=100))
+        chunks = [CodeChunk("x.py", 1, 200, "def f(x):\n    return x + 1\n" * 100)]
+
+        first = llm.generate_patch("Bug", chunks, "repo", 1, tmp_path, validation_results="None")
+        second = llm.generate_patch("Bug", chunks, "repo", 1, tmp_path,
+                                    validation_results="FAILED test_f: assert 2 == 3")
+
+        prefix_a, suffix_a = llm._build_patch_prompt_parts("Bug", chunks, "repo", 1, "None")
+        prefix_b, suffix_b = llm._build_patch_prompt_parts("Bug", chunks, "repo", 1, "FAILED")
+        assert prefix_a == prefix_b and suffix_a != suffix_b
+        assert first["cached_prompt_tokens"] == 0
+        assert second["cached_prompt_tokens"] > second["prompt_tokens"] // 2
@@ -0,0 +1,208 @@
+"""Unit tests for run deadlines, call timeouts and hedged requests."""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from infrastructure.llm_pool.backends import ReplayBackend
+from infrastructure.llm_pool.client import RateLimiter
+from infrastructure.llm_pool.deadline import (
+    CallTimeout, Deadline, DeadlineExceeded, HedgePolicy, current_deadline, deadline_scope, quantile
+)
+from infrastructure.llm_pool.provider import LLMProvider, RetryPolicy, is_retryable
+from infrastructure.llm_pool.response_cache import ResponseCache
+
+
+class SlowFirstBackend:
+    """Answers after ``first_delay`` seconds on the first call and immediately afterwards."""
+
+    def __init__(self, first_delay):
+        self.first_delay = first_delay
+        self.calls = 0
+        self.lock = threading.Lock()
+        self.answer = ReplayBackend()
+        self.answer.add(None, "ok", prompt_tokens=10, response_tokens=2)
+
+    def _delay(self):
+        with self.lock:
+            self.calls += 1
+            return self.first_delay if self.calls == 1 else 0.0
+
+    def generate_content(self, prompt):
+        time.sleep(self._delay())
+        return self.answer.generate_content(prompt)
+
+    async def generate_content_async(self, prompt):
+        await asyncio.sleep(self._delay())
+        return self.answer.generate_content(prompt)
+
+
+@pytest.fixture
+def make_provider(tmp_path):
+    def make(backend, max_retries=0, **kwargs):
+        return LLMProvider(model_name="test-model", backend=backend, rate_limiter=RateLimiter(),
+                           response_cache=ResponseCache(str(tmp_path / "cache.db"), mode="off"),
+                           retry_policy=RetryPolicy(max_retries=max_retries, seed=0, sleep=lambda s: None),
+                           **kwargs)
+    return make
+
+
+def warm_hedge():
+    hedge = HedgePolicy(min_samples=3, min_delay=0.0)
+    for _ in range(3):
+        hedge.observe(0.02)
+    return hedge
+
+
+class TestDeadline:
+    """Test deadline arithmetic and scoping."""
+
+    def test_call_timeout(self):
+        """Test the call timeout is the smaller of the cap and the time left."""
+        now = [100.0]
+        deadline = Deadline(30, clock=lambda: now[0])
+        assert deadline.call_timeout(10) == 10
+        now[0] += 25
+        assert deadline.call_timeout(10) == 5
+        now[0] += 5
+        assert deadline.expired
+        with pytest.raises(DeadlineExceeded):
+            deadline.call_timeout(10)
+
+    def test_unbounded(self):
+        """Test no deadline outside a scope."""
+        assert current_deadline().remaining() is None
+        assert current_deadline().call_timeout() is None
+        assert current_deadline().call_timeout(5) == 5
+
+    def test_nested_scope_never_extends(self):
+        """Test an inner scope keeps the earlier expiry of the outer one."""
+        with deadline_scope(10) as outer:
+            with deadline_scope(60) as inner:
+                assert inner is outer
+            with deadline_scope(1) as inner:
+                assert inner.remaining() <= 1
+        assert current_deadline().remaining() is None
+
+    def test_scope_reaches_async_tasks(self):
+        """Test tasks started inside a scope see its deadline."""
+        async def remaining():
+            return current_deadline().remaining()
+
+        with deadline_scope(10):
+            assert 0 < asyncio.run(remaining()) <= 10
+
+    def test_quantile(self):
+        """Test nearest-rank quantiles."""
+        values = list(range(1, 101))
+        assert quantile(values, 0.5) == 50
+        assert quantile(values, 0.95) == 95
+        assert quantile(values, 0.99) == 99
+        assert quantile([], 0.95) == 0.0
+
+
+class TestProviderDeadlines:
+    """Test timeouts and deadlines on provider calls."""
+
+    def test_slow_call_times_out(self, make_provider):
+        """Test a stuck call is abandoned at its timeout."""
+        provider = make_provider(SlowFirstBackend(first_delay=2.0), call_timeout=0.1)
+        start = time.perf_counter()
+        with pytest.raises(CallTimeout):
+            provider.generate("prompt")
+        assert time.perf_counter() - start < 1.0
+        assert provider.metrics()["llm_timeouts"] == 1
+
+    def test_timeout_is_retried(self, make_provider):
+        """Test a timed-out attempt is retried while the run has time left."""
+        provider = make_provider(SlowFirstBackend(first_delay=2.0), max_retries=1, call_timeout=0.1)
+        assert provider.generate("prompt").text == "ok"
+        assert provider.retry.retries == 1
+        assert is_retryable(CallTimeout("slow"))
+        assert not is_retryable(DeadlineExceeded("late"))
+
+    def test_expired_deadline(self, make_provider):
+        """Test no call is made after the run deadline."""
+        backend = SlowFirstBackend(first_delay=0.0)
+        provider = make_provider(backend, max_retries=2)
+        with deadline_scope(0):
+            with pytest.raises(DeadlineExceeded):
+                provider.generate("prompt")
+        assert backend.calls == 0
+
+    def test_retry_not_started_past_deadline(self):
+        """Test a backoff longer than the time left is not waited out."""
+        policy = RetryPolicy(base_delay=5.0, seed=0)
+        with deadline_scope(0.5):
+            assert not policy.should_retry(CallTimeout("slow"), 0, delay=1.0)
+            assert policy.should_retry(CallTimeout("slow"), 0, delay=0.1)
+
+
+class TestHedging:
+    """Test duplicate requests once a call outlives the p95 latency."""
+
+    def test_no_hedging_before_samples(self):
+        """Test hedging waits for enough latency samples."""
+        hedge = HedgePolicy(min_samples=2, min_delay=0.5)
+        hedge.observe(0.1)
+        assert hedge.delay() is None
+        hedge.observe(0.1)
+        assert hedge.delay() == 0.5
+
+    def test_hedged_request_wins(self, make_provider):
+        """Test the duplicate answers while the first request is still stuck."""
+        backend = SlowFirstBackend(first_delay=1.0)
+        provider = make_provider(backend, hedge=warm_hedge())
+        start = time.perf_counter()
+        assert provider.generate("prompt").text == "ok"
+        assert time.perf_counter() - start < 0.5
+        metrics = provider.metrics()
+        assert (metrics["llm_hedged"], metrics["llm_hedge_wins"]) == (1, 1)
+        assert backend.calls == 2
+
+    def test_hedged_async_request_wins(self, make_provider):
+        """Test async hedging takes the first answer and cancels the other request."""
+        backend = SlowFirstBackend(first_delay=1.0)
+        provider = make_provider(backend, hedge=warm_hedge())
+
+        start = time.perf_counter()
+        response = asyncio.run(provider.generate_async("prompt", 10, "key"))
+        assert response.text == "ok"
+        assert time.perf_counter() - start < 0.5
+        assert provider.metrics()["llm_hedge_wins"] == 1
+
+    def test_fast_call_not_hedged(self, make_provider):
+        """Test a call faster than the hedge delay sends one request and feeds the tracker."""
+        backend = SlowFirstBackend(first_delay=0.0)
+        hedge = HedgePolicy(min_samples=1, min_delay=0.5)
+        provider = make_provider(backend, hedge=hedge)
+        provider.generate("prompt")
+        provider.generate("other prompt")
+        assert backend.calls == 2
+        assert provider.metrics()["llm_hedged"] == 0
+        assert len(hedge.latencies) == 2
+
+    def test_hedge_reserves_and_records_both_requests(self, make_provider):
+        """Test the duplicate takes a reservation and the losing request's tokens are recorded."""
+        backend = SlowFirstBackend(first_delay=0.3)
+        provider = make_provider(backend, hedge=warm_hedge())
+        limiter = provider.rate_limiter
+
+        provider.generate("prompt", estimated_tokens=100)
+        time.sleep(0.5)  # Let the losing request finish
+
+        assert [count for _, count in limiter.token_history] == [12, 12]
+        assert not limiter.reservations
+        assert provider.metrics()["llm_prompt_tokens"] == 20
+
+    def test_hedge_skipped_without_rate_limit_room(self, make_provider):
+        """Test no duplicate is sent when the limiter would have to wait."""
+        backend = SlowFirstBackend(first_delay=0.2)
+        provider = make_provider(backend, hedge=warm_hedge())
+        provider.rate_limiter = RateLimiter(tokens_per_minute=150)
+
+        assert provider.generate("prompt", estimated_tokens=100).text == "ok"
+        metrics = provider.metrics()
+        assert backend.calls == 1
+        assert (metrics["llm_hedged"], metrics["llm_hedges_skipped"]) == (0, 1)
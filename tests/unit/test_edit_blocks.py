@@ -0,0 +1,163 @@
+"""Unit tests for search/replace edit-block patches."""
+import json
+import subprocess
+
+import pytest
+
+from infrastructure.llm_pool.edit_blocks import (
+    EditBlock, EditBlockError, apply_edit, edits_to_diff, parse_edit_blocks, parse_summary
+)
+from infrastructure.llm_pool.stream_guard import StreamGuard
+
+RESPONSE = """FILE: src/app.py
+<<<<<<< SEARCH
+def add(a, b):
+    return a - b
+=======
+def add(a, b):
+    return a + b
+>>>>>>> REPLACE
+
+EXPLANATION: Fix the sign in add
+RISK: low
+"""
+
+
+@pytest.fixture
+def repo(tmp_path):
+    root = tmp_path / "repo"
+    (root / "src").mkdir(parents=True)
+    (root / "src" / "app.py").write_text("import os\n\n\ndef add(a, b):\n    return a - b\n")
+    subprocess.run(["git", "init", "-q"], cwd=root, check=True)
+    return root
+
+
+def git_apply_check(root, diff):
+    proc = subprocess.run(["git", "apply", "--check", "-"], cwd=root, input=diff, text=True,
+                          capture_output=True)
+    return proc.returncode, proc.stderr
+
+
+class TestParse:
+    """Test parsing edit blocks from a response."""
+
+    def test_blocks_and_summary(self):
+        """Test path, search and replace text and the summary lines are extracted."""
+        blocks = parse_edit_blocks(RESPONSE)
+        assert blocks == [EditBlock("src/app.py", "def add(a, b):\n    return a - b\n",
+                                    "def add(a, b):\n    return a + b\n")]
+        assert parse_summary(RESPONSE) == ("Fix the sign in add", "Low")
+
+    def test_fenced_block_and_empty_search(self):
+        """Test a code fence after FILE is skipped and an empty SEARCH is kept empty."""
+        text = "FILE: `new.txt`\n```\n<<<<<<< SEARCH\n=======\nhello\n>>>>>>> REPLACE\n```\n"
+        assert parse_edit_blocks(text) == [EditBlock("new.txt", "", "hello\n")]
+
+    def test_no_blocks(self):
+        """Test a response without complete blocks is rejected."""
+        with pytest.raises(EditBlockError):
+            parse_edit_blocks("FILE: a.py\n<<<<<<< SEARCH\nx\n=======\ny\n")
+
+
+class TestApplyEdit:
+    """Test applying one block to file content."""
+
+    def test_exact_match(self):
+        """Test an exact unique match is replaced."""
+        assert apply_edit("a\nb\nc\n", EditBlock("f", "b\n", "B\n")) == "a\nB\nc\n"
+
+    def test_trailing_whitespace_tolerated(self):
+        """Test lines differing only in trailing whitespace still match."""
+        assert apply_edit("a  \nb\n", EditBlock("f", "a\nb\n", "x\n")) == "x\n"
+
+    def test_indentation_shifted(self):
+        """Test a block written at the wrong indentation is re-indented."""
+        content = "class A:\n    def f(self):\n        return 1\n"
+        block = EditBlock("f", "def f(self):\n    return 1\n", "def f(self):\n    return 2\n")
+        assert apply_edit(content, block) == "class A:\n    def f(self):\n        return 2\n"
+
+    def test_ambiguous_match(self):
+        """Test SEARCH text found in several places is rejected."""
+        with pytest.raises(EditBlockError, match="matches 2 places"):
+            apply_edit("x = 1\nx = 1\n", EditBlock("f", "x = 1\n", "x = 2\n"))
+
+    def test_not_found(self):
+        """Test SEARCH text missing from the file is rejected."""
+        with pytest.raises(EditBlockError, match="not found"):
+            apply_edit("a\n", EditBlock("f", "b\n", "c\n"))
+
+
+class TestEditsToDiff:
+    """Test rendering blocks as a unified diff against the checkout."""
+
+    def test_diff_applies(self, repo):
+        """Test the rendered diff passes git apply --check."""
+        diff = edits_to_diff(str(repo), parse_edit_blocks(RESPONSE))
+        assert diff.startswith("diff --git a/src/app.py b/src/app.py\n--- a/src/app.py\n+++ b/src/app.py\n")
+        assert "-    return a - b\n+    return a + b\n" in diff
+        assert git_apply_check(repo, diff) == (0, "")
+
+    def test_new_file_and_missing_newline(self, repo):
+        """Test new files and files without a final newline produce valid diffs."""
+        (repo / "VERSION").write_text("1.0")
+        blocks = [EditBlock("docs/NOTES.md", "", "# Notes\n"), EditBlock("VERSION", "1.0", "1.1")]
+        diff = edits_to_diff(str(repo), blocks)
+        assert "new file mode 100644\n--- /dev/null\n+++ b/docs/NOTES.md\n" in diff
+        assert diff.count("\\ No newline at end of file") == 2
+        assert git_apply_check(repo, diff) == (0, "")
+
+    def test_path_outside_repo(self, repo):
+        """Test edits escaping the repository are rejected."""
+        with pytest.raises(EditBlockError, match="outside the repository"):
+            edits_to_diff(str(repo), [EditBlock("../evil.py", "", "x\n")])
+
+    def test_missing_file(self, repo):
+        """Test a non-empty SEARCH in a file that does not exist is rejected."""
+        with pytest.raises(EditBlockError, match="does not exist"):
+            edits_to_diff(str(repo), [EditBlock("src/missing.py", "x\n", "y\n")])
+
+
+class TestGeminiEdits:
+    """Test generate_patch with patch_format="edits"."""
+
+    @pytest.fixture
+    def edits_llm(self, text_llm):
+        return lambda text: text_llm(text, structured_output=True, patch_format="edits")
+
+    def test_generate_patch(self, edits_llm, tmp_path, repo):
+        """Test edit blocks are returned as a diff and no JSON schema is requested."""
+        llm = edits_llm(RESPONSE)
+        result = llm.generate_patch("Fix add", [], "org/repo", 1, tmp_path / "art", repo_root=str(repo))
+
+        assert result["success"] is True
+        assert result["edits"] == 1
+        assert git_apply_check(repo, result["diff"]) == (0, "")
+        assert llm.model.configs == [None]
+        assert "<<<<<<< SEARCH" in (tmp_path / "art" / "prompt.txt").read_text()
+        assert json.loads((tmp_path / "art" / "response.json").read_text())["response_text"] == RESPONSE
+
+    def test_unapplicable_edits_fail(self, edits_llm, tmp_path, repo):
+        """Test edits that do not match the checkout fail with the reason."""
+        llm = edits_llm(RESPONSE.replace("a - b", "a * b"))
+        result = llm.generate_patch("Fix add", [], "org/repo", 1, tmp_path / "art", repo_root=str(repo))
+        assert result["success"] is False
+        assert result["reason"].startswith("Invalid edit blocks: src/app.py: SEARCH text not found")
+
+    def test_refusal(self, edits_llm, tmp_path, repo):
+        """Test a CANNOT_FIX_SAFELY response fails with its reason."""
+        llm = edits_llm("CANNOT_FIX_SAFELY: needs a design decision")
+        result = llm.generate_patch("Fix add", [], "org/repo", 1, tmp_path / "art", repo_root=str(repo))
+        assert result["success"] is False
+        assert result["reason"] == "needs a design decision"
+
+    def test_unknown_format(self, text_llm):
+        """Test an unknown patch format is rejected."""
+        with pytest.raises(ValueError):
+            text_llm("", patch_format="xml")
+
+    def test_stream_guard(self, repo):
+        """Test the guard accepts edit blocks but stops on paths outside the repository."""
+        guard = StreamGuard(str(repo), patch_format="edits")
+        assert guard.feed(RESPONSE) is None
+        guard = StreamGuard(str(repo), patch_format="edits")
+        assert "outside the repository" in guard.feed("FILE: ../../etc/passwd\n<<<<<<< SEARCH\n")
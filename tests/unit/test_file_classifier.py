@@ -0,0 +1,70 @@
+"""Unit tests for generated/vendored file detection."""
+import base64
+import random
+
+from infrastructure.code_graph.file_classifier import FileClassifier, ExclusionReport
+from infrastructure.code_graph.ingestion import Ingestor
+
+
+class TestFileClassifier:
+    """Test file classification heuristics."""
+
+    def setup_method(self):
+        """Set up test fixtures."""
+        self.classifier = FileClassifier()
+
+    def test_regular_source_is_kept(self):
+        """Test ordinary code passes through."""
+        content = "def add(a, b):\n    return a + b\n" * 50
+        assert self.classifier.classify("src/math_utils.py", content) is None
+
+    def test_paths_and_names(self):
+        """Test vendored directories and generated file names."""
+        assert self.classifier.classify("third_party/lib/x.py", "x = 1") == "vendored"
+        assert self.classifier.classify("api/service_pb2.py", "x = 1") == "generated"
+        assert self.classifier.classify("package-lock.json", "{}") == "generated"
+        assert self.classifier.classify("ui/__snapshots__/a.js", "x") == "vendored"
+
+    def test_generated_header(self):
+        """Test "generated by" headers are detected."""
+        content = "// Code generated by protoc-gen-go. DO NOT EDIT.\npackage api\n"
+        assert self.classifier.classify("api/types.go", content) == "generated"
+
+    def test_minified_and_size(self):
+        """Test minified bundles and oversized data fixtures."""
+        bundle = "var a=1;" * 500
+        assert self.classifier.classify("static/app.js", bundle) == "minified"
+
+        fixture = '{"id": 1, "name": "row"},\n' * 5000
+        assert self.classifier.classify("tests/data/rows.json", fixture) == "data_fixture"
+
+    def test_high_entropy_blob(self):
+        """Test base64 blobs are flagged."""
+        rng = random.Random(0)
+        blob = base64.b64encode(bytes(rng.getrandbits(8) for _ in range(6000))).decode()
+        content = "\n".join(blob[i:i + 76] for i in range(0, len(blob), 76))
+        assert self.classifier.classify("assets/font.txt", content) == "high_entropy"
+
+
+def test_exclusion_report_summary():
+    """Test report aggregation."""
+    report = ExclusionReport()
+    report.add("a.min.js", "minified", 100)
+    report.add("b_pb2.py", "generated", 50)
+    report.add("c.pb.go", "generated", 25)
+
+    summary = report.summary()
+    assert summary["files_excluded"] == 3
+    assert summary["bytes_excluded"] == 175
+    assert summary["by_reason"] == {"minified": 1, "generated": 2}
+
+
+def test_ingestor_reports_encoded_bytes(tmp_path):
+    """Test excluded sizes are UTF-8 bytes, not characters."""
+    ingestor = Ingestor()
+    ingestor.temp_dir = str(tmp_path)
+    (tmp_path / "strings_pb2.py").write_text("NAME = 'café'\n", encoding="utf-8")
+
+    ingestor.get_codebase_context()
+
+    assert ingestor.exclusion_report.summary()["bytes_excluded"] == 15
@@ -0,0 +1,122 @@
+"""Unit tests for the SQLite job queue."""
+import threading
+
+import pytest
+
+from data.job_queue import FAILED, QUEUED, RUNNING, SUCCEEDED, JobQueue
+
+REPO = "https://github.com/org/repo"
+OTHER = "https://github.com/org/other"
+
+
+@pytest.fixture
+def clock():
+    return [1000.0]
+
+
+@pytest.fixture
+def queue(tmp_path, clock):
+    queue = JobQueue(str(tmp_path / "openfix.db"), lease_seconds=60, max_attempts=2,
+                     retry_backoff_seconds=10, clock=lambda: clock[0])
+    yield queue
+    queue.close()
+
+
+class TestClaims:
+    """Test enqueueing, ordering and per-repo limits."""
+
+    def test_enqueue_skips_active_duplicates(self, queue):
+        """Test an issue already queued is not queued twice."""
+        assert queue.enqueue(REPO, 1) is not None
+        assert queue.enqueue(REPO, 1) is None
+        assert queue.enqueue(OTHER, 1) is not None
+        assert queue.stats()[QUEUED] == 2
+
+    def test_priority_then_fifo(self, queue):
+        """Test higher priority jobs are claimed first, then oldest first."""
+        queue.enqueue(REPO, 1)
+        queue.enqueue(REPO, 2, priority=5)
+        queue.enqueue(REPO, 3)
+        assert [queue.claim("w").issue_number for _ in range(3)] == [2, 1, 3]
+        assert queue.claim("w") is None
+
+    def test_per_repo_limit(self, queue):
+        """Test a repository never runs more jobs at once than its limit."""
+        for issue in (1, 2):
+            queue.enqueue(REPO, issue)
+        queue.enqueue(OTHER, 1)
+        first = queue.claim("a", per_repo_limit=1)
+        second = queue.claim("b", per_repo_limit=1)
+        assert (first.repo_url, second.repo_url) == (REPO, OTHER)
+        assert queue.claim("c", per_repo_limit=1) is None
+
+        queue.complete(first.id, "a")
+        assert queue.claim("c", per_repo_limit=1).issue_number == 2
+
+    def test_no_double_claims_across_connections(self, tmp_path):
+        """Test concurrent workers with their own connections never share a job."""
+        path = str(tmp_path / "openfix.db")
+        setup = JobQueue(path)
+        for issue in range(40):
+            setup.enqueue(REPO, issue)
+        claimed = []
+
+        def work(name):
+            queue = JobQueue(path)
+            while (job := queue.claim(name)) is not None:
+                claimed.append(job.id)
+            queue.close()
+
+        threads = [threading.Thread(target=work, args=(f"w{i}",)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert sorted(claimed) == sorted(set(claimed)) and len(claimed) == 40
+        assert setup.stats()[RUNNING] == 40
+
+
+class TestLeases:
+    """Test heartbeats, crashed workers and retries."""
+
+    def test_expired_lease_requeued_with_run_id(self, queue, clock):
+        """Test a crashed worker's job is retried under the same run id."""
+        queue.enqueue(REPO, 1)
+        job = queue.claim("crashed")
+        clock[0] += 61
+        retry = queue.claim("healthy")
+        assert (retry.id, retry.run_id, retry.attempts) == (job.id, job.run_id, 2)
+        assert not queue.heartbeat(job.id, "crashed")
+        assert not queue.complete(job.id, "crashed")
+
+    def test_heartbeat_keeps_lease(self, queue, clock):
+        """Test a heartbeating worker keeps its job past the initial lease."""
+        queue.enqueue(REPO, 1)
+        job = queue.claim("w")
+        clock[0] += 50
+        assert queue.heartbeat(job.id, "w")
+        clock[0] += 50
+        assert queue.claim("other") is None
+        assert queue.complete(job.id, "w", '{"patch_generated": true}')
+        assert queue.stats()[SUCCEEDED] == 1
+
+    def test_fail_backs_off_then_gives_up(self, queue, clock):
+        """Test failed attempts are retried after a backoff until max_attempts."""
+        queue.enqueue(REPO, 1)
+        job = queue.claim("w")
+        assert queue.fail(job.id, "w", "boom") == QUEUED
+        assert queue.claim("w") is None  # Backing off
+        clock[0] += 10
+        job = queue.claim("w")
+        assert queue.fail(job.id, "w", "boom again") == FAILED
+        assert queue.stats() == {QUEUED: 0, RUNNING: 0, SUCCEEDED: 0, FAILED: 1}
+        assert queue.pending() == 0
+
+    def test_lease_expiry_counts_attempts(self, queue, clock):
+        """Test a job that keeps killing its worker is eventually failed."""
+        queue.enqueue(REPO, 1)
+        for _ in range(2):
+            assert queue.claim("w") is not None
+            clock[0] += 61
+        assert queue.claim("w") is None
+        assert queue.stats()[FAILED] == 1
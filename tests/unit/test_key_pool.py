@@ -0,0 +1,185 @@
+"""Unit tests for the API key pool."""
+import asyncio
+
+import pytest
+
+from infrastructure.llm_pool.backends import GeminiBackend, ReplayBackend, backend_from_config
+from infrastructure.llm_pool.client import RateLimiter
+from infrastructure.llm_pool.key_pool import (
+    KeyPool, PooledKey, api_keys_from_env, is_quota_error, key_id
+)
+from infrastructure.llm_pool.shared_limiter import rate_limiter_from_config
+
+
+class QuotaError(Exception):
+    code = 429
+
+
+class KeyBackend:
+    """Answers "ok", or raises a quota error for the first ``quota_errors`` calls."""
+
+    def __init__(self, quota_errors=0):
+        self.quota_errors = quota_errors
+        self.calls = 0
+        self.answer = ReplayBackend()
+        self.answer.add(None, "ok", prompt_tokens=10, response_tokens=2)
+
+    def generate_content(self, prompt):
+        self.calls += 1
+        if self.calls <= self.quota_errors:
+            raise QuotaError("429 Resource has been exhausted (e.g. check quota)")
+        return self.answer.generate_content(prompt)
+
+    async def generate_content_async(self, prompt):
+        return self.generate_content(prompt)
+
+
+def make_pool(*backends, tokens_per_minute=900000):
+    now = [0.0]
+    keys = [PooledKey(f"k{i}", backend, RateLimiter(tokens_per_minute)) for i, backend in enumerate(backends)]
+    pool = KeyPool(keys, quarantine_seconds=60, max_quarantine_seconds=100, clock=lambda: now[0])
+    return pool, now
+
+
+class TestKeys:
+    """Test key discovery and error classification."""
+
+    def test_keys_from_env(self, monkeypatch):
+        """Test GEMINI_API_KEYS wins over GEMINI_API_KEY and duplicates are dropped."""
+        monkeypatch.setenv("GEMINI_API_KEY", "single")
+        monkeypatch.setenv("GEMINI_API_KEYS", "a, b,,a")
+        assert api_keys_from_env() == ["a", "b"]
+        monkeypatch.delenv("GEMINI_API_KEYS")
+        assert api_keys_from_env() == ["single"]
+
+    def test_quota_errors(self):
+        """Test 429 and resource-exhausted errors count as quota errors."""
+        assert is_quota_error(QuotaError("x"))
+        assert is_quota_error(RuntimeError("RESOURCE_EXHAUSTED"))
+        assert not is_quota_error(RuntimeError("500 internal"))
+        assert len(key_id("secret")) == 8 and "secret" not in key_id("secret")
+
+
+class TestScheduling:
+    """Test least-loaded selection."""
+
+    def test_calls_spread_evenly(self):
+        """Test sequential calls alternate between idle keys."""
+        a, b = KeyBackend(), KeyBackend()
+        pool, _ = make_pool(a, b)
+        for _ in range(10):
+            pool.generate_content("prompt")
+        assert (a.calls, b.calls) == (5, 5)
+
+    def test_in_flight_key_avoided(self):
+        """Test a key with a call in flight is not picked while another is idle."""
+        pool, _ = make_pool(KeyBackend(), KeyBackend())
+        first = pool.select(10)
+        assert pool.select(10) is not first
+
+    def test_key_without_quota_avoided(self):
+        """Test a key whose window is full is skipped, so throughput adds up across keys."""
+        a, b = KeyBackend(), KeyBackend()
+        pool, _ = make_pool(a, b, tokens_per_minute=15)
+        pool.generate_content("prompt")
+        pool.generate_content("prompt")
+        assert (a.calls, b.calls) == (1, 1)
+        assert all(k.rate_limiter.compute_wait(12) > 0 for k in pool.keys)
+
+    def test_aggregate_limit_scales(self, tmp_path):
+        """Test the provider-wide limit is the sum of the per-key quotas."""
+        config = {"rate_limit_db": str(tmp_path / "rl.db"), "max_tokens_per_minute": 1000,
+                  "max_llm_calls_per_minute": 2}
+        limiter = rate_limiter_from_config(config, keys=3)
+        assert (limiter.tokens_per_minute, limiter.requests_per_minute) == (3000, 6)
+
+
+class TestQuarantine:
+    """Test quarantine and failover after quota errors."""
+
+    def test_failover(self):
+        """Test a quota error quarantines the key and the call moves to another."""
+        a, b = KeyBackend(quota_errors=1), KeyBackend()
+        pool, now = make_pool(a, b)
+        assert pool.generate_content("prompt").text == "ok"
+        assert (a.calls, b.calls) == (1, 1)
+        assert pool.healthy() == [pool.keys[1]]
+        assert pool.stats()["failovers"] == 1
+
+        pool.generate_content("prompt")
+        assert b.calls == 2  # Quarantined key skipped
+        now[0] = 61
+        assert len(pool.healthy()) == 2
+
+    def test_quarantine_doubles(self):
+        """Test repeated quota errors lengthen the quarantine up to the cap."""
+        pool, now = make_pool(KeyBackend(quota_errors=5))
+        key = pool.keys[0]
+        for expected in (60, 100):
+            with pytest.raises(QuotaError):
+                pool.generate_content("prompt")
+            assert key.quarantined_until - now[0] == expected
+            now[0] = key.quarantined_until
+        assert pool.stats()["keys"]["k0"]["quota_errors"] == 2
+
+    def test_all_keys_exhausted(self):
+        """Test the error surfaces once every key has been tried."""
+        a, b = KeyBackend(quota_errors=1), KeyBackend(quota_errors=1)
+        pool, _ = make_pool(a, b)
+        with pytest.raises(QuotaError):
+            pool.generate_content("prompt")
+        assert (a.calls, b.calls) == (1, 1)
+        assert pool.healthy() == []
+
+    def test_async_failover(self):
+        """Test async calls fail over too."""
+        a, b = KeyBackend(quota_errors=1), KeyBackend()
+        pool, _ = make_pool(a, b)
+        assert asyncio.run(pool.generate_content_async("prompt")).text == "ok"
+        assert (a.calls, b.calls) == (1, 1)
+        assert [k.in_flight for k in pool.keys] == [0, 0]
+
+
+class TestConfig:
+    """Test building the pool from the environment."""
+
+    def test_backend_from_config(self, monkeypatch, tmp_path):
+        """Test several keys give a pool of Gemini backends with separate clients."""
+        monkeypatch.delenv("OPENFIX_LLM_BACKEND", raising=False)
+        monkeypatch.delenv("OPENFIX_LLM_RECORD", raising=False)
+        monkeypatch.setenv("GEMINI_API_KEYS", "key-one,key-two")
+        backend = backend_from_config({"rate_limit_db": str(tmp_path / "rl.db")}, "gemini-2.5-flash")
+
+        assert isinstance(backend, KeyPool)
+        assert [k.name for k in backend.keys] == [key_id("key-one"), key_id("key-two")]
+        assert all(isinstance(k.backend, GeminiBackend) for k in backend.keys)
+        assert backend.keys[0].backend.model._client is not backend.keys[1].backend.model._client
+        assert backend.keys[0].rate_limiter.bucket == f"gemini:{key_id('key-one')}"
+        assert backend.supports_timeout
+
+    def test_sdk_calls_go_through_per_key_clients(self):
+        """Test the pinned SDK still sends requests through the clients a pooled key installs."""
+        from google.ai import generativelanguage as glm
+
+        def answer():
+            return glm.GenerateContentResponse(candidates=[{"content": {"parts": [{"text": "ok"}]}}])
+
+        class KeyClient:
+            requests = 0
+
+            def generate_content(self, request, **kwargs):
+                self.requests += 1
+                return answer()
+
+        class AsyncKeyClient(KeyClient):
+            async def generate_content(self, request, **kwargs):
+                self.requests += 1
+                return answer()
+
+        backend = GeminiBackend("gemini-2.5-flash", api_key="key-one")
+        assert isinstance(backend.model._client, glm.GenerativeServiceClient)
+        backend.model._client, backend.model._async_client = KeyClient(), AsyncKeyClient()
+
+        assert backend.generate_content("hello").text == "ok"
+        assert asyncio.run(backend.generate_content_async("hello")).text == "ok"
+        assert (backend.model._client.requests, backend.model._async_client.requests) == (1, 1)
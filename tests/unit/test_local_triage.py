@@ -0,0 +1,144 @@
+"""Unit tests for the local triage classifier."""
+import json
+
+import pytest
+
+from infrastructure.llm_pool.local_triage import (
+    LocalTriage, NaiveBayes, issue_features, local_triage_from_config, log_verdicts, train_from_log
+)
+from infrastructure.llm_pool.router import CascadeRouter
+
+SUITABLE = {"is_suitable": True, "estimated_complexity_score": "low", "priority_score": 9}
+UNSUITABLE = {"is_suitable": False, "estimated_complexity_score": "high", "priority_score": 2}
+
+
+def training_examples(n=30):
+    examples = []
+    for i in range(n):
+        examples.append({"title": f"Typo in docstring of parser {i}", "body": "Misspelled word in the error message",
+                         "labels": ["good first issue"], "verdict": SUITABLE})
+        examples.append({"title": f"Redesign plugin architecture {i}", "body": "Discussion about a new roadmap",
+                         "labels": ["discussion"], "verdict": UNSUITABLE})
+    return examples
+
+
+@pytest.fixture
+def model():
+    return LocalTriage(min_examples=10).fit(training_examples())
+
+
+class TestClassifier:
+    """Test features, training and predictions."""
+
+    def test_features(self):
+        """Test title words, body words and labels become distinct features."""
+        features = issue_features("Fix crash", "crash on start", ["Bug"])
+        assert {"t:fix", "t:crash", "crash", "start", "label:bug"} <= set(features)
+        assert len(features) == len(set(features))
+
+    def test_untrained_is_uniform(self):
+        """Test an untrained classifier has no opinion."""
+        assert NaiveBayes(("a", "b")).predict_proba(["x"]) == {"a": 0.5, "b": 0.5}
+
+    def test_same_fields_as_remote_triage(self, model):
+        """Test verdicts carry the triage_issue fields plus a confidence."""
+        verdict = model.triage_issue("Typo in docstring of lexer", "Misspelled word", ["good first issue"])
+        assert verdict["is_suitable"] is True
+        assert verdict["estimated_complexity_score"] == "low"
+        assert verdict["priority_score"] >= 8
+        assert verdict["confidence"] > 0.9
+        assert {"reason", "suggested_labels"} <= set(verdict)
+
+        verdict = model.triage_issue("Redesign the architecture", "Roadmap discussion", ["discussion"])
+        assert verdict["is_suitable"] is False
+        assert verdict["estimated_complexity_score"] == "high"
+
+    def test_priority_learned_from_remote_scores(self):
+        """Test the priority follows the remote scores rather than the suitability confidence."""
+        examples = training_examples()
+        for example in examples:
+            if example["verdict"]["is_suitable"]:
+                example["verdict"] = dict(SUITABLE, priority_score=5)
+        model = LocalTriage(min_examples=10).fit(examples)
+
+        verdict = model.triage_issue("Typo in docstring of lexer", "Misspelled word", ["good first issue"])
+        assert verdict["confidence"] > 0.9
+        assert verdict["priority_score"] == 5
+
+    def test_no_priority_without_scores(self):
+        """Test a model that never saw a remote score emits no priority and is not trusted."""
+        examples = [dict(e, verdict={k: v for k, v in e["verdict"].items() if k != "priority_score"})
+                    for e in training_examples()]
+        model = LocalTriage(min_examples=10).fit(examples)
+
+        verdict = model.triage_issue("Typo in docstring of lexer", "Misspelled word", ["good first issue"])
+        assert verdict["priority_score"] is None
+        assert not model.trusted(verdict)
+
+    def test_round_trip(self, model, tmp_path):
+        """Test a saved model predicts the same after loading."""
+        path = tmp_path / "model.json"
+        model.save(str(path))
+        loaded = LocalTriage.load(str(path))
+        issue = ("Typo in README", "word", ["good first issue"])
+        assert loaded.triage_issue(*issue) == model.triage_issue(*issue)
+        assert loaded.examples == 60
+
+
+class TestTraining:
+    """Test collecting verdicts and loading the model from config."""
+
+    def test_only_remote_verdicts_logged(self, tmp_path):
+        """Test local and failed verdicts never become training data."""
+        log = tmp_path / "verdicts.jsonl"
+        issues = [{"title": f"Issue {i}", "body": "text", "labels": []} for i in range(3)]
+        results = [dict(SUITABLE, routed_tier="fast"), dict(SUITABLE, routed_tier="local"),
+                   {"is_suitable": False, "estimated_complexity_score": "unknown", "routed_tier": "strong"}]
+        log_verdicts(str(log), issues, results)
+
+        entries = [json.loads(line) for line in log.read_text().splitlines()]
+        assert [e["title"] for e in entries] == ["Issue 0"]
+        assert "routed_tier" not in entries[0]["verdict"]
+
+    def test_config(self, tmp_path):
+        """Test the model loads only when enabled and trained."""
+        log = tmp_path / "verdicts.jsonl"
+        log.write_text("\n".join(json.dumps(e) for e in training_examples(2)) + "\n")
+        config = {"local_triage_model": str(tmp_path / "model.json"), "local_triage_min_confidence": 0.8}
+        assert local_triage_from_config(config) is None
+
+        train_from_log(str(log), config["local_triage_model"])
+        model = local_triage_from_config(config)
+        assert (model.examples, model.min_confidence) == (4, 0.8)
+        assert local_triage_from_config(dict(config, local_triage=False)) is None
+
+
+class TestLocalTier:
+    """Test the router keeping confident local verdicts."""
+
+    @pytest.fixture
+    def router(self, make_llm, model):
+        fast = make_llm({"is_suitable": True, "priority_score": 9}, model_name="gemini-2.5-flash")
+        strong = make_llm({"is_suitable": True, "priority_score": 5}, model_name="gemini-2.5-pro")
+        return CascadeRouter([("fast", fast), ("strong", strong)], local_triage=model)
+
+    def test_only_unsure_issues_go_remote(self, router):
+        """Test confident local verdicts stay local and the rest take the remote cascade."""
+        issues = [
+            {"title": "Typo in docstring of parser", "body": "Misspelled word", "labels": ["good first issue"]},
+            {"title": "Unrelated crash when importing", "body": "Segfault", "labels": []},
+        ]
+        results = router.triage_issues(issues, batch_size=1)
+
+        assert [r["routed_tier"] for r in results] == ["local", "fast"]
+        stats = router.stats()["tiers"]
+        assert list(stats) == ["local", "fast", "strong"]
+        assert stats["local"]["successes"] == 1 and stats["local"]["escalations"] == 1
+        assert stats["local"]["cost_usd"] == 0
+        assert stats["fast"]["llm_calls"] == 1
+
+    def test_too_few_examples_go_remote(self, router):
+        """Test an undertrained model only observes."""
+        router.local_triage.min_examples = 1000
+        issue = {"title": "Typo in docstring", "body": "Misspelled word", "labels": ["good first issue"]}
+        assert router.triage_issues([issue], batch_size=1)[0]["routed_tier"] == "fast"
@@ -0,0 +1,123 @@
+"""Unit tests for the unified LLM provider."""
+import pytest
+
+from infrastructure.llm_pool.backends import BackendError, ReplayBackend
+from infrastructure.llm_pool.client import RateLimiter
+from infrastructure.llm_pool.provider import LLMProvider, RetryPolicy, is_retryable
+from infrastructure.llm_pool.response_cache import ResponseCache
+
+
+class ServerError(Exception):
+    def __init__(self, code):
+        super().__init__(f"{code} error")
+        self.code = code
+
+
+class FlakyBackend:
+    """Fails ``failures`` times with ``code`` before answering."""
+
+    def __init__(self, failures, code=429):
+        self.failures = failures
+        self.code = code
+        self.calls = 0
+        self.answer = ReplayBackend()
+        self.answer.add(None, "ok", prompt_tokens=10, response_tokens=2)
+
+    def generate_content(self, prompt):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ServerError(self.code)
+        return self.answer.generate_content(prompt)
+
+
+@pytest.fixture
+def make_provider(tmp_path):
+    def make(backend, **retry):
+        sleeps = []
+        policy = RetryPolicy(seed=0, sleep=sleeps.append, **retry)
+        provider = LLMProvider(model_name="test-model", backend=backend, rate_limiter=RateLimiter(),
+                               response_cache=ResponseCache(str(tmp_path / "cache.db"), mode="off"),
+                               retry_policy=policy)
+        return provider, sleeps
+    return make
+
+
+class TestRetryPolicy:
+    """Test which errors are retried and how long to back off."""
+
+    def test_retryable_errors(self):
+        """Test 429 and 5xx are retried, client errors are not."""
+        assert is_retryable(ServerError(429))
+        assert is_retryable(ServerError(503))
+        assert not is_retryable(ServerError(400))
+        assert is_retryable(BackendError("429 Resource exhausted (simulated)"))
+        assert not is_retryable(ValueError("bad prompt"))
+
+    def test_backoff_is_jittered_and_capped(self):
+        """Test delays stay under the exponential cap and max delay."""
+        policy = RetryPolicy(base_delay=1.0, max_delay=5.0, seed=1)
+        for attempt in range(6):
+            assert 0 <= policy.backoff(attempt) <= min(5.0, 2 ** attempt)
+
+
+class TestLLMProvider:
+    """Test retries, budgets and metrics on the provider."""
+
+    def test_retries_then_succeeds(self, make_provider):
+        """Test transient 429s are retried with backoff."""
+        backend = FlakyBackend(failures=2)
+        provider, sleeps = make_provider(backend)
+
+        assert provider.generate("prompt").text == "ok"
+        assert backend.calls == 3
+        assert len(sleeps) == 2
+        metrics = provider.metrics()
+        assert metrics["llm_calls"] == 1
+        assert metrics["llm_retries"] == 2
+        assert metrics["llm_failures"] == 0
+
+    def test_non_retryable_fails_fast(self, make_provider):
+        """Test a 400 is raised without retrying."""
+        backend = FlakyBackend(failures=1, code=400)
+        provider, sleeps = make_provider(backend)
+
+        with pytest.raises(ServerError):
+            provider.generate("prompt")
+        assert backend.calls == 1
+        assert sleeps == []
+        assert provider.metrics()["llm_failures"] == 1
+
+    def test_retry_budget_shared_across_calls(self, make_provider):
+        """Test the budget stops retries once spent."""
+        backend = FlakyBackend(failures=100)
+        provider, _ = make_provider(backend, max_retries=5, retry_budget=3)
+
+        with pytest.raises(ServerError):
+            provider.generate("first")
+        with pytest.raises(ServerError):
+            provider.generate("second")
+        assert backend.calls == 5  # 1 + 3 retries, then 1 with no budget left
+        assert provider.metrics()["llm_retry_budget_left"] == 0
+
+    def test_retry_budget_refills_with_calls(self, make_provider):
+        """Test a spent budget is earned back by later calls instead of staying empty."""
+        provider, _ = make_provider(FlakyBackend(failures=100), max_retries=1, retry_budget=1, retry_ratio=0.5)
+        with pytest.raises(ServerError):
+            provider.generate("first")
+        assert provider.retry.budget < 1
+
+        backend = provider.model = FlakyBackend(failures=0)
+        provider.generate("second")
+        backend.failures, backend.calls = 1, 0
+        assert provider.generate("third").text == "ok"
+        assert backend.calls == 2
+
+    def test_every_attempt_reserves_with_limiter(self, make_provider):
+        """Test retries take their own reservation and failed attempts are settled."""
+        provider, _ = make_provider(FlakyBackend(failures=2))
+        limiter = provider.rate_limiter
+
+        provider.generate("prompt", estimated_tokens=100)
+
+        assert [count for _, count in limiter.token_history] == [0, 0, 12]
+        assert not limiter.reservations
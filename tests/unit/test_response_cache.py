@@ -0,0 +1,99 @@
+"""Unit tests for the LLM response cache."""
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from infrastructure.llm_pool.response_cache import (
+    CacheMissError, LLMResponse, ResponseCache, cache_key
+)
+
+
+class FakeModel:
+    """Stands in for GenerativeModel and counts calls."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def generate_content(self, prompt):
+        self.calls += 1
+        text = json.dumps({"is_suitable": True, "priority_score": 5, "reason": "ok"})
+        usage = SimpleNamespace(prompt_token_count=50, candidates_token_count=10)
+        return SimpleNamespace(text=text, usage_metadata=usage)
+
+
+class TestResponseCache:
+    """Test storage, expiry and eviction."""
+
+    def test_key_covers_model_config_and_prompt(self):
+        """Test any part of the request changes the key."""
+        base = cache_key("m", {"temperature": 0.3}, "p")
+        assert base == cache_key("m", {"temperature": 0.3}, "p")
+        assert base != cache_key("other", {"temperature": 0.3}, "p")
+        assert base != cache_key("m", {"temperature": 0.7}, "p")
+        assert base != cache_key("m", {"temperature": 0.3}, "q")
+
+    def test_put_and_get(self, tmp_path):
+        """Test a stored response comes back marked as cached."""
+        cache = ResponseCache(str(tmp_path / "cache.db"))
+        cache.put("k", "m", LLMResponse("hello", 10, 2))
+
+        hit = cache.get("k")
+        assert hit.text == "hello"
+        assert hit.prompt_tokens == 10
+        assert hit.cached
+        assert cache.get("missing") is None
+        assert cache.stats() == {"hits": 1, "misses": 1}
+
+    def test_ttl_expiry(self, tmp_path):
+        """Test entries older than the TTL are treated as misses."""
+        cache = ResponseCache(str(tmp_path / "cache.db"), ttl_seconds=-1)
+        cache.put("k", "m", LLMResponse("hello", 10, 2))
+        assert cache.get("k") is None
+
+    def test_lru_eviction(self, tmp_path):
+        """Test least recently used entries are evicted over the size limit."""
+        cache = ResponseCache(str(tmp_path / "cache.db"), max_entries=2)
+        cache.put("a", "m", LLMResponse("a", 1, 1))
+        cache.put("b", "m", LLMResponse("b", 1, 1))
+        cache.get("a")
+        cache.put("c", "m", LLMResponse("c", 1, 1))
+
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.get("c") is not None
+
+    def test_replay_mode_fails_on_miss(self, tmp_path):
+        """Test replay mode serves hits, never writes and raises on a miss."""
+        db = str(tmp_path / "cache.db")
+        ResponseCache(db).put("k", "m", LLMResponse("hello", 10, 2))
+        replay = ResponseCache(db, mode="replay")
+
+        assert replay.get("k").text == "hello"
+        replay.put("new", "m", LLMResponse("x", 1, 1))
+        with pytest.raises(CacheMissError):
+            replay.get("new")
+
+
+class TestGeminiLLMCaching:
+    """Test the client consults the cache before calling the model."""
+
+    @pytest.fixture
+    def llm(self, make_llm):
+        return make_llm(backend=FakeModel(), cache_mode="read_write")
+
+    def test_triage_served_from_cache(self, llm):
+        """Test an identical triage prompt is only sent once."""
+        first = llm.triage_issue("Crash on empty input", "body", ["bug"])
+        second = llm.triage_issue("Crash on empty input", "body", ["bug"])
+
+        assert first == second
+        assert llm.model.calls == 1
+        assert llm.rate_limiter.tokens_in_window() == 60
+
+    def test_replay_miss_propagates(self, llm, tmp_path):
+        """Test replay mode surfaces misses instead of a failed triage result."""
+        llm.response_cache = ResponseCache(str(tmp_path / "cache.db"), mode="replay")
+        with pytest.raises(CacheMissError):
+            llm.triage_issue("Unseen issue", "body", [])
+        assert llm.model.calls == 0
@@ -0,0 +1,77 @@
+"""Unit tests for the retrieval result cache."""
+from git import Repo
+
+from infrastructure.retrieval import retrieval_cache
+from infrastructure.retrieval.retrieval_cache import RetrievalCache
+
+
+class TestRetrievalCache:
+    """Test cache keys and invalidation."""
+
+    def setup_method(self):
+        """Set up test fixtures."""
+        self.results = [{"file_path": "src/a.py", "start_line": 1, "end_line": 10, "score": 0.9}]
+
+    def test_query_hash_is_normalized(self):
+        """Test whitespace and case do not change the key."""
+        assert retrieval_cache.query_hash("Fix  the\nBug") == retrieval_cache.query_hash("fix the bug")
+        assert retrieval_cache.query_hash("fix the bug") != retrieval_cache.query_hash("fix a bug")
+
+    def test_round_trip(self, tmp_path):
+        """Test stored results are returned for the same key only."""
+        cache = RetrievalCache(str(tmp_path / "cache.db"))
+        cache.put("repo", "v1", "cfg", "q", self.results)
+
+        assert cache.get("repo", "v1", "cfg", "q") == self.results
+        assert cache.get("repo", "v1", "other-cfg", "q") is None
+        cache.close()
+
+    def test_new_version_invalidates_old(self, tmp_path):
+        """Test writing a new index version drops stale entries."""
+        cache = RetrievalCache(str(tmp_path / "cache.db"))
+        cache.put("repo", "v1", "cfg", "q1", self.results)
+        cache.put("repo", "v2", "cfg", "q2", self.results)
+
+        assert cache.get("repo", "v1", "cfg", "q1") is None
+        assert cache.get("repo", "v2", "cfg", "q2") == self.results
+        cache.close()
+
+
+def test_index_version_tracks_commit_and_dirty_tree(tmp_path):
+    """Test index version changes with commits and uncommitted edits."""
+    assert retrieval_cache.index_version(str(tmp_path)) is None
+
+    repo = Repo.init(tmp_path)
+    (tmp_path / "a.py").write_text("x = 1\n")
+    repo.index.add(["a.py"])
+    repo.index.commit("init")
+
+    clean = retrieval_cache.index_version(str(tmp_path))
+    assert clean == repo.head.commit.hexsha
+
+    (tmp_path / "a.py").write_text("x = 2\n")
+    dirty = retrieval_cache.index_version(str(tmp_path))
+    assert dirty.startswith(clean + ":")
+
+
+def test_index_version_tracks_untracked_files(tmp_path):
+    """Test new untracked files change the version by path and content, ignored files do not."""
+    repo = Repo.init(tmp_path)
+    (tmp_path / ".gitignore").write_text("*.log\n")
+    repo.index.add([".gitignore"])
+    repo.index.commit("init")
+    clean = retrieval_cache.index_version(str(tmp_path))
+
+    (tmp_path / "build.log").write_text("noise\n")
+    assert retrieval_cache.index_version(str(tmp_path)) == clean
+
+    (tmp_path / "new.py").write_text("x = 1\n")
+    added = retrieval_cache.index_version(str(tmp_path))
+    assert added.startswith(clean + ":")
+
+    (tmp_path / "new.py").write_text("x = 2\n")
+    edited = retrieval_cache.index_version(str(tmp_path))
+    assert edited != added
+
+    (tmp_path / "new.py").rename(tmp_path / "other.py")
+    assert retrieval_cache.index_version(str(tmp_path)) not in (added, edited)
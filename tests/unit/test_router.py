@@ -0,0 +1,83 @@
+"""Unit tests for cascade model routing."""
+import json
+
+import pytest
+
+from infrastructure.llm_pool.router import CascadeRouter, estimate_complexity, router_from_config
+
+
+def make_issues(n):
+    return [{"title": f"Bug {i}", "body": "Crash", "labels": ["bug"]} for i in range(n)]
+
+
+@pytest.fixture
+def router(make_llm):
+    fast = make_llm({"is_suitable": True, "priority_score": 9}, model_name="gemini-2.5-flash",
+                    prompt_tokens=1000, response_tokens=100)
+    strong = make_llm({"is_suitable": True, "priority_score": 5}, model_name="gemini-2.5-pro",
+                      prompt_tokens=1000, response_tokens=100)
+    return CascadeRouter([("fast", fast), ("strong", strong)])
+
+
+class TestEstimateComplexity:
+    """Test the label and length heuristic."""
+
+    def test_labels_win(self):
+        """Test complexity labels override issue length."""
+        assert estimate_complexity("x " * 5000, ["good first issue"]) == "low"
+        assert estimate_complexity("short", ["Security"]) == "high"
+
+    def test_length(self):
+        """Test short issues are low and long ones high."""
+        assert estimate_complexity("Typo in README") == "low"
+        assert estimate_complexity("word " * 3000) == "high"
+
+
+class TestCascadeRouter:
+    """Test tier selection, escalation and per-tier accounting."""
+
+    def test_confident_triage_stays_on_fast_tier(self, router):
+        """Test confident verdicts never reach the strong model."""
+        results = router.triage_issues(make_issues(3), batch_size=1)
+
+        assert all(r["routed_tier"] == "fast" for r in results)
+        stats = router.stats()["tiers"]
+        assert stats["fast"]["llm_calls"] == 3
+        assert stats["fast"]["success_rate"] == 1.0
+        assert stats["strong"]["llm_calls"] == 0
+
+    def test_borderline_triage_escalates(self, router):
+        """Test borderline verdicts are re-triaged by the strong tier."""
+        router.llm("fast").model.add(None, json.dumps({"is_suitable": True, "priority_score": 5}))
+        results = router.triage_issues(make_issues(2), batch_size=1)
+
+        assert all(r["routed_tier"] == "strong" for r in results)
+        stats = router.stats()
+        assert stats["escalations"] == 2
+        assert stats["tiers"]["fast"]["failures"] == 2
+        # Borderline is final on the strongest tier
+        assert stats["tiers"]["strong"]["successes"] == 2
+
+    def test_cost_uses_model_prices(self, router):
+        """Test cost is computed from provider token counts and per-model prices."""
+        router.triage_issues(make_issues(1), batch_size=1)
+
+        fast = router.stats()["tiers"]["fast"]
+        assert fast["prompt_tokens"] == 1000
+        assert fast["cost_usd"] == pytest.approx((1000 * 0.30 + 100 * 2.50) / 1_000_000)
+
+    def test_patch_tier_and_escalation(self, router):
+        """Test only low-complexity issues start cheap and escalation stops at the top."""
+        assert router.patch_tier("low") == "fast"
+        assert router.patch_tier("medium") == "strong"
+        assert router.escalate("fast", "validation failed") == "strong"
+        assert router.escalate("strong", "validation failed") == "strong"
+        assert router.stats()["escalations"] == 1
+
+    def test_single_policy(self, make_llm):
+        """Test the single policy routes everything to the strong model."""
+        strong = make_llm({"is_suitable": True, "priority_score": 9}, model_name="gemini-2.5-pro")
+        router = router_from_config({"routing_policy": "single"}, strong, lambda name: None)
+
+        assert router.tier_names == ["strong"]
+        assert router.patch_tier("low") == "strong"
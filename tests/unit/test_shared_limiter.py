@@ -0,0 +1,48 @@
+"""Unit tests for the cross-process rate limiter."""
+from infrastructure.llm_pool.client import RateLimiter
+from infrastructure.llm_pool.shared_limiter import SharedRateLimiter
+
+
+class TestSharedRateLimiter:
+    """Test the SQLite-backed shared window."""
+
+    def test_instances_share_one_bucket(self, tmp_path):
+        """Test two limiters on the same file see each other's usage."""
+        db = str(tmp_path / "limit.db")
+        first = SharedRateLimiter(db, tokens_per_minute=1000)
+        second = SharedRateLimiter(db, tokens_per_minute=1000)
+
+        assert first.acquire(600) == 0
+        assert second.acquire(600) > 0
+        assert second.acquire(400) == 0
+        assert first.tokens_in_window() == 1000
+
+    def test_requests_per_minute(self, tmp_path):
+        """Test the request cap is enforced independently of tokens."""
+        limiter = SharedRateLimiter(str(tmp_path / "limit.db"), requests_per_minute=2)
+
+        assert limiter.acquire(10) == 0
+        assert limiter.acquire(10) == 0
+        assert limiter.acquire(10) > 0
+
+    def test_record_usage_settles_reservation(self, tmp_path):
+        """Test actual usage replaces the reserved estimate."""
+        limiter = SharedRateLimiter(str(tmp_path / "limit.db"), tokens_per_minute=1000)
+
+        limiter.acquire(800)
+        limiter.record_usage(150)
+        assert limiter.tokens_in_window() == 150
+
+        limiter.record_usage(50)  # No reservation outstanding
+        assert limiter.tokens_in_window() == 200
+
+
+def test_in_process_limiter_reserves():
+    """Test RateLimiter follows the same reserve-then-settle protocol."""
+    limiter = RateLimiter(tokens_per_minute=1000)
+
+    assert limiter.acquire(700) == 0
+    assert limiter.acquire(700) > 0
+    limiter.record_usage(100)
+    assert limiter.tokens_in_window() == 100
+    assert limiter.acquire(700) == 0
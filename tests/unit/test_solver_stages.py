@@ -0,0 +1,193 @@
+"""Unit tests for the stage-checkpointed solver pipeline."""
+import json
+import uuid
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from git import Repo
+
+from agents.solver.solver_agent import STAGES, SolverAgent
+from data.database import Database
+from infrastructure.llm_pool.backends import ReplayBackend
+
+PATCH = json.dumps({
+    "patch_text": "--- a/calc.py\n+++ b/calc.py\n@@ -1,2 +1,2 @@\n def add(a, b):\n-    return a - b\n+    return a + b\n",
+    "explanation": "fix"
+})
+
+
+class FakeGitHub:
+    def __init__(self):
+        self.calls = 0
+
+    def get_repo_issues(self, repo_url):
+        self.calls += 1
+        label = SimpleNamespace(name="bug")
+        return [
+            SimpleNamespace(number=7, title="add() subtracts", body="calc.add returns a - b", labels=[label]),
+            SimpleNamespace(number=8, title="add() is wrong", body="calc.add(1, 2) gives -1", labels=[label]),
+        ]
+
+
+@pytest.fixture
+def repo(tmp_path):
+    path = tmp_path / "upstream"
+    path.mkdir()
+    (path / "calc.py").write_text("def add(a, b):\n    return a - b\n")
+    git = Repo.init(path)
+    git.index.add(["calc.py"])
+    git.index.commit("init")
+    return str(path)
+
+
+@pytest.fixture
+def make_solver(tmp_path, monkeypatch):
+    monkeypatch.delenv("OPENFIX_LLM_BACKEND", raising=False)
+    db = Database(str(tmp_path / "openfix.db"))
+    config = {
+        "llm_backend": "replay",
+        "llm_model": f"solver-test-{uuid.uuid4().hex[:8]}",  # Providers are pooled per model name
+        "routing_policy": "single",
+        "llm_cache_mode": "off",
+        "llm_hedge": False,
+        "artifact_store": False,
+        "stream_patches": False,
+        "rate_limit_db": str(tmp_path / "ratelimit.db"),
+        "db_path": str(tmp_path / "openfix.db"),
+        "runs_dir": str(tmp_path / "runs"),
+        "patch_dir": str(tmp_path / "patches"),
+        "issue_number": 7,
+    }
+
+    def make(run_id=None):
+        solver = SolverAgent(config, db, run_id=run_id)
+        solver.github_client = FakeGitHub()
+        backend = ReplayBackend()
+        backend.add(None, PATCH)
+        solver.llm.provider.model = backend
+        monkeypatch.setattr(solver, "_run_validation", lambda state, patch_path, attempt: (True, "ok"))
+        return solver
+
+    return make, db
+
+
+class TestStageRecords:
+    """Test the run_stages table."""
+
+    def test_completed_stages(self, tmp_path):
+        """Test only completed stages are returned, with their outputs."""
+        db = Database(str(tmp_path / "openfix.db"))
+        db.start_stage("run", "fetch")
+        db.complete_stage("run", "fetch", {"issue": {"number": 1}})
+        db.start_stage("run", "clone")
+        db.fail_stage("run", "clone", "network down")
+        assert db.get_completed_stages("run") == {"fetch": {"issue": {"number": 1}}}
+
+        db.start_stage("run", "clone")
+        db.complete_stage("run", "clone", {"commit": "abc"})
+        assert list(db.get_completed_stages("run")) == ["fetch", "clone"]
+
+
+class TestResume:
+    """Test restarting a crashed run after its last completed stage."""
+
+    def test_full_run_records_every_stage(self, make_solver, repo):
+        """Test a successful run records all stages and the final status."""
+        make, db = make_solver
+        result = make().execute(repo)
+
+        assert result["patch_generated"] and result["validation_passed"]
+        assert list(db.get_completed_stages(result["run_id"])) == list(STAGES)
+        assert db.get_run(result["run_id"])["status"] == "SUCCESS"
+
+    def test_resume_after_crash(self, make_solver, repo, monkeypatch):
+        """Test a run that crashed while generating skips fetch and indexing when resumed."""
+        make, db = make_solver
+        solver = make()
+
+        def crash(state):
+            raise RuntimeError("process killed")
+        monkeypatch.setattr(solver, "_generate", crash)
+        with pytest.raises(RuntimeError):
+            solver.execute(repo)
+        run = db.get_run(solver.run_id)
+        assert (run["status"], run["github_issue_number"]) == ("FAILED", 7)
+        assert list(db.get_completed_stages(solver.run_id)) == ["fetch", "clone", "index", "retrieve"]
+
+        resumed = make(run_id=solver.run_id)
+        monkeypatch.setattr(resumed, "_index", lambda state: pytest.fail("index re-run"))
+        result = resumed.execute(run["github_url"], resume=True)
+
+        assert result["patch_generated"] and result["chunks_selected"] >= 1
+        assert resumed.github_client.calls == 0
+        assert db.get_run(solver.run_id)["status"] == "SUCCESS"
+        assert list(db.get_completed_stages(solver.run_id)) == list(STAGES)
+
+    def test_resume_completed_run(self, make_solver, repo):
+        """Test resuming a finished run returns its recorded result without work."""
+        make, _ = make_solver
+        result = make().execute(repo)
+        resumed = make(run_id=result["run_id"])
+        again = resumed.execute(repo, resume=True)
+        assert again["patch_path"] == result["patch_path"]
+        assert resumed.github_client.calls == 0
+
+
+class TestBatch:
+    """Test solving several issues against one clone and index."""
+
+    def test_clone_and_index_shared(self, make_solver, repo, monkeypatch):
+        """Test the repo is cloned and chunked once and reset between issues."""
+        make, db = make_solver
+        solver = make()
+        clones, indexes, seen = [], [], []
+        clone_repo, create_chunks = solver.ingestor.clone_repo, solver._create_chunks
+        monkeypatch.setattr(solver.ingestor, "clone_repo", lambda url: clones.append(url) or clone_repo(url))
+        monkeypatch.setattr(solver, "_create_chunks", lambda text: indexes.append(1) or create_chunks(text))
+
+        def validate(state, patch_path, attempt):
+            # Validation leaves the patch applied to the shared checkout
+            calc = Path(solver.ingestor.temp_dir) / "calc.py"
+            seen.append(calc.read_text())
+            calc.write_text("patched\n")
+            (calc.parent / "build.log").write_text("x")
+            return True, "ok"
+        monkeypatch.setattr(solver, "_run_validation", validate)
+
+        results = solver.execute_batch(repo, [7, 8, 99])
+
+        assert [r["issue_number"] for r in results] == [7, 8, 99]
+        assert all(r["patch_generated"] for r in results[:2])
+        assert "not found" in results[2]["error"]
+        assert (len(clones), len(indexes)) == (1, 1)
+        assert seen[1] == seen[0] and "a - b" in seen[1]
+        assert len({r["run_id"] for r in results}) == 3
+        assert list(db.get_completed_stages(results[1]["run_id"])) == list(STAGES)
+        assert not Path(solver.ingestor.temp_dir).exists()
+
+    def test_shared_chunks_unchanged_between_issues(self, make_solver, repo, monkeypatch):
+        """Test truncating one issue's selected chunks leaves the shared chunk list intact."""
+        big = Path(repo) / "big.py"
+        big.write_text("".join(f"value_{i} = {i}  # padding padding padding\n" for i in range(300)))
+        git = Repo(repo)
+        git.index.add(["big.py"])
+        git.index.commit("big file")
+
+        make, _ = make_solver
+        solver = make()
+        contents, selected = [], []
+        retrieve = solver._retrieve
+
+        def record(state):
+            contents.append([c.content for c in state['shared']['chunks']])
+            result = retrieve(state)
+            selected.append(state['selected_chunks'])
+            return result
+        monkeypatch.setattr(solver, "_retrieve", record)
+
+        solver.execute_batch(repo, [7, 8])
+
+        assert len(contents) == 2 and contents[1] == contents[0]
+        assert not any("truncated from" in content for content in contents[1])
+        assert any("truncated from" in c.content for c in selected[0])
@@ -0,0 +1,107 @@
+"""Unit tests for speculative patch candidates."""
+import subprocess
+import time
+
+import pytest
+
+from agents.solver.speculative import SpeculativeSolver, candidate_specs, pack_candidate_chunks, speculative_result
+from infrastructure.code_graph.chunk_selector import CodeChunk
+from infrastructure.llm_pool.deadline import deadline_scope
+
+# Passes patches containing GOOD, hangs on SLOW, fails the rest
+VALIDATE_SCRIPT = """#!/bin/bash
+while [[ $# -gt 0 ]]; do
+    case $1 in
+        --patch) PATCH="$2"; shift 2 ;;
+        --output-dir) OUT="$2"; shift 2 ;;
+        *) shift 2 ;;
+    esac
+done
+if grep -q SLOW "$PATCH"; then sleep 30; fi
+if grep -q GOOD "$PATCH"; then VERDICT=pass; else VERDICT=fail; fi
+echo "{\\"verdict\\": \\"$VERDICT\\"}" > "$OUT/validation.json"
+"""
+
+MARKERS = {0.2: "SLOW", 0.6: "GOOD", 1.0: "BAD"}
+
+
+@pytest.fixture
+def repo(tmp_path):
+    path = tmp_path / "repo"
+    path.mkdir()
+    (path / "app.py").write_text("x = 1\n")
+    for cmd in (["init", "-q"], ["add", "."],
+                ["-c", "user.name=t", "-c", "user.email=t@t", "commit", "-q", "-m", "init"]):
+        subprocess.run(["git", *cmd], cwd=path, check=True)
+    return path
+
+
+@pytest.fixture
+def make_solver(tmp_path, make_llm):
+    script = tmp_path / "validate.sh"
+    script.write_text(VALIDATE_SCRIPT)
+    script.chmod(0o755)
+
+    def make(markers):
+        def llm_for(temperature):
+            diff = f"--- a/app.py\n+++ b/app.py\n@@ -1 +1 @@\n-x = 1\n+x = 2  # {markers[temperature]}\n"
+            return make_llm({"patch_text": diff})
+        return SpeculativeSolver(llm_for, k=3, validate_script=str(script))
+    return make
+
+
+@pytest.fixture
+def solver(make_solver):
+    return make_solver(MARKERS)
+
+
+def make_chunks():
+    return [CodeChunk("b.py", 1, 10, "b"), CodeChunk("a.py", 20, 30, "a2"), CodeChunk("a.py", 1, 10, "a1")]
+
+
+class TestCandidateSpecs:
+    """Test how candidates vary."""
+
+    def test_specs_are_distinct(self):
+        """Test no two candidates share temperature and packing."""
+        specs = candidate_specs(9)
+        assert len({(s["temperature"], s["packing"]) for s in specs}) == 9
+
+    def test_packings(self):
+        """Test chunk packing variants."""
+        chunks = make_chunks()
+        assert pack_candidate_chunks(chunks, "ranked") == chunks
+        assert [c.content for c in pack_candidate_chunks(chunks, "by_file")] == ["a1", "a2", "b"]
+        assert pack_candidate_chunks(chunks, "focused") == chunks[:2]
+
+
+class TestSpeculativeSolver:
+    """Test first-pass-wins validation in worktrees."""
+
+    def test_first_passing_candidate_wins(self, solver, repo, tmp_path):
+        """Test the passing candidate wins and the hanging one is cancelled."""
+        start = time.time()
+        outcome = solver.run("Fix x", make_chunks(), "repo", 1, tmp_path / "run", str(repo), "run-1")
+
+        assert time.time() - start < 20
+        assert outcome["winner"]["index"] == 1
+        assert "GOOD" in outcome["winner"]["result"]["diff"]
+        assert outcome["cancelled"] >= 1  # At least the hanging validation
+        assert outcome["cancelled"] + len(outcome["candidates"]) == 3
+        assert (tmp_path / "run" / "speculative.json").exists()
+        worktrees = subprocess.run(["git", "worktree", "list"], cwd=repo, capture_output=True, text=True)
+        assert len(worktrees.stdout.strip().splitlines()) == 1
+        assert (repo / "app.py").read_text() == "x = 1\n"
+
+    def test_deadline_during_validation(self, make_solver, repo, tmp_path):
+        """Test a deadline passing while every candidate validates ends with a failed result."""
+        solver = make_solver({t: "SLOW" for t in MARKERS})
+        start = time.time()
+        with deadline_scope(0.5):
+            outcome = solver.run("Fix x", make_chunks(), "repo", 1, tmp_path / "run", str(repo), "run-1")
+
+        assert time.time() - start < 20
+        assert (outcome["winner"], outcome["candidates"], outcome["cancelled"]) == (None, [], 3)
+        result = speculative_result(outcome)
+        assert result["success"] is False
+        assert result["reason"] == "Run deadline exceeded before any candidate finished"
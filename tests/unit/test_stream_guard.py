@@ -0,0 +1,114 @@
+"""Unit tests for streaming patch generation with early abort."""
+import json
+
+import pytest
+
+from infrastructure.llm_pool.backends import ReplayBackend
+from infrastructure.llm_pool.stream_guard import StreamGuard, decode_partial_json_string
+
+
+def feed_in_pieces(guard, text, size=7):
+    for i in range(0, len(text), size):
+        reason = guard.feed(text[i:i + size])
+        if reason:
+            return reason, i + size
+    return None, len(text)
+
+
+class TestStreamGuard:
+    """Test abort detection on streamed prefixes."""
+
+    def test_decode_partial_json_string(self):
+        """Test escapes split across chunks are held back."""
+        assert decode_partial_json_string('a\\nb\\') == ("a\nb", False)
+        assert decode_partial_json_string('a\\u00e9"rest') == ("aé", True)
+
+    def test_refusal_aborts_with_reason(self):
+        """Test a refusal is reported once its reason is complete."""
+        text = json.dumps({"patch_text": "CANNOT_FIX_SAFELY: needs a schema migration",
+                           "explanation": "x" * 2000})
+        reason, consumed = feed_in_pieces(StreamGuard(), text)
+
+        assert reason == "needs a schema migration"
+        assert consumed < len(text) // 2
+
+    def test_invalid_header_aborts(self):
+        """Test a patch that does not start with a diff header is rejected."""
+        text = json.dumps({"patch_text": "Here is the fix:\n--- a/x.py\n+++ b/x.py\n" + "+y\n" * 500})
+        reason, consumed = feed_in_pieces(StreamGuard(), text)
+
+        assert reason.startswith("Invalid diff header")
+        assert consumed < 100
+
+    def test_path_outside_repo_aborts(self, tmp_path):
+        """Test escaping paths and missing files are rejected when a repo is known."""
+        (tmp_path / "app.py").write_text("x = 1\n")
+        guard = StreamGuard(str(tmp_path))
+        assert guard.feed("--- a/../../etc/passwd\n").startswith("Patch touches path outside")
+
+        guard = StreamGuard(str(tmp_path))
+        assert guard.feed("--- a/missing.py\n").startswith("Patch modifies a file that does not exist")
+
+    def test_valid_patch_streams_to_end(self, tmp_path):
+        """Test a well-formed diff is never aborted."""
+        (tmp_path / "app.py").write_text("x = 1\n")
+        diff = "--- a/app.py\n+++ b/app.py\n@@ -1 +1 @@\n-x = 1\n+x = 2\n"
+        reason, _ = feed_in_pieces(StreamGuard(str(tmp_path)), json.dumps({"patch_text": diff}))
+        assert reason is None
+
+    def test_removed_double_dash_line_is_not_a_header(self, tmp_path):
+        """Test a removed "-- comment" line inside a hunk is not read as a file header."""
+        (tmp_path / "schema.sql").write_text("-- old comment\nSELECT 1;\n")
+        diff = ("--- a/schema.sql\n+++ b/schema.sql\n@@ -1,2 +1,2 @@\n"
+                "--- old comment\n+-- new comment\n SELECT 1;\n")
+        reason, _ = feed_in_pieces(StreamGuard(str(tmp_path)), json.dumps({"patch_text": diff}))
+        assert reason is None
+
+    def test_added_double_plus_line_is_not_a_header(self, tmp_path):
+        """Test an added "++ x" line inside a hunk is not read as a file header."""
+        (tmp_path / "main.c").write_text("int x = 0;\n")
+        diff = ("--- a/main.c\n+++ b/main.c\n@@ -1 +1,2 @@\n"
+                " int x = 0;\n+++ /etc/passwd\n")
+        reason, _ = feed_in_pieces(StreamGuard(str(tmp_path)), json.dumps({"patch_text": diff}))
+        assert reason is None
+
+    def test_header_after_hunk_is_checked(self, tmp_path):
+        """Test file headers following a finished hunk are still checked."""
+        (tmp_path / "app.py").write_text("x = 1\n")
+        diff = ("--- a/app.py\n+++ b/app.py\n@@ -1 +1 @@\n-x = 1\n+x = 2\n"
+                "--- a/missing.py\n+++ b/missing.py\n")
+        reason, _ = feed_in_pieces(StreamGuard(str(tmp_path)), json.dumps({"patch_text": diff}))
+        assert reason.startswith("Patch modifies a file that does not exist")
+
+
+class TestStreamingGeneratePatch:
+    """Test GeminiLLM cancels the stream on abort."""
+
+    @pytest.fixture
+    def llm(self, make_llm):
+        return make_llm(backend=ReplayBackend(stream_chunk_chars=20), cache_mode="read_write")
+
+    def test_refusal_stops_stream(self, llm, tmp_path):
+        """Test a refusal stops reading chunks and is not cached."""
+        text = json.dumps({"patch_text": "CANNOT_FIX_SAFELY: ambiguous requirements",
+                           "explanation": "x" * 4000})
+        llm.model.add(None, text)
+
+        result = llm.generate_patch("Bug", [], "repo", 1, tmp_path / "artifacts", stream=True)
+
+        assert result["aborted"] is True
+        assert result["reason"] == "ambiguous requirements"
+        assert llm.model.chunks_streamed < 10
+        rows = llm.response_cache.conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+        assert rows == 0
+
+    def test_valid_patch_matches_non_streaming(self, llm, tmp_path):
+        """Test streaming returns the same result as a blocking call."""
+        (tmp_path / "app.py").write_text("x = 1\n")
+        diff = "--- a/app.py\n+++ b/app.py\n@@ -1 +1 @@\n-x = 1\n+x = 2\n"
+        llm.model.add(None, json.dumps({"patch_text": diff}))
+
+        result = llm.generate_patch("Bug", [], "repo", 1, tmp_path / "artifacts",
+                                    stream=True, repo_root=str(tmp_path))
+        assert result["success"] is True
+        assert result["diff"] == diff
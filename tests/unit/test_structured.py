@@ -0,0 +1,110 @@
+"""Unit tests for schema-constrained JSON output."""
+import json
+
+import pytest
+
+from infrastructure.llm_pool.structured import (
+    StructuredOutput, StructuredOutputError, repair_json, to_response_schema, validate
+)
+
+
+@pytest.fixture
+def structured_llm(text_llm):
+    def make(text, structured_output=True):
+        return text_llm(text, structured_output=structured_output)
+    return make
+
+
+class TestRepairJson:
+    """Test the local fix-up pass."""
+
+    def test_fences_and_trailing_commas(self):
+        """Test markdown fences, preamble and trailing commas are removed."""
+        text = 'Here you go:\n```json\n{"a": [1, 2,], "b": "x",}\n```'
+        assert json.loads(repair_json(text)) == {"a": [1, 2], "b": "x"}
+
+    def test_raw_newlines_in_strings(self):
+        """Test unescaped newlines inside strings are escaped."""
+        text = '{"patch_text": "--- a/x\n+++ b/x\n"}'
+        assert json.loads(repair_json(text))["patch_text"] == "--- a/x\n+++ b/x\n"
+
+    def test_truncated_output_is_closed(self):
+        """Test a response cut off mid-string is closed."""
+        assert json.loads(repair_json('{"reason": "too long", "labels": ["bug", "ui')) == {
+            "reason": "too long", "labels": ["bug", "ui"]
+        }
+
+    def test_trailing_text_ignored(self):
+        """Test text after the first complete value is dropped."""
+        assert json.loads(repair_json('{"a": 1} and {"b": 2}')) == {"a": 1}
+
+
+class TestStructuredOutput:
+    """Test schema conversion, validation and coercion."""
+
+    def test_response_schema_for_gemini(self):
+        """Test unsupported keywords are dropped and types upper-cased."""
+        schema = to_response_schema(StructuredOutput("triage_response").schema)
+        assert schema["type"] == "OBJECT"
+        assert schema["properties"]["priority_score"] == {
+            "type": "INTEGER", "description": "Priority for automation, 10 highest"
+        }
+        assert "$schema" not in schema and "title" not in schema
+
+    def test_validate_errors(self):
+        """Test type, enum and range violations are reported."""
+        schema = StructuredOutput("triage_response").schema
+        errors = validate({"is_suitable": "yes", "estimated_complexity_score": "huge", "priority_score": 11}, schema)
+        assert len(errors) == 3
+
+    def test_coercion_counts_as_fixed(self):
+        """Test string scalars and enum case are coerced to the schema."""
+        output = StructuredOutput("triage_response")
+        data = output.parse('{"is_suitable": "true", "priority_score": "7", "estimated_complexity_score": "Low"}')
+
+        assert data == {"is_suitable": True, "priority_score": 7, "estimated_complexity_score": "low"}
+        assert output.stats() == {"parsed": 0, "fixed": 1, "failed": 0}
+
+    def test_unfixable_raises(self):
+        """Test a response that cannot match raises instead of passing through."""
+        output = StructuredOutput("patch_response")
+        with pytest.raises(StructuredOutputError):
+            output.parse('{"explanation": "no patch"}')
+        assert output.stats()["failed"] == 1
+
+
+class TestStructuredClient:
+    """Test GeminiLLM requests and parses structured output."""
+
+    def test_requests_response_schema(self, structured_llm):
+        """Test triage calls carry the JSON mime type and schema."""
+        llm = structured_llm(json.dumps({"is_suitable": True, "priority_score": 8}))
+        result = llm.triage_issue("Bug", "Crash", ["bug"])
+
+        assert result["priority_score"] == 8
+        config = llm.model.configs[0]
+        assert config["response_mime_type"] == "application/json"
+        assert config["response_schema"]["required"] == ["is_suitable"]
+
+    def test_unstructured_mode_sends_no_config(self, structured_llm):
+        """Test structured_output=False still validates but requests nothing."""
+        llm = structured_llm(json.dumps({"is_suitable": False}), structured_output=False)
+        llm.triage_issue("Bug", "Crash", ["bug"])
+        assert llm.model.configs == [None]
+
+    def test_garbage_patch_fails_without_raw_fallback(self, structured_llm, tmp_path):
+        """Test a non-JSON, non-diff patch response fails instead of becoming the diff."""
+        llm = structured_llm("I think you should change --- and +++ somewhere")
+        result = llm.generate_patch("Fix", [], "repo", 1, tmp_path / "run")
+
+        assert result["success"] is False
+        assert result["reason"].startswith("Invalid patch response")
+
+    def test_fixed_up_patch_succeeds(self, structured_llm, tmp_path):
+        """Test a fenced response with a raw newline is recovered locally."""
+        llm = structured_llm('```json\n{"patch_text": "--- a/x.py\n+++ b/x.py\n@@ -1 +1 @@\n-a\n+b\n",}\n```')
+        result = llm.generate_patch("Fix", [], "repo", 1, tmp_path / "run")
+
+        assert result["success"] is True
+        assert result["diff"].startswith("--- a/x.py\n")
+        assert llm.structured_stats()["patch_response"]["fixed"] == 1
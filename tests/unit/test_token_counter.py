@@ -0,0 +1,59 @@
+"""Unit tests for token counting and context packing."""
+from infrastructure.code_graph.chunk_selector import ChunkSelector, CodeChunk
+from infrastructure.llm_pool.token_counter import TokenCounter, approximate_tokens
+
+
+class TestTokenCounter:
+    """Test estimates, calibration and exact counts."""
+
+    def test_code_costs_more_than_prose(self):
+        """Test punctuation-dense code is not undercounted like len // 4."""
+        code = "if (x[i] != y[j]) { z += f(a, b); }\n" * 10
+        assert approximate_tokens(code) > len(code) // 4
+
+    def test_observe_calibrates_ratio(self):
+        """Test real counts from responses scale later estimates."""
+        counter = TokenCounter()
+        text = "def handler(event): return event['body']"
+        raw = counter.count(text)
+
+        counter.observe(text, raw * 2)
+        assert counter.ratio == 2.0
+        assert counter.count(text) == raw * 2
+
+    def test_exact_count_is_cached(self):
+        """Test the exact counter is called once per distinct text."""
+        calls = []
+
+        def count_fn(text):
+            calls.append(text)
+            return 42
+
+        counter = TokenCounter(count_fn=count_fn)
+        assert counter.count("hello world", exact=True) == 42
+        assert counter.count("hello world", exact=True) == 42
+        assert counter.count("hello world") == 42
+        assert len(calls) == 1
+
+    def test_exact_count_failure_falls_back(self):
+        """Test a failing provider count falls back to the estimate."""
+        def count_fn(text):
+            raise RuntimeError("offline")
+
+        counter = TokenCounter(count_fn=count_fn)
+        assert counter.count("hello world", exact=True) == approximate_tokens("hello world")
+
+
+class TestContextPacking:
+    """Test token-budgeted chunk selection."""
+
+    def test_pack_chunks_respects_budget(self):
+        """Test chunks over budget are skipped but the best chunk is kept."""
+        selector = ChunkSelector()
+        counter = TokenCounter()
+        big = CodeChunk("big.py", 1, 100, "value = compute(a, b)\n" * 200)
+        small = CodeChunk("small.py", 1, 2, "x = 1\n")
+        budget = counter.count(big.content) + counter.count(small.content)
+
+        assert selector.pack_chunks([big, big, small], budget, counter) == [big, small]
+        assert selector.pack_chunks([big], 1, counter) == [big]
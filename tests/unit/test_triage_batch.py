@@ -0,0 +1,78 @@
+"""Unit tests for batched multi-issue triage."""
+import asyncio
+import json
+import re
+from types import SimpleNamespace
+
+import pytest
+
+from infrastructure.llm_pool.async_client import AsyncGeminiLLM
+
+
+class BatchModel:
+    """Answers batch prompts with an array that omits issues listed in ``drop``."""
+
+    def __init__(self, drop=()):
+        self.drop = set(drop)
+        self.prompts = []
+
+    def _answer(self, prompt):
+        self.prompts.append(prompt)
+        ids = [int(n) for n in re.findall(r"--- ISSUE (\d+) ---", prompt)]
+        if not ids:
+            text = json.dumps({"is_suitable": False, "reason": "single"})
+        else:
+            text = "```json\n" + json.dumps([
+                {"issue_id": i, "is_suitable": True, "priority_score": i} for i in ids if i not in self.drop
+            ]) + "\n```"
+        usage = SimpleNamespace(prompt_token_count=100, candidates_token_count=10)
+        return SimpleNamespace(text=text, usage_metadata=usage)
+
+    def generate_content(self, prompt):
+        return self._answer(prompt)
+
+    async def generate_content_async(self, prompt):
+        return self._answer(prompt)
+
+
+@pytest.fixture
+def llm(make_llm):
+    return make_llm(backend=BatchModel())
+
+
+def make_issues(n):
+    return [{"title": f"Bug {i}", "body": "Crash", "labels": ["bug"]} for i in range(n)]
+
+
+class TestBatchedTriage:
+    """Test batching, ordering and fallback."""
+
+    def test_one_call_per_batch(self, llm):
+        """Test N issues cost ceil(N / batch_size) calls when all parse."""
+        results = llm.triage_issues(make_issues(8), batch_size=4)
+
+        assert len(llm.model.prompts) == 2
+        assert [r["priority_score"] for r in results] == [1, 2, 3, 4, 1, 2, 3, 4]
+
+    def test_missing_verdicts_fall_back(self, llm):
+        """Test issues absent from the array are triaged individually."""
+        llm.model.drop = {2}
+        results = llm.triage_issues(make_issues(3), batch_size=3)
+
+        assert len(llm.model.prompts) == 2
+        assert results[1] == {"is_suitable": False, "reason": "single"}
+        assert results[2]["is_suitable"] is True
+
+    def test_unparseable_batch_falls_back(self, llm):
+        """Test a non-JSON batch response retries every issue."""
+        assert llm._parse_triage_batch_response("not json", 2) == [None, None]
+
+    def test_async_batches(self, llm):
+        """Test the async client batches and falls back the same way."""
+        llm.model.drop = {1}
+        results = asyncio.run(AsyncGeminiLLM(llm).triage_many(make_issues(5), batch_size=2))
+
+        # Batches [0, 1] and [2, 3] plus the trailing single and two fallbacks
+        assert len(llm.model.prompts) == 5
+        assert results[0]["reason"] == "single"
+        assert results[1]["priority_score"] == 2
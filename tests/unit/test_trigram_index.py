@@ -0,0 +1,64 @@
+"""Unit tests for the trigram index."""
+from infrastructure.retrieval.trigram_index import TrigramIndex, extract_exact_terms
+from infrastructure.code_graph.chunk_selector import ChunkSelector, CodeChunk
+
+
+class TestTrigramIndex:
+    """Test exact substring and regex lookup."""
+
+    def setup_method(self):
+        """Set up test fixtures."""
+        self.index = TrigramIndex.from_texts([
+            "def load_config(path):\n    return yaml.safe_load(path)",
+            "MAX_RETRIES = 3\nraise ValueError('Invalid token')",
+            "class DealerHand:\n    pass",
+        ])
+
+    def test_substring_search(self):
+        """Test exact substring lookup."""
+        assert self.index.search("load_config") == [0]
+        assert self.index.search("MAX_RETRIES") == [1]
+        assert self.index.search("missing_name") == []
+
+    def test_case_insensitive_search(self):
+        """Test case-insensitive verification."""
+        assert self.index.search("dealerhand") == []
+        assert self.index.search("dealerhand", case_sensitive=False) == [2]
+
+    def test_short_needle_scans(self):
+        """Test needles shorter than a trigram still match."""
+        assert self.index.search("3\n") == [1]
+
+    def test_regex_search(self):
+        """Test regex lookup with and without required literals."""
+        assert self.index.search_regex(r"raise \w+Error") == [1]
+        assert self.index.search_regex(r"class \w+Hand") == [2]
+        assert self.index.search_regex(r"(yaml|Dealer)") == [0, 2]
+
+
+def test_extract_exact_terms():
+    """Test identifiers and error strings are pulled from issue text."""
+    terms = extract_exact_terms(
+        "Crash in `load_config` when MAX_RETRIES is set: \"Invalid token\" from yaml.safe_load"
+    )
+    assert "load_config" in terms
+    assert "MAX_RETRIES" in terms
+    assert "Invalid token" in terms
+    assert "yaml.safe_load" in terms
+    assert "Crash" not in terms
+
+
+def test_exact_hits_rank_first():
+    """Test exact identifier hits outrank keyword scoring."""
+    selector = ChunkSelector()
+    chunks = [
+        CodeChunk("src/dealer.py", 1, 10, "dealer logic dealer bug"),
+        CodeChunk("src/util.py", 1, 10, "def parse_hand_value(): pass"),
+    ]
+    index = selector.build_index(chunks)
+
+    selected = selector.select_chunks(
+        chunks, "dealer bug in `parse_hand_value`", top_k=2, trigram_index=index
+    )
+    assert selected[0].file_path == "src/util.py"
+    assert selected[0].exact_matches == 1